@@ -0,0 +1,39 @@
+"""Add endpoint_change feed and binary_ml_model.version
+
+Revision ID: 5e8a2f4c7b10
+Revises: b3f1c7d2a9e4
+Create Date: 2022-12-19 14:05:12.736912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a2f4c7b10'
+down_revision = 'b3f1c7d2a9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'endpoint_change',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('endpoint_id', sa.Integer(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_endpoint_change_id'), 'endpoint_change', ['id'], unique=True)
+    op.create_index(op.f('ix_endpoint_change_endpoint_id'), 'endpoint_change', ['endpoint_id'], unique=False)
+    op.create_index(op.f('ix_endpoint_change_changed_at'), 'endpoint_change', ['changed_at'], unique=False)
+    op.add_column('binary_ml_model', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('binary_ml_model') as batch_op:
+        batch_op.drop_column('version')
+    op.drop_index(op.f('ix_endpoint_change_changed_at'), table_name='endpoint_change')
+    op.drop_index(op.f('ix_endpoint_change_endpoint_id'), table_name='endpoint_change')
+    op.drop_index(op.f('ix_endpoint_change_id'), table_name='endpoint_change')
+    op.drop_table('endpoint_change')
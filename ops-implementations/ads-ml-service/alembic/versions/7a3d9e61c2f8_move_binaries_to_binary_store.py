@@ -0,0 +1,59 @@
+"""Move model binaries to the binary store
+
+Revision ID: 7a3d9e61c2f8
+Revises: 5e8a2f4c7b10
+Create Date: 2023-01-09 10:42:37.214306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import app.db.binary_store as app_binary_store
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d9e61c2f8'
+down_revision = '5e8a2f4c7b10'
+branch_labels = None
+depends_on = None
+
+binary_ml_model = sa.table(
+    'binary_ml_model',
+    sa.column('id', sa.Integer),
+    sa.column('model_b64', sa.LargeBinary),
+    sa.column('hash', sa.String),
+    sa.column('size', sa.BigInteger))
+
+
+def upgrade():
+    op.add_column('binary_ml_model', sa.Column('hash', sa.String(length=64), nullable=True))
+    op.add_column('binary_ml_model', sa.Column('size', sa.BigInteger(), nullable=True))
+    connection = op.get_bind()
+    store = app_binary_store.get_store()
+    # one binary in memory at a time
+    for binary_id, in connection.execute(sa.select(binary_ml_model.c.id)).fetchall():
+        binary = connection.execute(
+            sa.select(binary_ml_model.c.model_b64).where(binary_ml_model.c.id == binary_id)).scalar()
+        connection.execute(
+            binary_ml_model.update().where(binary_ml_model.c.id == binary_id).values(
+                hash=store.put(binary), size=len(binary)))
+    with op.batch_alter_table('binary_ml_model') as batch_op:
+        batch_op.alter_column('hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.alter_column('size', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_column('model_b64')
+    op.create_index(op.f('ix_binary_ml_model_hash'), 'binary_ml_model', ['hash'], unique=False)
+
+
+def downgrade():
+    # binaries are kept in the store
+    op.add_column('binary_ml_model', sa.Column('model_b64', sa.LargeBinary(), nullable=True))
+    connection = op.get_bind()
+    store = app_binary_store.get_store()
+    for binary_id, key in connection.execute(sa.select(binary_ml_model.c.id, binary_ml_model.c.hash)).fetchall():
+        connection.execute(
+            binary_ml_model.update().where(binary_ml_model.c.id == binary_id).values(model_b64=store.read(key)))
+    op.drop_index(op.f('ix_binary_ml_model_hash'), table_name='binary_ml_model')
+    with op.batch_alter_table('binary_ml_model') as batch_op:
+        batch_op.alter_column('model_b64', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_column('size')
+        batch_op.drop_column('hash')
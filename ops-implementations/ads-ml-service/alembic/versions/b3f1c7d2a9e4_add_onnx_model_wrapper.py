@@ -0,0 +1,28 @@
+"""Add ONNX to modelwrapper
+
+Revision ID: b3f1c7d2a9e4
+Revises: 4d2c7cb1e02d
+Create Date: 2022-12-12 10:21:37.418265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c7d2a9e4'
+down_revision = '4d2c7cb1e02d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # enum columns are plain strings without constraint on other databases
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE modelwrapper ADD VALUE IF NOT EXISTS 'ONNX'")
+
+
+def downgrade():
+    # postgresql can not drop a value from an enum type, ONNX binaries have to be removed before downgrading
+    pass
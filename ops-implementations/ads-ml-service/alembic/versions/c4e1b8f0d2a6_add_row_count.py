@@ -0,0 +1,31 @@
+"""Add row_count of the model and endpoint tables
+
+Revision ID: c4e1b8f0d2a6
+Revises: 7a3d9e61c2f8
+Create Date: 2023-01-16 10:21:47.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1b8f0d2a6'
+down_revision = '7a3d9e61c2f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'row_count',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+    for table in ('model', 'endpoint'):
+        op.execute(f"INSERT INTO row_count (table_name, value) SELECT '{table}', COUNT(*) FROM {table}")
+
+
+def downgrade():
+    op.drop_table('row_count')
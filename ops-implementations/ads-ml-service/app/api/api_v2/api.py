@@ -21,6 +21,7 @@ import app.api.api_v2.endpoints.capabilities as capabilities
 import app.api.api_v2.endpoints.endpoints as endpoints
 import app.api.api_v2.endpoints.info as info
 import app.api.api_v2.endpoints.login as login
+import app.api.api_v2.endpoints.metrics as metrics
 import app.api.api_v2.endpoints.models as models
 import app.api.api_v2.endpoints.predictions as predictions
 import app.api.api_v2.endpoints.users as users
@@ -32,6 +33,7 @@ api_router.include_router(users.router, prefix='/users', tags=['account'])
 api_router.include_router(login.router, tags=['login'])
 api_router.include_router(info.router, tags=['info'])
 api_router.include_router(capabilities.router, tags=['info'])
+api_router.include_router(metrics.router, tags=['info'])
 api_router.include_router(models.router)
 api_router.include_router(upload.router)
 api_router.include_router(endpoints.router)
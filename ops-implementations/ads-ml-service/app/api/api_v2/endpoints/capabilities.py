@@ -42,8 +42,8 @@ async def server_capabilities() -> typing.Dict[typing.Text, typing.Any]:
         'managed_capabilities': {
             'supported_input_data_structure': ['auto', 'DataFrame', 'ndarray', 'DMatrix', 'list'],
             'supported_output_data_structure': ['auto', 'DataFrame', 'ndarray', 'list'],
-            'supported_binary_format': ['pickle', 'joblib', 'pmml', 'bst'],
-            'supported_upload_format': ['pmml'],
+            'supported_binary_format': ['pickle', 'joblib', 'pmml', 'bst', 'onnx'],
+            'supported_upload_format': ['pmml', 'onnx'],
             'file_size_limit': app_conf.get_config().UPLOAD_SIZE_LIMIT,
             'unknown_file_size': True
         }
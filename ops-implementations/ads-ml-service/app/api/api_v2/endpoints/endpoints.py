@@ -23,8 +23,13 @@ import sqlalchemy.orm as saorm
 import starlette.status as status
 
 import app.api.deps as deps
+import app.api.discovery as app_discovery
+import app.api.pagination as app_pagination
 import app.crud as crud
+import app.db.session as app_db_session
 import app.gen.schemas.ops_schemas as ops_schemas
+import app.models as models
+import app.runtime.cache as app_cache
 import app.schemas as schemas
 import app.schemas.impl as impl
 import app.core.configuration as app_conf
@@ -34,35 +39,38 @@ router = fastapi.APIRouter()
 
 @router.get(
     path='/endpoints',
-    response_model=ops_schemas.Endpoints,
+    response_model=impl.EndpointsImpl,
     tags=['discover']
 )
-def get_endpoints(
-        db: saorm.Session = fastapi.Depends(deps.get_db),
+async def get_endpoints(
+        request: fastapi.Request,
+        db: app_db_session.LazySession = fastapi.Depends(deps.get_lazy_db),
         model_id: typing.Optional[int] = -1,
         total_count: typing.Optional[bool] = False,
         offset: typing.Optional[int] = 0,
-        limit: typing.Optional[int] = 100
-) -> typing.Dict[typing.Text, typing.Any]:
-    if not (0 < limit <= app_conf.get_config().MAX_PAGE_SIZE and offset >= 0):
-        raise fastapi.HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Requested offset/limit is not valid')
-    if model_id != -1:
-        model = crud.model.get(db, id=model_id)
-        if model is None:
-            raise fastapi.HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f'Model with id {model_id} is not found')
+        limit: typing.Optional[int] = 100,
+        cursor: typing.Optional[str] = None
+) -> responses.Response:
+    after = app_pagination.check(offset, limit, cursor)
+
+    def build() -> typing.Dict[typing.Text, typing.Any]:
+        if model_id != -1:
+            model = crud.model.get(db, id=model_id)
+            if model is None:
+                raise fastapi.HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail=f'Model with id {model_id} is not found')
+            return {
+                'endpoints': [impl.EndpointImpl.from_database(model.endpoint)],
+                'total_count': 0 if not total_count else 1
+            }
+        page = crud.endpoint.get_listing(db, after=after, skip=offset, limit=limit + 1)
         return {
-            'endpoints': [impl.EndpointImpl.from_database(model.endpoint)],
-            'total_count': 0 if not total_count else 1
+            'endpoints': [impl.EndpointImpl.from_listing(row) for row in page[:limit]],
+            'total_count': 0 if not total_count else crud.row_count.get_count(db, mapped=models.Endpoint),
+            'links': app_pagination.links(request, page, limit)
         }
-    return {
-        'endpoints': [
-            impl.EndpointImpl.from_database(endpoint)
-            for endpoint in crud.endpoint.get_multi(db, skip=offset, limit=limit)
-        ],
-        'total_count': 0 if not total_count else crud.endpoint.count(db)
-    }
+
+    return await app_discovery.materialized(request, impl.EndpointsImpl, build)
 
 
 @router.get(
@@ -98,7 +106,10 @@ def patch_endpoint(
     endpoint_in = e_in.dict(exclude_unset=True)
     if endpoint_in.get('metadata'):
         endpoint_in['metadata_'] = endpoint_in.pop('metadata')
+    # discovery pages listing the endpoint are materialized again
+    version = app_cache.cache.record(db, endpoint_id)
     crud.endpoint.update(db, db_obj=endpoint, obj_in=schemas.EndpointUpdate(**endpoint_in))
+    app_cache.cache.published(endpoint_id, version)
     return impl.EndpointImpl.from_database(endpoint)
 
 
@@ -115,5 +126,8 @@ def delete_endpoint(
     if endpoint is None:
         raise fastapi.HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f'Endpoint with id {endpoint_id} is not found')
+    version = app_cache.cache.record(db, endpoint_id)
     crud.endpoint.delete(db, id=endpoint_id)
+    app_cache.cache.published(endpoint_id, version)
+    crud.binary_ml_model.prune_store(db)
     return responses.Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -20,7 +20,7 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from ... import deps
 from .... import crud
@@ -28,33 +28,38 @@ from ....core.configuration import get_config
 from .... import schemas
 from ....core import security
 from .... import models
+from ....db.session import LazySession
+from ....runtime import token_cache
 
 router = APIRouter()
 
 
 @router.post('/login/access-token', response_model=schemas.Token, include_in_schema=False)
-def login_access_token(
-        db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login_access_token(
+        db: LazySession = Depends(deps.get_lazy_db), form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
-    user = crud.user.authenticate(
-        db, username=form_data.username, password=form_data.password
-    )
-    if user is None:
+    """
+    Password verification runs in the threads of `security.get_hashing_pool`, the user of the new token is cached
+    """
+    user = await run_in_threadpool(crud.user.get_by_username, db, username=form_data.username)
+    if user is None or not await security.verify_pwd_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Incorrect username of password'
         )
     access_token_expires = timedelta(minutes=get_config().ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        subject=user.id, expires_delta=access_token_expires
+    )
+    token_cache.tokens.put(access_token, user, deps.decode_token(access_token).exp)
     return {
-        'access_token': security.create_access_token(
-            subject=user.id, expires_delta=access_token_expires
-        ),
+        'access_token': access_token,
         'token_type': 'bearer'
     }
 
 
 @router.post('/login/test-token', response_model=schemas.User, include_in_schema=False)
-def test_token(
+async def test_token(
       current_user: models.User = Depends(deps.get_current_user)
 ) -> Any:
     return current_user
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import typing
+
+import fastapi
+
+import app.runtime.batching as app_batching
+import app.runtime.cache as app_cache
+import app.runtime.discovery_cache as app_discovery_cache
+import app.runtime.inference as app_inference
+import app.runtime.pmml_gateways as app_pmml_gateways
+import app.runtime.result_cache as app_result_cache
+import app.runtime.token_cache as app_token_cache
+
+router = fastapi.APIRouter()
+
+
+@router.get(
+    path='/metrics'
+)
+async def server_metrics() -> typing.Dict[typing.Text, typing.Any]:
+    return {
+        'discovery_cache': app_discovery_cache.pages.stats(),
+        'inference': app_inference.get_executor().stats(),
+        'micro_batching': app_batching.batchers.stats(),
+        'model_cache': app_cache.cache.stats(),
+        'pmml_gateways': app_pmml_gateways.get_pool().stats(),
+        'result_cache': app_result_cache.result_caches.stats(),
+        'token_cache': app_token_cache.tokens.stats()
+    }
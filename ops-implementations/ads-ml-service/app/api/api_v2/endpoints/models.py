@@ -17,22 +17,29 @@
 
 import logging
 import typing
-import io
 
 import fastapi
 import fastapi.encoders as encoders
 import fastapi.responses as responses
 import sqlalchemy.orm as saorm
+import starlette.concurrency as concurrency
 import starlette.status as status
 
 import app.api.deps as deps
+import app.api.discovery as app_discovery
+import app.api.download as app_download
+import app.api.pagination as app_pagination
 import app.crud as crud
+import app.db.binary_store as app_binary_store
+import app.db.session as app_db_session
 import app.gen.schemas.ops_schemas as ops_schemas
+import app.runtime.cache as app_cache
 import app.runtime.model_upload as app_model_upload
 import app.runtime.inspection as app_runtime_inspection
 import app.schemas as schemas
 import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as impl
+import app.schemas.runtime_config as app_runtime_config
 import app.core.configuration as app_conf
 import app.models as models
 
@@ -45,22 +52,25 @@ LOGGER = logging.getLogger(__name__)
     response_model=impl.ModelsImpl,
     tags=['discover']
 )
-def get_models(
-        db: saorm.Session = fastapi.Depends(deps.get_db),
+async def get_models(
+        request: fastapi.Request,
+        db: app_db_session.LazySession = fastapi.Depends(deps.get_lazy_db),
         total_count: typing.Optional[bool] = False,
         offset: typing.Optional[int] = 0,
-        limit: typing.Optional[int] = 100
-) -> typing.Dict[typing.Text, typing.Any]:
-    if not (0 < limit <= app_conf.get_config().MAX_PAGE_SIZE and offset >= 0):
-        raise fastapi.HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Requested offset/limit is not valid')
-    return {
-        'models': [
-            impl.ModelImpl.from_database(model)
-            for model in crud.model.get_multi(db, skip=offset, limit=limit)
-        ],
-        'total_count': 0 if not total_count else crud.model.count(db)
-    }
+        limit: typing.Optional[int] = 100,
+        cursor: typing.Optional[str] = None
+) -> responses.Response:
+    after = app_pagination.check(offset, limit, cursor)
+
+    def build() -> typing.Dict[typing.Text, typing.Any]:
+        page = crud.model.get_listing(db, after=after, skip=offset, limit=limit + 1)
+        return {
+            'models': [impl.ModelImpl.from_listing(row) for row in page[:limit]],
+            'total_count': 0 if not total_count else crud.row_count.get_count(db, mapped=models.Model),
+            'links': app_pagination.links(request, page, limit)
+        }
+
+    return await app_discovery.materialized(request, impl.ModelsImpl, build)
 
 
 @router.get(
@@ -92,6 +102,8 @@ def add_model(
         db: saorm.Session = fastapi.Depends(deps.get_db)
 ) -> typing.Dict[typing.Text, typing.Any]:
     model = crud.model.create(db, obj_in=schemas.ModelCreate())
+    # discovery pages listing the model are materialized again
+    version = app_cache.cache.record(db, model.id)
     crud.model_config.create_with_model(
         db,
         obj_in=schemas.ModelConfigCreate(
@@ -100,6 +112,7 @@ def add_model(
         model_id=model.id
     )
     LOGGER.info('Created model \'%s\'', model.id)
+    app_cache.cache.published(model.id, version)
     return impl.ModelImpl.from_database(
         db_obj=model
     )
@@ -124,11 +137,14 @@ def patch_model(
         field: update_data[field] if field in update_data else model.config.configuration[field]
         for field in model.config.configuration
     }
+    # runtime options and input schema are read when the model is loaded
+    version = app_cache.cache.record(db, model_id)
     crud.model_config.update(
         db,
         db_obj=model.config,
         obj_in=schemas.ModelConfigUpdate(configuration=new_config)
     )
+    app_cache.cache.published(model_id, version)
     return impl.ModelImpl.from_database(
         db_obj=model
     )
@@ -148,7 +164,10 @@ def delete_model(
     if model is None:
         raise fastapi.HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f'Model with id {model_id} is not found')
+    version = app_cache.cache.record(db, model_id)
     crud.model.delete(db, id=model_id)
+    app_cache.cache.published(model_id, version)
+    crud.binary_ml_model.prune_store(db)
     return responses.Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -173,17 +192,23 @@ async def add_binary(
 
     model_binary = await file.read()
 
-    if not app_model_upload.is_compatible(model_binary, format_):
+    # the model is loaded once, outside of the event loop, and serves the first predictions
+    uploaded = await concurrency.run_in_threadpool(
+        app_model_upload.UploadedModel.load, model_binary, format_,
+        app_runtime_config.RuntimeOptions.from_metadata(
+            None if model.config is None else model.config.configuration.get('metadata')))
+    if uploaded is None:
         raise fastapi.HTTPException(status_code=422, detail='Can not deserialize model binary')
 
-    m = app_model_upload.store_model(
-        db,
-        model_binary,
-        input_data_structure=input_data_structure,
-        output_data_structure=output_data_structure,
-        format_=format_,
-        model_id=model_id
-    )
+    m, executor, version = await concurrency.run_in_threadpool(
+        lambda: app_model_upload.store_model(
+            db,
+            uploaded,
+            input_data_structure=input_data_structure,
+            output_data_structure=output_data_structure,
+            model_id=model_id
+        ))
+    app_cache.cache.add(m, executor, len(model_binary), app_cache.cache.published(m, version))
     return impl.EndpointImpl.from_database(crud.endpoint.get(db, id=m))
 
 
@@ -199,12 +224,15 @@ def get_model_metadata(
         case None:
             raise fastapi.HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f'Model with id {model_id} is not found')
-        case models.BinaryMlModel(format=app_binary_config.ModelWrapper.PICKLE | app_binary_config.ModelWrapper.JOBLIB as format):
+        case models.BinaryMlModel(
+                format=app_binary_config.ModelWrapper.PICKLE
+                | app_binary_config.ModelWrapper.JOBLIB
+                | app_binary_config.ModelWrapper.ONNX as format):
             return ops_schemas.AdditionalModelInfo(
                 modelPackage=format.value,
                 modelType='other')
-        case models.BinaryMlModel(format=app_binary_config.ModelWrapper.PMML, model_b64=binary):
-            match app_runtime_inspection.inspect_pmml_subtype(binary):
+        case models.BinaryMlModel(format=app_binary_config.ModelWrapper.PMML, hash=key) as binary:
+            match app_runtime_inspection.stored_pmml_subtype(key, lambda: binary.model_b64):
                 case 'Scorecard' | 'RuleSetModel' as typ:
                     return ops_schemas.AdditionalModelInfo(
                         modelPackage='pmml',
@@ -225,36 +253,39 @@ def get_model_metadata(
     tags=['discover'])
 def get_model_binary(
         model_id: int,
+        request: fastapi.Request,
         db: saorm.Session = fastapi.Depends(deps.get_db)):
     LOGGER.info('Retrieving model binary for id: %s', model_id)
 
-    model = crud.model.get(db=db, id=model_id)
+    download = crud.binary_ml_model.get_download(db, model_id=model_id)
 
-    if model is None:
+    if download is None:
         raise fastapi.HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f'Model with id {model_id} is not found')
 
-    filename = model.config.configuration['name']
+    filename = download.configuration['name']
 
-    try:
-        binary = model.endpoint.binary
-    except AttributeError:
+    if download.hash is None:
         raise fastapi.HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f'Model binary with id {model_id} is not found')
 
-    if binary.format == app_binary_config.ModelWrapper.PMML:
+    if download.format == app_binary_config.ModelWrapper.PMML:
         file_extension = 'pmml'
-    elif binary.format == app_binary_config.ModelWrapper.PICKLE:
+    elif download.format == app_binary_config.ModelWrapper.PICKLE:
         file_extension = 'pickle'
-    elif binary.format == app_binary_config.ModelWrapper.JOBLIB:
+    elif download.format == app_binary_config.ModelWrapper.JOBLIB:
         file_extension = 'joblib'
+    elif download.format == app_binary_config.ModelWrapper.ONNX:
+        file_extension = 'onnx'
     else:
         file_extension = 'bin'
 
     LOGGER.info('Downloading model binary with name %s and format %s', filename, file_extension)
 
-    return responses.StreamingResponse(
-        content=io.BytesIO(binary.model_b64),
-        media_type='application/octet-stream',
-        headers={'Content-Disposition': 'attachment; filename="{basename}.{extension}"'.format(
-            basename=filename, extension=file_extension)})
+    return app_download.binary_response(
+        request,
+        app_binary_store.get_store(),
+        download.hash,
+        download.size,
+        filename='{basename}.{extension}'.format(basename=filename, extension=file_extension),
+        compression_level=app_conf.get_config().DOWNLOAD_COMPRESSION_LEVEL)
@@ -19,30 +19,43 @@ import logging
 import typing
 
 import fastapi
-import sqlalchemy.orm as saorm
+import fastapi.responses as responses
+import pydantic
 import starlette.status as status
 
 import app.api.deps as deps
 import app.core.uri as ops_uri
+import app.db.session as app_db_session
 import app.gen.schemas.ops_schemas as ops_schemas
+import app.runtime.batching as app_batching
 import app.runtime.cache as app_cache
+import app.runtime.inference as app_inference
+import app.runtime.result_cache as app_result_cache
 import app.schemas.impl as impl
 
 router = fastapi.APIRouter()
 LOGGER = logging.getLogger(__name__)
 
 
-@router.post(
-    path='/predictions',
-    response_model=ops_schemas.PredictionResponse
-)
-async def predict(
-        pre_in: impl.PredictionImpl,
-        db: saorm.Session = fastapi.Depends(deps.get_db)
-) -> typing.Dict[typing.Text, typing.Any]:
-    LOGGER.info('Prediction input: %s', pre_in)
+def inline_schema(model: typing.Type[pydantic.BaseModel]) -> typing.Dict[typing.Text, typing.Any]:
+    """Json schema of a model with its definitions inlined, for bodies that are not declared as parameters"""
+    schema = model.schema()
+    definitions = schema.pop('definitions', {})
+
+    def resolve(node: typing.Any) -> typing.Any:
+        if isinstance(node, typing.Dict):
+            if '$ref' in node:
+                return resolve(definitions[node['$ref'].split('/')[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, typing.List):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
 
-    endpoint_resources = (link for link in pre_in.target if link.rel == 'endpoint')
+
+def get_endpoint_id(target: typing.List[ops_schemas.Link]) -> int:
+    endpoint_resources = (link for link in target if link.rel == 'endpoint')
     endpoint_resource = next(endpoint_resources, None)
     if endpoint_resource is None or next(endpoint_resources, None) is not None:
         raise fastapi.HTTPException(
@@ -59,13 +72,77 @@ async def predict(
     if resource_path != '/endpoints':
         raise fastapi.HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='/predictions only accept /endpoints as target')
+    return resource_id
+
+
+@router.post(
+    path='/predictions',
+    response_model=ops_schemas.PredictionResponse,
+    # the body is decoded by `deps.get_prediction_input`
+    openapi_extra={
+        'requestBody': {
+            'content': {'application/json': {'schema': inline_schema(impl.PredictionImpl)}},
+            'required': True
+        }
+    }
+)
+async def predict(
+        pre_in: impl.PredictionImpl = fastapi.Depends(deps.get_prediction_input),
+        db: app_db_session.LazySession = fastapi.Depends(deps.get_lazy_db)
+) -> responses.ORJSONResponse:
+    LOGGER.info('Prediction input: %s', pre_in)
 
-    deserialized = app_cache.cache.get_deserialized_model(db, endpoint_id=resource_id)
-    if not deserialized:
+    resource_id = get_endpoint_id(pre_in.target)
+
+    cached = app_cache.cache.peek(resource_id)
+    result_cache = app_result_cache.result_caches.get(resource_id, cached) \
+        if cached is not None and pre_in.parameters \
+        else None
+    if result_cache is not None:
+        result_key = result_cache.key(pre_in.parameters)
+        prediction_output = result_cache.get(result_key)
+        if prediction_output is not None:
+            LOGGER.info('Prediction output (cached): %s', prediction_output)
+            return responses.ORJSONResponse(prediction_output)
+
+    if cached is not None and cached.options.micro_batching.enabled:
+        prediction_output = await app_batching.batchers.get(resource_id, cached).predict(pre_in.parameters)
+    else:
+        prediction_output = await app_inference.get_executor().predict(
+            db, resource_id, 'predict', pre_in.parameters)
+    if prediction_output is None:
         raise fastapi.HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail='Requested model not found.')
-
-    prediction_output = deserialized.predict(pre_in.parameters)
+    if result_cache is not None:
+        result_cache.put(result_key, prediction_output)
 
     LOGGER.info('Prediction output: %s', prediction_output)
-    return prediction_output
+    # results may contain numpy arrays: returned as is to be serialized by orjson without response_model validation
+    return responses.ORJSONResponse(prediction_output)
+
+
+@router.post(
+    path='/predictions/columnar',
+    response_model=ops_schemas.PredictionResponse
+)
+async def predict_columnar(
+        pre_in: impl.ColumnarPredictionImpl,
+        db: app_db_session.LazySession = fastapi.Depends(deps.get_lazy_db)
+) -> responses.ORJSONResponse:
+    LOGGER.info('Columnar prediction input: %s columns', len(pre_in.columns))
+
+    resource_id = get_endpoint_id(pre_in.target)
+
+    try:
+        prediction_output = await app_inference.get_executor().predict(
+            db, resource_id, 'predict_columnar', pre_in.columns, pre_in.data)
+    except (ValueError, TypeError) as e:
+        LOGGER.exception('Columnar input can not be converted')
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'Columnar input can not be converted: {e}')
+    if prediction_output is None:
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail='Requested model not found.')
+
+    LOGGER.debug('Columnar prediction output: %s', prediction_output)
+    return responses.ORJSONResponse(prediction_output)
@@ -21,14 +21,16 @@ import typing
 
 import fastapi
 import sqlalchemy.orm as saorm
+import starlette.concurrency as concurrency
 import starlette.status as status
 
 import app.api.deps as deps
 import app.crud as crud
+import app.runtime.cache as app_cache
 import app.runtime.model_upload as app_model_upload
 import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as impl
-import app.runtime.inspection as app_inspection
+import app.schemas.runtime_config as app_runtime_config
 
 router = fastapi.APIRouter()
 LOGGER = logging.getLogger(__name__)
@@ -52,34 +54,32 @@ async def upload(
     model_binary = await file.read()
     LOGGER.debug('Received model length: %s', len(model_binary))
 
-    file_format = app_model_upload.infer_file_format(model_binary, file_extension)
+    binary_format = app_model_upload.format_from_extension(file_extension)
+    file_format = app_binary_config.ModelWrapper.PMML if binary_format is None else binary_format
     LOGGER.debug('Inferred Model format: %s', file_format)
 
-    if file_format is None:
+    # the model is loaded once, outside of the event loop, and serves the first predictions
+    uploaded = await concurrency.run_in_threadpool(
+        app_model_upload.UploadedModel.load, model_binary, file_format, app_runtime_config.RuntimeOptions())
+    if uploaded is None and binary_format is None:
         LOGGER.error(
             'Model is not supported: %s', file.filename)
         raise fastapi.HTTPException(
             status_code=422,
             detail='Model is not supported: %s' % file.filename
         )
-
-    if not app_model_upload.is_compatible(model_binary, file_format):
+    if uploaded is None:
         raise fastapi.HTTPException(status_code=422, detail=f'Model can not be loaded. Model type: {file_format}')
 
-    if file_format is app_binary_config.ModelWrapper.PMML:
-        inspected_name = app_inspection.inspect_pmml_model_name(model_binary)
-        model_name = inspected_name if inspected_name is not None else file_name
-    else:
-        model_name = file_name
-
-    m = app_model_upload.store_model(
-        db,
-        model_binary,
-        input_data_structure,
-        output_data_structure,
-        file_format,
-        name=model_name
-    )
+    m, executor, version = await concurrency.run_in_threadpool(
+        lambda: app_model_upload.store_model(
+            db,
+            uploaded,
+            input_data_structure,
+            output_data_structure,
+            name=uploaded.name(file_name)
+        ))
+    app_cache.cache.add(m, executor, len(model_binary), app_cache.cache.published(m, version))
 
     return impl.ModelImpl.from_database(
         db_obj=crud.model.get(db, id=m)
@@ -17,21 +17,22 @@
 
 from typing import Text
 
-from app.schemas import UserUpdate
 from fastapi import APIRouter, Depends, Body
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from ... import deps
 from .... import crud
 from .... import models
 from .... import schemas
+from ....core import security
+from ....db.session import LazySession
+from ....runtime import token_cache
 
 router = APIRouter()
 
 
 @router.get('/me', response_model=schemas.User, include_in_schema=False)
-def get_user_self(
+async def get_user_self(
     *,
     current_user: models.User = Depends(deps.get_current_user)
 ):
@@ -42,21 +43,24 @@ def get_user_self(
 
 
 @router.put('/me', response_model=schemas.User, include_in_schema=False)
-def update_user_self(
+async def update_user_self(
     *,
-    db: Session = Depends(deps.get_db),
+    db: LazySession = Depends(deps.get_lazy_db),
     username: Text = Body(None),
     password: Text = Body(None),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """
-    Update current user
+    Update current user, the new password is hashed in the threads of `security.get_hashing_pool`
     """
-    current_user_data = jsonable_encoder(current_user)
-    user_in = UserUpdate(**current_user_data)
+    user_in = {}
     if username is not None:
-        user_in.username = username
+        user_in['username'] = username
     if password is not None:
-        user_in.password = password
-    user = crud.user.update(db, db_obj=current_user, obj_in=user_in)
+        user_in['hashed_password'] = (await security.get_pwd_hash_async(password)).encode()
+    # a cached user is not attached to the session, it is merged without being read again
+    user = await run_in_threadpool(
+        lambda: crud.user.update(db, db_obj=db.merge(current_user, load=False), obj_in=user_in))
+    # other tokens of the user would keep its former name
+    token_cache.tokens.invalidate(user.id)
     return user
@@ -15,13 +15,22 @@
 #
 
 
+import email.message
+import json
 import typing
 
 import fastapi
+import fastapi.dependencies.utils as fdeps
+import fastapi.exceptions as fexc
+import fastapi.params as fparams
 import fastapi.security as fsec
+import fastapi.utils as futils
 import jwt
+import orjson
 import pydantic as pyd
+import pydantic.error_wrappers as pyd_errors
 import sqlalchemy.orm as saorm
+import starlette.concurrency as concurrency
 import starlette.status as status
 
 import app.core.configuration as conf
@@ -29,12 +38,19 @@ import app.core.security as security
 import app.crud as crud
 import app.db.session as session
 import app.models as models
+import app.runtime.token_cache as app_token_cache
 import app.schemas as schemas
+import app.schemas.decoding as decoding
+import app.schemas.impl as impl
 
 reusable_oauth2 = fsec.OAuth2PasswordBearer(
     tokenUrl=f'/login/access-token'
 )
 
+# same field as the one fastapi creates for a `pre_in: impl.PredictionImpl` body parameter
+prediction_body = futils.create_response_field(
+    name='pre_in', type_=impl.PredictionImpl, required=True, field_info=fparams.Body(...))
+
 
 def get_db() -> typing.Iterable[saorm.Session]:
     db = None
@@ -45,20 +61,98 @@ def get_db() -> typing.Iterable[saorm.Session]:
         db.close()
 
 
-def get_current_user(
-        db: saorm.Session = fastapi.Depends(get_db), token: typing.Text = fastapi.Depends(reusable_oauth2)
-) -> models.User:
+async def get_lazy_db() -> typing.AsyncIterable[session.LazySession]:
+    """
+    Session opened by the first query, for routes which are mostly served without the database. Unlike `get_db`,
+    no worker thread is used to enter and leave the dependency.
+    """
+    db = session.LazySession()
+    try:
+        yield db
+    finally:
+        if db.opened:
+            await concurrency.run_in_threadpool(db.close)
+
+
+def decode_token(token: typing.Text) -> schemas.token.TokenData:
+    """Claims of a valid token"""
     try:
         payload = jwt.decode(
             token, conf.get_config().SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = schemas.token.TokenData(**payload)
+        return schemas.token.TokenData(**payload)
     except (jwt.PyJWTError, pyd.ValidationError):
         raise fastapi.HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail='Not valid credentials'
         )
-    user = crud.user.get(db, id=token_data.sub)
+
+
+async def get_current_user(
+        db: session.LazySession = fastapi.Depends(get_lazy_db), token: typing.Text = fastapi.Depends(reusable_oauth2)
+) -> models.User:
+    """
+    User of the token. Tokens verified before are served from `app.runtime.token_cache` without decoding them again
+    nor querying the database.
+    """
+    user = app_token_cache.tokens.get(token)
+    if user is not None:
+        return user
+    token_data = decode_token(token)
+    user = await concurrency.run_in_threadpool(crud.user.get, db, id=token_data.sub)
     if user is None:
         raise fastapi.HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+    app_token_cache.tokens.put(token, user, token_data.exp)
     return user
+
+
+def is_json(request: fastapi.Request) -> bool:
+    """Whether fastapi reads the body as json, without content type or with a json content type"""
+    content_type = request.headers.get('content-type')
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message['content-type'] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == 'application' and (subtype == 'json' or subtype.endswith('+json'))
+
+
+async def read_body(request: fastapi.Request) -> typing.Any:
+    """Body as fastapi reads it for a body parameter: json with the json module, raw bytes for other content types"""
+    try:
+        body = await request.body()
+        if not body:
+            return None
+        return await request.json() if is_json(request) else body
+    except json.JSONDecodeError as e:
+        raise fexc.RequestValidationError([pyd_errors.ErrorWrapper(e, ('body', e.pos))], body=e.doc)
+    except Exception:
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='There was an error parsing the body')
+
+
+async def get_prediction_input(request: fastapi.Request) -> impl.PredictionImpl:
+    """
+    Decodes the body of a prediction like fastapi does for a `pre_in: impl.PredictionImpl` body parameter. When
+    `FAST_REQUEST_DECODING` is enabled, well-formed json bodies are parsed by orjson and skip pydantic validation.
+    Bodies orjson does not accept (`NaN`, integers of more than 64 bits) and other requests take the default path and
+    produce the usual errors.
+    """
+    payload = None
+    if conf.get_config().FAST_REQUEST_DECODING and is_json(request):
+        body = await request.body()
+        try:
+            payload = orjson.loads(body) if body else None
+        except orjson.JSONDecodeError:
+            payload = None
+        else:
+            decoded = decoding.decode_prediction(payload)
+            if decoded is not None:
+                return decoded
+    if payload is None:
+        payload = await read_body(request)
+
+    values, errors = await fdeps.request_body_to_args([prediction_body], payload)
+    if errors:
+        raise fexc.RequestValidationError(errors, body=payload)
+    return values[prediction_body.name]
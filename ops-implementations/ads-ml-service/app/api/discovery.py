@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+"""
+Discovery responses served from the materialized pages of `app.runtime.discovery_cache`.
+
+Pages carry an `ETag`, the hash of their body, and the time of the last known change of the catalog as
+`Last-Modified`. Polls sending them back in `If-None-Match` or `If-Modified-Since` get `304` while the catalog does
+not change, without opening a database session nor serializing anything.
+"""
+
+
+import datetime as dt
+import email.utils
+import typing
+
+import fastapi
+import fastapi.encoders as encoders
+import fastapi.responses as responses
+import pydantic
+import starlette.concurrency as concurrency
+import starlette.status as status
+
+import app.api.download as app_download
+import app.runtime.discovery_cache as app_discovery_cache
+
+
+def not_modified(request: fastapi.Request, etag: typing.Text, modified_at: typing.Optional[dt.datetime]) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return app_download.matches(if_none_match, (etag,))
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if if_modified_since is None or modified_at is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=dt.timezone.utc)
+    return modified_at.replace(microsecond=0) <= since
+
+
+async def materialized(
+        request: fastapi.Request,
+        response_model: typing.Type[pydantic.BaseModel],
+        build: typing.Callable[[], typing.Dict[typing.Text, typing.Any]]
+) -> responses.Response:
+    """
+    Page of the request, the content of a page which is not cached for the current generation is read from the database
+    by `build` in the thread pool
+    """
+    pages = app_discovery_cache.pages
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    generation = pages.generation
+    page = pages.get(key)
+    if page is None:
+        content = await concurrency.run_in_threadpool(lambda: encoders.jsonable_encoder(response_model(**build())))
+        page = pages.put(key, responses.ORJSONResponse(content).body, generation)
+    headers = {'ETag': page.etag, 'Cache-Control': 'no-cache'}
+    modified_at = pages.modified_at
+    if modified_at is not None:
+        modified_at = modified_at.astimezone(dt.timezone.utc)
+        headers['Last-Modified'] = email.utils.format_datetime(modified_at, usegmt=True)
+    if not_modified(request, page.etag, modified_at):
+        return responses.Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return responses.Response(content=page.body, media_type='application/json', headers=headers)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+"""
+Streamed downloads of stored model binaries.
+
+Binaries are read from the binary store in chunks and never held in memory. Their SHA-256 hash is their `ETag`: a
+client sending it back in `If-None-Match` gets `304` without any read of the binary. A single `Range` of bytes is
+served with `206` so that interrupted downloads can resume, `If-Range` makes sure that the resumed binary did not
+change. Complete downloads are compressed with gzip when the client accepts it; compressed downloads have their own
+`ETag` and are not served by range.
+"""
+
+
+import typing
+import zlib
+
+import fastapi
+import fastapi.responses as responses
+import starlette.status as status
+
+import app.db.binary_store as app_binary_store
+
+GZIP = 'gzip'
+
+
+def entity_tag(key: typing.Text, encoding: typing.Optional[typing.Text] = None) -> typing.Text:
+    return f'"{key}"' if encoding is None else f'"{key}-{encoding}"'
+
+
+def matches(header: typing.Optional[typing.Text], tags: typing.Iterable[typing.Text]) -> bool:
+    """Weak comparison of an `If-None-Match` header with the tags of a binary"""
+    if header is None:
+        return False
+    received = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in received or not received.isdisjoint(tags)
+
+
+def parse_range(header: typing.Optional[typing.Text], size: int) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    First and last offsets of a single byte range, None when the whole binary is sent: no range, several ranges or a
+    range which can not be parsed. Ranges starting after the end of the binary raise `416`.
+    """
+    if header is None or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, separator, last = header.removeprefix('bytes=').strip().partition('-')
+    if not separator or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # suffix range: last bytes of the binary
+        start, end = max(size - int(last), 0), size - 1 if int(last) > 0 else -1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size or end < start:
+        raise unsatisfiable(size)
+    return start, end
+
+
+def unsatisfiable(size: int) -> fastapi.HTTPException:
+    return fastapi.HTTPException(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail='Requested range not satisfiable',
+        headers={'Content-Range': f'bytes */{size}'})
+
+
+def accepts_gzip(header: typing.Optional[typing.Text]) -> bool:
+    """Whether an `Accept-Encoding` header accepts gzip, `gzip;q=0` refuses it"""
+    for coding in (header or '').split(','):
+        name, _, parameters = coding.partition(';')
+        if name.strip().lower() not in (GZIP, '*'):
+            continue
+        quality = parameters.strip().lower().removeprefix('q=')
+        try:
+            return not parameters.strip() or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def compress(chunks: typing.Iterator[bytes], level: int) -> typing.Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def binary_response(
+        request: fastapi.Request,
+        store: app_binary_store.BinaryStore,
+        key: typing.Text,
+        size: int,
+        filename: typing.Text,
+        compression_level: int
+) -> responses.Response:
+    """Streamed response of a stored binary, `304`, `206` or `200` depending on the conditions of the request"""
+    identity_tag, gzip_tag = entity_tag(key), entity_tag(key, GZIP)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Vary': 'Accept-Encoding'
+    }
+    if matches(request.headers.get('If-None-Match'), (identity_tag, gzip_tag)):
+        tag = gzip_tag if compression_level and accepts_gzip(request.headers.get('Accept-Encoding')) else identity_tag
+        return responses.Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, 'ETag': tag})
+
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if_range = request.headers.get('If-Range')
+    byte_range = parse_range(request.headers.get('Range'), size) if if_range in (None, identity_tag) else None
+    try:
+        if byte_range is not None:
+            start, end = byte_range
+            chunks = store.chunks(key, start=start, length=end - start + 1)
+            return responses.StreamingResponse(
+                content=chunks,
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type='application/octet-stream',
+                headers={
+                    **headers, 'ETag': identity_tag, 'Content-Range': f'bytes {start}-{end}/{size}',
+                    'Content-Length': str(end - start + 1)})
+        chunks = store.chunks(key)
+    except FileNotFoundError:
+        raise fastapi.HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Model binary is not stored')
+    if compression_level and accepts_gzip(request.headers.get('Accept-Encoding')):
+        return responses.StreamingResponse(
+            content=compress(chunks, compression_level),
+            media_type='application/octet-stream',
+            headers={**headers, 'ETag': gzip_tag, 'Content-Encoding': GZIP})
+    return responses.StreamingResponse(
+        content=chunks,
+        media_type='application/octet-stream',
+        headers={**headers, 'ETag': identity_tag, 'Content-Length': str(size)})
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+"""
+Pagination of the discovery endpoints.
+
+Pages are ordered by id. Besides `offset`, a page is requested with the opaque `cursor` of the `next` link of the
+previous page, which holds the last id of that page: the database seeks to it through the primary key index instead of
+scanning and skipping the rows of the previous pages.
+"""
+
+
+import base64
+import binascii
+import json
+import typing
+
+import fastapi
+import starlette.status as status
+
+import app.core.configuration as app_conf
+
+
+def encode_cursor(last_id: int) -> typing.Text:
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: typing.Text) -> int:
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        last_id = None
+    if not isinstance(last_id, int):
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Requested cursor is not valid')
+    return last_id
+
+
+def check(offset: int, limit: int, cursor: typing.Optional[typing.Text]) -> typing.Optional[int]:
+    """Id following which the page starts, None when the page starts at `offset`"""
+    if not (0 < limit <= app_conf.get_config().MAX_PAGE_SIZE and offset >= 0):
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Requested offset/limit is not valid')
+    if cursor is None:
+        return None
+    if offset:
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Requested offset and cursor are exclusive')
+    return decode_cursor(cursor)
+
+
+def links(request: fastapi.Request, rows: typing.List[typing.Any], limit: int) -> typing.List[typing.Dict[str, str]]:
+    """`next` link of a page, pages are fetched with one more row than `limit` to know whether a next page exists"""
+    if len(rows) <= limit:
+        return []
+    url = request.url.remove_query_params('offset').include_query_params(
+        cursor=encode_cursor(rows[limit - 1].id), limit=limit)
+    return [{'rel': 'next', 'href': f'{url.path}?{url.query}'}]
@@ -41,12 +41,45 @@ class ServerConfiguration(BaseSettings):
     DEFAULT_USER_PWD: Text = 'password'
 
     ADDITIONAL_INFO_FIELD: Text = 'additional'
+    RUNTIME_OPTIONS_FIELD: Text = 'runtime'
     DATABASE_NAME: Text = 'db.sqlite'
     LOGGING: typing.Optional[Path] = '/etc/ads-ml-service/logging/logging.yaml'
     DEBUG: bool = False
     RETRAIN_MODELS: bool = False
+    # Maximum number of deserialized models per worker
     MODEL_CACHE_SIZE: int = 64
+    # Seconds after the last use of a model before it is dropped from the cache
     CACHE_TTL: int = 60
+    # Seconds after CACHE_TTL during which an expired model is served while its binary version is checked
+    MODEL_CACHE_MAX_STALENESS: int = 0
+    # Estimated memory of the deserialized models per worker in bytes, 0 for no limit
+    MODEL_CACHE_MEMORY_LIMIT: int = 1024 ** 3
+    # Models evicted first when the cache is full, `lru` (least recently used) or `lfu` (least frequently used)
+    MODEL_CACHE_POLICY: Text = 'lru'
+    # Seconds between two reads of the endpoint changes made by other workers, 0 to disable
+    MODEL_CACHE_SYNC_INTERVAL: float = 1.0
+    # Seconds endpoint changes are kept for the other workers
+    MODEL_CACHE_CHANGE_RETENTION: int = 3600
+    # Local directory of the memory mapped model artifacts, `MODEL_STORAGE/artifacts` by default
+    MODEL_ARTIFACT_DIR: typing.Optional[Path] = None
+    # Load the models of all endpoints when a worker starts
+    MODEL_PRELOAD: bool = False
+    # Local directory of the model binaries, `MODEL_STORAGE/binaries` by default
+    BINARY_STORE_DIR: typing.Optional[Path] = None
+    # Seconds an unreferenced model binary is kept, it may belong to an upload which is not committed yet
+    BINARY_STORE_GRACE_PERIOD: int = 3600
+    # Serialized pages of `/models` and `/endpoints` kept per worker, 0 to disable
+    DISCOVERY_CACHE_SIZE: int = 256
+    # Seconds a serialized discovery page is served at most
+    DISCOVERY_CACHE_TTL: float = 60.0
+    # gzip level of the model downloads of clients accepting it, 0 disables the compression
+    DOWNLOAD_COMPRESSION_LEVEL: int = 6
+    # Verified bearer tokens and their users kept per worker, 0 to disable
+    TOKEN_CACHE_SIZE: int = 1024
+    # Seconds the user of a verified token is served at most
+    TOKEN_CACHE_TTL: float = 300.0
+    # Threads hashing and verifying passwords per worker
+    PASSWORD_HASHING_WORKERS: int = 2
 
     USE_SQLITE: bool = True
     MODEL_STORAGE: typing.Optional[Path] = None
@@ -56,6 +89,20 @@ class ServerConfiguration(BaseSettings):
     UPLOAD_SIZE_LIMIT: int = 0
     MAX_PAGE_SIZE: int = 200
 
+    # Model inference runs outside of the event loop, `thread` or `process`
+    INFERENCE_EXECUTOR: Text = 'thread'
+    INFERENCE_WORKERS: int = 4
+    # Number of predictions allowed to wait for a free worker before answering 429
+    INFERENCE_QUEUE_SIZE: int = 64
+    # Seconds a prediction may wait for a free worker before answering 503
+    INFERENCE_QUEUE_TIMEOUT: float = 10.0
+    # Decode prediction requests with orjson and a structural validator instead of pydantic
+    FAST_REQUEST_DECODING: bool = False
+    # Number of pypmml JVM gateways per worker, PMML models are spread over the gateways
+    PMML_GATEWAY_POOL_SIZE: int = 1
+    # Seconds between two health checks of the started pypmml gateways, 0 disables them
+    PMML_GATEWAY_HEALTH_CHECK_INTERVAL: float = 30.0
+
     @validator('MODEL_STORAGE')
     def storage_check(
             cls, p: typing.Optional[Path], values: typing.Dict[typing.Text, typing.Any]) -> typing.Optional[Path]:
@@ -67,6 +114,96 @@ class ServerConfiguration(BaseSettings):
             raise PermissionError('R/W permission needed')
         return p
 
+    @validator('MODEL_CACHE_MEMORY_LIMIT')
+    def model_cache_memory_limit_check(cls, n: int) -> int:
+        if n < 0:
+            raise ValueError('MODEL_CACHE_MEMORY_LIMIT must not be negative')
+        return n
+
+    @validator('MODEL_CACHE_POLICY')
+    def model_cache_policy_check(cls, p: Text) -> Text:
+        if p not in ('lru', 'lfu'):
+            raise ValueError(f'MODEL_CACHE_POLICY must be `lru` or `lfu`, not {p}')
+        return p
+
+    @validator('MODEL_CACHE_MAX_STALENESS')
+    def model_cache_max_staleness_check(cls, t: int) -> int:
+        if t < 0:
+            raise ValueError('MODEL_CACHE_MAX_STALENESS must not be negative')
+        return t
+
+    @validator('MODEL_CACHE_SYNC_INTERVAL')
+    def model_cache_sync_interval_check(cls, t: float) -> float:
+        if t < 0:
+            raise ValueError('MODEL_CACHE_SYNC_INTERVAL must not be negative')
+        return t
+
+    @validator('MODEL_CACHE_CHANGE_RETENTION')
+    def model_cache_change_retention_check(cls, t: int) -> int:
+        if t <= 0:
+            raise ValueError('MODEL_CACHE_CHANGE_RETENTION must be positive')
+        return t
+
+    @validator('BINARY_STORE_GRACE_PERIOD')
+    def binary_store_grace_period_check(cls, t: int) -> int:
+        if t < 0:
+            raise ValueError('BINARY_STORE_GRACE_PERIOD must not be negative')
+        return t
+
+    @validator('DISCOVERY_CACHE_SIZE')
+    def discovery_cache_size_check(cls, size: int) -> int:
+        if size < 0:
+            raise ValueError('DISCOVERY_CACHE_SIZE must not be negative')
+        return size
+
+    @validator('DISCOVERY_CACHE_TTL')
+    def discovery_cache_ttl_check(cls, t: float) -> float:
+        if t < 0:
+            raise ValueError('DISCOVERY_CACHE_TTL must not be negative')
+        return t
+
+    @validator('DOWNLOAD_COMPRESSION_LEVEL')
+    def download_compression_level_check(cls, level: int) -> int:
+        if not 0 <= level <= 9:
+            raise ValueError('DOWNLOAD_COMPRESSION_LEVEL must be between 0 and 9')
+        return level
+
+    @validator('TOKEN_CACHE_SIZE')
+    def token_cache_size_check(cls, size: int) -> int:
+        if size < 0:
+            raise ValueError('TOKEN_CACHE_SIZE must not be negative')
+        return size
+
+    @validator('TOKEN_CACHE_TTL')
+    def token_cache_ttl_check(cls, t: float) -> float:
+        if t < 0:
+            raise ValueError('TOKEN_CACHE_TTL must not be negative')
+        return t
+
+    @validator('PASSWORD_HASHING_WORKERS')
+    def password_hashing_workers_check(cls, n: int) -> int:
+        if n <= 0:
+            raise ValueError('PASSWORD_HASHING_WORKERS must be positive')
+        return n
+
+    @validator('INFERENCE_EXECUTOR')
+    def inference_executor_check(cls, e: Text) -> Text:
+        if e not in ('thread', 'process'):
+            raise ValueError(f'INFERENCE_EXECUTOR must be `thread` or `process`, not {e}')
+        return e
+
+    @validator('INFERENCE_WORKERS')
+    def inference_workers_check(cls, n: int) -> int:
+        if n <= 0:
+            raise ValueError(f'INFERENCE_WORKERS must be positive')
+        return n
+
+    @validator('PMML_GATEWAY_POOL_SIZE')
+    def pmml_gateway_pool_size_check(cls, n: int) -> int:
+        if n <= 0:
+            raise ValueError(f'PMML_GATEWAY_POOL_SIZE must be positive')
+        return n
+
     @validator('DB_URL')
     def db_url_check(
             cls,
@@ -15,7 +15,10 @@
 #
 
 
+import asyncio
+import concurrent.futures as futures
 import datetime as dt
+import functools
 import typing as tp
 
 import jwt
@@ -43,3 +46,22 @@ def verify_pwd(plain_password: tp.Text, hashed_password: tp.Union[bytes, tp.Text
 
 def get_pwd_hash(password: tp.Text) -> tp.Text:
     return pwd_context.hash(password)
+
+
+@functools.lru_cache()
+def get_hashing_pool() -> futures.ThreadPoolExecutor:
+    """
+    Threads of bcrypt, which is slow on purpose. A burst of logins neither blocks the event loop nor holds the threads
+    of the other routes.
+    """
+    return futures.ThreadPoolExecutor(
+        max_workers=conf.get_config().PASSWORD_HASHING_WORKERS, thread_name_prefix='password')
+
+
+async def verify_pwd_async(plain_password: tp.Text, hashed_password: tp.Union[bytes, tp.Text]) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        get_hashing_pool(), verify_pwd, plain_password, hashed_password)
+
+
+async def get_pwd_hash_async(password: tp.Text) -> tp.Text:
+    return await asyncio.get_running_loop().run_in_executor(get_hashing_pool(), get_pwd_hash, password)
@@ -20,3 +20,5 @@ from .crud_model_config import model_config
 from .crud_binary_ml_model import binary_ml_model
 from .crud_model import model
 from .crud_endpoints import endpoint
+from .crud_endpoint_change import endpoint_change
+from .crud_row_count import row_count
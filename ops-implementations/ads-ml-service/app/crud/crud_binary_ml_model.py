@@ -19,8 +19,11 @@ import typing
 
 import sqlalchemy.orm as orm
 
+import app.core.configuration as app_core_config
 import app.crud.base as app_crud_base
+import app.db.binary_store as app_binary_store
 import app.models as models
+import app.runtime.artifacts as app_artifacts
 import app.schemas as schemas
 
 
@@ -42,5 +45,53 @@ class CRUDBinaryMLModel(app_crud_base.CRUDBase[
     def get_by_endpoint(self, db: orm.Session, *, endpoint_id: app_crud_base.IdType) -> typing.Optional[models.Endpoint]:
         return db.query(self.model).filter(self.model.id == endpoint_id).first()
 
+    def get_with_configuration(
+            self, db: orm.Session, *, endpoint_id: app_crud_base.IdType
+    ) -> typing.Optional[typing.Any]:
+        """
+        Hash and size of the binary, format, data structures, version and model configuration of an endpoint in a
+        single query, None when the binary or the configuration does not exist
+        """
+        return db.query(
+            self.model.hash,
+            self.model.size,
+            self.model.input_data_structure,
+            self.model.output_data_structure,
+            self.model.format,
+            self.model.version,
+            models.ModelConfig.configuration
+        ).join(models.ModelConfig, models.ModelConfig.id == self.model.id) \
+            .filter(self.model.id == endpoint_id).first()
+
+    def get_download(self, db: orm.Session, *, model_id: app_crud_base.IdType) -> typing.Optional[typing.Any]:
+        """
+        Configuration of a model with the hash, size and format of its binary, which are None when the model has no
+        binary. None when the model does not exist.
+        """
+        return db.query(
+            models.ModelConfig.configuration,
+            self.model.hash,
+            self.model.size,
+            self.model.format
+        ).outerjoin(self.model, self.model.id == models.ModelConfig.id) \
+            .filter(models.ModelConfig.id == model_id).first()
+
+    def get_version(self, db: orm.Session, *, endpoint_id: app_crud_base.IdType) -> typing.Optional[int]:
+        """Version of the binary of an endpoint, None when there is no binary"""
+        return db.query(self.model.version).filter(self.model.id == endpoint_id).scalar()
+
+    def get_hashes(self, db: orm.Session) -> typing.Set[typing.Text]:
+        return {key for key, in db.query(self.model.hash).distinct()}
+
+    def prune_store(self, db: orm.Session) -> int:
+        """Deletes the stored binaries and the model artifacts which are no longer referenced"""
+        referenced = self.get_hashes(db)
+        grace_period = app_core_config.get_config().BINARY_STORE_GRACE_PERIOD
+        app_artifacts.prune(referenced, grace_period)
+        return app_binary_store.get_store().prune(referenced, grace_period)
+
+    def get_endpoint_ids(self, db: orm.Session) -> typing.List[app_crud_base.IdType]:
+        return [endpoint_id for endpoint_id, in db.query(self.model.id).order_by(self.model.id)]
+
 
 binary_ml_model = CRUDBinaryMLModel(models.BinaryMlModel)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import datetime as dt
+import typing
+
+import sqlalchemy as sql
+import sqlalchemy.orm as orm
+
+import app.crud.base as app_crud_base
+import app.models as models
+import app.schemas as schemas
+
+
+# versions of the endpoints changed in the transaction of a session, read by the binaries inserted in that transaction
+PENDING_VERSIONS = 'endpoint_versions'
+
+
+@sql.event.listens_for(models.BinaryMlModel, 'before_insert')
+def version_new_binary(mapper: orm.Mapper, connection: sql.engine.Connection, target: models.BinaryMlModel):
+    session = orm.object_session(target)
+    if session is not None and target.id in session.info.get(PENDING_VERSIONS, {}):
+        target.version = session.info[PENDING_VERSIONS][target.id]
+
+
+@sql.event.listens_for(orm.Session, 'after_transaction_end')
+def forget_versions(session: orm.Session, transaction: orm.SessionTransaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_VERSIONS, None)
+
+
+class CRUDEndpointChange(app_crud_base.CRUDBase[
+                             models.EndpointChange, schemas.EndpointChangeCreate, schemas.EndpointChangeUpdate]):
+    def record(self, db: orm.Session, *, endpoint_id: app_crud_base.IdType, retention_seconds: float) -> int:
+        """
+        Records a change of an endpoint in the open transaction, which is committed with the change of the endpoint.
+        Its id becomes the version of the binary of the endpoint, including a binary inserted later in the transaction.
+        """
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        # noinspection PyArgumentList
+        change = self.model(endpoint_id=endpoint_id, changed_at=now)
+        db.add(change)
+        db.flush()
+        db.info.setdefault(PENDING_VERSIONS, {})[endpoint_id] = change.id
+        db.query(models.BinaryMlModel) \
+            .filter(models.BinaryMlModel.id == endpoint_id) \
+            .update({models.BinaryMlModel.version: change.id}, synchronize_session=False)
+        db.query(self.model) \
+            .filter(self.model.changed_at < now - dt.timedelta(seconds=retention_seconds)) \
+            .delete(synchronize_session=False)
+        return change.id
+
+    def publish(self, db: orm.Session, *, endpoint_id: app_crud_base.IdType, retention_seconds: float) -> int:
+        """Records and commits a change of an endpoint, its id becomes the version of the binary of the endpoint"""
+        version = self.record(db, endpoint_id=endpoint_id, retention_seconds=retention_seconds)
+        db.commit()
+        return version
+
+    def get_since(
+            self, db: orm.Session, *, after: int, missing: typing.Collection[int] = ()
+    ) -> typing.List[models.EndpointChange]:
+        """Changes after `after` and changes of the `missing` ids, which were not committed when they were polled"""
+        condition = self.model.id > after
+        if missing:
+            condition = sql.or_(condition, self.model.id.in_(missing))
+        return db.query(self.model).filter(condition).order_by(self.model.id).all()
+
+
+endpoint_change = CRUDEndpointChange(models.EndpointChange)
@@ -16,8 +16,10 @@
 
 
 import datetime as dt
+import typing
 
 import fastapi.encoders as encoders
+import sqlalchemy as sql
 import sqlalchemy.orm as orm
 
 import app.crud.base as app_crud_base
@@ -91,6 +93,30 @@ class CRUDModel(app_crud_base.CRUDBase[models.Endpoint, schemas.EndpointCreate,
         db.refresh(endpoint_db_obj)
         return endpoint_db_obj
 
+    def get_listing(
+            self,
+            db: orm.Session,
+            *,
+            after: typing.Optional[app_crud_base.IdType] = None,
+            skip: int = 0,
+            limit: int = 100
+    ) -> typing.List[typing.Any]:
+        """
+        Id, name, deployment time, metadata and whether a binary is deployed of a page of endpoints ordered by id,
+        without loading the endpoints nor their binaries
+        """
+        in_service = sql.exists().where(models.BinaryMlModel.id == self.model.id)
+        query = db.query(
+            self.model.id,
+            self.model.name,
+            self.model.deployed_at,
+            self.model.metadata_,
+            in_service.label('in_service')
+        ).order_by(self.model.id)
+        if after is not None:
+            query = query.filter(self.model.id > after)
+        return query.offset(skip).limit(limit).all()
+
     def update_binary(
             self,
             db: orm.Session,
@@ -58,6 +58,31 @@ class CRUDModel(app_crud_base.CRUDBase[models.Model, schemas.ModelCreate, schema
         db.refresh(db_obj)
         return db_obj
 
+    def get_listing(
+            self,
+            db: orm.Session,
+            *,
+            after: typ.Optional[app_crud_base.IdType] = None,
+            skip: int = 0,
+            limit: int = 100
+    ) -> typ.List[typ.Any]:
+        """
+        Id, creation and modification times, configuration and endpoint id of a page of models ordered by id, without
+        loading the models nor their relationships
+        """
+        query = db.query(
+            self.model.id,
+            self.model.created_at,
+            self.model.modified_at,
+            models.ModelConfig.configuration,
+            models.Endpoint.id.label('endpoint_id')
+        ).join(models.ModelConfig, models.ModelConfig.id == self.model.id) \
+            .outerjoin(models.Endpoint, models.Endpoint.id == self.model.id) \
+            .order_by(self.model.id)
+        if after is not None:
+            query = query.filter(self.model.id > after)
+        return query.offset(skip).limit(limit).all()
+
     def update(
             self,
             db: orm.Session,
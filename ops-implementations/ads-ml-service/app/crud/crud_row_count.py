@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+import typing
+
+import sqlalchemy as sql
+import sqlalchemy.orm as orm
+
+import app.crud.base as app_crud_base
+import app.db.base_class as base_class
+import app.models as models
+import app.schemas as schemas
+
+
+class CRUDRowCount(app_crud_base.CRUDBase[models.RowCount, schemas.RowCountCreate, schemas.RowCountUpdate]):
+    def get_count(self, db: orm.Session, *, mapped: typing.Type[base_class.Base]) -> int:
+        """Maintained number of rows of a table, counted when the table did not change since the count was added"""
+        value = db.query(self.model.value).filter(self.model.table_name == mapped.__tablename__).scalar()
+        if value is None:
+            return db.query(sql.func.count()).select_from(mapped).scalar()
+        return value
+
+
+row_count = CRUDRowCount(models.RowCount)
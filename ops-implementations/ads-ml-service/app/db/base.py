@@ -21,3 +21,5 @@ from app.models.binary_ml_model import BinaryMlModel
 from app.models.user import User
 from app.models.model import Model
 from app.models.endpoint import Endpoint
+from app.models.endpoint_change import EndpointChange
+from app.models.row_count import RowCount
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+"""
+Model binaries stored outside of the relational database, keyed by the SHA-256 hash of their content.
+
+The database only keeps the hash and the size of a binary, so listing endpoints, checking their status or deleting
+them never reads model bytes. Identical binaries are stored once. Binaries are written to a temporary file and renamed,
+readers never see a partial binary. Other storages (object stores, ...) implement `BinaryStore`.
+"""
+
+
+import abc
+import functools
+import hashlib
+import logging
+import os
+import pathlib
+import threading
+import time
+import typing
+
+import app.core.configuration as app_core_config
+
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def digest(binary: bytes) -> typing.Text:
+    return hashlib.sha256(binary).hexdigest()
+
+
+def read_chunks(
+        binary: typing.BinaryIO, start: int = 0, length: typing.Optional[int] = None, chunk_size: int = CHUNK_SIZE
+) -> typing.Iterator[bytes]:
+    """Reads and closes a file"""
+    with binary:
+        binary.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = binary.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+class BinaryStore(abc.ABC):
+    @abc.abstractmethod
+    def put(self, binary: bytes) -> typing.Text:
+        """Stores a binary and returns its hash"""
+
+    @abc.abstractmethod
+    def open(self, key: typing.Text) -> typing.BinaryIO:
+        """Readable file of a binary, raises `FileNotFoundError` when it is not stored"""
+
+    @abc.abstractmethod
+    def keys(self) -> typing.Iterable[typing.Text]:
+        """Hashes of the stored binaries"""
+
+    @abc.abstractmethod
+    def delete(self, key: typing.Text):
+        """Deletes a binary, nothing happens when it is not stored"""
+
+    @abc.abstractmethod
+    def modified_at(self, key: typing.Text) -> float:
+        """Time of the last `put` of a binary"""
+
+    def read(self, key: typing.Text) -> bytes:
+        with self.open(key) as binary:
+            return binary.read()
+
+    def chunks(
+            self,
+            key: typing.Text,
+            start: int = 0,
+            length: typing.Optional[int] = None,
+            chunk_size: int = CHUNK_SIZE
+    ) -> typing.Iterator[bytes]:
+        """
+        Chunks of `length` bytes of a binary from offset `start`, up to its end by default. The binary is opened
+        before the first chunk is requested, `FileNotFoundError` is raised by this call when it is not stored.
+        """
+        return read_chunks(self.open(key), start, length, chunk_size)
+
+    def prune(self, referenced: typing.Set[typing.Text], grace_seconds: float) -> int:
+        """
+        Deletes the binaries which are not referenced, binaries stored less than `grace_seconds` ago may belong to
+        an upload which is not committed yet and are kept
+        """
+        deleted = 0
+        now = time.time()
+        for key in list(self.keys()):
+            if key in referenced:
+                continue
+            try:
+                if now - self.modified_at(key) < grace_seconds:
+                    continue
+                self.delete(key)
+                deleted += 1
+            except FileNotFoundError:
+                continue
+        if deleted:
+            LOGGER.info('Deleted %s unreferenced model binaries', deleted)
+        return deleted
+
+
+class LocalBinaryStore(BinaryStore):
+    """Binaries in a local directory, `ab/abcdef...` for the hash `abcdef...`"""
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+
+    def path(self, key: typing.Text) -> pathlib.Path:
+        return self.directory / key[:2] / key
+
+    def put(self, binary: bytes) -> typing.Text:
+        key = digest(binary)
+        path = self.path(key)
+        if path.exists():
+            # refreshed so that it is not pruned before the upload referencing it is committed
+            os.utime(path)
+            return key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            tmp.write_bytes(binary)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        LOGGER.debug('Stored model binary %s (%s bytes)', key, len(binary))
+        return key
+
+    def open(self, key: typing.Text) -> typing.BinaryIO:
+        return self.path(key).open(mode='rb')
+
+    def keys(self) -> typing.Iterable[typing.Text]:
+        if not self.directory.exists():
+            return
+        for path in self.directory.glob('??/*'):
+            if not path.name.endswith('.tmp'):
+                yield path.name
+
+    def delete(self, key: typing.Text):
+        self.path(key).unlink(missing_ok=True)
+
+    def modified_at(self, key: typing.Text) -> float:
+        return self.path(key).stat().st_mtime
+
+
+@functools.lru_cache()
+def get_store() -> BinaryStore:
+    config = app_core_config.get_config()
+    if config.BINARY_STORE_DIR is not None:
+        return LocalBinaryStore(config.BINARY_STORE_DIR)
+    if config.MODEL_STORAGE is not None:
+        return LocalBinaryStore(config.MODEL_STORAGE / 'binaries')
+    raise ValueError('BINARY_STORE_DIR is None')
@@ -19,7 +19,7 @@ import logging
 import typing
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.configuration import get_config
 
@@ -51,3 +51,28 @@ SessionLocal = sessionmaker(
         autocommit=False,
         autoflush=False,
         bind=get_engine())
+
+
+class LazySession(object):
+    """
+    Session created on its first use, other attributes are the attributes of the session. Requests served from the
+    model cache neither create a session nor check out a connection.
+    """
+
+    def __init__(self, factory: typing.Callable[[], Session] = SessionLocal):
+        self.factory = factory
+        self.session: typing.Optional[Session] = None
+
+    @property
+    def opened(self) -> bool:
+        return self.session is not None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        if self.session is None:
+            self.session = self.factory()
+        return getattr(self.session, name)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
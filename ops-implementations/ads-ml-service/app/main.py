@@ -19,6 +19,7 @@ import logging.config
 import os
 import pathlib
 import tempfile
+import threading
 
 import fastapi
 import fastapi.responses as responses
@@ -27,6 +28,17 @@ import yaml
 LOGGER = logging.getLogger(__name__)
 
 
+def preload_models():
+    import app.db.session as app_db_session
+    import app.runtime.cache as app_cache
+
+    db = app_db_session.SessionLocal()
+    try:
+        app_cache.cache.preload(db)
+    finally:
+        db.close()
+
+
 def get_app() -> fastapi.FastAPI:
     import app.api.api_v2.api as api_v2
     import app.core.configuration as app_conf
@@ -51,6 +63,20 @@ def get_app() -> fastapi.FastAPI:
         logging.config.dictConfig(conf)
         if debug_mode:
             LOGGER.info("Launching application in debug mode")
+        import app.runtime.cache as app_cache
+        app_cache.cache.start_sync()
+        if app_conf.get_config().MODEL_PRELOAD:
+            # workers answer while models are loaded
+            threading.Thread(target=preload_models, name='model-preload', daemon=True).start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        import app.runtime.cache as app_cache
+        import app.runtime.inference as app_inference
+        import app.runtime.pmml_gateways as app_pmml_gateways
+        app_cache.cache.stop_sync()
+        app_inference.get_executor().shutdown()
+        app_pmml_gateways.get_pool().shutdown()
 
     @app.get(path='/', include_in_schema=False)
     async def redirect_docs() -> responses.RedirectResponse:
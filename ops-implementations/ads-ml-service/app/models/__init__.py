@@ -17,6 +17,8 @@
 
 from .binary_ml_model import BinaryMlModel
 from .endpoint import Endpoint
+from .endpoint_change import EndpointChange
 from .model import Model
 from .model_config import ModelConfig
+from .row_count import RowCount
 from .user import User
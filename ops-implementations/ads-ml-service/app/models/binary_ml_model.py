@@ -19,15 +19,30 @@ import sqlalchemy as sql
 import sqlalchemy.orm as sql_orm
 
 import app.db.base_class as base_class
+import app.db.binary_store as app_binary_store
 import app.schemas.binary_config as app_binary_config
 
 
 class BinaryMlModel(base_class.Base):
     id = sql.Column('id', sql.Integer, sql.ForeignKey('endpoint.id'),
                     nullable=False, unique=True, index=True, primary_key=True)
-    model_b64 = sql.Column('model_b64', sql.LargeBinary, nullable=False)
+    # SHA-256 hash of the binary in the binary store
+    hash = sql.Column('hash', sql.String(length=64), nullable=False, index=True)
+    size = sql.Column('size', sql.BigInteger, nullable=False)
     input_data_structure = sql.Column('input_data_structure', sql.Enum(app_binary_config.ModelInput), nullable=False)
     output_data_structure = sql.Column('output_data_structure', sql.Enum(app_binary_config.ModelOutput), nullable=False)
     format = sql.Column('format', sql.Enum(app_binary_config.ModelWrapper), nullable=False)
+    # id of the last `endpoint_change` of the endpoint, cached models of older versions are stale
+    version = sql.Column('version', sql.Integer, nullable=False, default=0, server_default='0')
 
     endpoint = sql_orm.relationship('Endpoint', back_populates='binary', uselist=False)
+
+    @property
+    def model_b64(self) -> bytes:
+        """Binary read from the binary store, only when it is accessed"""
+        return app_binary_store.get_store().read(self.hash)
+
+    @model_b64.setter
+    def model_b64(self, binary: bytes):
+        self.hash = app_binary_store.get_store().put(binary)
+        self.size = len(binary)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import sqlalchemy as sql
+
+import app.db.base_class as base_class
+
+
+class EndpointChange(base_class.Base):
+    """
+    Change feed of the endpoints, one row per change of a binary or of the configuration read with it. Workers evict
+    the cached models of the endpoints changed since their last poll.
+    """
+    id = sql.Column('id', sql.Integer, nullable=False, unique=True, index=True, primary_key=True, autoincrement=True)
+    # not a foreign key: changes of deleted endpoints are kept
+    endpoint_id = sql.Column('endpoint_id', sql.Integer, nullable=False, index=True)
+    changed_at = sql.Column('changed_at', sql.DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+import sqlalchemy as sql
+import sqlalchemy.event as sql_event
+import sqlalchemy.orm as sql_orm
+
+import app.db.base_class as base_class
+from .endpoint import Endpoint
+from .model import Model
+
+
+class RowCount(base_class.Base):
+    """
+    Number of rows of the tables listed by the discovery endpoints, maintained in the transaction inserting or deleting
+    them so that `total_count` does not scan the tables.
+    """
+    table_name = sql.Column('table_name', sql.String(64), nullable=False, primary_key=True)
+    value = sql.Column('value', sql.BigInteger, nullable=False)
+
+
+def add_rows(connection: sql.engine.Connection, table: sql.Table, delta: int):
+    counts = RowCount.__table__
+    result = connection.execute(
+        sql.update(counts).where(counts.c.table_name == table.name).values(value=counts.c.value + delta))
+    if result.rowcount == 0:
+        # the count of a table is initialized by its first change, the changed row is already counted
+        connection.execute(sql.insert(counts).values(
+            table_name=table.name, value=sql.select(sql.func.count()).select_from(table).scalar_subquery()))
+
+
+def count_rows(mapped: type):
+    """Maintains the row count of the table of a mapped class"""
+    def inserted(mapper: sql_orm.Mapper, connection: sql.engine.Connection, _):
+        add_rows(connection, mapper.local_table, 1)
+
+    def deleted(mapper: sql_orm.Mapper, connection: sql.engine.Connection, _):
+        add_rows(connection, mapper.local_table, -1)
+
+    sql_event.listen(mapped, 'after_insert', inserted)
+    sql_event.listen(mapped, 'after_delete', deleted)
+
+
+count_rows(Model)
+count_rows(Endpoint)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+"""
+Deserialized models written to local disk and memory mapped.
+
+The first worker loading a model writes it with `joblib.dump`, every worker then loads it with `mmap_mode='r'`: numpy
+arrays of the model are read-only views of the file and the operating system shares their pages between workers.
+Artifacts are named after the hash of the binary, a changed binary gets a new artifact.
+"""
+
+
+import copy
+import functools
+import hashlib
+import logging
+import os
+import pathlib
+import stat
+import tempfile
+import threading
+import time
+import typing
+
+import joblib
+
+import app.core.configuration as app_core_config
+import app.runtime.tree_ensembles as app_tree_ensembles
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DeferredModel(object):
+    """Model loaded from its artifact on first use"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.__lock__ = threading.Lock()
+        self.__model__ = None
+
+    def __reduce__(self):
+        return DeferredModel, (self.path,)
+
+    def __getattr__(self, name: typing.Text) -> typing.Any:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def load(self) -> typing.Any:
+        with self.__lock__:
+            if self.__model__ is None:
+                LOGGER.info('Loading deferred model %s', self.path)
+                self.__model__ = joblib.load(self.path, mmap_mode='r')
+            return self.__model__
+
+
+class ArtifactStore(object):
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+
+    def path(self, binary: bytes, variant: typing.Text) -> pathlib.Path:
+        return self.directory / f'{hashlib.sha256(binary).hexdigest()}-{variant}.joblib'
+
+    def write(self, path: pathlib.Path, model: typing.Any):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # other workers only see complete artifacts
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            joblib.dump(model, tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def save(self, path: pathlib.Path, model: typing.Any):
+        if isinstance(model, app_tree_ensembles.CompiledEnsemble):
+            # scikit-learn trees copy their nodes when they are unpickled: the original model is written apart and only
+            # loaded by workers scoring inputs the compiled model does not handle
+            original = path.with_name(path.name.replace('.joblib', '.original.joblib'))
+            self.write(original, model.original)
+            model = copy.copy(model)
+            model.original = DeferredModel(original)
+        self.write(path, model)
+
+    def load(self, binary: bytes, variant: typing.Text, build: typing.Callable[[], typing.Any]) -> typing.Any:
+        """
+        Memory mapped model of a binary, `build` deserializes the binary when there is no artifact yet. `variant`
+        tells apart the artifacts of a binary loaded with different options.
+        """
+        path = self.path(binary, variant)
+        if path.exists():
+            try:
+                return joblib.load(path, mmap_mode='r')
+            except Exception:
+                LOGGER.exception('Failed to load model artifact %s, writing it again', path)
+        model = build()
+        try:
+            self.save(path, model)
+            return joblib.load(path, mmap_mode='r')
+        except Exception:
+            LOGGER.exception('Failed to write model artifact %s, model is not memory mapped', path)
+            return model
+
+    def prune(self, referenced: typing.Set[typing.Text], grace_seconds: float) -> int:
+        """
+        Deletes the artifacts of the binaries which are not referenced, artifacts written less than `grace_seconds`
+        ago are kept like their binaries
+        """
+        if not self.directory.exists():
+            return 0
+        deleted = 0
+        now = time.time()
+        # artifacts, original models of compiled ensembles and temporary files of crashed writers
+        for path in self.directory.glob('*-*.joblib*'):
+            if path.name.split('-', 1)[0] in referenced:
+                continue
+            try:
+                if now - path.stat().st_mtime < grace_seconds:
+                    continue
+                path.unlink()
+                deleted += 1
+            except FileNotFoundError:
+                continue
+        if deleted:
+            LOGGER.info('Deleted %s unreferenced model artifacts', deleted)
+        return deleted
+
+
+def private_directory(directory: pathlib.Path) -> pathlib.Path:
+    """
+    Directory created for the user of the service, artifacts are unpickled when they are loaded: a directory created
+    by another user, or which other users can write, is refused
+    """
+    directory.mkdir(mode=0o700, exist_ok=True)
+    status = directory.lstat()
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise PermissionError(f'{directory} is not a private directory of the service user')
+    return directory
+
+
+@functools.lru_cache()
+def get_store() -> ArtifactStore:
+    config = app_core_config.get_config()
+    if config.MODEL_ARTIFACT_DIR is not None:
+        return ArtifactStore(config.MODEL_ARTIFACT_DIR)
+    if config.MODEL_STORAGE is not None:
+        return ArtifactStore(config.MODEL_STORAGE / 'artifacts')
+    # workers of the same user share the artifacts
+    directory = pathlib.Path(tempfile.gettempdir()) / f'ads-ml-service-artifacts-{os.getuid()}'
+    return ArtifactStore(private_directory(directory))
+
+
+def prune(referenced: typing.Set[typing.Text], grace_seconds: float) -> int:
+    """Deletes unreferenced artifacts, nothing is deleted when the artifact directory is refused"""
+    try:
+        store = get_store()
+    except PermissionError:
+        LOGGER.warning('Model artifacts are not pruned', exc_info=True)
+        return 0
+    return store.prune(referenced, grace_seconds)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import asyncio
+import collections
+import logging
+import threading
+import typing
+
+import fastapi
+import starlette.status as status
+
+import app.runtime.inference as app_inference
+import app.runtime.input as app_input
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.impl as app_schemas_impl
+
+LOGGER = logging.getLogger(__name__)
+
+Rows = typing.List[typing.List[app_schemas_impl.ParameterImpl]]
+
+# full queue or timeout of the inference executor, scoring the requests one by one would not help
+EXECUTOR_ERRORS = (status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class PendingBatch(object):
+    def __init__(self):
+        self.requests: typing.List[Rows] = []
+        self.futures: typing.List[asyncio.Future] = []
+        self.rows = 0
+        self.timer: typing.Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher(object):
+    """
+    Collects the predictions of one endpoint arriving within `max_wait_ms` and scores them with a single model
+    invocation. Requests are only grouped with requests having the same features in the same order.
+    Pending batches are confined to the event loop of the worker.
+    """
+
+    def __init__(
+            self,
+            endpoint_id: int,
+            model: app_runtime_wrapper.ModelInvocationExecutor,
+            max_batch_size: int,
+            max_wait_ms: float,
+            executor: typing.Optional[app_inference.InferenceExecutor] = None
+    ):
+        self.endpoint_id = endpoint_id
+        self.executor = executor
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self.__pending__: typing.Dict[typing.Tuple[typing.Text, ...], PendingBatch] = {}
+        self.__running__: typing.Set[asyncio.Task] = set()
+        self.__stats_lock__ = threading.Lock()
+        self.__batch_sizes__: typing.Counter[int] = collections.Counter()
+        self.__requests__ = 0
+        self.__rows__ = 0
+
+    async def predict(
+            self,
+            parameters: typing.Union[Rows, typing.List[app_schemas_impl.ParameterImpl]]
+    ) -> typing.Dict[typing.Text, typing.Any]:
+        if not parameters:
+            raise app_input.EmptyParameters()
+        rows = parameters if isinstance(parameters[0], typing.List) else [parameters]
+        key = tuple(param.name for param in rows[0])
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self.__pending__.get(key)
+        if batch is not None and batch.rows + len(rows) > self.max_batch_size:
+            # the pending batch is scored without the request rather than exceeding the maximum batch size
+            self.flush(key)
+            batch = None
+        if batch is None:
+            batch = self.__pending__[key] = PendingBatch()
+            batch.timer = loop.call_later(self.max_wait, self.flush, key)
+        batch.requests.append(rows)
+        batch.futures.append(future)
+        batch.rows += len(rows)
+
+        if batch.rows >= self.max_batch_size:
+            self.flush(key)
+        return await future
+
+    def flush(self, key: typing.Tuple[typing.Text, ...]):
+        batch = self.__pending__.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.ensure_future(self.run(batch))
+        self.__running__.add(task)
+        task.add_done_callback(self.__running__.discard)
+
+    async def run(self, batch: PendingBatch):
+        with self.__stats_lock__:
+            self.__batch_sizes__[len(batch.requests)] += 1
+            self.__requests__ += len(batch.requests)
+            self.__rows__ += batch.rows
+        LOGGER.debug('Scoring batch of %s requests for endpoint %s', len(batch.requests), self.endpoint_id)
+        executor = self.executor or app_inference.get_executor()
+        try:
+            results = await executor.predict_loaded(
+                self.endpoint_id, self.model, 'predict_batch', batch.requests)
+        except Exception as e:
+            if len(batch.requests) == 1 or \
+                    isinstance(e, fastapi.HTTPException) and e.status_code in EXECUTOR_ERRORS:
+                for future in batch.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # the error may come from the rows of a single request, each caller only gets its own error
+            LOGGER.warning(
+                'Batch of %s requests failed for endpoint %s, scoring them one by one: %s',
+                len(batch.requests), self.endpoint_id, e)
+            await asyncio.gather(*[
+                self.run_alone(executor, rows, future) for rows, future in zip(batch.requests, batch.futures)])
+            return
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def run_alone(self, executor: app_inference.InferenceExecutor, rows: Rows, future: asyncio.Future):
+        try:
+            result = (await executor.predict_loaded(self.endpoint_id, self.model, 'predict_batch', [rows]))[0]
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__stats_lock__:
+            batches = sum(self.__batch_sizes__.values())
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': batches,
+                'requests': self.__requests__,
+                'rows': self.__rows__,
+                'mean_batch_size': self.__requests__ / batches if batches else 0.0,
+                'batch_size_distribution': dict(sorted(self.__batch_sizes__.items()))
+            }
+
+
+class MicroBatchers(object):
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__batchers__: typing.Dict[int, MicroBatcher] = {}
+
+    def get(self, endpoint_id: int, model: app_runtime_wrapper.ModelInvocationExecutor) -> MicroBatcher:
+        with self.__lock__:
+            batcher = self.__batchers__.get(endpoint_id)
+            # a new batcher is created when the model is reloaded
+            if batcher is None or batcher.model is not model:
+                options = model.options.micro_batching
+                batcher = self.__batchers__[endpoint_id] = MicroBatcher(
+                    endpoint_id, model, options.max_batch_size, options.max_wait_ms)
+            return batcher
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            return {str(endpoint_id): batcher.stats() for endpoint_id, batcher in self.__batchers__.items()}
+
+    def clear(self):
+        with self.__lock__:
+            self.__batchers__.clear()
+
+
+batchers = MicroBatchers()
@@ -15,68 +15,422 @@
 #
 
 
+import concurrent.futures as futures
 import logging
+import threading
+import time
 import typing
 
-import cachetools
-import readerwriterlock.rwlock as rwlock
 import sqlalchemy.orm as saorm
 
 import app.core.configuration as app_core_config
 import app.crud as crud
+import app.db.binary_store as app_binary_store
+import app.runtime.discovery_cache as app_discovery_cache
+import app.runtime.footprint as app_footprint
+import app.runtime.result_cache as app_result_cache
 import app.runtime.wrapper as runtime_wrapper
 
 LOGGER = logging.getLogger(__name__)
 METADATA_FIELD = app_core_config.get_config().ADDITIONAL_INFO_FIELD
+RUNTIME_OPTIONS_FIELD = app_core_config.get_config().RUNTIME_OPTIONS_FIELD
+
+EVICTION_REASONS = ('memory', 'count', 'ttl', 'oversized', 'invalidated')
+
+
+class CacheEntry(object):
+    def __init__(
+            self, model: runtime_wrapper.ModelInvocationExecutor, size: int, pinned: bool, version: int, now: float
+    ):
+        self.model = model
+        self.size = size
+        self.pinned = pinned
+        self.version = version
+        self.hits = 0
+        self.loaded_at = now
+        self.accessed_at = now
 
 
 class ModelCache(object):
-    def __init__(self, max_len: int, max_age_seconds: int):
-        self.__cache_lock__ = rwlock.RWLockRead()
-        self.__cache__: cachetools.TTLCache[int, runtime_wrapper.ModelInvocationExecutor] = \
-            cachetools.TTLCache(maxsize=max_len, ttl=max_age_seconds)
+    """
+    Deserialized models by endpoint, bounded by a number of models and by the estimated memory of the models.
+    Models which were not used for `max_age_seconds` expire. An expired model is still served for `max_stale_seconds`
+    while a background thread checks that its binary did not change, it is then fresh again. When a bound is exceeded,
+    models are evicted by least recent use (`lru`) or fewest hits (`lfu`). Models of pinned endpoints are only dropped
+    when they are invalidated. Concurrent misses of an endpoint wait for a single load of its model.
+
+    Changes of endpoints are published in the `endpoint_change` table. Every `sync_interval` seconds, the changes
+    committed by other workers since the last poll are read and the models loaded from an older version are dropped.
+    A change is recorded in the transaction of the change of its endpoint. Ids skipped by a poll may belong to
+    transactions which were not committed yet, they are polled again for `gap_grace_seconds`.
+    """
+
+    def __init__(
+            self,
+            max_len: int,
+            max_age_seconds: float,
+            max_bytes: int = 0,
+            policy: typing.Text = 'lru',
+            sync_interval: float = 0.0,
+            change_retention_seconds: float = 3600.0,
+            gap_grace_seconds: float = 60.0,
+            max_stale_seconds: float = 0.0,
+            session_factory: typing.Optional[typing.Callable[[], saorm.Session]] = None,
+            clock: typing.Callable[[], float] = time.monotonic
+    ):
+        self.max_len = max_len
+        self.max_age_seconds = max_age_seconds
+        # 0: no memory limit
+        self.max_bytes = max_bytes
+        self.policy = policy
+        # 0: changes of other workers are not read
+        self.sync_interval = sync_interval
+        self.change_retention_seconds = change_retention_seconds
+        # seconds a missing id of the change feed is polled again
+        self.gap_grace_seconds = gap_grace_seconds
+        # 0: expired models are dropped
+        self.max_stale_seconds = max_stale_seconds
+        # sessions of background threads, `app.db.session.SessionLocal` by default
+        self.session_factory = session_factory
+        self.clock = clock
+
+        self.__lock__ = threading.Lock()
+        self.__entries__: typing.Dict[int, CacheEntry] = {}
+        self.__hits__ = 0
+        self.__misses__ = 0
+        self.__evictions__ = {reason: 0 for reason in EVICTION_REASONS}
+        self.__loads__ = 0
+        self.__coalesced__ = 0
+        self.__stale_hits__ = 0
+        self.__flights__: typing.Dict[int, futures.Future] = {}
+        self.__revalidating__: typing.Set[int] = set()
+        self.__feed_position__ = 0
+        # ids lower than the feed position which were not read yet, by time they were first missed
+        self.__feed_gaps__: typing.Dict[int, float] = {}
+        self.__synced_at__: typing.Optional[float] = None
+        self.__sync_thread__: typing.Optional[threading.Thread] = None
+        self.__sync_stop__ = threading.Event()
+
+    @property
+    def memory(self) -> int:
+        return sum(entry.size for entry in self.__entries__.values())
+
+    def evict(self, endpoint_id: int, reason: typing.Text):
+        entry = self.__entries__.pop(endpoint_id)
+        self.__evictions__[reason] += 1
+        LOGGER.info('Evicted model of endpoint %s (%s bytes): %s', endpoint_id, entry.size, reason)
+
+    def expire(self, now: float):
+        for endpoint_id, entry in list(self.__entries__.items()):
+            if not entry.pinned and now - entry.accessed_at > self.max_age_seconds + self.max_stale_seconds:
+                self.evict(endpoint_id, 'ttl')
+
+    def victim(self, inserted: int) -> typing.Optional[int]:
+        """Endpoint whose model is evicted first, None when all models are pinned"""
+        candidates = [(endpoint_id, entry) for endpoint_id, entry in self.__entries__.items() if not entry.pinned]
+        if len(candidates) > 1:
+            # the inserted model has no hits yet, it is only evicted when the other models are pinned
+            candidates = [(endpoint_id, entry) for endpoint_id, entry in candidates if endpoint_id != inserted]
+        if not candidates:
+            return None
+        if self.policy == 'lfu':
+            return min(candidates, key=lambda item: (item[1].hits, item[1].accessed_at))[0]
+        return min(candidates, key=lambda item: item[1].accessed_at)[0]
+
+    def shrink(self, inserted: int):
+        while len(self.__entries__) > self.max_len or (self.max_bytes and self.memory > self.max_bytes):
+            reason = 'count' if len(self.__entries__) > self.max_len else 'memory'
+            endpoint_id = self.victim(inserted)
+            if endpoint_id is None:
+                LOGGER.warning('Pinned models exceed the model cache limits')
+                return
+            self.evict(endpoint_id, reason)
+
+    def lookup(self, endpoint_id: int, count: bool) -> typing.Optional[runtime_wrapper.ModelInvocationExecutor]:
+        """Cached model, its time to live starts again unless it expired and waits for its revalidation"""
+        now = self.clock()
+        with self.__lock__:
+            self.expire(now)
+            entry = self.__entries__.get(endpoint_id)
+            if count:
+                if entry is None:
+                    self.__misses__ += 1
+                else:
+                    self.__hits__ += 1
+                    entry.hits += 1
+            if entry is None:
+                return None
+            if entry.pinned or now - entry.accessed_at <= self.max_age_seconds:
+                entry.accessed_at = now
+            elif count:
+                self.__stale_hits__ += 1
+                if endpoint_id not in self.__revalidating__:
+                    self.__revalidating__.add(endpoint_id)
+                    threading.Thread(
+                        target=self.revalidate, args=(endpoint_id, entry.version), name='model-revalidation',
+                        daemon=True).start()
+            return entry.model
+
+    def insert(
+            self, endpoint_id: int, model: runtime_wrapper.ModelInvocationExecutor, size: int, version: int = 0
+    ) -> runtime_wrapper.ModelInvocationExecutor:
+        pinned = model.options.pinned
+        with self.__lock__:
+            # already added by other thread
+            if endpoint_id in self.__entries__:
+                return self.__entries__[endpoint_id].model
+            if not pinned and self.max_bytes and size > self.max_bytes:
+                LOGGER.warning(
+                    'Model of endpoint %s (%s bytes) exceeds the model cache memory limit, not cached',
+                    endpoint_id, size)
+                self.__evictions__['oversized'] += 1
+                return model
+            self.__entries__[endpoint_id] = CacheEntry(model, size, pinned, version, self.clock())
+            self.shrink(endpoint_id)
+            return model
+
+    def peek(self, endpoint_id: int) -> typing.Optional[runtime_wrapper.ModelInvocationExecutor]:
+        """Returns the cached model without loading it"""
+        return self.lookup(endpoint_id, count=False)
 
     def get_deserialized_model(
             self, db: saorm.Session, endpoint_id: int
     ) -> typing.Optional[runtime_wrapper.ModelInvocationExecutor]:
         LOGGER.debug('Loading binary for endpoint id: %s', endpoint_id)
-        with self.__cache_lock__.gen_rlock():
-            if endpoint_id in self.__cache__:
-                LOGGER.debug('Model cache hit')
-                return self.__cache__.get(endpoint_id)
+        cached = self.lookup(endpoint_id, count=True)
+        if cached is not None:
+            LOGGER.debug('Model cache hit')
+            return cached
         LOGGER.debug('Model cache miss')
+        return self.load(db, endpoint_id)
+
+    def load(self, db: saorm.Session, endpoint_id: int) -> typing.Optional[runtime_wrapper.ModelInvocationExecutor]:
+        """Loads and caches the model of an endpoint, concurrent calls wait for the first one"""
+        with self.__lock__:
+            # inserted by a load which ended after the lookup of this thread
+            if endpoint_id in self.__entries__:
+                return self.__entries__[endpoint_id].model
+            flight = self.__flights__.get(endpoint_id)
+            leader = flight is None
+            if leader:
+                flight = self.__flights__[endpoint_id] = futures.Future()
+                self.__loads__ += 1
+            else:
+                self.__coalesced__ += 1
+        if not leader:
+            LOGGER.debug('Waiting for the model of endpoint %s loaded by other thread', endpoint_id)
+            return flight.result()
+        try:
+            model = self.deserialize(db, endpoint_id)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(model)
+            return model
+        finally:
+            with self.__lock__:
+                self.__flights__.pop(endpoint_id, None)
 
-        model_binary = crud.binary_ml_model.get_by_endpoint(db, endpoint_id=endpoint_id)
-        model_config = crud.model_config.get(db, id=endpoint_id)
+    def deserialize(
+            self, db: saorm.Session, endpoint_id: int
+    ) -> typing.Optional[runtime_wrapper.ModelInvocationExecutor]:
+        model_binary = crud.binary_ml_model.get_with_configuration(db, endpoint_id=endpoint_id)
 
-        if not model_binary or not model_config:
+        if not model_binary:
             # a deserialized model should contain a binary and associated metadata
             LOGGER.error('Requested model does not exist')
             return None
 
-        metadata = model_config.configuration.get('metadata')
-        additional_metadata = {} if not metadata else metadata.get(METADATA_FIELD)
-
-        deserialized = runtime_wrapper.ModelInvocationExecutor(
-            model=model_binary.model_b64,
-            input_type=model_binary.input_data_structure,
-            output_type=model_binary.output_data_structure,
-            binary_format=model_binary.format,
-            info=additional_metadata
+        deserialized = runtime_wrapper.ModelInvocationExecutor.from_configuration(
+            app_binary_store.get_store().read(model_binary.hash),
+            model_binary.configuration,
+            model_binary.input_data_structure,
+            model_binary.output_data_structure,
+            model_binary.format
         )
-        with self.__cache_lock__.gen_wlock():
-            # already added by other thread
-            if endpoint_id in self.__cache__:
-                return self.__cache__[endpoint_id]
-            self.__cache__[endpoint_id] = deserialized
-            return deserialized
+        return self.add(endpoint_id, deserialized, model_binary.size, model_binary.version)
+
+    def add(
+            self, endpoint_id: int, model: runtime_wrapper.ModelInvocationExecutor, binary_size: int, version: int
+    ) -> runtime_wrapper.ModelInvocationExecutor:
+        """Caches a deserialized model, such as a model loaded when it was uploaded"""
+        return self.insert(endpoint_id, model, app_footprint.estimate(model, binary_size), version)
+
+    def revalidate(self, endpoint_id: int, version: int):
+        """Keeps an expired model when its binary did not change, loads the new model otherwise"""
+        db = self.new_session()
+        try:
+            current = crud.binary_ml_model.get_version(db, endpoint_id=endpoint_id)
+            if current == version:
+                with self.__lock__:
+                    entry = self.__entries__.get(endpoint_id)
+                    if entry is not None and entry.version == version:
+                        entry.accessed_at = self.clock()
+                return
+            LOGGER.info('Model of endpoint %s changed from version %s to %s', endpoint_id, version, current)
+            self.invalidate(endpoint_id)
+            if current is not None:
+                self.load(db, endpoint_id)
+        except Exception:
+            LOGGER.exception('Failed to revalidate model of endpoint %s', endpoint_id)
+        finally:
+            with self.__lock__:
+                self.__revalidating__.discard(endpoint_id)
+            db.close()
+
+    def new_session(self) -> saorm.Session:
+        if self.session_factory is None:
+            import app.db.session as app_db_session
+            return app_db_session.SessionLocal()
+        return self.session_factory()
+
+    def preload(self, db: saorm.Session):
+        """Loads the models of the first endpoints until the cache is full"""
+        for endpoint_id in crud.binary_ml_model.get_endpoint_ids(db)[:self.max_len]:
+            try:
+                self.get_deserialized_model(db, endpoint_id)
+            except Exception:
+                LOGGER.exception('Failed to preload model of endpoint %s', endpoint_id)
+        LOGGER.info('Preloaded %s models', len(self.__entries__))
+
+    def invalidate(self, endpoint_id: int, version: typing.Optional[int] = None):
+        """
+        Drops the model and the cached results of an endpoint after its binary or configuration changed. When
+        `version` is given, a model loaded from this version or a later one is kept.
+        """
+        with self.__lock__:
+            entry = self.__entries__.get(endpoint_id)
+            if entry is not None and version is not None and entry.version >= version:
+                return
+            if entry is not None:
+                self.evict(endpoint_id, 'invalidated')
+        app_result_cache.result_caches.invalidate(endpoint_id)
+
+    def record(self, db: saorm.Session, endpoint_id: int) -> int:
+        """
+        Records a change of an endpoint in the open transaction of `db`, before the change itself so that both are
+        committed together. Returns the new version of the endpoint, which is passed to `published` after the commit.
+        """
+        return crud.endpoint_change.record(
+            db, endpoint_id=endpoint_id, retention_seconds=self.change_retention_seconds)
+
+    def published(self, endpoint_id: int, version: int) -> int:
+        """Invalidates an endpoint in this worker once its recorded change is committed, returns its version"""
+        self.invalidate(endpoint_id)
+        app_discovery_cache.pages.bump()
+        return version
+
+    def publish(self, db: saorm.Session, endpoint_id: int) -> int:
+        """
+        Invalidates an endpoint in this worker and records the change for the other workers, returns the new version
+        of the endpoint
+        """
+        version = self.record(db, endpoint_id)
+        db.commit()
+        return self.published(endpoint_id, version)
+
+    def sync(self, db: saorm.Session):
+        """Invalidates the endpoints changed by other workers since the last poll and the discovery pages listing them"""
+        now = self.clock()
+        if self.__synced_at__ is not None and now - self.__synced_at__ > self.change_retention_seconds:
+            # changes may have been pruned before they were read
+            LOGGER.warning('Model cache was not synchronized for %.0fs, clearing it', now - self.__synced_at__)
+            with self.__lock__:
+                cached = list(self.__entries__)
+            for endpoint_id in cached:
+                self.invalidate(endpoint_id)
+            app_discovery_cache.pages.bump()
+        changes = crud.endpoint_change.get_since(db, after=self.__feed_position__, missing=list(self.__feed_gaps__))
+        for change in changes:
+            self.invalidate(change.endpoint_id, change.id)
+            self.__feed_gaps__.pop(change.id, None)
+        if changes:
+            read = {change.id for change in changes}
+            position = max(self.__feed_position__, max(read))
+            if self.__synced_at__ is not None:
+                # ids are allocated when changes are inserted, a lower id may still be committed by another worker
+                self.__feed_gaps__.update(
+                    (missing, now) for missing in range(self.__feed_position__ + 1, position) if missing not in read)
+            self.__feed_position__ = position
+            app_discovery_cache.pages.bump(max(change.changed_at for change in changes))
+        # ids of rolled back transactions are never committed
+        for missing, seen_at in list(self.__feed_gaps__.items()):
+            if now - seen_at > self.gap_grace_seconds:
+                del self.__feed_gaps__[missing]
+        self.__synced_at__ = now
+
+    def sync_periodically(self):
+        while not self.__sync_stop__.wait(self.sync_interval):
+            db = self.new_session()
+            try:
+                self.sync(db)
+            except Exception:
+                LOGGER.exception('Failed to read the endpoint changes')
+            finally:
+                db.close()
+
+    def start_sync(self):
+        """Starts polling the changes of other workers in this process"""
+        with self.__lock__:
+            if self.sync_interval <= 0 or self.__sync_thread__ is not None:
+                return
+            self.__sync_stop__.clear()
+            self.__sync_thread__ = threading.Thread(
+                target=self.sync_periodically, name='model-cache-sync', daemon=True)
+            self.__sync_thread__.start()
+
+    def stop_sync(self):
+        with self.__lock__:
+            thread, self.__sync_thread__ = self.__sync_thread__, None
+        self.__sync_stop__.set()
+        if thread is not None:
+            thread.join()
 
     def clear(self):
-        with self.__cache_lock__.gen_wlock():
-            self.__cache__.clear()
+        with self.__lock__:
+            self.__entries__.clear()
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        now = self.clock()
+        with self.__lock__:
+            lookups = self.__hits__ + self.__misses__
+            return {
+                'policy': self.policy,
+                'size': len(self.__entries__),
+                'max_size': self.max_len,
+                'memory_bytes': self.memory,
+                'max_memory_bytes': self.max_bytes,
+                'ttl_seconds': self.max_age_seconds,
+                'hits': self.__hits__,
+                'misses': self.__misses__,
+                'hit_ratio': self.__hits__ / lookups if lookups else 0.0,
+                'stale_hits': self.__stale_hits__,
+                'max_stale_seconds': self.max_stale_seconds,
+                'loads': self.__loads__,
+                'coalesced_loads': self.__coalesced__,
+                'evictions': dict(self.__evictions__),
+                'change_feed_position': self.__feed_position__,
+                'change_feed_gaps': len(self.__feed_gaps__),
+                'models': {
+                    str(endpoint_id): {
+                        'size_bytes': entry.size,
+                        'pinned': entry.pinned,
+                        'version': entry.version,
+                        'hits': entry.hits,
+                        'idle_seconds': now - entry.accessed_at,
+                        'age_seconds': now - entry.loaded_at
+                    }
+                    for endpoint_id, entry in self.__entries__.items()}
+            }
 
 
 cache = ModelCache(
-    max_len=app_core_config.get_config().CACHE_TTL,
-    max_age_seconds=app_core_config.get_config().MODEL_CACHE_SIZE
+    max_len=app_core_config.get_config().MODEL_CACHE_SIZE,
+    max_age_seconds=app_core_config.get_config().CACHE_TTL,
+    max_bytes=app_core_config.get_config().MODEL_CACHE_MEMORY_LIMIT,
+    policy=app_core_config.get_config().MODEL_CACHE_POLICY,
+    sync_interval=app_core_config.get_config().MODEL_CACHE_SYNC_INTERVAL,
+    change_retention_seconds=app_core_config.get_config().MODEL_CACHE_CHANGE_RETENTION,
+    max_stale_seconds=app_core_config.get_config().MODEL_CACHE_MAX_STALENESS
 )
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+"""
+Serialized pages of the discovery endpoints (`/models`, `/endpoints`), keyed by path and query parameters.
+
+Pages are materialized for a generation of the catalog. The generation is bumped by every change of a model or an
+endpoint published by this worker and by every poll of the change feed which reads changes of other workers, pages of
+older generations are not served anymore. Pages also expire after `ttl_seconds`, which bounds their staleness when the
+change feed is not polled.
+"""
+
+
+import datetime as dt
+import hashlib
+import threading
+import typing
+
+import cachetools
+
+import app.core.configuration as app_core_config
+
+Key = typing.Tuple[typing.Text, typing.Tuple[typing.Tuple[typing.Text, typing.Text], ...]]
+
+
+class Page(object):
+    def __init__(self, body: bytes, generation: int):
+        self.body = body
+        self.generation = generation
+        # pages of all workers listing the same items have the same tag
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class DiscoveryCache(object):
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self.__lock__ = threading.Lock()
+        self.__pages__: cachetools.TTLCache[Key, Page] = cachetools.TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self.__generation__ = 0
+        self.__modified_at__: typing.Optional[dt.datetime] = None
+        self.__hits__ = 0
+        self.__misses__ = 0
+
+    @property
+    def generation(self) -> int:
+        return self.__generation__
+
+    @property
+    def modified_at(self) -> typing.Optional[dt.datetime]:
+        """Time of the last known change of the catalog, None when no change was seen since this worker started"""
+        return self.__modified_at__
+
+    def bump(self, modified_at: typing.Optional[dt.datetime] = None):
+        """Starts a new generation after models or endpoints changed at `modified_at` (now by default)"""
+        modified_at = modified_at or dt.datetime.now(tz=dt.timezone.utc)
+        if modified_at.tzinfo is None:
+            modified_at = modified_at.replace(tzinfo=dt.timezone.utc)
+        with self.__lock__:
+            self.__generation__ += 1
+            self.__pages__.clear()
+            if self.__modified_at__ is None or modified_at > self.__modified_at__:
+                self.__modified_at__ = modified_at
+
+    def get(self, key: Key) -> typing.Optional[Page]:
+        with self.__lock__:
+            page = self.__pages__.get(key)
+            if page is None or page.generation != self.__generation__:
+                self.__misses__ += 1
+                return None
+            self.__hits__ += 1
+            return page
+
+    def put(self, key: Key, body: bytes, generation: int) -> Page:
+        """
+        Caches a page read from the database during `generation`, the generation read before the database so that a
+        page which may have missed a change is never cached for the generation of that change
+        """
+        page = Page(body, generation)
+        if self.max_size > 0:
+            with self.__lock__:
+                if generation == self.__generation__:
+                    self.__pages__[key] = page
+        return page
+
+    def clear(self):
+        with self.__lock__:
+            self.__pages__.clear()
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            lookups = self.__hits__ + self.__misses__
+            return {
+                'size': self.__pages__.currsize,
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'generation': self.__generation__,
+                'hits': self.__hits__,
+                'misses': self.__misses__,
+                'hit_ratio': self.__hits__ / lookups if lookups else 0.0
+            }
+
+
+pages = DiscoveryCache(
+    max_size=app_core_config.get_config().DISCOVERY_CACHE_SIZE,
+    ttl_seconds=app_core_config.get_config().DISCOVERY_CACHE_TTL
+)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+"""
+Memory footprint estimation of deserialized models.
+
+Python objects reachable from a model are visited once and their sizes are summed, numpy arrays count their buffers.
+Memory mapped arrays are shared with other workers and only count their header.
+Models whose state lives outside of the python heap (xgboost boosters, onnxruntime sessions, pypmml models in a JVM)
+are counted as the length of their binary.
+"""
+
+
+import logging
+import mmap
+import sys
+import types
+import typing
+
+import numpy as np
+
+import app.runtime.wrapper as app_runtime_wrapper
+
+LOGGER = logging.getLogger(__name__)
+
+# shared by all models or not owned by them
+SKIPPED = (type, types.ModuleType, types.BuiltinFunctionType, types.MethodType, logging.Logger)
+
+
+def array_size(array: np.ndarray, stack: typing.List[typing.Any]) -> int:
+    if isinstance(array.base, np.ndarray):
+        # view: the buffer is counted with the array owning it
+        stack.append(array.base)
+        return sys.getsizeof(array)
+    if isinstance(array.base, mmap.mmap):
+        return sys.getsizeof(array)
+    size = sys.getsizeof(array) if array.base is None else sys.getsizeof(array) + array.nbytes
+    if array.dtype == object:
+        stack.extend(array.ravel().tolist())
+    return size
+
+
+def object_size(root: typing.Any, excluded: typing.Iterable[typing.Any] = ()) -> int:
+    """Size in bytes of the objects reachable from `root`, `excluded` objects are not visited"""
+    seen = {id(obj) for obj in excluded}
+    # states are built on demand, they are kept alive so that their ids are not reused during the traversal
+    states = []
+    stack = [root]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            size += array_size(obj, stack)
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, types.FunctionType):
+            # compiled models keep their state in closures
+            stack.extend(cell.cell_contents for cell in obj.__closure__ or () if cell.cell_contents is not None)
+            stack.extend(obj.__defaults__ or ())
+            continue
+        if hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+        elif type(obj).__getstate__ is not object.__getstate__:
+            # extension types such as scikit-learn trees expose their arrays through their state
+            try:
+                states.append(obj.__getstate__())
+                stack.append(states[-1])
+            except Exception:
+                LOGGER.debug('Can not read the state of %s', type(obj).__name__)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                if isinstance(slot, str) and slot != '__dict__' and hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+def estimate(executor: app_runtime_wrapper.ModelInvocationExecutor, binary_size: int) -> int:
+    """Estimated memory footprint in bytes of a deserialized model"""
+    external = executor.loaded_model.external_size(binary_size)
+    excluded = [executor.loaded_model.model] if external else []
+    return object_size(executor, excluded) + external
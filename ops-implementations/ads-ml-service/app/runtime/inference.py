@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import asyncio
+import concurrent.futures as futures
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+import typing
+
+import fastapi
+import sqlalchemy.orm as saorm
+import starlette.status as status
+
+import app.core.configuration as app_core_config
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QueueTimeoutError(Exception):
+    """Prediction waited longer than the configured queue timeout before a worker was free"""
+
+
+class RemoteHTTPError(Exception):
+    """Picklable replacement of `fastapi.HTTPException` raised inside a worker process"""
+
+    def __init__(self, status_code: int, detail: typing.Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _timed_call(
+        enqueued_at: float, queue_timeout: float, fn: typing.Callable, *args: typing.Any
+) -> typing.Tuple[float, typing.Any]:
+    # wall clock: it needs to be comparable between processes
+    waited = time.time() - enqueued_at
+    if waited > queue_timeout:
+        raise QueueTimeoutError(waited)
+    try:
+        return waited, fn(*args)
+    except fastapi.HTTPException as e:
+        raise RemoteHTTPError(e.status_code, e.detail)
+
+
+def predict(
+        db: saorm.Session, endpoint_id: int, method: typing.Text, *args: typing.Any
+) -> typing.Optional[typing.Dict[typing.Text, typing.Any]]:
+    import app.runtime.cache as app_cache
+
+    deserialized = app_cache.cache.get_deserialized_model(db, endpoint_id=endpoint_id)
+    if not deserialized:
+        return None
+    return getattr(deserialized, method)(*args)
+
+
+def predict_with_session(
+        endpoint_id: int, method: typing.Text, *args: typing.Any
+) -> typing.Optional[typing.Dict[typing.Text, typing.Any]]:
+    import app.db.session as app_db_session
+    import app.runtime.cache as app_cache
+
+    # each inference process has its own model cache
+    app_cache.cache.start_sync()
+    db = app_db_session.LazySession()
+    try:
+        return predict(db, endpoint_id, method, *args)
+    finally:
+        db.close()
+
+
+class InferenceExecutor(object):
+    def __init__(self, kind: typing.Text, workers: int, queue_size: int, queue_timeout: float):
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+        self.__lock__ = threading.Lock()
+        self.__pool__: typing.Optional[futures.Executor] = None
+        self.__pending__ = 0
+        self.__rejected__ = 0
+        self.__timed_out__ = 0
+        self.__completed__ = 0
+        self.__wait_total__ = 0.0
+        self.__wait_max__ = 0.0
+
+    def get_pool(self) -> futures.Executor:
+        with self.__lock__:
+            if self.__pool__ is None:
+                LOGGER.info('Starting %s inference executor with %s workers', self.kind, self.workers)
+                self.__pool__ = futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')) \
+                    if self.kind == 'process' \
+                    else futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+            return self.__pool__
+
+    async def wait_for_worker(self, fn: typing.Callable, *args: typing.Any) -> typing.Tuple[float, typing.Any]:
+        """
+        Waiting time and result of `fn`. A call still queued after `queue_timeout` is cancelled and never runs, the
+        check of `_timed_call` only guards calls picked up by a worker at the time of the timeout.
+        """
+        future = self.get_pool().submit(_timed_call, time.time(), self.queue_timeout, fn, *args)
+        result = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                raise QueueTimeoutError(self.queue_timeout)
+        # started before the timeout
+        return await result
+
+    async def submit(self, fn: typing.Callable, *args: typing.Any) -> typing.Any:
+        with self.__lock__:
+            if self.__pending__ >= self.workers + self.queue_size:
+                self.__rejected__ += 1
+                LOGGER.warning('Inference queue is full, rejecting prediction')
+                raise fastapi.HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail='Inference queue is full',
+                    headers={'Retry-After': '1'})
+            self.__pending__ += 1
+
+        try:
+            waited, result = await self.wait_for_worker(fn, *args)
+        except QueueTimeoutError as e:
+            with self.__lock__:
+                self.__timed_out__ += 1
+            LOGGER.warning('Prediction waited %.3fs for an inference worker', e.args[0])
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Timeout while waiting for an inference worker',
+                headers={'Retry-After': '1'})
+        except RemoteHTTPError as e:
+            raise fastapi.HTTPException(status_code=e.status_code, detail=e.detail)
+        finally:
+            with self.__lock__:
+                self.__pending__ -= 1
+
+        with self.__lock__:
+            self.__completed__ += 1
+            self.__wait_total__ += waited
+            self.__wait_max__ = max(self.__wait_max__, waited)
+        return result
+
+    async def predict(
+            self, db: saorm.Session, endpoint_id: int, method: typing.Text, *args: typing.Any
+    ) -> typing.Optional[typing.Dict[typing.Text, typing.Any]]:
+        if self.kind == 'process':
+            # sessions can not be shared with other processes
+            return await self.submit(predict_with_session, endpoint_id, method, *args)
+        return await self.submit(predict, db, endpoint_id, method, *args)
+
+    async def predict_loaded(
+            self, endpoint_id: int, model: typing.Any, method: typing.Text, *args: typing.Any
+    ) -> typing.Any:
+        """Invokes an already deserialized model"""
+        if self.kind == 'process':
+            return await self.submit(predict_with_session, endpoint_id, method, *args)
+        return await self.submit(getattr(model, method), *args)
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            return {
+                'executor': self.kind,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'pending': self.__pending__,
+                'queue_depth': max(0, self.__pending__ - self.workers),
+                'completed': self.__completed__,
+                'rejected': self.__rejected__,
+                'timed_out': self.__timed_out__,
+                'wait_seconds_avg': self.__wait_total__ / self.__completed__ if self.__completed__ else 0.0,
+                'wait_seconds_max': self.__wait_max__
+            }
+
+    def shutdown(self):
+        with self.__lock__:
+            pool, self.__pool__ = self.__pool__, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+@functools.lru_cache()
+def get_executor() -> InferenceExecutor:
+    return InferenceExecutor(
+        kind=app_core_config.get_config().INFERENCE_EXECUTOR,
+        workers=app_core_config.get_config().INFERENCE_WORKERS,
+        queue_size=app_core_config.get_config().INFERENCE_QUEUE_SIZE,
+        queue_timeout=app_core_config.get_config().INFERENCE_QUEUE_TIMEOUT
+    )
@@ -15,8 +15,11 @@
 #
 
 
+from __future__ import annotations
+
 import typing as typ
 
+import fastapi
 import numpy as np
 import pandas as pd
 import xgboost as xgb
@@ -55,9 +58,330 @@ def to_dmatrix(
     return xgb.DMatrix(to_ndarray(input_))
 
 
+def to_float32(
+        input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]],
+        feature_names: typ.Optional[typ.List[typ.Text]] = None
+) -> np.ndarray:
+    """Contiguous float32 array of `xgb.Booster.inplace_predict`, columns follow `feature_names` when given"""
+    rows = input_ if isinstance(input_[0], typ.List) else [input_]
+    if feature_names is None:
+        values = to_list(rows)
+    else:
+        positions = {col.name: i for i, col in enumerate(rows[0])}
+        missing = [name for name in feature_names if name not in positions]
+        if missing:
+            raise fastapi.HTTPException(422, f'Missing features: {missing}')
+        values = [[row[positions[name]].value for name in feature_names] for row in rows]
+    try:
+        return np.array(values, dtype=np.float32)
+    except (ValueError, TypeError):
+        raise fastapi.HTTPException(422, 'Features must be numeric')
+
+
+def columnar_to_list(
+        columns: typ.List[typ.Text],
+        data: typ.Dict[typ.Text, typ.List[typ.Any]]
+) -> typ.List[typ.List[typ.Any]]:
+    return [list(row) for row in zip(*(data[col] for col in columns))]
+
+
+def columnar_to_ndarray(
+        columns: typ.List[typ.Text],
+        data: typ.Dict[typ.Text, typ.List[typ.Any]]
+) -> np.ndarray:
+    # Each column is converted by numpy in a single pass, no per-cell python object is created
+    return np.column_stack([np.asarray(data[col]) for col in columns])
+
+
+def columnar_to_float32(
+        columns: typ.List[typ.Text],
+        data: typ.Dict[typ.Text, typ.List[typ.Any]],
+        feature_names: typ.Optional[typ.List[typ.Text]] = None
+) -> np.ndarray:
+    names = columns if feature_names is None else feature_names
+    missing = [name for name in names if name not in data]
+    if missing:
+        raise fastapi.HTTPException(422, f'Missing features: {missing}')
+    try:
+        return np.column_stack([np.asarray(data[name], dtype=np.float32) for name in names])
+    except (ValueError, TypeError):
+        raise fastapi.HTTPException(422, 'Features must be numeric')
+
+
+def columnar_to_dataframe(
+        columns: typ.List[typ.Text],
+        data: typ.Dict[typ.Text, typ.List[typ.Any]]
+) -> pd.DataFrame:
+    return pd.DataFrame({col: data[col] for col in columns}, columns=columns)
+
+
+def columnar_to_dmatrix(
+        columns: typ.List[typ.Text],
+        data: typ.Dict[typ.Text, typ.List[typ.Any]]
+) -> xgb.DMatrix:
+    return xgb.DMatrix(columnar_to_ndarray(columns, data))
+
+
+PYTHON_DTYPES = {
+    'int': np.dtype(np.int64),
+    'float': np.dtype(np.float64),
+    'bool': np.dtype(np.bool_),
+    'str': np.dtype(object),
+    'string': np.dtype(object)
+}
+
+ABSTRACT_NUMPY_TYPES = (
+    np.number, np.integer, np.signedinteger, np.unsignedinteger, np.inexact, np.floating, np.complexfloating)
+
+
+def feature_dtype(type_: typ.Text) -> typ.Optional[np.dtype]:
+    """Maps the type of a `FeatureImpl` to the numpy dtype of its column, None if it is not supported"""
+    if type_ in PYTHON_DTYPES:
+        return PYTHON_DTYPES[type_]
+    numpy_type = getattr(np, type_, None)
+    if not isinstance(numpy_type, type) or not issubclass(numpy_type, np.generic):
+        return None
+    if issubclass(numpy_type, np.bool_):
+        return np.dtype(np.bool_)
+    if issubclass(numpy_type, np.character):
+        return np.dtype(object)
+    if issubclass(numpy_type, (np.integer, np.floating)):
+        if numpy_type in ABSTRACT_NUMPY_TYPES:
+            return np.dtype(np.int64) if issubclass(numpy_type, np.integer) else np.dtype(np.float64)
+        return np.dtype(numpy_type)
+    return None
+
+
+class EmptyParameters(fastapi.HTTPException):
+    def __init__(self):
+        super().__init__(422, 'Parameters are empty')
+
+
+class MissingFeatures(fastapi.HTTPException):
+    def __init__(self, missing: typ.List[typ.Text]):
+        super().__init__(422, f'Missing features: {missing}')
+
+
+class InputAdapter(object):
+    """
+    Converts requests according to the input schema of a model. Features are mapped to their column once,
+    each request fills typed buffers in the order of the schema whatever the order of its parameters.
+    Numeric and boolean features are written in a float64 buffer and checked before being cast to their dtype,
+    other features are kept as python objects. Strings are rejected for numeric features, booleans are read as 0 and
+    1. Parameters which are not in the schema are ignored.
+
+    The buffers are allocated for each call: models such as identity models or DataFrame views may return arrays
+    sharing the memory of their input, which outlive the call.
+
+    Models accepting missing values (`allow_missing`), PMML models with their missing value treatment, convert requests
+    lacking features of the schema with the generic converters, as if they had no schema.
+    """
+
+    def __init__(self, names: typ.List[typ.Text], dtypes: typ.List[np.dtype], allow_missing: bool = False):
+        self.names = names
+        self.dtypes = dtypes
+        self.allow_missing = allow_missing
+        self.positions = {name: i for i, name in enumerate(names)}
+        self.numeric = [dtype != np.dtype(object) for dtype in dtypes]
+        self.all_numeric = all(self.numeric)
+        self.all_float64 = all(dtype == np.dtype(np.float64) for dtype in dtypes)
+        # names given to xgboost, which does not accept some characters
+        self.feature_names = None if any(char in name for name in names for char in '[]<') else names
+
+    @staticmethod
+    def compile(
+            input_schema: typ.Optional[typ.List[typ.Dict[typ.Text, typ.Any]]],
+            allow_missing: bool = False
+    ) -> typ.Optional[InputAdapter]:
+        if not input_schema:
+            return None
+        features = sorted(input_schema, key=lambda f: f['order'])
+        dtypes = [feature_dtype(feature['type']) for feature in features]
+        if any(dtype is None for dtype in dtypes) or len({feature['name'] for feature in features}) != len(features):
+            return None
+        return InputAdapter([feature['name'] for feature in features], dtypes, allow_missing)
+
+    def fill(
+            self,
+            rows: typ.List[typ.List[app_schema_impl.ParameterImpl]]
+    ) -> typ.Tuple[np.ndarray, typ.List[np.ndarray]]:
+        """Returns the float64 buffer of numeric features and the raw columns, in the order of the schema"""
+        buffer = np.full((len(rows), len(self.names)), np.nan)
+        columns = [
+            buffer[:, i] if numeric else np.empty(len(rows), dtype=object)
+            for i, numeric in enumerate(self.numeric)]
+        param = None
+        try:
+            for i, row in enumerate(rows):
+                for param in row:
+                    position = self.positions.get(param.name)
+                    if position is None:
+                        continue
+                    if self.numeric[position] and isinstance(param.value, str):
+                        # numpy would parse numeric strings
+                        raise ValueError(param.value)
+                    columns[position][i] = param.value
+        except (ValueError, TypeError):
+            raise fastapi.HTTPException(
+                422, f'Invalid value for feature {param.name} of type {self.dtypes[self.positions[param.name]]}')
+        # request values can not be NaN as JSON does not allow it
+        missing = [
+            name for name, numeric, column in zip(self.names, self.numeric, columns)
+            if (np.isnan(column).any() if numeric else np.equal(column, None).any())]
+        if missing:
+            raise MissingFeatures(missing)
+        return buffer, columns
+
+    def typed_column(self, position: int, column: np.ndarray) -> np.ndarray:
+        dtype = self.dtypes[position]
+        if not self.numeric[position] or dtype == column.dtype:
+            return column
+        if dtype == np.dtype(np.bool_):
+            valid = np.isin(column, (0, 1)).all()
+        elif np.issubdtype(dtype, np.integer):
+            valid = np.array_equal(column, np.trunc(column))
+        else:
+            valid = True
+        if not valid:
+            raise fastapi.HTTPException(422, f'Invalid value for feature {self.names[position]} of type {dtype}')
+        return column.astype(dtype)
+
+    def typed_columns(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]]
+    ) -> typ.List[np.ndarray]:
+        _, columns = self.fill(input_ if isinstance(input_[0], typ.List) else [input_])
+        return [self.typed_column(i, column) for i, column in enumerate(columns)]
+
+    def to_list(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]]
+    ) -> typ.List[typ.List[typ.Any]]:
+        return [list(row) for row in zip(*(column.tolist() for column in self.typed_columns(input_)))]
+
+    def to_ndarray(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]]
+    ) -> np.ndarray:
+        if self.all_float64:
+            buffer, _ = self.fill(input_ if isinstance(input_[0], typ.List) else [input_])
+            return buffer
+        return np.column_stack(self.typed_columns(input_))
+
+    def to_dataframe(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]]
+    ) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(self.names, self.typed_columns(input_))), columns=self.names)
+
+    def to_dmatrix(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]]
+    ) -> xgb.DMatrix:
+        return xgb.DMatrix(self.to_ndarray(input_), feature_names=self.feature_names)
+
+    def to_float32(
+            self,
+            input_: typ.Union[typ.List[typ.List[app_schema_impl.ParameterImpl]], typ.List[app_schema_impl.ParameterImpl]],
+            order: typ.Optional[typ.List[int]] = None
+    ) -> np.ndarray:
+        """Contiguous float32 array of `xgb.Booster.inplace_predict`, `order` lists the schema positions of columns"""
+        if not self.all_numeric:
+            raise fastapi.HTTPException(422, 'Features must be numeric')
+        array = self.to_ndarray(input_)
+        return np.ascontiguousarray(array if order is None else array[:, order], dtype=np.float32)
+
+    def columnar_column(self, position: int, values: typ.List[typ.Any]) -> np.ndarray:
+        try:
+            if not self.numeric[position]:
+                column = np.asarray(values, dtype=object)
+            else:
+                column = np.asarray(values)
+                if column.dtype.kind in 'USO' and any(isinstance(value, str) for value in values):
+                    # numpy would parse numeric strings
+                    raise ValueError(values)
+                column = column.astype(np.float64)
+        except (ValueError, TypeError):
+            raise fastapi.HTTPException(
+                422, f'Invalid value for feature {self.names[position]} of type {self.dtypes[position]}')
+        return self.typed_column(position, column)
+
+    def columnar_columns(self, data: typ.Dict[typ.Text, typ.List[typ.Any]]) -> typ.List[np.ndarray]:
+        missing = [name for name in self.names if name not in data]
+        if missing:
+            raise MissingFeatures(missing)
+        return [self.columnar_column(i, data[name]) for i, name in enumerate(self.names)]
+
+    def columnar_to_list(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
+    ) -> typ.List[typ.List[typ.Any]]:
+        return [list(row) for row in zip(*(column.tolist() for column in self.columnar_columns(data)))]
+
+    def columnar_to_ndarray(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
+    ) -> np.ndarray:
+        return np.column_stack(self.columnar_columns(data))
+
+    def columnar_to_dataframe(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
+    ) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(self.names, self.columnar_columns(data))), columns=self.names)
+
+    def columnar_to_dmatrix(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
+    ) -> xgb.DMatrix:
+        return xgb.DMatrix(self.columnar_to_ndarray(columns, data), feature_names=self.feature_names)
+
+    def columnar_to_float32(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]],
+            order: typ.Optional[typ.List[int]] = None
+    ) -> np.ndarray:
+        if not self.all_numeric:
+            raise fastapi.HTTPException(422, 'Features must be numeric')
+        array = self.columnar_to_ndarray(columns, data)
+        return np.ascontiguousarray(array if order is None else array[:, order], dtype=np.float32)
+
+    def input_handler(self, input_type: app_binary_config.ModelInput) -> typ.Callable:
+        handler = getattr(self, INPUT_HANDLING[input_type].__name__)
+        return with_missing_features(handler, INPUT_HANDLING[input_type]) if self.allow_missing else handler
+
+    def columnar_input_handler(self, input_type: app_binary_config.ModelInput) -> typ.Callable:
+        handler = getattr(self, COLUMNAR_INPUT_HANDLING[input_type].__name__)
+        return with_missing_features(handler, COLUMNAR_INPUT_HANDLING[input_type]) if self.allow_missing else handler
+
+
+def with_missing_features(handler: typ.Callable, generic: typ.Callable) -> typ.Callable:
+    """`handler` converting requests lacking features with the `generic` converter"""
+
+    def convert(*args: typ.Any) -> typ.Any:
+        try:
+            return handler(*args)
+        except MissingFeatures:
+            return generic(*args)
+
+    return convert
+
+
 INPUT_HANDLING = {
     app_binary_config.ModelInput.LIST: to_list,
     app_binary_config.ModelInput.NUMPY_ARRAY: to_ndarray,
     app_binary_config.ModelInput.DATAFRAME: to_dataframe,
     app_binary_config.ModelInput.DMATRIX: to_dmatrix,
 }
+
+COLUMNAR_INPUT_HANDLING = {
+    app_binary_config.ModelInput.LIST: columnar_to_list,
+    app_binary_config.ModelInput.NUMPY_ARRAY: columnar_to_ndarray,
+    app_binary_config.ModelInput.DATAFRAME: columnar_to_dataframe,
+    app_binary_config.ModelInput.DMATRIX: columnar_to_dmatrix,
+}
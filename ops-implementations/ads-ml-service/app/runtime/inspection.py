@@ -16,24 +16,45 @@
 
 
 import logging
+import threading
 import typing
 import pickletools
 
+import cachetools
 import pypmml.base as pypmml_base
 
+import app.runtime.native_pmml as app_native_pmml
 import app.runtime.wrapper as app_runtime_wrapper
 import app.schemas.binary_config as app_binary_config
+import app.schemas.runtime_config as app_runtime_config
 
 LOGGER = logging.getLogger(__name__)
 
 
+ONNX_SCHEMA_TYPES = {
+    'tensor(float)': 'float32',
+    'tensor(double)': 'float64',
+    'tensor(int64)': 'int64',
+    'tensor(int32)': 'int32',
+    'tensor(bool)': 'bool',
+    'tensor(string)': 'str'
+}
+
+# subtypes of stored PMML binaries by hash, a binary is inspected once per worker while it is among the recent ones
+PMML_SUBTYPES_SIZE = 1024
+PMML_SUBTYPES: cachetools.LRUCache = cachetools.LRUCache(maxsize=PMML_SUBTYPES_SIZE)
+PMML_SUBTYPES_LOCK = threading.Lock()
+
+
 def load_pmml_model(model_file: bytes) -> app_runtime_wrapper.ModelInvocationExecutor:
     try:
         runner = app_runtime_wrapper.ModelInvocationExecutor(
             model=model_file,
             input_type=app_binary_config.ModelInput.AUTO,
             output_type=app_binary_config.ModelOutput.AUTO,
-            binary_format=app_binary_config.ModelWrapper.PMML
+            binary_format=app_binary_config.ModelWrapper.PMML,
+            # inspection reads the fields and model attributes of the pypmml model
+            options=app_runtime_config.RuntimeOptions(pmml_evaluator=app_runtime_config.PMMLEvaluator.PYPMML)
         )
     except pypmml_base.PmmlError:
         LOGGER.exception('Can not load pmml model')
@@ -41,33 +62,118 @@ def load_pmml_model(model_file: bytes) -> app_runtime_wrapper.ModelInvocationExe
     return runner
 
 
-def inspect_pmml_input(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
-    wrapper = load_pmml_model(model_file).loaded_model
+def describes_fields(model: typing.Any) -> bool:
+    """Whether a loaded PMML model can be inspected without pypmml"""
+    return not isinstance(model, app_native_pmml.NativeModel) or model.output_types is not None
+
 
-    if wrapper.model.inputFields is not None and len(wrapper.model.inputFields) > 0:
-        return {field.name: field.dataType for field in wrapper.model.inputFields}
+def describe_pmml_model(model_file: bytes) -> typing.Any:
+    """Model describing the fields of a PMML binary, the compiled document when the native evaluator describes it"""
+    try:
+        model = app_native_pmml.compile(model_file)
+    except app_native_pmml.UnsupportedPMML:
+        model = None
+    if model is not None and describes_fields(model):
+        return model
+    return load_pmml_model(model_file).loaded_model.model
+
+
+def pmml_input(model: typing.Any) -> typing.Optional[typing.Dict[str, str]]:
+    """Input fields of a pypmml or compiled model"""
+    if isinstance(model, app_native_pmml.NativeModel):
+        return {field.name: field.data_type for field in model.inputs} or None
+    if model.inputFields is not None and len(model.inputFields) > 0:
+        return {field.name: field.dataType for field in model.inputFields}
     else:
         return None
 
 
-def inspect_pmml_output(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
-    wrapper = load_pmml_model(model_file).loaded_model
+def pmml_output(model: typing.Any) -> typing.Optional[typing.Dict[str, str]]:
+    if isinstance(model, app_native_pmml.NativeModel):
+        return dict(model.output_types) or None
+    if model.outputFields is not None and len(model.outputFields) > 0:
+        return {field.name: field.dataType for field in model.outputFields}
+    else:
+        return None
+
 
-    if wrapper.model.outputFields is not None and len(wrapper.model.outputFields) > 0:
-        return {field.name: field.dataType for field in wrapper.model.outputFields}
+def pmml_model_name(model: typing.Any) -> typing.Optional[str]:
+    if isinstance(model, app_native_pmml.NativeModel):
+        return model.model_name
+    if model.modelName is not None:
+        return model.modelName
     else:
         return None
 
 
+def pmml_subtype(model: typing.Any) -> typing.Optional[str]:
+    if isinstance(model, app_native_pmml.NativeModel):
+        return model.model_element
+    return model.modelElement
+
+
+def inspect_pmml_input(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
+    return pmml_input(describe_pmml_model(model_file))
+
+
+def inspect_pmml_output(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
+    return pmml_output(describe_pmml_model(model_file))
+
+
 def inspect_pmml_model_name(model_file: bytes) -> typing.Optional[str]:
-    wrapper = load_pmml_model(model_file).loaded_model
+    return pmml_model_name(describe_pmml_model(model_file))
+
 
-    if wrapper.model.modelName is not None:
-        return wrapper.model.modelName
+def inspect_pmml_subtype(model_file: bytes) -> typing.Optional[str]:
+    return pmml_subtype(describe_pmml_model(model_file))
+
+
+def remember_pmml_subtype(key: typing.Text, subtype: typing.Optional[str]):
+    with PMML_SUBTYPES_LOCK:
+        PMML_SUBTYPES[key] = subtype
+
+
+def stored_pmml_subtype(key: typing.Text, read: typing.Callable[[], bytes]) -> typing.Optional[str]:
+    """Subtype of the PMML binary with hash `key`, `read` is only called when the binary is not among the recent ones"""
+    with PMML_SUBTYPES_LOCK:
+        if key in PMML_SUBTYPES:
+            return PMML_SUBTYPES[key]
+    # inspected outside of the lock, concurrent requests for the same binary may both inspect it
+    subtype = inspect_pmml_subtype(read())
+    remember_pmml_subtype(key, subtype)
+    return subtype
+
+
+def load_onnx_model(model_file: bytes) -> app_runtime_wrapper.ONNXFormat:
+    try:
+        return app_runtime_wrapper.ONNXFormat.load(model_file)
+    except Exception:
+        LOGGER.exception('Can not load onnx model')
+        raise ValueError('Can not load onnx model')
+
+
+def onnx_input(wrapper: app_runtime_wrapper.ONNXFormat) -> typing.Optional[typing.Dict[str, str]]:
+    """Features of graphs taking one tensor per feature, a single tensor input does not name its features"""
+    inputs = wrapper.inputs
+
+    if len(inputs) > 1 and all(input_.type in ONNX_SCHEMA_TYPES for input_ in inputs):
+        return {input_.name: ONNX_SCHEMA_TYPES[input_.type] for input_ in inputs}
     else:
         return None
 
 
-def inspect_pmml_subtype(model_file: bytes) -> typing.Optional[str]:
-    wrapper = load_pmml_model(model_file).loaded_model
-    return wrapper.model.modelElement
+def onnx_output(wrapper: app_runtime_wrapper.ONNXFormat) -> typing.Optional[typing.Dict[str, str]]:
+    outputs = wrapper.model.get_outputs()
+
+    if len(outputs) > 0:
+        return {output.name: ONNX_SCHEMA_TYPES.get(output.type, output.type) for output in outputs}
+    else:
+        return None
+
+
+def inspect_onnx_input(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
+    return onnx_input(load_onnx_model(model_file))
+
+
+def inspect_onnx_output(model_file: bytes) -> typing.Optional[typing.Dict[str, str]]:
+    return onnx_output(load_onnx_model(model_file))
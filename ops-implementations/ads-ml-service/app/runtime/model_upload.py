@@ -15,25 +15,46 @@
 #
 
 
+from __future__ import annotations
+
 import logging
 import typing
 
 import fastapi
 import fastapi.encoders as encoders
+import numpy as np
 import sqlalchemy.orm as saorm
 import starlette.status as status
 
+import app.core.configuration as app_core_config
 import app.crud as crud
+import app.db.binary_store as app_binary_store
+import app.runtime.input as app_input
 import app.runtime.inspection as app_signature_inspection
 import app.runtime.wrapper as app_runtime_wrapper
 import app.schemas as schemas
 import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as impl
+import app.schemas.runtime_config as app_runtime_config
 
 router = fastapi.APIRouter()
 LOGGER = logging.getLogger(__name__)
 
-SUPPORTED_BINARY_FORMAT = ('.bst', '.pkl', '.pickle', '.joblib')
+SUPPORTED_BINARY_FORMAT = ('.bst', '.pkl', '.pickle', '.joblib', '.onnx')
+
+
+def format_from_extension(file_extension: str) -> typing.Optional[app_binary_config.ModelWrapper]:
+    """Format of a binary model file, None for other files"""
+    if file_extension.lower() == '.bst':
+        return app_binary_config.ModelWrapper.BST
+    elif file_extension.lower() == '.onnx':
+        return app_binary_config.ModelWrapper.ONNX
+    elif file_extension.lower() in ('.pkl', '.pickle'):
+        return app_binary_config.ModelWrapper.PICKLE
+    elif file_extension.lower() in SUPPORTED_BINARY_FORMAT:
+        return app_binary_config.ModelWrapper.JOBLIB
+    else:
+        return None
 
 
 def infer_file_format(
@@ -41,18 +62,13 @@ def infer_file_format(
         file_extension: str
 ) -> typing.Optional[app_binary_config.ModelWrapper]:
     # Binary model needs to have correct file extension
-    if file_extension.lower() in SUPPORTED_BINARY_FORMAT:
-        if file_extension.lower() == '.bst':
-            return app_binary_config.ModelWrapper.BST
-        elif file_extension.lower() in ('.pkl', '.pickle'):
-            return app_binary_config.ModelWrapper.PICKLE
-        else:
-            return app_binary_config.ModelWrapper.JOBLIB
+    binary_format = format_from_extension(file_extension)
+    if binary_format is not None:
+        return binary_format
+    if is_compatible(model, app_binary_config.ModelWrapper.PMML):
+        return app_binary_config.ModelWrapper.PMML
     else:
-        if is_compatible(model, app_binary_config.ModelWrapper.PMML):
-            return app_binary_config.ModelWrapper.PMML
-        else:
-            return None
+        return None
 
 
 def is_compatible(
@@ -73,43 +89,184 @@ def is_compatible(
     return True
 
 
+class UploadedModel(object):
+    """
+    Binary loaded once when it is uploaded. Its schema, name and subtype are read from the loaded model, which then
+    serves the predictions of the endpoint.
+    """
+
+    def __init__(
+            self,
+            binary: bytes,
+            binary_format: app_binary_config.ModelWrapper,
+            options: app_runtime_config.RuntimeOptions,
+            loaded: app_runtime_wrapper.InMemoryModel
+    ):
+        self.binary = binary
+        self.format = binary_format
+        self.options = options
+        self.loaded = loaded
+        self.__pmml_model__ = None
+
+    @staticmethod
+    def load(
+            binary: bytes,
+            binary_format: app_binary_config.ModelWrapper,
+            options: typing.Optional[app_runtime_config.RuntimeOptions] = None
+    ) -> typing.Optional[UploadedModel]:
+        """Binary loaded with the runtime options of its endpoint, None when it can not be loaded"""
+        options = options or app_runtime_config.RuntimeOptions()
+        # noinspection PyBroadException
+        try:
+            loaded = app_runtime_wrapper.WRAPPERS[binary_format].load(binary, options)
+        except Exception:
+            LOGGER.error('Model can not be parsed as %s', binary_format)
+            return None
+        return UploadedModel(binary, binary_format, options, loaded)
+
+    @property
+    def pmml_model(self) -> typing.Any:
+        """pypmml or compiled model describing the fields of a PMML binary"""
+        if self.__pmml_model__ is None:
+            if app_signature_inspection.describes_fields(self.loaded.model):
+                self.__pmml_model__ = self.loaded.model
+            else:
+                # pypmml loads the binary only to infer the output fields the document does not declare
+                self.__pmml_model__ = app_signature_inspection.load_pmml_model(self.binary).loaded_model.model
+            app_signature_inspection.remember_pmml_subtype(
+                app_binary_store.digest(self.binary), app_signature_inspection.pmml_subtype(self.__pmml_model__))
+        return self.__pmml_model__
+
+    def inspect(self) -> typing.Tuple[typing.Optional[typing.Dict[str, str]], typing.Optional[typing.Dict[str, str]]]:
+        """Input and output fields of PMML and ONNX models"""
+        if self.format is app_binary_config.ModelWrapper.PMML:
+            return app_signature_inspection.pmml_input(self.pmml_model), \
+                   app_signature_inspection.pmml_output(self.pmml_model)
+        if self.format is app_binary_config.ModelWrapper.ONNX:
+            return app_signature_inspection.onnx_input(self.loaded), app_signature_inspection.onnx_output(self.loaded)
+        return None, None
+
+    def name(self, file_name: str) -> str:
+        """Model name of PMML binaries, the file name otherwise"""
+        if self.format is app_binary_config.ModelWrapper.PMML:
+            inspected_name = app_signature_inspection.pmml_model_name(self.pmml_model)
+            if inspected_name is not None:
+                return inspected_name
+        return file_name
+
+    def executor(
+            self,
+            configuration: typing.Dict[typing.Text, typing.Any],
+            input_data_structure: app_binary_config.ModelInput,
+            output_data_structure: app_binary_config.ModelOutput
+    ) -> app_runtime_wrapper.ModelInvocationExecutor:
+        """Executor of the endpoint, the loaded model is reused unless the configuration has other runtime options"""
+        options = app_runtime_config.RuntimeOptions.from_metadata(configuration.get('metadata'))
+        return app_runtime_wrapper.ModelInvocationExecutor.from_configuration(
+            self.binary, configuration, input_data_structure, output_data_structure, self.format,
+            loaded_model=self.loaded if options == self.options else None)
+
+
+def probe_parameters(
+        input_schema: typing.Optional[typing.List[typing.Dict[typing.Text, typing.Any]]]
+) -> typing.Optional[typing.List[typing.List[impl.ParameterImpl]]]:
+    """Builds two synthetic rows from the input schema, None if a feature type is not supported"""
+    if not input_schema:
+        return None
+    rows = [[], []]
+    for feature in sorted(input_schema, key=lambda f: f['order']):
+        dtype = app_input.feature_dtype(feature['type'])
+        if dtype is None:
+            return None
+        elif dtype == np.dtype(np.bool_):
+            values = (False, True)
+        elif dtype == np.dtype(object):
+            values = ('0', '1')
+        else:
+            values = (0, 1)
+        for row, value in zip(rows, values):
+            row.append(impl.ParameterImpl(name=feature['name'], value=value))
+    return rows
+
+
+def verify_scoring_mode(
+        db: saorm.Session,
+        model_id: int,
+        runner: app_runtime_wrapper.ModelInvocationExecutor
+) -> typing.Optional[bool]:
+    """
+    Compares single pass scoring with predict/predict_proba at deployment. Endpoints where both disagree are
+    switched to `two_pass` scoring in the model configuration.
+    """
+    if runner.single_pass is not None:
+        return runner.single_pass
+    model_config = crud.model_config.get(db, id=model_id)
+    probe = probe_parameters(model_config.configuration.get('input_schema'))
+    if probe is None:
+        LOGGER.info('No input schema to verify scoring mode, verifying on first prediction')
+        return None
+    # noinspection PyBroadException
+    try:
+        single_pass = runner.check_single_pass(runner.input_handling(probe))
+    except Exception:
+        LOGGER.warning('Scoring mode can not be verified with synthetic input', exc_info=True)
+        return None
+    if not single_pass:
+        field = app_core_config.get_config().RUNTIME_OPTIONS_FIELD
+        metadata = model_config.configuration.get('metadata') or {}
+        crud.model_config.update(
+            db,
+            db_obj=model_config,
+            obj_in=schemas.ModelConfigUpdate(configuration={
+                **model_config.configuration,
+                'metadata': {
+                    **metadata,
+                    field: {**(metadata.get(field) or {}), 'scoring_mode': app_runtime_config.ScoringMode.TWO_PASS}
+                }
+            }))
+    return single_pass
+
+
 def store_model(
         db: saorm.Session,
-        model_binary: bytes,
+        uploaded: UploadedModel,
         input_data_structure: app_binary_config.ModelInput = None,
         output_data_structure: app_binary_config.ModelOutput = None,
-        format_: app_binary_config.ModelWrapper = None,
         model_id: typing.Optional[int] = None,
         name: typing.Optional[str] = None
-) -> int:
+) -> typing.Tuple[int, app_runtime_wrapper.ModelInvocationExecutor, int]:
+    """
+    Stores an uploaded binary, returns the id of its model, the executor of its endpoint and the version of the
+    endpoint to publish with `app.runtime.cache.ModelCache.published`
+    """
     if not ((model_id is None) ^ (name is None)):
         raise RuntimeError('`model_id` xor `name` needs to be true')
+    format_ = uploaded.format
 
     if model_id is None:
         LOGGER.info('Adding binary directly')
         input_schema_ops = None
         output_schema_ops = None
 
-        if format_ is app_binary_config.ModelWrapper.PMML:
-            input_schema_pmml = app_signature_inspection.inspect_pmml_input(model_binary)
-            if input_schema_pmml is None:
-                LOGGER.warning('pmml file does not contain input schema')
-            output_schema_pmml = app_signature_inspection.inspect_pmml_output(model_binary)
-            if output_schema_pmml is None:
-                LOGGER.warning('pmml file does not contain output schema')
+        if format_ in (app_binary_config.ModelWrapper.PMML, app_binary_config.ModelWrapper.ONNX):
+            input_schema_inspected, output_schema_inspected = uploaded.inspect()
+            if input_schema_inspected is None:
+                LOGGER.warning('%s file does not contain input schema', format_.value)
+            if output_schema_inspected is None:
+                LOGGER.warning('%s file does not contain output schema', format_.value)
 
-            input_schema_ops = None if not input_schema_pmml else [
+            input_schema_ops = None if not input_schema_inspected else [
                                 impl.FeatureImpl(
                                     name=k,
                                     order=i,
-                                    type=input_schema_pmml[k]
-                                ) for i, k in enumerate(input_schema_pmml.keys())
+                                    type=input_schema_inspected[k]
+                                ) for i, k in enumerate(input_schema_inspected.keys())
                             ]
-            output_schema_ops = None if not output_schema_pmml else {
+            output_schema_ops = None if not output_schema_inspected else {
                                 k: {
                                     'type': v
                                 }
-                                for k, v in output_schema_pmml.items()
+                                for k, v in output_schema_inspected.items()
                             }
 
         model = crud.model.create_with_config(
@@ -137,17 +294,24 @@ def store_model(
     endpoint = crud.endpoint.get(db, id=model.id)
     if not endpoint:
         LOGGER.info('Endpoint not exist, creating')
+        import app.runtime.cache as app_cache
+
+        # committed with the endpoint, the binary is created with this version
+        version = app_cache.cache.record(db, model.id)
         # Creation
         crud.endpoint.create_with_model_and_binary(
             db,
             model=model,
             ec=schemas.EndpointCreate(name=model_config.configuration['name']),
             bc=schemas.BinaryMlModelCreate(
-                model_b64=model_binary,
+                model_b64=uploaded.binary,
                 input_data_structure=input_data_structure,
                 output_data_structure=output_data_structure,
                 format=format_))
-        return model.id
+        executor = uploaded.executor(model_config.configuration, input_data_structure, output_data_structure)
+        if format_ in (app_binary_config.ModelWrapper.PICKLE, app_binary_config.ModelWrapper.JOBLIB):
+            verify_scoring_mode(db, model.id, executor)
+        return model.id, executor, version
     else:
         LOGGER.warning('Endpoint already exists, existing binary upload')
         raise fastapi.HTTPException(status_code=422, detail='Endpoint already exists')
@@ -0,0 +1,1438 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+"""
+Vectorized evaluation of PMML documents.
+
+RegressionModel, TreeModel, Scorecard, RuleSetModel and MiningModel documents are compiled into numpy operations over
+whole columns, instead of one gateway call per row with pypmml. Numeric values are float64 arrays with NaN for missing
+values, strings are object arrays with None. Documents using an element that is not implemented raise `UnsupportedPMML`
+while compiling and are scored by pypmml.
+"""
+
+
+from __future__ import annotations
+
+import logging
+import operator
+import re
+import typing as typ
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import scipy.special
+
+LOGGER = logging.getLogger(__name__)
+
+NUMBER = 'number'
+STRING = 'string'
+
+DATA_TYPES = {
+    'double': NUMBER,
+    'float': NUMBER,
+    'integer': NUMBER,
+    'string': STRING
+}
+
+MODEL_ELEMENTS = ('RegressionModel', 'TreeModel', 'Scorecard', 'RuleSetModel', 'MiningModel')
+
+COMPARISONS = {
+    'equal': operator.eq,
+    'notEqual': operator.ne,
+    'lessThan': operator.lt,
+    'lessOrEqual': operator.le,
+    'greaterThan': operator.gt,
+    'greaterOrEqual': operator.ge
+}
+
+ARITHMETIC = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.divide,
+    'pow': np.power
+}
+
+MATH = {
+    'log10': np.log10,
+    'ln': np.log,
+    'exp': np.exp,
+    'sqrt': np.sqrt,
+    'abs': np.abs,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    # java rounds half up
+    'round': lambda x: np.floor(x + 0.5)
+}
+
+LINKS = {
+    'logit': scipy.special.expit,
+    'softmax': scipy.special.expit,
+    'probit': scipy.special.ndtr,
+    'cloglog': lambda y: 1 - np.exp(-np.exp(y)),
+    'loglog': lambda y: np.exp(-np.exp(-y)),
+    'cauchit': lambda y: 0.5 + np.arctan(y) / np.pi
+}
+
+ARRAY_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+
+Column = np.ndarray
+Truth = typ.Tuple[np.ndarray, np.ndarray]
+Rows = typ.Optional[np.ndarray]
+
+
+class UnsupportedPMML(Exception):
+    """The document uses a PMML element that is not implemented by the native evaluator"""
+
+
+def is_missing(values: Column) -> np.ndarray:
+    return np.isnan(values) if values.dtype.kind == 'f' else pd.isna(values)
+
+
+def format_value(value: typ.Any) -> typ.Text:
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    return value if isinstance(value, str) else str(value)
+
+
+def to_number(values: typ.Any) -> Column:
+    array = np.asarray(values)
+    if array.dtype.kind in 'biuf':
+        return array.astype(np.float64)
+    return pd.to_numeric(pd.Series(array, dtype=object), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def to_string(values: typ.Any) -> Column:
+    array = np.asarray(values, dtype=object)
+    missing = pd.isna(array)
+    result = np.empty(len(array), dtype=object)
+    result[:] = [None if m else format_value(v) for v, m in zip(array, missing)]
+    return result
+
+
+def cast(values: typ.Any, data_type: typ.Text) -> Column:
+    if data_type == 'string':
+        return to_string(values)
+    numbers = to_number(values)
+    if data_type == 'integer':
+        return np.trunc(numbers)
+    return numbers.astype(np.float32).astype(np.float64) if data_type == 'float' else numbers
+
+
+def kind_of(data_type: typ.Optional[typ.Text]) -> typ.Text:
+    kind = DATA_TYPES.get(data_type)
+    if kind is None:
+        raise UnsupportedPMML(f'Data type {data_type}')
+    return kind
+
+
+def parse_value(text: typ.Text, kind: typ.Text) -> typ.Any:
+    return float(text) if kind == NUMBER else text
+
+
+def parse_typed_value(text: typ.Text, data_type: typ.Text) -> typ.Any:
+    """Values compared with a field are converted to its data type, pypmml truncates integers"""
+    value = parse_value(text, kind_of(data_type))
+    return float(int(value)) if data_type == 'integer' else value
+
+
+def parse_array(element: ET.Element) -> typ.List[typ.Text]:
+    return [quoted.replace('\\"', '"') if quoted or not bare else bare
+            for quoted, bare in ARRAY_TOKEN.findall(element.text or '')]
+
+
+def constant(value: typ.Any, kind: typ.Text, size: int) -> Column:
+    if kind == NUMBER:
+        return np.full(size, np.nan if value is None else value, dtype=np.float64)
+    result = np.empty(size, dtype=object)
+    result[:] = [value] * size
+    return result
+
+
+def fill_missing(values: Column, replacement: typ.Any) -> Column:
+    missing = is_missing(values)
+    if not missing.any():
+        return values
+    values = values.copy()
+    values[missing] = replacement
+    return values
+
+
+def children(element: ET.Element, *tags: typ.Text) -> typ.List[ET.Element]:
+    return [child for child in element if child.tag in tags]
+
+
+def predicate_element(element: ET.Element) -> ET.Element:
+    for child in element:
+        if child.tag in PREDICATES:
+            return child
+    raise UnsupportedPMML(f'{element.tag} without predicate')
+
+
+class Scope(object):
+    """Fields visible to a model: data types and derived field definitions"""
+
+    def __init__(self, parent: typ.Optional[Scope] = None):
+        self.parent = parent
+        self.types: typ.Dict[typ.Text, typ.Text] = {}
+        self.ordinal: typ.Set[typ.Text] = set()
+        self.derived: typ.Dict[typ.Text, typ.Callable[[Frame], Column]] = {}
+
+    def data_type(self, name: typ.Text) -> typ.Text:
+        scope = self
+        while scope is not None:
+            if name in scope.types:
+                return scope.types[name]
+            scope = scope.parent
+        raise UnsupportedPMML(f'Unknown field {name}')
+
+    def kind(self, name: typ.Text) -> typ.Text:
+        return kind_of(self.data_type(name))
+
+    def is_ordinal(self, name: typ.Text) -> bool:
+        scope = self
+        while scope is not None:
+            if name in scope.types:
+                return name in scope.ordinal
+            scope = scope.parent
+        return False
+
+    def declare(self, element: ET.Element):
+        self.types[element.get('name')] = element.get('dataType')
+        if element.get('optype') == 'ordinal':
+            self.ordinal.add(element.get('name'))
+
+    def define(self, elements: typ.Iterable[ET.Element]):
+        elements = list(elements)
+        for element in elements:
+            self.declare(element)
+        for element in elements:
+            self.derived[element.get('name')] = compile_derived_field(element, self)
+
+
+class Frame(object):
+    """Values of the fields of a scope for a batch of rows, derived fields are computed on first access"""
+
+    def __init__(
+            self,
+            scope: Scope,
+            size: int,
+            values: typ.Optional[typ.Dict[typ.Text, Column]] = None,
+            parent: typ.Optional[Frame] = None
+    ):
+        self.scope = scope
+        self.size = size
+        self.values = values or {}
+        self.parent = parent
+
+    def get(self, name: typ.Text) -> Column:
+        values = self.values.get(name)
+        if values is None:
+            derived = self.scope.derived.get(name)
+            if derived is not None:
+                values = self.values[name] = derived(self)
+            else:
+                values = self.parent.get(name)
+        return values
+
+    def take(self, name: typ.Text, rows: Rows) -> Column:
+        values = self.get(name)
+        return values if rows is None else values[rows]
+
+    def length(self, rows: Rows) -> int:
+        return self.size if rows is None else len(rows)
+
+
+class DataField(object):
+    def __init__(self, element: ET.Element):
+        self.name = element.get('name')
+        self.data_type = element.get('dataType')
+        self.kind = kind_of(self.data_type)
+        values = children(element, 'Value')
+        self.categories = [value.get('value') for value in values if value.get('property', 'valid') == 'valid']
+        self.valid = [parse_value(value.get('value'), self.kind)
+                      for value in values if value.get('property', 'valid') == 'valid']
+        self.missing = [parse_value(value.get('value'), self.kind)
+                        for value in values if value.get('property') == 'missing']
+        self.intervals = [compile_interval(interval) for interval in children(element, 'Interval')]
+        if values and any(value.get('property') not in (None, 'valid', 'missing', 'invalid') for value in values):
+            raise UnsupportedPMML(f'Values of {self.name}')
+
+    def cast(self, values: typ.Any) -> Column:
+        values = cast(values, self.data_type)
+        if self.missing:
+            values = values.copy()
+            values[np.isin(values, self.missing) if self.kind == NUMBER
+                   else pd.Series(values).isin(self.missing).to_numpy()] = np.nan if self.kind == NUMBER else None
+        return values
+
+    def invalid(self, values: Column) -> typ.Optional[np.ndarray]:
+        """Known values that are neither in the valid values nor in the intervals of the field"""
+        if not self.valid and not self.intervals:
+            return None
+        valid = np.zeros(len(values), dtype=bool)
+        if self.valid:
+            valid |= np.isin(values, self.valid) if self.kind == NUMBER \
+                else pd.Series(values).isin(self.valid).to_numpy()
+        for interval in self.intervals:
+            valid |= interval(values)
+        return ~valid & ~is_missing(values)
+
+
+def compile_interval(element: ET.Element) -> typ.Callable[[Column], np.ndarray]:
+    closure = element.get('closure')
+    left = float(element.get('leftMargin', '-inf'))
+    right = float(element.get('rightMargin', 'inf'))
+    above = operator.ge if closure.startswith('closed') else operator.gt
+    below = operator.le if closure.endswith('Closed') else operator.lt
+
+    def contains(values: Column) -> np.ndarray:
+        with np.errstate(invalid='ignore'):
+            return above(values, left) & below(values, right)
+
+    return contains
+
+
+# predicates, evaluated with three-valued logic as (value, known) arrays
+
+
+def compile_predicate(element: ET.Element, scope: Scope) -> typ.Callable[[Frame, Rows], Truth]:
+    return PREDICATES[element.tag](element, scope)
+
+
+def compile_simple_predicate(element: ET.Element, scope: Scope) -> typ.Callable[[Frame, Rows], Truth]:
+    field = element.get('field')
+    kind = scope.kind(field)
+    operator_ = element.get('operator')
+
+    if operator_ in ('isMissing', 'isNotMissing'):
+        def missing(frame: Frame, rows: Rows) -> Truth:
+            values = is_missing(frame.take(field, rows))
+            return (values if operator_ == 'isMissing' else ~values), np.ones(len(values), dtype=bool)
+
+        return missing
+
+    # pypmml does not order ordinal fields by their numeric values
+    if operator_ not in COMPARISONS \
+            or (operator_ not in ('equal', 'notEqual') and (kind == STRING or scope.is_ordinal(field))):
+        raise UnsupportedPMML(f'Operator {operator_} on {kind} field {field}')
+    compare = COMPARISONS[operator_]
+    value = parse_typed_value(element.get('value'), scope.data_type(field))
+
+    def simple(frame: Frame, rows: Rows) -> Truth:
+        values = frame.take(field, rows)
+        known = ~is_missing(values)
+        with np.errstate(invalid='ignore'):
+            return np.asarray(compare(values, value), dtype=bool) & known, known
+
+    return simple
+
+
+def compile_set_predicate(element: ET.Element, scope: Scope) -> typ.Callable[[Frame, Rows], Truth]:
+    field = element.get('field')
+    kind = scope.kind(field)
+    negate = element.get('booleanOperator') == 'isNotIn'
+    array = element.find('Array')
+    if array is None:
+        raise UnsupportedPMML('SimpleSetPredicate without Array')
+    values_set = [parse_typed_value(value, scope.data_type(field)) for value in parse_array(array)]
+
+    def set_predicate(frame: Frame, rows: Rows) -> Truth:
+        values = frame.take(field, rows)
+        known = ~is_missing(values)
+        contained = np.isin(values, values_set) if kind == NUMBER else pd.Series(values).isin(values_set).to_numpy()
+        return (~contained if negate else contained) & known, known
+
+    return set_predicate
+
+
+def compile_compound_predicate(element: ET.Element, scope: Scope) -> typ.Callable[[Frame, Rows], Truth]:
+    boolean_operator = element.get('booleanOperator')
+    predicates = [compile_predicate(child, scope) for child in children(element, *PREDICATES)]
+    if boolean_operator not in ('and', 'or', 'xor', 'surrogate'):
+        raise UnsupportedPMML(f'CompoundPredicate {boolean_operator}')
+
+    def compound(frame: Frame, rows: Rows) -> Truth:
+        truths = [predicate(frame, rows) for predicate in predicates]
+        if boolean_operator == 'and':
+            return conjunction(truths)
+        if boolean_operator == 'or':
+            true = np.logical_or.reduce([value & known for value, known in truths])
+            false = np.logical_and.reduce([~value & known for value, known in truths])
+            return true, true | false
+        if boolean_operator == 'xor':
+            known = np.logical_and.reduce([known for _, known in truths])
+            return np.logical_xor.reduce([value for value, _ in truths]) & known, known
+        # surrogate: the first known value
+        value, known = truths[0]
+        value, known = value.copy(), known.copy()
+        for other_value, other_known in truths[1:]:
+            fallback = ~known & other_known
+            value[fallback] = other_value[fallback]
+            known |= other_known
+        return value, known
+
+    return compound
+
+
+def conjunction(truths: typ.Sequence[Truth]) -> Truth:
+    true = np.logical_and.reduce([value & known for value, known in truths])
+    false = np.logical_or.reduce([~value & known for value, known in truths])
+    return true, true | false
+
+
+def compile_constant_predicate(element: ET.Element, scope: Scope) -> typ.Callable[[Frame, Rows], Truth]:
+    truth = element.tag == 'True'
+
+    def constant_predicate(frame: Frame, rows: Rows) -> Truth:
+        size = frame.length(rows)
+        return np.full(size, truth), np.ones(size, dtype=bool)
+
+    return constant_predicate
+
+
+PREDICATES = {
+    'SimplePredicate': compile_simple_predicate,
+    'SimpleSetPredicate': compile_set_predicate,
+    'CompoundPredicate': compile_compound_predicate,
+    'True': compile_constant_predicate,
+    'False': compile_constant_predicate
+}
+
+
+# expressions, evaluated over all the rows of a frame
+
+
+Expression = typ.Tuple[typ.Callable[[Frame], Column], typ.Text]
+
+
+def compile_expression(element: ET.Element, scope: Scope) -> Expression:
+    compiler = EXPRESSIONS.get(element.tag)
+    if compiler is None:
+        raise UnsupportedPMML(f'Expression {element.tag}')
+    evaluate, kind = compiler(element, scope)
+    replacement = element.get('mapMissingTo') or element.get('defaultValue')
+    if replacement is None:
+        return evaluate, kind
+    replacement = parse_value(replacement, kind)
+    return (lambda frame: fill_missing(evaluate(frame), replacement)), kind
+
+
+def compile_derived_field(element: ET.Element, scope: Scope) -> typ.Callable[[Frame], Column]:
+    data_type = element.get('dataType')
+    kind = kind_of(data_type)
+    expressions = [child for child in element if child.tag in EXPRESSIONS]
+    if len(expressions) != 1:
+        raise UnsupportedPMML(f'Derived field {element.get("name")}')
+    evaluate, expression_kind = compile_expression(expressions[0], scope)
+    if data_type == 'float' or kind != expression_kind:
+        return lambda frame: cast(evaluate(frame), data_type)
+    return evaluate
+
+
+def compile_constant(element: ET.Element, scope: Scope) -> Expression:
+    text = element.text or ''
+    data_type = element.get('dataType')
+    if data_type is None:
+        try:
+            float(text)
+            data_type = 'double'
+        except ValueError:
+            data_type = 'string'
+    kind = kind_of(data_type)
+    value = None if element.get('missing') == 'true' else parse_value(text.strip() if kind == NUMBER else text, kind)
+    return (lambda frame: constant(value, kind, frame.size)), kind
+
+
+def compile_field_ref(element: ET.Element, scope: Scope) -> Expression:
+    field = element.get('field')
+    return (lambda frame: frame.get(field)), scope.kind(field)
+
+
+def compile_norm_continuous(element: ET.Element, scope: Scope) -> Expression:
+    field = element.get('field')
+    if scope.kind(field) != NUMBER:
+        raise UnsupportedPMML(f'NormContinuous on {field}')
+    norms = children(element, 'LinearNorm')
+    original = np.array([float(norm.get('orig')) for norm in norms])
+    normalized = np.array([float(norm.get('norm')) for norm in norms])
+    outliers = element.get('outliers', 'asIs')
+    if len(norms) < 2 or outliers not in ('asIs', 'asMissingValues', 'asExtremeValues'):
+        raise UnsupportedPMML('NormContinuous')
+
+    def norm_continuous(frame: Frame) -> Column:
+        values = frame.get(field)
+        result = np.interp(values, original, normalized)
+        result[np.isnan(values)] = np.nan
+        below, above = values < original[0], values > original[-1]
+        if outliers == 'asMissingValues':
+            result[below | above] = np.nan
+        elif outliers == 'asIs':
+            result[below] = normalized[0] + (values[below] - original[0]) \
+                * (normalized[1] - normalized[0]) / (original[1] - original[0])
+            result[above] = normalized[-1] + (values[above] - original[-1]) \
+                * (normalized[-1] - normalized[-2]) / (original[-1] - original[-2])
+        return result
+
+    return norm_continuous, NUMBER
+
+
+def compile_norm_discrete(element: ET.Element, scope: Scope) -> Expression:
+    field = element.get('field')
+    value = parse_value(element.get('value'), scope.kind(field))
+
+    def norm_discrete(frame: Frame) -> Column:
+        values = frame.get(field)
+        result = np.asarray(values == value, dtype=np.float64)
+        result[is_missing(values)] = np.nan
+        return result
+
+    return norm_discrete, NUMBER
+
+
+def compile_discretize(element: ET.Element, scope: Scope) -> Expression:
+    field = element.get('field')
+    if scope.kind(field) != NUMBER:
+        raise UnsupportedPMML(f'Discretize on {field}')
+    data_type = element.get('dataType')
+    bins = children(element, 'DiscretizeBin')
+    if data_type is None:
+        data_type = 'string'
+        try:
+            [float(bin_.get('binValue')) for bin_ in bins]
+            data_type = 'double'
+        except ValueError:
+            pass
+    kind = kind_of(data_type)
+    intervals = [(compile_interval(bin_.find('Interval')), parse_value(bin_.get('binValue'), kind)) for bin_ in bins]
+    default = element.get('defaultValue')
+    default = None if default is None else parse_value(default, kind)
+
+    def discretize(frame: Frame) -> Column:
+        values = frame.get(field)
+        missing = np.isnan(values)
+        result = constant(default, kind, frame.size)
+        pending = ~missing
+        for contains, bin_value in intervals:
+            matched = pending & contains(values)
+            result[matched] = bin_value
+            pending &= ~matched
+        result[missing] = np.nan if kind == NUMBER else None
+        return result
+
+    return discretize, kind
+
+
+def compile_apply(element: ET.Element, scope: Scope) -> Expression:
+    function = element.get('function')
+    arguments = [compile_expression(child, scope) for child in element if child.tag in EXPRESSIONS]
+    kinds = [kind for _, kind in arguments]
+    evaluators = [evaluate for evaluate, _ in arguments]
+
+    if function in ('isMissing', 'isNotMissing') and len(arguments) == 1:
+        def missing(frame: Frame) -> Column:
+            values = is_missing(evaluators[0](frame))
+            return np.asarray(values if function == 'isMissing' else ~values, dtype=np.float64)
+
+        return missing, NUMBER
+
+    if function in ('isIn', 'isNotIn') and len(arguments) > 1:
+        def membership(frame: Frame) -> Column:
+            values = evaluators[0](frame)
+            contained = np.logical_or.reduce([values == evaluate(frame) for evaluate in evaluators[1:]])
+            result = np.asarray(contained if function == 'isIn' else ~contained, dtype=np.float64)
+            result[is_missing(values)] = np.nan
+            return result
+
+        return membership, NUMBER
+
+    if function in COMPARISONS and len(arguments) == 2:
+        if STRING in kinds and (function not in ('equal', 'notEqual') or kinds[0] != kinds[1]):
+            raise UnsupportedPMML(f'Function {function} on strings')
+
+        def comparison(frame: Frame) -> Column:
+            left, right = evaluators[0](frame), evaluators[1](frame)
+            with np.errstate(invalid='ignore'):
+                result = np.asarray(COMPARISONS[function](left, right), dtype=np.float64)
+            result[is_missing(left) | is_missing(right)] = np.nan
+            return result
+
+        return comparison, NUMBER
+
+    if function == 'if' and len(arguments) in (2, 3) and kinds[0] == NUMBER:
+        if len(arguments) == 3 and kinds[1] != kinds[2]:
+            raise UnsupportedPMML('Function if with different types')
+
+        def if_(frame: Frame) -> Column:
+            condition = evaluators[0](frame)
+            blank = np.nan if kinds[1] == NUMBER else None
+            result = evaluators[1](frame).copy()
+            # as pypmml, a missing condition selects the else branch
+            otherwise = condition != 1
+            result[otherwise] = evaluators[2](frame)[otherwise] if len(arguments) == 3 else blank
+            return result
+
+        return if_, kinds[1]
+
+    if STRING in kinds:
+        raise UnsupportedPMML(f'Function {function} on strings')
+
+    if function in ARITHMETIC and len(arguments) == 2:
+        def arithmetic(frame: Frame) -> Column:
+            with np.errstate(all='ignore'):
+                return ARITHMETIC[function](evaluators[0](frame), evaluators[1](frame))
+
+        return arithmetic, NUMBER
+
+    if function in MATH and len(arguments) == 1:
+        def math(frame: Frame) -> Column:
+            with np.errstate(all='ignore'):
+                return MATH[function](evaluators[0](frame))
+
+        return math, NUMBER
+
+    if function == 'threshold' and len(arguments) == 2:
+        def threshold(frame: Frame) -> Column:
+            values, limit = evaluators[0](frame), evaluators[1](frame)
+            result = np.asarray(values > limit, dtype=np.float64)
+            result[np.isnan(values) | np.isnan(limit)] = np.nan
+            return result
+
+        return threshold, NUMBER
+
+    if function in ('and', 'or') and len(arguments) >= 2:
+        def logical(frame: Frame) -> Column:
+            truths = [(values == 1, ~np.isnan(values)) for values in (evaluate(frame) for evaluate in evaluators)]
+            if function == 'and':
+                value, known = conjunction(truths)
+            else:
+                value = np.logical_or.reduce([value & known for value, known in truths])
+                known = value | np.logical_and.reduce([known for _, known in truths])
+            result = np.asarray(value, dtype=np.float64)
+            result[~known] = np.nan
+            return result
+
+        return logical, NUMBER
+
+    if function == 'not' and len(arguments) == 1:
+        return (lambda frame: 1 - evaluators[0](frame)), NUMBER
+
+    if function in ('min', 'max', 'sum', 'avg', 'product') and arguments:
+        reduce = {'min': np.min, 'max': np.max, 'sum': np.sum, 'avg': np.mean, 'product': np.prod}[function]
+        return (lambda frame: reduce(np.stack([evaluate(frame) for evaluate in evaluators]), axis=0)), NUMBER
+
+    raise UnsupportedPMML(f'Function {function}')
+
+
+EXPRESSIONS = {
+    'Constant': compile_constant,
+    'FieldRef': compile_field_ref,
+    'NormContinuous': compile_norm_continuous,
+    'NormDiscrete': compile_norm_discrete,
+    'Discretize': compile_discretize,
+    'Apply': compile_apply
+}
+
+
+# models
+
+
+class Prediction(object):
+    """
+    Result of a model for a batch of rows. Classification values are labels, as in the document, with None for missing
+    predictions. Probabilities are indexed by the categories of the model.
+    """
+
+    def __init__(
+            self,
+            values: Column,
+            probabilities: typ.Optional[np.ndarray] = None,
+            confidence: typ.Optional[Column] = None,
+            entity_ids: typ.Optional[Column] = None
+    ):
+        self.values = values
+        self.probabilities = probabilities
+        self.confidence = confidence
+        self.entity_ids = entity_ids
+
+    def mask(self, rows: np.ndarray):
+        self.values[rows] = np.nan if self.values.dtype.kind == 'f' else None
+        if self.probabilities is not None:
+            self.probabilities[rows] = np.nan
+        if self.confidence is not None:
+            self.confidence[rows] = np.nan
+        if self.entity_ids is not None:
+            self.entity_ids[rows] = None
+
+
+def labels_from_probabilities(categories: typ.Sequence[typ.Text], probabilities: np.ndarray) -> Column:
+    labels = np.empty(len(probabilities), dtype=object)
+    known = ~np.isnan(probabilities).all(axis=1)
+    labels[known] = np.asarray(categories, dtype=object)[np.nanargmax(probabilities[known], axis=1)]
+    return labels
+
+
+class MiningSchema(object):
+    """Missing, invalid value and outlier treatments of the active fields of a model"""
+
+    def __init__(
+            self,
+            element: ET.Element,
+            scope: Scope,
+            dictionary: typ.Dict[typ.Text, DataField],
+            validate: bool = True
+    ):
+        self.validate = validate
+        self.target: typ.Optional[typ.Text] = None
+        self.active: typ.List[typ.Text] = []
+        self.treatments: typ.List[typ.Tuple[typ.Text, typ.Callable[[Column], Column]]] = []
+        self.validations: typ.List[typ.Tuple[typ.Text, DataField]] = []
+
+        for field in children(element, 'MiningField'):
+            name = field.get('name')
+            usage = field.get('usageType', 'active')
+            if usage in ('target', 'predicted'):
+                self.target = name
+                continue
+            if usage == 'supplementary':
+                continue
+            if usage != 'active':
+                raise UnsupportedPMML(f'Mining field usage {usage}')
+            self.active.append(name)
+            self.compile_treatments(field, scope.kind(name), dictionary.get(name))
+
+    def compile_treatments(self, field: ET.Element, kind: typ.Text, data_field: typ.Optional[DataField]):
+        name = field.get('name')
+        invalid_treatment = field.get('invalidValueTreatment', 'returnInvalid')
+        if invalid_treatment not in ('returnInvalid', 'asIs', 'asMissing'):
+            raise UnsupportedPMML(f'Invalid value treatment {invalid_treatment}')
+        if data_field is not None and invalid_treatment == 'returnInvalid' and self.validate:
+            self.validations.append((name, data_field))
+        if data_field is not None and invalid_treatment == 'asMissing' and (data_field.valid or data_field.intervals):
+            def as_missing(values: Column) -> Column:
+                invalid = data_field.invalid(values)
+                values = values.copy()
+                values[invalid] = np.nan if kind == NUMBER else None
+                return values
+
+            self.treatments.append((name, as_missing))
+
+        outliers = field.get('outliers', 'asIs')
+        if outliers != 'asIs':
+            if kind != NUMBER or outliers not in ('asMissingValues', 'asExtremeValues'):
+                raise UnsupportedPMML(f'Outlier treatment {outliers}')
+            low, high = float(field.get('lowValue', '-inf')), float(field.get('highValue', 'inf'))
+
+            def outlier(values: Column) -> Column:
+                with np.errstate(invalid='ignore'):
+                    below, above = values < low, values > high
+                values = values.copy()
+                if outliers == 'asMissingValues':
+                    values[below | above] = np.nan
+                else:
+                    values[below], values[above] = low, high
+                return values
+
+            self.treatments.append((name, outlier))
+
+        replacement = field.get('missingValueReplacement')
+        if replacement is not None:
+            replacement = parse_value(replacement, kind)
+            self.treatments.append((name, lambda values: fill_missing(values, replacement)))
+
+    def frame(self, scope: Scope, parent: Frame) -> typ.Tuple[Frame, typ.Optional[np.ndarray]]:
+        """Frame of the model and the rows having invalid values"""
+        invalid = None
+        for name, data_field in self.validations:
+            rows = data_field.invalid(parent.get(name))
+            if rows is not None:
+                invalid = rows if invalid is None else invalid | rows
+
+        values: typ.Dict[typ.Text, Column] = {}
+        for name, treatment in self.treatments:
+            values[name] = treatment(values[name] if name in values else parent.get(name))
+        return Frame(scope, parent.size, values, parent), invalid
+
+
+class ModelEvaluator(object):
+    has_probabilities = False
+    has_confidence = False
+    has_entity_id = False
+
+    def __init__(
+            self,
+            element: ET.Element,
+            parent: Scope,
+            dictionary: typ.Dict[typ.Text, DataField],
+            transformations: typ.Sequence[ET.Element] = (),
+            nested: bool = False
+    ):
+        if element.get('isScorable', 'true') != 'true':
+            raise UnsupportedPMML('Model is not scorable')
+        self.function = element.get('functionName')
+        if self.function not in ('regression', 'classification'):
+            raise UnsupportedPMML(f'Function {self.function}')
+
+        self.scope = Scope(parent)
+        # like pypmml, only the values given to the top level model are validated
+        self.mining_schema = MiningSchema(element.find('MiningSchema'), parent, dictionary, validate=not nested)
+        local_transformations = element.find('LocalTransformations')
+        self.scope.define([*transformations, *([] if local_transformations is None else local_transformations)])
+
+        target = dictionary.get(self.mining_schema.target)
+        self.target = self.mining_schema.target
+        self.target_type = target.data_type if target is not None else None
+        self.categories: typ.List[typ.Text] = list(target.categories) \
+            if target is not None and self.function == 'classification' else []
+        self.rescale = self.compile_targets(element.find('Targets'))
+        self.compile(element, dictionary)
+        if self.function == 'classification' and not self.categories:
+            raise UnsupportedPMML('Classification without categories')
+
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        raise NotImplementedError
+
+    def predict(self, frame: Frame) -> Prediction:
+        raise NotImplementedError
+
+    def add_category(self, category: typ.Optional[typ.Text]):
+        if category is not None and category not in self.categories:
+            self.categories.append(category)
+
+    def compile_targets(self, element: typ.Optional[ET.Element]) -> typ.Optional[typ.Callable[[Column], Column]]:
+        if element is None:
+            return None
+        targets = children(element, 'Target')
+        if len(targets) != 1 or children(targets[0], 'TargetValue'):
+            raise UnsupportedPMML('Targets')
+        if self.function != 'regression':
+            return None
+        target = targets[0]
+        low, high = float(target.get('min', '-inf')), float(target.get('max', 'inf'))
+        factor, offset = float(target.get('rescaleFactor', '1')), float(target.get('rescaleConstant', '0'))
+        rounding = {None: None, 'round': MATH['round'], 'ceiling': np.ceil, 'floor': np.floor}[target.get('castInteger')]
+
+        def rescale(values: Column) -> Column:
+            values = np.clip(values, low, high) * factor + offset
+            return values if rounding is None else rounding(values)
+
+        return rescale
+
+    def evaluate(self, parent: Frame) -> Prediction:
+        frame, invalid = self.mining_schema.frame(self.scope, parent)
+        prediction = self.predict(frame)
+        if self.rescale is not None:
+            prediction.values = self.rescale(prediction.values)
+        if invalid is not None and invalid.any():
+            prediction.mask(invalid)
+        return prediction
+
+
+class RegressionEvaluator(ModelEvaluator):
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        self.normalization = element.get('normalizationMethod', 'none')
+        tables = children(element, 'RegressionTable')
+        self.tables = [self.compile_table(table) for table in tables]
+        if not tables:
+            raise UnsupportedPMML('RegressionModel without RegressionTable')
+
+        if self.function == 'regression':
+            if len(tables) != 1 or self.normalization not in ('none', 'exp', *LINKS):
+                raise UnsupportedPMML(f'Regression normalization {self.normalization}')
+            return
+
+        self.table_categories = [table.get('targetCategory') for table in tables]
+        for category in self.table_categories:
+            self.add_category(category)
+        if None in self.table_categories or len(set(self.table_categories)) != len(tables) \
+                or set(self.categories) != set(self.table_categories):
+            raise UnsupportedPMML('Regression tables do not match the categories')
+        if self.normalization not in ('softmax', 'simplemax', 'none', *LINKS) \
+                or (self.normalization in LINKS and self.normalization != 'softmax' and len(tables) != 2):
+            raise UnsupportedPMML(f'Classification normalization {self.normalization}')
+        self.has_probabilities = True
+
+    def compile_table(self, element: ET.Element) -> typ.Callable[[Frame], Column]:
+        intercept = float(element.get('intercept', '0'))
+        numeric, categorical, terms = [], {}, []
+        for child in element:
+            if child.tag == 'NumericPredictor':
+                name = child.get('name')
+                if self.scope.kind(name) != NUMBER:
+                    raise UnsupportedPMML(f'NumericPredictor on {name}')
+                numeric.append((name, int(child.get('exponent', '1')), float(child.get('coefficient'))))
+            elif child.tag == 'CategoricalPredictor':
+                name = child.get('name')
+                categorical.setdefault(name, []).append(
+                    (parse_value(child.get('value'), self.scope.kind(name)), float(child.get('coefficient'))))
+            elif child.tag == 'PredictorTerm':
+                fields = [field.get('field') for field in children(child, 'FieldRef')]
+                if any(self.scope.kind(field) != NUMBER for field in fields):
+                    raise UnsupportedPMML('PredictorTerm on strings')
+                terms.append((fields, float(child.get('coefficient'))))
+            elif child.tag != 'Extension':
+                raise UnsupportedPMML(child.tag)
+
+        def table(frame: Frame) -> Column:
+            result = np.full(frame.size, intercept)
+            for name, exponent, coefficient in numeric:
+                values = frame.get(name)
+                result += coefficient * (values if exponent == 1 else values ** exponent)
+            for name, coefficients in categorical.items():
+                values = frame.get(name)
+                for value, coefficient in coefficients:
+                    result += coefficient * np.asarray(values == value, dtype=np.float64)
+                result[is_missing(values)] = np.nan
+            for fields, coefficient in terms:
+                result += coefficient * np.prod([frame.get(field) for field in fields], axis=0)
+            return result
+
+        return table
+
+    def predict(self, frame: Frame) -> Prediction:
+        scores = [table(frame) for table in self.tables]
+        if self.function == 'regression':
+            score = scores[0]
+            with np.errstate(over='ignore'):
+                if self.normalization == 'exp':
+                    score = np.exp(score)
+                elif self.normalization in LINKS:
+                    score = LINKS[self.normalization](score)
+            return Prediction(score)
+
+        scores = np.column_stack(scores)
+        with np.errstate(all='ignore'):
+            if self.normalization == 'softmax':
+                exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+                probabilities = exp / exp.sum(axis=1, keepdims=True)
+            elif self.normalization == 'simplemax':
+                probabilities = scores / scores.sum(axis=1, keepdims=True)
+            else:
+                probabilities = scores.copy()
+                if self.normalization in LINKS:
+                    probabilities[:, 0] = LINKS[self.normalization](scores[:, 0])
+                probabilities[:, -1] = 1 - probabilities[:, :-1].sum(axis=1)
+        probabilities[np.isnan(scores).any(axis=1)] = np.nan
+        order = [self.table_categories.index(category) for category in self.categories]
+        probabilities = probabilities[:, order]
+        return Prediction(labels_from_probabilities(self.categories, probabilities), probabilities)
+
+
+class TreeNode(object):
+    def __init__(self, index: int, predicate: typ.Callable[[Frame, Rows], Truth]):
+        self.index = index
+        self.predicate = predicate
+        self.children: typ.List[TreeNode] = []
+        self.default_child: typ.Optional[TreeNode] = None
+
+
+class TreeEvaluator(ModelEvaluator):
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        self.missing_strategy = element.get('missingValueStrategy', 'none')
+        self.no_true_child = element.get('noTrueChildStrategy', 'returnNullPrediction')
+        if self.missing_strategy not in ('none', 'nullPrediction', 'lastPrediction', 'defaultChild'):
+            raise UnsupportedPMML(f'Missing value strategy {self.missing_strategy}')
+        if self.no_true_child not in ('returnNullPrediction', 'returnLastPrediction'):
+            raise UnsupportedPMML(f'No true child strategy {self.no_true_child}')
+
+        nodes: typ.List[ET.Element] = []
+        self.root = self.compile_node(element.find('Node'), nodes)
+        ids = [node.get('id') for node in nodes]
+        self.has_entity_id = None not in ids
+        self.node_ids = np.array([*ids, None], dtype=object)
+
+        # the last slot holds the null prediction
+        if self.function == 'regression':
+            self.node_values = np.array(
+                [float(node.get('score', 'nan')) for node in nodes] + [np.nan], dtype=np.float64)
+            return
+        for node in nodes:
+            for distribution in children(node, 'ScoreDistribution'):
+                self.add_category(distribution.get('value'))
+            self.add_category(node.get('score'))
+        self.node_probabilities = np.full((len(nodes) + 1, len(self.categories)), np.nan)
+        self.has_probabilities = True
+        for index, node in enumerate(nodes):
+            distributions = children(node, 'ScoreDistribution')
+            if distributions:
+                self.node_probabilities[index] = self.distribution(distributions)
+            elif node.get('score') is not None:
+                self.has_probabilities = False
+        self.node_values = np.empty(len(nodes) + 1, dtype=object)
+        for index, node in enumerate(nodes):
+            score = node.get('score')
+            if score is None and not np.isnan(self.node_probabilities[index]).all():
+                score = self.categories[int(np.nanargmax(self.node_probabilities[index]))]
+            self.node_values[index] = score
+
+    def distribution(self, distributions: typ.List[ET.Element]) -> np.ndarray:
+        # like pypmml, categories without a score distribution have no probability
+        probabilities = np.full(len(self.categories), np.nan)
+        if all(distribution.get('probability') is not None for distribution in distributions):
+            for distribution in distributions:
+                probabilities[self.categories.index(distribution.get('value'))] = float(distribution.get('probability'))
+            return probabilities
+        for distribution in distributions:
+            probabilities[self.categories.index(distribution.get('value'))] = float(distribution.get('recordCount'))
+        total = np.nansum(probabilities)
+        return probabilities / total if total > 0 else np.full(len(self.categories), np.nan)
+
+    def compile_node(self, element: ET.Element, nodes: typ.List[ET.Element]) -> TreeNode:
+        node = TreeNode(len(nodes), compile_predicate(predicate_element(element), self.scope))
+        nodes.append(element)
+        node.children = [self.compile_node(child, nodes) for child in children(element, 'Node')]
+        if children(element, 'Partition', 'EmbeddedModel'):
+            raise UnsupportedPMML('Node with embedded model')
+        if self.missing_strategy == 'defaultChild' and node.children:
+            default_child = element.get('defaultChild')
+            node.default_child = next(
+                (child for child, child_element in zip(node.children, children(element, 'Node'))
+                 if child_element.get('id') == default_child), None)
+            if node.default_child is None:
+                raise UnsupportedPMML('Node without default child')
+        return node
+
+    def leaves(self, frame: Frame) -> np.ndarray:
+        """
+        Index of the node predicting each row. As pypmml, a row follows the first child evaluating to true, the missing
+        value strategy only applies when none is true and some are unknown, `nullPrediction` behaves as `none`.
+        """
+        null = len(self.node_values) - 1
+        leaves = np.full(frame.size, null, dtype=np.intp)
+        value, known = self.root.predicate(frame, None)
+        stack = [(self.root, np.flatnonzero(value & known))]
+        while stack:
+            node, rows = stack.pop()
+            if not node.children:
+                leaves[rows] = node.index
+                continue
+            remaining = rows
+            unknown = np.zeros(len(rows), dtype=bool)
+            for child in node.children:
+                if remaining.size == 0:
+                    break
+                value, known = child.predicate(frame, remaining)
+                if value.any():
+                    stack.append((child, remaining[value]))
+                    remaining, unknown, known = remaining[~value], unknown[~value], known[~value]
+                unknown |= ~known
+            if remaining.size == 0:
+                continue
+            if self.missing_strategy == 'lastPrediction':
+                leaves[remaining[unknown]] = node.index
+                remaining = remaining[~unknown]
+            elif self.missing_strategy == 'defaultChild':
+                stack.append((node.default_child, remaining[unknown]))
+                remaining = remaining[~unknown]
+            if self.no_true_child == 'returnLastPrediction':
+                leaves[remaining] = node.index
+        return leaves
+
+    def predict(self, frame: Frame) -> Prediction:
+        leaves = self.leaves(frame)
+        entity_ids = self.node_ids[leaves]
+        if self.function == 'regression':
+            return Prediction(self.node_values[leaves], entity_ids=entity_ids)
+        return Prediction(self.node_values[leaves], self.node_probabilities[leaves], entity_ids=entity_ids)
+
+
+class ScorecardEvaluator(ModelEvaluator):
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        if self.function != 'regression':
+            raise UnsupportedPMML('Classification scorecard')
+        self.initial_score = float(element.get('initialScore', '0'))
+        self.characteristics = []
+        for characteristic in children(element.find('Characteristics'), 'Characteristic'):
+            attributes = []
+            for attribute in children(characteristic, 'Attribute'):
+                complex_score = attribute.find('ComplexPartialScore')
+                if complex_score is not None:
+                    partial_score, kind = compile_expression(
+                        next(child for child in complex_score if child.tag in EXPRESSIONS), self.scope)
+                    if kind != NUMBER:
+                        raise UnsupportedPMML('ComplexPartialScore')
+                else:
+                    partial_score = float(attribute.get('partialScore'))
+                attributes.append((compile_predicate(predicate_element(attribute), self.scope), partial_score))
+            self.characteristics.append(attributes)
+
+    def predict(self, frame: Frame) -> Prediction:
+        total = np.full(frame.size, self.initial_score)
+        for attributes in self.characteristics:
+            # characteristics without a matching attribute have no score
+            score = np.full(frame.size, np.nan)
+            pending = np.ones(frame.size, dtype=bool)
+            for predicate, partial_score in attributes:
+                value, known = predicate(frame, None)
+                matched = pending & value & known
+                score[matched] = partial_score(frame)[matched] if callable(partial_score) else partial_score
+                pending &= ~matched
+            total += score
+        return Prediction(total)
+
+
+class RuleSetEvaluator(ModelEvaluator):
+    has_confidence = True
+
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        if self.function != 'classification':
+            raise UnsupportedPMML('Regression rule set')
+        rule_set = element.find('RuleSet')
+        methods = children(rule_set, 'RuleSelectionMethod')
+        self.criterion = methods[0].get('criterion') if methods else None
+        if self.criterion not in ('firstHit', 'weightedMax', 'weightedSum'):
+            raise UnsupportedPMML(f'Rule selection {self.criterion}')
+        self.default_score = rule_set.get('defaultScore')
+        self.default_confidence = float(rule_set.get('defaultConfidence', 'nan'))
+        self.rules = []
+        self.compile_rules(rule_set, [])
+        self.add_category(self.default_score)
+        for _, score, _, _ in self.rules:
+            self.add_category(score)
+
+    def compile_rules(self, element: ET.Element, conditions: typ.List[typ.Callable[[Frame, Rows], Truth]]):
+        for rule in children(element, 'SimpleRule', 'CompoundRule'):
+            predicates = [*conditions, compile_predicate(predicate_element(rule), self.scope)]
+            if rule.tag == 'CompoundRule':
+                self.compile_rules(rule, predicates)
+                continue
+            if children(rule, 'ScoreDistribution'):
+                raise UnsupportedPMML('Rule with score distribution')
+            self.rules.append((
+                predicates, rule.get('score'), float(rule.get('weight', '1')), float(rule.get('confidence', '1'))))
+
+    def predict(self, frame: Frame) -> Prediction:
+        labels = np.empty(frame.size, dtype=object)
+        labels[:] = self.default_score
+        confidence = np.full(frame.size, self.default_confidence)
+        fired = []
+        for predicates, score, weight, rule_confidence in self.rules:
+            value, known = conjunction([predicate(frame, None) for predicate in predicates])
+            fired.append(value & known)
+
+        if self.criterion == 'weightedSum':
+            count = np.sum(fired, axis=0)
+            totals = np.zeros((frame.size, len(self.categories)))
+            for (_, score, weight, _), fires in zip(self.rules, fired):
+                totals[:, self.categories.index(score)] += weight * fires
+            rows = count > 0
+            best = np.argmax(totals[rows], axis=1)
+            labels[rows] = np.asarray(self.categories, dtype=object)[best]
+            confidence[rows] = totals[rows, best] / count[rows]
+            return Prediction(labels, confidence=confidence)
+
+        best_weight = np.full(frame.size, -np.inf)
+        pending = np.ones(frame.size, dtype=bool)
+        for (_, score, weight, rule_confidence), fires in zip(self.rules, fired):
+            selected = fires & pending if self.criterion == 'firstHit' else fires & (weight > best_weight)
+            labels[selected] = score
+            confidence[selected] = rule_confidence
+            best_weight[selected] = weight
+            pending &= ~selected
+        return Prediction(labels, confidence=confidence)
+
+
+class MiningEvaluator(ModelEvaluator):
+    REGRESSION_METHODS = ('average', 'weightedAverage', 'sum', 'weightedSum', 'median', 'max', 'selectFirst')
+    CLASSIFICATION_METHODS = ('majorityVote', 'weightedMajorityVote', 'average', 'weightedAverage', 'selectFirst')
+
+    def compile(self, element: ET.Element, dictionary: typ.Dict[typ.Text, DataField]):
+        segmentation = element.find('Segmentation')
+        if segmentation is None:
+            raise UnsupportedPMML('MiningModel without Segmentation')
+        self.method = segmentation.get('multipleModelMethod')
+        methods = self.REGRESSION_METHODS if self.function == 'regression' else self.CLASSIFICATION_METHODS
+        if self.method not in methods:
+            raise UnsupportedPMML(f'Segmentation {self.method}')
+        treatment = segmentation.get('missingPredictionTreatment', 'continue')
+        if treatment not in ('continue', 'skipSegment', 'returnMissing'):
+            raise UnsupportedPMML(f'Missing prediction treatment {treatment}')
+        self.return_missing = treatment == 'returnMissing'
+
+        self.segments = []
+        for segment in children(segmentation, 'Segment'):
+            models = children(segment, *MODEL_ELEMENTS)
+            if len(models) != 1:
+                raise UnsupportedPMML('Segment without supported model')
+            model = EVALUATORS[models[0].tag](models[0], self.scope, dictionary, nested=True)
+            if model.function != self.function:
+                raise UnsupportedPMML('Segments with different functions')
+            for category in model.categories:
+                self.add_category(category)
+            self.segments.append((
+                compile_predicate(predicate_element(segment), self.scope), float(segment.get('weight', '1')), model))
+        if not self.segments:
+            raise UnsupportedPMML('Segmentation without segments')
+
+        if self.function == 'classification':
+            self.has_probabilities = self.method != 'selectFirst' \
+                or all(model.has_probabilities for _, _, model in self.segments)
+            self.has_confidence = self.method == 'selectFirst' \
+                and all(model.has_confidence for _, _, model in self.segments)
+            if self.method in ('average', 'weightedAverage') \
+                    and not all(model.has_probabilities for _, _, model in self.segments):
+                raise UnsupportedPMML('Averaging segments without probabilities')
+
+    def predict(self, frame: Frame) -> Prediction:
+        if self.method == 'selectFirst':
+            return self.select_first(frame)
+
+        size = frame.size
+        classification = self.function == 'classification'
+        totals = np.zeros((size, len(self.categories))) if classification else np.zeros(size)
+        weights = np.zeros(size)
+        missing = np.zeros(size, dtype=bool)
+        collected = []
+        for predicate, weight, model in self.segments:
+            value, known = predicate(frame, None)
+            active = value & known
+            if not active.any():
+                continue
+            prediction = model.evaluate(frame)
+            predicted = active & ~is_missing(prediction.values)
+            missing |= active & ~predicted
+            weight = weight if self.method.startswith('weighted') else 1.0
+            if not classification:
+                collected.append(np.where(predicted, prediction.values, np.nan))
+                totals += np.where(predicted, weight * prediction.values, 0)
+            elif self.method in ('average', 'weightedAverage'):
+                order = [model.categories.index(category) if category in model.categories else None
+                         for category in self.categories]
+                probabilities = np.column_stack([
+                    prediction.probabilities[:, index] if index is not None else np.zeros(size) for index in order])
+                totals += np.where(predicted[:, None], weight * probabilities, 0)
+            else:
+                for index, category in enumerate(self.categories):
+                    totals[:, index] += weight * (predicted & (prediction.values == category))
+            weights += np.where(predicted, weight, 0)
+
+        with np.errstate(all='ignore'):
+            if classification:
+                probabilities = totals / weights[:, None]
+                probabilities[weights == 0] = np.nan
+                if self.return_missing:
+                    probabilities[missing] = np.nan
+                return Prediction(labels_from_probabilities(self.categories, probabilities), probabilities)
+
+            if self.method in ('sum', 'weightedSum'):
+                values = totals
+            elif self.method in ('average', 'weightedAverage'):
+                values = totals / weights
+            elif collected:
+                values = (np.nanmedian if self.method == 'median' else np.nanmax)(np.stack(collected), axis=0)
+            else:
+                values = np.full(size, np.nan)
+        values = np.where(weights == 0, np.nan, values)
+        if self.return_missing:
+            values[missing] = np.nan
+        return Prediction(values)
+
+    def select_first(self, frame: Frame) -> Prediction:
+        classification = self.function == 'classification'
+        values = np.empty(frame.size, dtype=object) if classification else np.full(frame.size, np.nan)
+        probabilities = np.full((frame.size, len(self.categories)), np.nan) if self.has_probabilities else None
+        confidence = np.full(frame.size, np.nan) if self.has_confidence else None
+        pending = np.ones(frame.size, dtype=bool)
+        for predicate, _, model in self.segments:
+            value, known = predicate(frame, None)
+            selected = pending & value & known
+            if not selected.any():
+                continue
+            prediction = model.evaluate(frame)
+            values[selected] = prediction.values[selected]
+            if probabilities is not None and classification:
+                for index, category in enumerate(self.categories):
+                    probabilities[selected, index] = prediction.probabilities[selected, model.categories.index(
+                        category)] if category in model.categories else 0.0
+            if confidence is not None:
+                confidence[selected] = prediction.confidence[selected]
+            pending &= ~selected
+        return Prediction(values, probabilities if classification else None, confidence)
+
+
+EVALUATORS: typ.Dict[typ.Text, typ.Type[ModelEvaluator]] = {
+    'RegressionModel': RegressionEvaluator,
+    'TreeModel': TreeEvaluator,
+    'Scorecard': ScorecardEvaluator,
+    'RuleSetModel': RuleSetEvaluator,
+    'MiningModel': MiningEvaluator
+}
+
+
+# outputs
+
+
+def convert(values: Column, data_type: typ.Optional[typ.Text]) -> Column:
+    """Converts predicted values to the data type of an output field, integers are int64 when none is missing"""
+    if data_type == 'string':
+        return to_string(values)
+    numbers = to_number(values)
+    if data_type == 'integer':
+        missing = np.isnan(numbers)
+        if not missing.any():
+            return numbers.astype(np.int64)
+        result = np.empty(len(numbers), dtype=object)
+        result[~missing] = numbers[~missing].astype(np.int64).tolist()
+        return result
+    return numbers
+
+
+def compile_output(
+        field: ET.Element, model: ModelEvaluator
+) -> typ.Callable[[Prediction], Column]:
+    feature = field.get('feature', 'predictedValue')
+    if field.get('segmentId') is not None or field.get('ruleFeature', 'consequent') != 'consequent' \
+            or children(field, *EXPRESSIONS):
+        raise UnsupportedPMML(f'Output field {field.get("name")}')
+
+    if feature in ('predictedValue', 'predictedDisplayValue'):
+        data_type = 'string' if feature == 'predictedDisplayValue' \
+            else field.get('dataType') or model.target_type or ('double' if model.function == 'regression' else 'string')
+        if data_type not in DATA_TYPES:
+            raise UnsupportedPMML(f'Output data type {data_type}')
+        return lambda prediction: convert(prediction.values, data_type)
+
+    if feature == 'probability' and model.has_probabilities:
+        value = field.get('value')
+        if value is not None:
+            if value not in model.categories:
+                raise UnsupportedPMML(f'Probability of unknown category {value}')
+            index = model.categories.index(value)
+            return lambda prediction: prediction.probabilities[:, index].copy()
+
+        def predicted_probability(prediction: Prediction) -> Column:
+            known = ~is_missing(prediction.values)
+            result = np.full(len(prediction.values), np.nan)
+            indexes = [model.categories.index(label) for label in prediction.values[known]]
+            result[known] = prediction.probabilities[np.flatnonzero(known), indexes]
+            return result
+
+        return predicted_probability
+
+    if feature == 'confidence' and model.has_confidence:
+        return lambda prediction: prediction.confidence.copy()
+
+    if feature == 'entityId' and model.has_entity_id:
+        return lambda prediction: prediction.entity_ids.copy()
+
+    raise UnsupportedPMML(f'Output feature {feature}')
+
+
+def default_outputs(model: ModelEvaluator) -> typ.List[ET.Element]:
+    """Output fields returned by pypmml for documents without Output"""
+    name = 'predicted' if model.target is None else f'predicted_{model.target}'
+    fields = [ET.Element('OutputField', name=name, feature='predictedValue')]
+    if model.function == 'classification' and model.has_probabilities:
+        fields.append(ET.Element('OutputField', name='probability', feature='probability'))
+        fields.extend(ET.Element('OutputField', name=f'probability_{category}', feature='probability', value=category)
+                      for category in model.categories)
+    elif model.function == 'classification' and model.has_confidence:
+        fields.append(ET.Element('OutputField', name='confidence', feature='confidence'))
+    if model.has_entity_id:
+        fields.append(ET.Element('OutputField', name='node_id', feature='entityId'))
+    return fields
+
+
+class NativeModel(object):
+    """PMML document compiled to numpy, with the `predict` interface of `pypmml.Model`"""
+
+    def __init__(
+            self,
+            inputs: typ.List[DataField],
+            scope: Scope,
+            model: ModelEvaluator,
+            outputs: typ.List[typ.Tuple[typ.Text, typ.Callable[[Prediction], Column]]],
+            model_name: typ.Optional[typ.Text] = None,
+            model_element: typ.Optional[typ.Text] = None,
+            output_types: typ.Optional[typ.Dict[typ.Text, typ.Text]] = None
+    ):
+        self.inputs = inputs
+        self.scope = scope
+        self.model = model
+        self.outputs = outputs
+        self.model_name = model_name
+        self.model_element = model_element
+        # declared data types of the output fields, None when pypmml infers some of them
+        self.output_types = output_types
+        # pypmml builds data frames from java maps, pandas sorts their keys
+        self.columns = sorted(name for name, _ in outputs)
+
+    def predict_columns(self, data: pd.DataFrame) -> typ.Dict[typ.Text, Column]:
+        values = {
+            field.name: field.cast(data[field.name].to_numpy() if field.name in data else [None] * len(data))
+            for field in self.inputs}
+        prediction = self.model.evaluate(Frame(self.scope, len(data), values))
+        return {name: output(prediction) for name, output in self.outputs}
+
+    def predict(self, data: typ.Any) -> typ.Any:
+        if isinstance(data, pd.DataFrame):
+            columns = self.predict_columns(data)
+            return pd.DataFrame({name: columns[name] for name in self.columns})
+        if isinstance(data, typ.Dict):
+            columns = self.predict_columns(pd.DataFrame([data]))
+            return {name: column.tolist()[0] for name, column in columns.items()}
+        rows = np.asarray(data, dtype=object)
+        single = rows.ndim == 1
+        columns = self.predict_columns(pd.DataFrame(rows.reshape(1, -1) if single else rows, columns=[field.name for field in self.inputs]))
+        records = [list(row) for row in zip(*(column.tolist() for column in columns.values()))]
+        return records[0] if single else records
+
+
+def compile_document(document: typ.Union[bytes, typ.Text]) -> NativeModel:
+    root = ET.fromstring(document)
+    for element in root.iter():
+        if isinstance(element.tag, str):
+            element.tag = element.tag.rsplit('}', 1)[-1]
+
+    dictionary = {field.get('name'): DataField(field) for field in children(root.find('DataDictionary'), 'DataField')}
+    scope = Scope()
+    for field in children(root.find('DataDictionary'), 'DataField'):
+        scope.declare(field)
+
+    models = children(root, *MODEL_ELEMENTS)
+    other_models = [child for child in root if child.tag.endswith('Model') and child.tag not in MODEL_ELEMENTS]
+    if len(models) != 1 or other_models:
+        raise UnsupportedPMML('Document without a single supported model')
+    transformations = root.find('TransformationDictionary')
+    if transformations is not None and children(transformations, 'DefineFunction'):
+        raise UnsupportedPMML('DefineFunction')
+    model = EVALUATORS[models[0].tag](
+        models[0], scope, dictionary, [] if transformations is None else children(transformations, 'DerivedField'))
+
+    output = models[0].find('Output')
+    fields = children(output, 'OutputField') if output is not None else default_outputs(model)
+    outputs = [(field.get('name'), compile_output(field, model)) for field in fields]
+    if not outputs:
+        raise UnsupportedPMML('No output fields')
+    inputs = [dictionary[name] for name in model.mining_schema.active if name in dictionary]
+    output_types = {field.get('name'): field.get('dataType') for field in fields}
+    return NativeModel(
+        inputs, scope, model, outputs,
+        model_name=models[0].get('modelName'),
+        model_element=models[0].tag,
+        output_types=output_types if output is not None and all(output_types.values()) else None)
+
+
+def compile(document: typ.Union[bytes, typ.Text]) -> NativeModel:
+    """Compiles a PMML document, raises `UnsupportedPMML` when it needs to be scored by pypmml"""
+    try:
+        return compile_document(document)
+    except UnsupportedPMML:
+        raise
+    except (ET.ParseError, AttributeError, KeyError, TypeError, ValueError, StopIteration) as e:
+        raise UnsupportedPMML(f'{type(e).__name__}: {e}') from e
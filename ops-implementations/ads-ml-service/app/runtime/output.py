@@ -59,8 +59,109 @@ def from_dataframe(
     return from_list(output.to_dict(orient='records'))
 
 
+def columnar_from_list(
+        output: typing.List[typing.Any]
+) -> typing.List[typing.Any]:
+    # Batch results are never squeezed, one element per input row
+    return output
+
+
+def columnar_from_ndarray(
+        output: np.ndarray
+) -> typing.List[typing.Any]:
+    return output.tolist()
+
+
+def columnar_from_dataframe(
+        output: pd.DataFrame
+) -> typing.Dict[typing.Text, typing.List[typing.Any]]:
+    return output.to_dict(orient='list')
+
+
+def is_encodable(output: np.ndarray) -> bool:
+    """Arrays that orjson serializes natively with `OPT_SERIALIZE_NUMPY`"""
+    return output.dtype.kind in 'biuf' and output.dtype.isnative and output.flags.c_contiguous \
+        and (output.dtype.kind != 'f' or 4 <= output.dtype.itemsize <= 8)
+
+
+def to_native(output: np.ndarray) -> np.ndarray:
+    """
+    Numbers in native byte order and at most in double precision, orjson would read swapped bytes as other numbers
+    and neither orjson nor the json encoder of the responses read extended precision floats
+    """
+    if output.dtype.kind in 'biuf' and not output.dtype.isnative:
+        output = output.astype(output.dtype.newbyteorder('='))
+    if output.dtype.kind == 'f' and output.dtype.itemsize > 8:
+        output = output.astype(np.float64)
+    return output
+
+
+def encodable_from_ndarray(
+        output: np.ndarray
+) -> typing.Any:
+    """Same json as `from_ndarray`, numeric arrays are kept as is instead of being converted to python objects"""
+    output = to_native(output)
+    if output.ndim == 0 or not is_encodable(output):
+        return from_ndarray(output)
+    if len(output) != 1:
+        return output
+    if output.ndim == 1:
+        # Singleton array
+        return output.item()
+    row = output[0]
+    if len(row) == 1:
+        # Row element is not array
+        return row[0].item() if row.ndim == 1 else row[0]
+    return row
+
+
+def encodable_columnar_from_ndarray(
+        output: np.ndarray
+) -> typing.Any:
+    output = to_native(output)
+    return output if output.ndim > 0 and is_encodable(output) else columnar_from_ndarray(output)
+
+
+def encodable_columnar_from_dataframe(
+        output: pd.DataFrame
+) -> typing.Dict[typing.Any, typing.Any]:
+    columns = {}
+    for name, series in output.items():
+        column = to_native(series.to_numpy())
+        columns[name] = column if is_encodable(column) else column.tolist()
+    return columns
+
+
+def take_rows(
+        output: typing.Union[typing.List[typing.Any], np.ndarray, pd.DataFrame],
+        start: int,
+        end: int
+) -> typing.Union[typing.List[typing.Any], np.ndarray, pd.DataFrame]:
+    if isinstance(output, pd.DataFrame):
+        return output.iloc[start:end]
+    return output[start:end]
+
+
 OUTPUT_HANDLING = {
     app_binary_config.ModelOutput.LIST: from_list,
     app_binary_config.ModelOutput.NUMPY_ARRAY: from_ndarray,
     app_binary_config.ModelOutput.DATAFRAME: from_dataframe
 }
+
+COLUMNAR_OUTPUT_HANDLING = {
+    app_binary_config.ModelOutput.LIST: columnar_from_list,
+    app_binary_config.ModelOutput.NUMPY_ARRAY: columnar_from_ndarray,
+    app_binary_config.ModelOutput.DATAFRAME: columnar_from_dataframe
+}
+
+# Results of these handlers contain numpy arrays, they are returned in `ORJSONResponse` bodies
+ENCODABLE_OUTPUT_HANDLING = {
+    **OUTPUT_HANDLING,
+    app_binary_config.ModelOutput.NUMPY_ARRAY: encodable_from_ndarray
+}
+
+ENCODABLE_COLUMNAR_OUTPUT_HANDLING = {
+    **COLUMNAR_OUTPUT_HANDLING,
+    app_binary_config.ModelOutput.NUMPY_ARRAY: encodable_columnar_from_ndarray,
+    app_binary_config.ModelOutput.DATAFRAME: encodable_columnar_from_dataframe
+}
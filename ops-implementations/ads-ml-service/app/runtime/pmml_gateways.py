@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+"""
+Pool of pypmml JVM gateways of a worker.
+
+pypmml keeps a single py4j gateway per python process. Models loaded through the pool are bound to one gateway of the
+pool (the one holding the fewest models when the model is loaded) and are scored on it, so concurrent predictions of
+models bound to different gateways run in different JVMs. Gateways are started on first use and restarted when a call
+fails or when the health check of the pool, run by a background thread once a model is loaded, gets no answer; bound
+models are loaded again on the new JVM.
+"""
+
+
+import functools
+import logging
+import os
+import subprocess
+import threading
+import time
+import typing
+
+try:
+    import py4j.java_gateway as py4j_gateway
+    import py4j.protocol as py4j_protocol
+    import pypmml
+    import pypmml.base as pypmml_base
+    import pypmml.metadata as pypmml_metadata
+except ImportError:
+    pypmml = None
+
+import app.core.configuration as app_core_config
+
+LOGGER = logging.getLogger(__name__)
+
+
+def launch_gateway() -> typing.Tuple[typing.Any, subprocess.Popen]:
+    """Same JVM as `pypmml.base.PMMLContext.launch_gateway`, the process is kept to be stopped on restart"""
+    jars_dir = os.environ.get(
+        'PYPMML_JARS_DIR', os.path.join(os.path.dirname(os.path.abspath(pypmml.__file__)), 'jars'))
+    java_opts = os.environ.get('JAVA_OPTS')
+    port, process = py4j_gateway.launch_gateway(
+        classpath=os.path.join(jars_dir, '*'),
+        javaopts=java_opts.split() if java_opts else [],
+        die_on_exit=True,
+        return_proc=True)
+    gateway = py4j_gateway.JavaGateway(
+        gateway_parameters=py4j_gateway.GatewayParameters(port=port, auto_convert=True))
+    return gateway, process
+
+
+class Gateway(object):
+    def __init__(self, index: int):
+        self.index = index
+
+        self.__lock__ = threading.Lock()
+        self.__gateway__: typing.Optional[typing.Any] = None
+        self.__process__: typing.Optional[subprocess.Popen] = None
+        self.generation = 0
+        self.models = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+        self.__latency_total__ = 0.0
+        self.__latency_max__ = 0.0
+
+    def get(self) -> typing.Tuple[typing.Any, int]:
+        """py4j gateway and its generation, the JVM is started on first use"""
+        with self.__lock__:
+            if self.__gateway__ is None:
+                LOGGER.info('Starting pypmml gateway %s', self.index)
+                self.__gateway__, self.__process__ = launch_gateway()
+                self.generation += 1
+            return self.__gateway__, self.generation
+
+    def ping(self) -> bool:
+        gateway, _ = self.get()
+        try:
+            gateway.jvm.java.lang.System.currentTimeMillis()
+            return True
+        except py4j_protocol.Py4JError:
+            return False
+
+    def stop(self):
+        with self.__lock__:
+            self.stop_locked()
+
+    def stop_locked(self):
+        gateway, process = self.__gateway__, self.__process__
+        self.__gateway__ = self.__process__ = None
+        # the JVM belongs to the pool, it is killed instead of being asked to shut down
+        if gateway is not None:
+            gateway.close()
+            # java objects collected later must not reconnect to the stopped JVM
+            gateway._gateway_client.is_connected = False
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def restart(self, generation: int):
+        """Stops the JVM of `generation` unless it was already replaced, the next call starts a new one"""
+        with self.__lock__:
+            if generation != self.generation or self.__gateway__ is None:
+                return
+            LOGGER.warning('Restarting pypmml gateway %s', self.index)
+            self.restarts += 1
+            self.stop_locked()
+
+    def bind_model(self):
+        with self.__lock__:
+            self.models += 1
+
+    def release_model(self, java_model: typing.Optional[typing.Any], generation: int):
+        with self.__lock__:
+            self.models -= 1
+            if java_model is None or generation != self.generation or self.__gateway__ is None:
+                return
+            try:
+                self.__gateway__.detach(java_model)
+            except Exception:
+                LOGGER.debug('Can not detach model from pypmml gateway %s', self.index)
+
+    def check(self):
+        """Restarts the JVM when it does not answer"""
+        _, generation = self.get()
+        if not self.ping():
+            with self.__lock__:
+                self.failures += 1
+            self.restart(generation)
+
+    def call(self, model: 'PooledModel', name: typing.Text, *args: typing.Any) -> typing.Any:
+        for attempt in range(2):
+            java_model, generation = model.bind()
+            start = time.perf_counter()
+            with self.__lock__:
+                self.in_flight += 1
+            try:
+                return pypmml_base.call_java_func(getattr(java_model, name), *args)
+            except py4j_protocol.Py4JJavaError:
+                raise
+            except py4j_protocol.Py4JError:
+                # the JVM does not answer
+                with self.__lock__:
+                    self.failures += 1
+                LOGGER.exception('pypmml gateway %s failed', self.index)
+                if attempt:
+                    raise
+                self.restart(generation)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.__lock__:
+                    self.in_flight -= 1
+                    self.calls += 1
+                    self.__latency_total__ += elapsed
+                    self.__latency_max__ = max(self.__latency_max__, elapsed)
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            return {
+                'started': self.__gateway__ is not None,
+                'models': self.models,
+                'in_flight': self.in_flight,
+                'calls': self.calls,
+                'failures': self.failures,
+                'restarts': self.restarts,
+                'latency_seconds_avg': self.__latency_total__ / self.calls if self.calls else 0.0,
+                'latency_seconds_max': self.__latency_max__
+            }
+
+
+class GatewayBound(object):
+    """Java objects of a pooled gateway, pypmml wrappers would start and use the default gateway of pypmml"""
+
+    def __init__(self, gateway: typing.Any, java_model: typing.Any):
+        self._gateway = gateway
+        self._java_model = java_model
+
+    def __del__(self):
+        try:
+            self._gateway.detach(self._java_model)
+        except Exception:
+            pass
+
+
+if pypmml:
+    class Field(GatewayBound, pypmml_metadata.Field):
+        pass
+
+    class OutputField(GatewayBound, pypmml_metadata.OutputField):
+        pass
+
+    class PooledModel(pypmml.Model):
+        """pypmml model scored on the gateway it is bound to"""
+
+        def __init__(self, gateway: Gateway, source: typing.Text):
+            self.__gateway__ = gateway
+            self.__source__ = source
+            self.__lock__ = threading.Lock()
+            self.__java_model__: typing.Optional[typing.Any] = None
+            self.__generation__ = 0
+            self.bind()
+
+        def bind(self) -> typing.Tuple[typing.Any, int]:
+            """Java model and gateway generation, the model is loaded again when the gateway was restarted"""
+            gateway, generation = self.__gateway__.get()
+            with self.__lock__:
+                if self.__generation__ != generation:
+                    try:
+                        self.__java_model__ = gateway.jvm.org.pmml4s.model.Model.fromString(self.__source__)
+                    except py4j_protocol.Py4JJavaError as e:
+                        raise pypmml_base.PmmlError(
+                            e.java_exception.getClass().getSimpleName(), e.java_exception.getMessage())
+                    self.__generation__ = generation
+                return self.__java_model__, generation
+
+        def call(self, name: typing.Text, *args: typing.Any) -> typing.Any:
+            return self.__gateway__.call(self, name, *args)
+
+        def fields(self, name: typing.Text, cls: typing.Type[GatewayBound]) -> typing.List[GatewayBound]:
+            gateway, _ = self.__gateway__.get()
+            return [cls(gateway, field) for field in self.call(name)]
+
+        @property
+        def inputFields(self):
+            return self.fields('inputFields', Field)
+
+        @property
+        def targetField(self):
+            gateway, _ = self.__gateway__.get()
+            return Field(gateway, self.call('targetField'))
+
+        @property
+        def targetFields(self):
+            return self.fields('targetFields', Field)
+
+        @property
+        def outputFields(self):
+            return self.fields('outputFields', OutputField)
+
+        def __del__(self):
+            self.__gateway__.release_model(self.__java_model__, self.__generation__)
+
+
+class GatewayPool(object):
+    def __init__(self, size: int, health_check_interval: float):
+        self.size = size
+        self.health_check_interval = health_check_interval
+
+        self.__lock__ = threading.Lock()
+        self.__check_thread__: typing.Optional[threading.Thread] = None
+        self.__check_stop__ = threading.Event()
+        self.gateways = [Gateway(index) for index in range(size)]
+
+    def assign(self) -> Gateway:
+        """Gateway holding the fewest models"""
+        with self.__lock__:
+            gateway = min(self.gateways, key=lambda g: g.models)
+            gateway.bind_model()
+            return gateway
+
+    def load(self, binary: bytes) -> 'PooledModel':
+        if not pypmml:
+            LOGGER.exception('pypmml is not installed')
+            raise RuntimeError('pypmml is not installed')
+        model = PooledModel(self.assign(), binary.decode('utf-8'))
+        self.start_checks()
+        return model
+
+    def check(self):
+        """Restarts started gateways which do not answer"""
+        for gateway in self.gateways:
+            if gateway.stats()['started']:
+                gateway.check()
+
+    def check_periodically(self):
+        while not self.__check_stop__.wait(self.health_check_interval):
+            try:
+                self.check()
+            except Exception:
+                LOGGER.exception('Failed to check the pypmml gateways')
+
+    def start_checks(self):
+        """Starts checking the gateways in the background, outside of the predictions"""
+        with self.__lock__:
+            if self.health_check_interval <= 0 or self.__check_thread__ is not None:
+                return
+            self.__check_stop__.clear()
+            self.__check_thread__ = threading.Thread(
+                target=self.check_periodically, name='pmml-gateway-check', daemon=True)
+            self.__check_thread__.start()
+
+    def stop_checks(self):
+        with self.__lock__:
+            thread, self.__check_thread__ = self.__check_thread__, None
+        self.__check_stop__.set()
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        gateways = [gateway.stats() for gateway in self.gateways]
+        busy = sum(1 for gateway in gateways if gateway['in_flight'])
+        return {
+            'size': self.size,
+            'started': sum(1 for gateway in gateways if gateway['started']),
+            'busy': busy,
+            'utilization': busy / self.size,
+            'gateways': gateways
+        }
+
+    def shutdown(self):
+        self.stop_checks()
+        for gateway in self.gateways:
+            gateway.stop()
+
+
+@functools.lru_cache()
+def get_pool() -> GatewayPool:
+    return GatewayPool(
+        size=app_core_config.get_config().PMML_GATEWAY_POOL_SIZE,
+        health_check_interval=app_core_config.get_config().PMML_GATEWAY_HEALTH_CHECK_INTERVAL
+    )
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import hashlib
+import logging
+import threading
+import typing
+
+import cachetools
+import orjson
+
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.impl as app_schemas_impl
+
+LOGGER = logging.getLogger(__name__)
+
+Key = typing.Tuple[typing.Text, bytes]
+
+
+class ResultCache(object):
+    """
+    Prediction results of one endpoint, keyed by the hash of the model binary and a canonical hash of the input rows.
+    Entries are evicted when the cache is full (least recently used first) or after `ttl_seconds`.
+    """
+
+    def __init__(self, endpoint_id: int, binary_hash: typing.Text, max_size: int, ttl_seconds: float,
+                 ordered: bool = True):
+        self.endpoint_id = endpoint_id
+        self.binary_hash = binary_hash
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # parameter order is not significant when requests are converted according to the input schema
+        self.ordered = ordered
+
+        self.__lock__ = threading.Lock()
+        self.__cache__: cachetools.TTLCache[Key, typing.Dict[typing.Text, typing.Any]] = \
+            cachetools.TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self.__hits__ = 0
+        self.__misses__ = 0
+
+    def key(
+            self,
+            parameters: typing.Union[
+                typing.List[typing.List[app_schemas_impl.ParameterImpl]], typing.List[app_schemas_impl.ParameterImpl]]
+    ) -> Key:
+        rows = parameters if isinstance(parameters[0], typing.List) else [parameters]
+        canonical = [[(param.name, param.value) for param in row] for row in rows]
+        if not self.ordered:
+            canonical = [sorted(row, key=lambda item: item[0]) for row in canonical]
+        # json keeps 1, 1.0 and true apart
+        return self.binary_hash, hashlib.blake2b(orjson.dumps(canonical), digest_size=16).digest()
+
+    def get(self, key: Key) -> typing.Optional[typing.Dict[typing.Text, typing.Any]]:
+        with self.__lock__:
+            result = self.__cache__.get(key)
+            if result is None:
+                self.__misses__ += 1
+            else:
+                self.__hits__ += 1
+            return result
+
+    def put(self, key: Key, result: typing.Dict[typing.Text, typing.Any]):
+        with self.__lock__:
+            self.__cache__[key] = result
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            lookups = self.__hits__ + self.__misses__
+            return {
+                'size': self.__cache__.currsize,
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.__hits__,
+                'misses': self.__misses__,
+                'hit_ratio': self.__hits__ / lookups if lookups else 0.0
+            }
+
+
+class ResultCaches(object):
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__caches__: typing.Dict[int, ResultCache] = {}
+
+    def get(
+            self, endpoint_id: int, model: app_runtime_wrapper.ModelInvocationExecutor
+    ) -> typing.Optional[ResultCache]:
+        """Result cache of an endpoint if it is enabled, a new cache is created when the binary changes"""
+        options = model.options.result_cache
+        if not options.enabled:
+            return None
+        with self.__lock__:
+            result_cache = self.__caches__.get(endpoint_id)
+            if result_cache is None \
+                    or result_cache.binary_hash != model.binary_hash \
+                    or (result_cache.max_size, result_cache.ttl_seconds) != (options.max_size, options.ttl_seconds):
+                LOGGER.info('Creating result cache for endpoint %s', endpoint_id)
+                result_cache = self.__caches__[endpoint_id] = ResultCache(
+                    endpoint_id, model.binary_hash, options.max_size, options.ttl_seconds,
+                    ordered=model.input_adapter is None)
+            return result_cache
+
+    def invalidate(self, endpoint_id: int):
+        with self.__lock__:
+            if self.__caches__.pop(endpoint_id, None) is not None:
+                LOGGER.info('Invalidated result cache of endpoint %s', endpoint_id)
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            return {str(endpoint_id): cache.stats() for endpoint_id, cache in self.__caches__.items()}
+
+    def clear(self):
+        with self.__lock__:
+            self.__caches__.clear()
+
+
+result_caches = ResultCaches()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+"""
+Users of the bearer tokens verified by this worker, keyed by token.
+
+A token is verified once and its user is read once, later requests carrying the same token are served from the cache
+until the token expires. Entries also expire after `ttl_seconds`, which bounds the staleness of users changed by
+other workers, changes made through this worker drop the entries of the user.
+"""
+
+
+import threading
+import time
+import typing
+
+import cachetools
+import sqlalchemy.orm as saorm
+
+import app.core.configuration as app_core_config
+import app.models as models
+
+COLUMNS = ('id', 'username', 'hashed_password')
+
+
+class VerifiedToken(object):
+    def __init__(self, user: typing.Dict[typing.Text, typing.Any], expires_at: float):
+        self.user = user
+        self.expires_at = expires_at
+
+    def to_user(self) -> models.User:
+        """User which is not attached to any session, it is merged into a session without being read again"""
+        # noinspection PyArgumentList
+        user = models.User(**self.user)
+        saorm.make_transient_to_detached(user)
+        return user
+
+
+class TokenCache(object):
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self.__lock__ = threading.Lock()
+        self.__tokens__: cachetools.TLRUCache[typing.Text, VerifiedToken] = cachetools.TLRUCache(
+            maxsize=max_size, ttu=self.time_to_use, timer=time.time)
+        self.__hits__ = 0
+        self.__misses__ = 0
+
+    def time_to_use(self, token: typing.Text, verified: VerifiedToken, now: float) -> float:
+        return min(verified.expires_at, now + self.ttl_seconds)
+
+    def get(self, token: typing.Text) -> typing.Optional[models.User]:
+        with self.__lock__:
+            verified = self.__tokens__.get(token)
+            if verified is None:
+                self.__misses__ += 1
+                return None
+            self.__hits__ += 1
+        return verified.to_user()
+
+    def put(self, token: typing.Text, user: models.User, expires_at: typing.Optional[float]):
+        """Caches the user of a verified token, tokens without expiration are kept `ttl_seconds`"""
+        if self.max_size <= 0:
+            return
+        verified = VerifiedToken(
+            {column: getattr(user, column) for column in COLUMNS},
+            time.time() + self.ttl_seconds if expires_at is None else expires_at)
+        with self.__lock__:
+            self.__tokens__[token] = verified
+
+    def invalidate(self, user_id: int):
+        """Drops the tokens of a user which changed"""
+        with self.__lock__:
+            for token in [token for token, verified in self.__tokens__.items() if verified.user['id'] == user_id]:
+                del self.__tokens__[token]
+
+    def clear(self):
+        with self.__lock__:
+            self.__tokens__.clear()
+
+    def stats(self) -> typing.Dict[typing.Text, typing.Any]:
+        with self.__lock__:
+            lookups = self.__hits__ + self.__misses__
+            return {
+                'size': self.__tokens__.currsize,
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.__hits__,
+                'misses': self.__misses__,
+                'hit_ratio': self.__hits__ / lookups if lookups else 0.0
+            }
+
+
+tokens = TokenCache(
+    max_size=app_core_config.get_config().TOKEN_CACHE_SIZE,
+    ttl_seconds=app_core_config.get_config().TOKEN_CACHE_TTL
+)
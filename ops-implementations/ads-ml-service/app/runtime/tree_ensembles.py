@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+"""
+scikit-learn tree ensembles compiled to a flat node table.
+
+The nodes of all the trees of a random forest or a gradient boosting model are stored in arrays and all the trees
+are traversed at once for a batch of rows, one level per step. This avoids the thread pool and the per tree calls of
+scikit-learn, which dominate the scoring time of small batches. A compiled model is only used after its outputs were
+compared with the outputs of the original model on rows built from the split thresholds; inputs the compiled model
+can not read and large batches are scored by the original model.
+"""
+
+
+from __future__ import annotations
+
+import logging
+import typing
+
+import numpy as np
+import pandas as pd
+import sklearn.dummy as skl_dummy
+import sklearn.ensemble as skl_ensemble
+import sklearn.pipeline as skl_pipeline
+import sklearn.tree as skl_tree
+
+LOGGER = logging.getLogger(__name__)
+
+RTOL = 1e-5
+ATOL = 1e-6
+PROBE_SIZE = 256
+
+FORESTS = (skl_ensemble.RandomForestClassifier, skl_ensemble.RandomForestRegressor)
+GRADIENT_BOOSTING = (skl_ensemble.GradientBoostingClassifier, skl_ensemble.GradientBoostingRegressor)
+CLASSIFIERS = (skl_ensemble.RandomForestClassifier, skl_ensemble.GradientBoostingClassifier)
+# classifiers whose predict is the argmax of predict_proba
+ARGMAX_CLASSIFIERS = (
+    skl_ensemble.RandomForestClassifier,
+    skl_ensemble.ExtraTreesClassifier,
+    skl_ensemble.GradientBoostingClassifier,
+    skl_ensemble.HistGradientBoostingClassifier,
+    skl_tree.DecisionTreeClassifier
+)
+
+
+class UnsupportedModel(Exception):
+    """The model can not be compiled"""
+
+
+class TreeTable(object):
+    """
+    Nodes of several trees, a row goes to the left child when its value is lower than or equal to the threshold.
+    Leaves point to themselves so that traversing `depth` levels always ends on a leaf.
+    """
+
+    def __init__(
+            self,
+            feature: np.ndarray,
+            threshold: np.ndarray,
+            left: np.ndarray,
+            right: np.ndarray,
+            values: np.ndarray,
+            roots: np.ndarray,
+            depth: int
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.values = values
+        self.roots = roots
+        self.depth = depth
+        # children[2 * node] is the right child of node and children[2 * node + 1] its left child
+        self.children = np.stack([right, left], axis=1).ravel()
+
+    @staticmethod
+    def from_estimators(estimators: typing.List[typing.Any], values: typing.List[np.ndarray]) -> TreeTable:
+        """Table of decision trees, `values` holds the output of the nodes of each tree"""
+        trees = [estimator.tree_ for estimator in estimators]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+        def children(offset: int, linked: np.ndarray) -> np.ndarray:
+            nodes = np.arange(len(linked)) + offset
+            return np.where(linked < 0, nodes, linked + offset)
+
+        return TreeTable(
+            feature=np.concatenate([np.maximum(tree.feature, 0) for tree in trees]),
+            threshold=np.concatenate([tree.threshold for tree in trees]),
+            left=np.concatenate([children(offset, tree.children_left) for offset, tree in zip(offsets, trees)]),
+            right=np.concatenate([children(offset, tree.children_right) for offset, tree in zip(offsets, trees)]),
+            values=np.concatenate(values),
+            roots=offsets[:-1],
+            depth=max(tree.max_depth for tree in trees))
+
+    @property
+    def size(self) -> int:
+        return len(self.feature)
+
+    def leaves(self, x: np.ndarray) -> np.ndarray:
+        """Leaf of each row (first axis) in each tree (second axis)"""
+        cells = x.ravel()
+        offsets = (np.arange(len(x)) * x.shape[1])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], len(x), axis=0)
+        for _ in range(self.depth):
+            # scikit-learn compares float32 features with float64 thresholds
+            left = cells[offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = self.children[2 * nodes + left]
+        return nodes
+
+    def sum(self, x: np.ndarray) -> np.ndarray:
+        return self.values[self.leaves(x)].sum(axis=1)
+
+    def probe(self, n_features: int, size: int = PROBE_SIZE) -> np.ndarray:
+        """Rows made of split thresholds and their float32 neighbours, where compiled models are most likely to differ"""
+        rng = np.random.default_rng(0)
+        split = self.left != np.arange(self.size)
+        probe = np.zeros((size, n_features), dtype=np.float32)
+        for feature in range(n_features):
+            thresholds = self.threshold[split & (self.feature == feature)].astype(np.float32)
+            if len(thresholds) == 0:
+                continue
+            candidates = np.concatenate([
+                thresholds, np.nextafter(thresholds, np.float32(-np.inf)), np.nextafter(thresholds, np.float32(np.inf)),
+                [thresholds.min() - 1, thresholds.max() + 1]])
+            probe[:, feature] = rng.choice(candidates, size)
+        return probe
+
+
+class CompiledEnsemble(object):
+    """
+    Compiled tree ensemble, other attributes are the attributes of the original model. Batches of more than
+    `max_rows` rows and inputs which are not numeric tables of the features of the original model are scored by the
+    original model.
+    """
+
+    def __init__(self, original: typing.Any, table: TreeTable, base: np.ndarray, scale: float, max_rows: int):
+        self.original = original
+        self.table = table
+        self.base = base
+        self.scale = scale
+        self.max_rows = max_rows
+        self.n_features = original.n_features_in_
+        names = getattr(original, 'feature_names_in_', None)
+        self.feature_names = None if names is None else names.tolist()
+
+    def __getattr__(self, name: typing.Text) -> typing.Any:
+        # the original model may be loaded on demand, it is not needed to know that a regressor has no probabilities
+        if name in ('original', 'predict_proba'):
+            raise AttributeError(name)
+        return getattr(self.original, name)
+
+    def features(self, data: typing.Any) -> typing.Optional[np.ndarray]:
+        """float32 table of the features, None when it is scored by the original model"""
+        if len(data) > self.max_rows:
+            return None
+        if isinstance(data, pd.DataFrame) and self.feature_names is not None \
+                and data.columns.tolist() != self.feature_names:
+            return None
+        try:
+            x = np.asarray(data, dtype=np.float32)
+        except (ValueError, TypeError):
+            return None
+        if x.ndim != 2 or x.shape[1] != self.n_features or not np.isfinite(x).all():
+            return None
+        return x
+
+    def raw(self, x: np.ndarray) -> np.ndarray:
+        return self.base + self.scale * self.table.sum(x)
+
+    def transform(self, raw: np.ndarray) -> typing.Any:
+        return raw[:, 0]
+
+    def predict(self, data: typing.Any) -> typing.Any:
+        x = self.features(data)
+        if x is None:
+            return self.original.predict(data)
+        return self.transform(self.raw(x))
+
+    def evaluate(self, x: np.ndarray) -> typing.Dict[typing.Text, typing.Any]:
+        """Outputs of the compiled model by method of the original model"""
+        return {'predict': self.transform(self.raw(x))}
+
+
+class CompiledClassifier(CompiledEnsemble):
+    def __init__(self, original: typing.Any, table: TreeTable, base: np.ndarray, scale: float, max_rows: int):
+        super().__init__(original, table, base, scale, max_rows)
+        self.classes_ = original.classes_
+
+    def probabilities(self, raw: np.ndarray) -> np.ndarray:
+        return raw
+
+    def transform(self, raw: np.ndarray) -> typing.Any:
+        return self.classes_.take(np.argmax(raw, axis=1))
+
+    def predict_proba(self, data: typing.Any) -> np.ndarray:
+        x = self.features(data)
+        if x is None:
+            return self.original.predict_proba(data)
+        return self.probabilities(self.raw(x))
+
+    def evaluate(self, x: np.ndarray) -> typing.Dict[typing.Text, typing.Any]:
+        raw = self.raw(x)
+        return {'predict': self.transform(raw), 'predict_proba': self.probabilities(raw)}
+
+
+class CompiledGradientBoostingClassifier(CompiledClassifier):
+    def __init__(self, original: typing.Any, table: TreeTable, base: np.ndarray, scale: float, max_rows: int):
+        super().__init__(original, table, base, scale, max_rows)
+        self.loss = original._loss
+
+    def probabilities(self, raw: np.ndarray) -> np.ndarray:
+        return self.loss._raw_prediction_to_proba(raw)
+
+    def transform(self, raw: np.ndarray) -> typing.Any:
+        return self.classes_.take(self.loss._raw_prediction_to_decision(raw))
+
+
+def compile_forest(model: typing.Any, max_rows: int) -> CompiledEnsemble:
+    if model.n_outputs_ != 1:
+        raise UnsupportedModel('Multi-output forest')
+    values = []
+    for estimator in model.estimators_:
+        value = estimator.tree_.value[:, 0, :]
+        if isinstance(model, skl_ensemble.RandomForestClassifier):
+            # probabilities of a tree are the normalized class weights of its leaves
+            normalizer = value.sum(axis=1, keepdims=True)
+            value = value / np.where(normalizer == 0.0, 1.0, normalizer)
+        values.append(value)
+    table = TreeTable.from_estimators(model.estimators_, values)
+    cls = CompiledClassifier if isinstance(model, CLASSIFIERS) else CompiledEnsemble
+    return cls(model, table, np.zeros(table.values.shape[1]), 1 / len(model.estimators_), max_rows)
+
+
+def compile_gradient_boosting(model: typing.Any, max_rows: int) -> CompiledEnsemble:
+    if not (model.init_ == 'zero' or isinstance(model.init_, (skl_dummy.DummyClassifier, skl_dummy.DummyRegressor))):
+        raise UnsupportedModel(f'Gradient boosting initialized with {type(model.init_).__name__}')
+    n_scores = model.estimators_.shape[1]
+    estimators, values = [], []
+    for stage in model.estimators_:
+        for k, estimator in enumerate(stage):
+            # each tree only adds to the score of its class
+            value = np.zeros((estimator.tree_.node_count, n_scores))
+            value[:, k] = model.learning_rate * estimator.tree_.value[:, 0, 0]
+            estimators.append(estimator)
+            values.append(value)
+    # constant initial scores
+    base = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+    cls = CompiledGradientBoostingClassifier if isinstance(model, CLASSIFIERS) else CompiledEnsemble
+    return cls(model, TreeTable.from_estimators(estimators, values), base, 1.0, max_rows)
+
+
+def compile_ensemble(model: typing.Any, max_rows: int) -> CompiledEnsemble:
+    if isinstance(model, FORESTS):
+        return compile_forest(model, max_rows)
+    if isinstance(model, GRADIENT_BOOSTING):
+        return compile_gradient_boosting(model, max_rows)
+    raise UnsupportedModel(f'{type(model).__name__} is not a supported tree ensemble')
+
+
+def matches(compiled: typing.Any, original: typing.Any) -> bool:
+    compiled, original = np.asarray(compiled), np.asarray(original)
+    if compiled.shape != original.shape:
+        return False
+    if np.issubdtype(original.dtype, np.number) and np.issubdtype(compiled.dtype, np.number):
+        return np.allclose(compiled, original, rtol=RTOL, atol=ATOL)
+    return bool(np.array_equal(compiled, original))
+
+
+def verify(compiled: CompiledEnsemble) -> bool:
+    """Compares the outputs of the compiled model with the outputs of the original model on probe rows"""
+    probe = compiled.table.probe(compiled.n_features)
+    data = pd.DataFrame(probe, columns=compiled.feature_names) if compiled.feature_names is not None else probe
+    for method, output in compiled.evaluate(probe).items():
+        if not matches(output, getattr(compiled.original, method)(data)):
+            LOGGER.warning('Compiled %s does not match %s', type(compiled.original).__name__, method)
+            return False
+    return True
+
+
+def compile_model(model: typing.Any, max_rows: int) -> typing.Any:
+    """Compiled tree ensemble when its outputs match the original model, the original model otherwise"""
+    try:
+        compiled = compile_ensemble(model, max_rows)
+        if verify(compiled):
+            LOGGER.info('Compiled %s with %s nodes', type(model).__name__, compiled.table.size)
+            return compiled
+    except UnsupportedModel as e:
+        LOGGER.debug('Model is not compiled: %s', e)
+    except Exception:
+        LOGGER.exception('Failed to compile %s', type(model).__name__)
+    return model
+
+
+def predicts_argmax(model: typing.Any) -> bool:
+    """Whether labels of a model, or of the last step of a pipeline, are the argmax of its probabilities"""
+    while isinstance(model, skl_pipeline.Pipeline):
+        model = model.steps[-1][1]
+    return isinstance(model, (*ARGMAX_CLASSIFIERS, CompiledClassifier))
@@ -17,8 +17,11 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
 import io
 import logging
+import threading
 import typing as typ
 
 import fastapi
@@ -36,10 +39,20 @@ try:
 except ImportError:
     xgb = None
 
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+import app.runtime.artifacts as app_artifacts
 import app.runtime.input as app_input
+import app.runtime.native_pmml as app_native_pmml
 import app.runtime.output as app_output
+import app.runtime.pmml_gateways as app_pmml_gateways
+import app.runtime.tree_ensembles as app_tree_ensembles
 import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
 
 LOGGER = logging.getLogger(__name__)
 
@@ -51,6 +64,10 @@ class InMemoryModel:
     def has_method(self, method_name: typ.Text):
         return hasattr(self.model, method_name)
 
+    def external_size(self, binary_size: int) -> int:
+        """Estimated memory held by the model outside of python objects"""
+        return 0
+
     def predict(self, request: typ.Any) -> typ.Any:
         try:
             return self.model.predict(request)
@@ -68,36 +85,195 @@ class InMemoryModel:
 
 class JoblibFormat(InMemoryModel):
     @staticmethod
-    def load(binary: typ.Any) -> JoblibFormat:
+    def deserialize(binary: typ.Any, options: app_runtime_config.RuntimeOptions) -> typ.Any:
         model = joblib.load(io.BytesIO(binary))
-        return JoblibFormat(model)
+        if options.tree_compilation.enabled:
+            model = app_tree_ensembles.compile_model(model, options.tree_compilation.max_rows)
+        return model
+
+    @staticmethod
+    def load(binary: typ.Any, options: typ.Optional[app_runtime_config.RuntimeOptions] = None) -> JoblibFormat:
+        options = options or app_runtime_config.RuntimeOptions()
+        if options.memory_mapping:
+            # artifacts hold the compiled model
+            variant = f'compiled-{options.tree_compilation.max_rows}' if options.tree_compilation.enabled else 'model'
+            return JoblibFormat(app_artifacts.get_store().load(
+                binary, variant, lambda: JoblibFormat.deserialize(binary, options)))
+        return JoblibFormat(JoblibFormat.deserialize(binary, options))
 
 
 class PMMLFormat(InMemoryModel):
     @staticmethod
-    def load(binary: typ.Any) -> PMMLFormat:
+    def load(binary: typ.Any, options: typ.Optional[app_runtime_config.RuntimeOptions] = None) -> PMMLFormat:
+        options = options or app_runtime_config.RuntimeOptions()
+        if options.pmml_evaluator is app_runtime_config.PMMLEvaluator.AUTO:
+            try:
+                return PMMLFormat(app_native_pmml.compile(binary))
+            except app_native_pmml.UnsupportedPMML as e:
+                LOGGER.info('Native PMML evaluation is not supported (%s), using pypmml', e)
         if not pypmml:
             LOGGER.exception('pypmml is not installed')
             raise RuntimeError('pypmml is not installed')
-        model = pypmml.Model.load(io.BytesIO(binary))
+        model = app_pmml_gateways.get_pool().load(binary)
         return PMMLFormat(model)
 
+    def external_size(self, binary_size: int) -> int:
+        # pypmml models are held by a JVM
+        return 0 if isinstance(self.model, app_native_pmml.NativeModel) else binary_size
+
 
 class SBTFormat(InMemoryModel):
+    def __init__(self, model: typ.Any, inplace_predict: bool = False):
+        super().__init__(model)
+        self.inplace_predict = inplace_predict
+
     @staticmethod
-    def load(binary: typ.Any) -> SBTFormat:
+    def load(binary: typ.Any, options: typ.Optional[app_runtime_config.RuntimeOptions] = None) -> SBTFormat:
         if not xgb:
             LOGGER.exception('xgboost is not installed')
             raise RuntimeError('xgboost is not installed')
+        options = options or app_runtime_config.RuntimeOptions()
         model = xgb.Booster(model_file=bytearray(binary))
-        return SBTFormat(model)
+        # predictions already run in several inference threads of several workers
+        model.set_param({'nthread': options.xgboost.nthread})
+        return SBTFormat(model, options.xgboost.inplace_predict)
+
+    def external_size(self, binary_size: int) -> int:
+        return binary_size
+
+    def predict(self, request: typ.Any) -> typ.Any:
+        if not isinstance(request, np.ndarray):
+            return super().predict(request)
+        try:
+            return self.model.inplace_predict(request)
+        except Exception:
+            LOGGER.exception('Failed to predict %s', request)
+            raise
+
+    def name_features(self, input_adapter: typ.Optional[app_input.InputAdapter]):
+        """Boosters saved in the binary format do not keep their feature names, they are taken from the input schema"""
+        if input_adapter is not None and self.model.feature_names is None:
+            self.model.feature_names = input_adapter.feature_names
+
+    def feature_order(self, input_adapter: app_input.InputAdapter) -> typ.Optional[typ.List[int]]:
+        """Positions in the input schema of the features of the booster, None if they are in the same order"""
+        names = self.model.feature_names
+        if names is None or names == input_adapter.names:
+            return None
+        if sorted(names) != sorted(input_adapter.names):
+            LOGGER.warning('Features of the booster do not match the input schema, using the order of the schema')
+            return None
+        return [input_adapter.positions[name] for name in names]
+
+    def input_handlers(
+            self, input_adapter: typ.Optional[app_input.InputAdapter]
+    ) -> typ.Tuple[typ.Callable, typ.Callable]:
+        """Row and columnar handlers building the float32 arrays of `inplace_predict`"""
+        if input_adapter is None:
+            return (
+                functools.partial(app_input.to_float32, feature_names=self.model.feature_names),
+                functools.partial(app_input.columnar_to_float32, feature_names=self.model.feature_names))
+        order = self.feature_order(input_adapter)
+        return (
+            functools.partial(input_adapter.to_float32, order=order),
+            functools.partial(input_adapter.columnar_to_float32, order=order))
+
+
+ONNX_TENSOR_TYPES = {
+    'tensor(float)': np.dtype(np.float32),
+    'tensor(double)': np.dtype(np.float64),
+    'tensor(int64)': np.dtype(np.int64),
+    'tensor(int32)': np.dtype(np.int32),
+    'tensor(bool)': np.dtype(np.bool_),
+    'tensor(string)': np.dtype(object)
+}
+
+
+class ONNXFormat(InMemoryModel):
+    """
+    onnxruntime session. Graphs take a single 2D tensor or one tensor per feature, the first output is the prediction
+    and a second output holds the scores of classifiers (probability tensor or ZipMap, as converted by skl2onnx).
+    """
+
+    def __init__(self, model: typ.Any):
+        super().__init__(model)
+        self.inputs = model.get_inputs()
+        self.outputs = [output.name for output in model.get_outputs()]
+        self._last_run = threading.local()
+
+    @staticmethod
+    def load(binary: typ.Any, options: typ.Optional[app_runtime_config.RuntimeOptions] = None) -> ONNXFormat:
+        if not ort:
+            LOGGER.exception('onnxruntime is not installed')
+            raise RuntimeError('onnxruntime is not installed')
+        options = options or app_runtime_config.RuntimeOptions()
+        session_options = ort.SessionOptions()
+        # predictions already run in several inference threads of several workers
+        session_options.intra_op_num_threads = options.onnx.intra_op_threads
+        session_options.inter_op_num_threads = options.onnx.inter_op_threads
+        session = ort.InferenceSession(
+            bytes(binary), sess_options=session_options, providers=['CPUExecutionProvider'])
+        return ONNXFormat(session)
+
+    def external_size(self, binary_size: int) -> int:
+        return binary_size
+
+    def has_method(self, method_name: typ.Text):
+        return method_name == 'predict' or (method_name == 'predict_proba' and len(self.outputs) > 1)
+
+    def feeds(self, request: typ.Any) -> typ.Dict[typ.Text, np.ndarray]:
+        if len(self.inputs) == 1:
+            input_ = self.inputs[0]
+            return {input_.name: np.asarray(request, dtype=ONNX_TENSOR_TYPES.get(input_.type))}
+        # one input per feature, matched by name for DataFrame and by position otherwise
+        columns = [request[input_.name].to_numpy() for input_ in self.inputs] \
+            if isinstance(request, pd.DataFrame) \
+            else np.asarray(request).T
+        return {
+            input_.name: np.asarray(column, dtype=ONNX_TENSOR_TYPES.get(input_.type)).reshape(
+                (-1, 1) if len(input_.shape) == 2 else -1)
+            for input_, column in zip(self.inputs, columns)}
+
+    def run(self, request: typ.Any) -> typ.List[typ.Any]:
+        return self.model.run(self.outputs, self.feeds(request))
+
+    def take_run(self, request: typ.Any) -> typ.List[typ.Any]:
+        """Outputs kept by the predict call of the same request in this thread, released once taken"""
+        request_, outputs = getattr(self._last_run, 'outputs', (None, None))
+        self._last_run.outputs = None, None
+        return outputs if request_ is request else self.run(request)
+
+    def predict(self, request: typ.Any) -> typ.Any:
+        try:
+            outputs = self.run(request)
+        except Exception:
+            LOGGER.exception('Failed to predict %s', request)
+            raise
+        if len(self.outputs) > 1:
+            # predict_proba of the same request follows, it takes the scores instead of running the graph again
+            self._last_run.outputs = request, outputs
+        output = outputs[0]
+        return output.ravel() if output.ndim == 2 and output.shape[1] == 1 else output
+
+    def predict_proba(self, request: typ.Any) -> typ.Any:
+        try:
+            output = self.take_run(request)[1]
+        except Exception:
+            LOGGER.exception('Failed to predict_proba %s', request)
+            raise
+        if isinstance(output, list):
+            # ZipMap: one {label: probability} per row
+            labels = list(output[0]) if output else []
+            return np.array([[row[label] for label in labels] for row in output], dtype=np.float32)
+        return output
 
 
 WRAPPERS = {
     app_binary_config.ModelWrapper.PICKLE: JoblibFormat,
     app_binary_config.ModelWrapper.JOBLIB: JoblibFormat,
     app_binary_config.ModelWrapper.PMML: PMMLFormat,
-    app_binary_config.ModelWrapper.BST: SBTFormat
+    app_binary_config.ModelWrapper.BST: SBTFormat,
+    app_binary_config.ModelWrapper.ONNX: ONNXFormat
 }
 
 
@@ -109,19 +285,113 @@ class ModelInvocationExecutor:
             input_type: app_binary_config.ModelInput = app_binary_config.ModelInput.DATAFRAME,
             output_type: app_binary_config.ModelOutput = app_binary_config.ModelOutput.NUMPY_ARRAY,
             binary_format: app_binary_config.ModelWrapper = app_binary_config.ModelWrapper.JOBLIB,
-            info: typ.Optional[typ.Dict] = None
+            info: typ.Optional[typ.Dict] = None,
+            options: typ.Optional[app_runtime_config.RuntimeOptions] = None,
+            input_schema: typ.Optional[typ.List[typ.Dict[typ.Text, typ.Any]]] = None,
+            encodable_output: bool = False,
+            loaded_model: typ.Optional[InMemoryModel] = None
     ):
+        # requests are converted by the adapter compiled from the input schema when there is one
+        self.input_adapter = app_input.InputAdapter.compile(
+            input_schema, allow_missing=binary_format is app_binary_config.ModelWrapper.PMML)
         self.input_handler = None \
             if input_type is app_binary_config.ModelInput.AUTO \
-            else app_input.INPUT_HANDLING[input_type]
+            else self.resolve_input_handler(input_type)
+        self.columnar_input_handler = None \
+            if input_type is app_binary_config.ModelInput.AUTO \
+            else self.resolve_columnar_input_handler(input_type)
+        # encodable outputs keep numpy arrays for orjson instead of converting them to python objects
+        self.output_handlers = app_output.ENCODABLE_OUTPUT_HANDLING \
+            if encodable_output \
+            else app_output.OUTPUT_HANDLING
+        self.columnar_output_handlers = app_output.ENCODABLE_COLUMNAR_OUTPUT_HANDLING \
+            if encodable_output \
+            else app_output.COLUMNAR_OUTPUT_HANDLING
         self.output_handler = None \
             if output_type is app_binary_config.ModelOutput.AUTO \
-            else app_output.OUTPUT_HANDLING[output_type]
+            else self.output_handlers[output_type]
+        self.columnar_output_handler = None \
+            if output_type is app_binary_config.ModelOutput.AUTO \
+            else self.columnar_output_handlers[output_type]
         self.model_wrapper = WRAPPERS[binary_format]
         self.info = info or {}
+        self.options = options or app_runtime_config.RuntimeOptions()
 
-        self.loaded_model = self.model_wrapper.load(model)
+        # `loaded_model` was already loaded from `model` with the same options
+        self.loaded_model = loaded_model if loaded_model is not None else self.model_wrapper.load(model, self.options)
+        if self.model_wrapper is SBTFormat:
+            self.loaded_model.name_features(self.input_adapter)
+            # boosters score float32 arrays in place instead of DMatrix
+            if self.loaded_model.inplace_predict \
+                    and input_type in (app_binary_config.ModelInput.AUTO, app_binary_config.ModelInput.DMATRIX):
+                self.input_handler, self.columnar_input_handler = self.loaded_model.input_handlers(self.input_adapter)
+        # identifies the binary in result cache keys
+        self.binary_hash = hashlib.sha256(model).hexdigest() if self.options.result_cache.enabled else None
         self.can_predict_proba = self.loaded_model.has_method('predict_proba')
+        # True: labels are derived from predict_proba, False: predict and predict_proba are both called,
+        # None: not verified yet, the first invocation compares both paths
+        self.single_pass = self.resolve_single_pass(self.options.scoring_mode)
+
+    @staticmethod
+    def from_configuration(
+            model: typ.Any,
+            configuration: typ.Dict[typ.Text, typ.Any],
+            input_type: app_binary_config.ModelInput,
+            output_type: app_binary_config.ModelOutput,
+            binary_format: app_binary_config.ModelWrapper,
+            loaded_model: typ.Optional[InMemoryModel] = None
+    ) -> ModelInvocationExecutor:
+        """Executor serving the predictions of an endpoint, configured by the configuration of its model"""
+        import app.core.configuration as app_core_config
+
+        metadata = configuration.get('metadata')
+        return ModelInvocationExecutor(
+            model=model,
+            input_type=input_type,
+            output_type=output_type,
+            binary_format=binary_format,
+            info={} if not metadata else metadata.get(app_core_config.get_config().ADDITIONAL_INFO_FIELD),
+            options=app_runtime_config.RuntimeOptions.from_metadata(metadata),
+            input_schema=configuration.get('input_schema'),
+            encodable_output=True,
+            loaded_model=loaded_model
+        )
+
+    def resolve_single_pass(self, scoring_mode: app_runtime_config.ScoringMode) -> typ.Optional[bool]:
+        classes = getattr(self.loaded_model.model, 'classes_', None) if self.can_predict_proba else None
+        capable = isinstance(classes, np.ndarray) and classes.ndim == 1
+        if scoring_mode is app_runtime_config.ScoringMode.TWO_PASS or not capable:
+            if scoring_mode is app_runtime_config.ScoringMode.SINGLE_PASS:
+                LOGGER.warning('Single pass scoring needs predict_proba and classes_, using two passes')
+            return False
+        if scoring_mode is app_runtime_config.ScoringMode.SINGLE_PASS:
+            return True
+        # labels of other classifiers, e.g. SVC with Platt scaling, can differ from the argmax of their probabilities
+        # on rows the verification does not see
+        return None if app_tree_ensembles.predicts_argmax(self.loaded_model.model) else False
+
+    def labels_from_proba(self, predict_proba: np.ndarray) -> np.ndarray:
+        return self.loaded_model.model.classes_.take(np.argmax(predict_proba, axis=1))
+
+    def verify_single_pass(self, predict: typ.Any, predict_proba: typ.Any) -> bool:
+        """Compares labels derived from predict_proba with predict and fixes the scoring mode"""
+        self.single_pass = bool(np.array_equal(np.asarray(predict), self.labels_from_proba(predict_proba)))
+        LOGGER.info('Single pass scoring %s', 'verified' if self.single_pass else 'rejected, using two passes')
+        return self.single_pass
+
+    def check_single_pass(self, prepared_data: typ.Any) -> bool:
+        return self.verify_single_pass(
+            self.loaded_model.predict(prepared_data), self.loaded_model.predict_proba(prepared_data))
+
+    def resolve_input_handler(self, input_type: app_binary_config.ModelInput) -> typ.Callable:
+        return self.input_adapter.input_handler(input_type) \
+            if self.input_adapter is not None \
+            else app_input.INPUT_HANDLING[input_type]
+
+    def resolve_columnar_input_handler(self, input_type: app_binary_config.ModelInput) -> typ.Callable:
+        return self.input_adapter.columnar_input_handler(input_type) \
+            if self.input_adapter is not None \
+            else app_input.COLUMNAR_INPUT_HANDLING[input_type]
 
     def input_handling(
             self,
@@ -131,48 +401,121 @@ class ModelInvocationExecutor:
         if self.input_handler is not None:
             return self.input_handler(input_)
         if self.model_wrapper is SBTFormat:
-            self.input_handler = app_input.to_dmatrix
+            self.input_handler = self.resolve_input_handler(app_binary_config.ModelInput.DMATRIX)
         else:
-            self.input_handler = app_input.to_dataframe
+            self.input_handler = self.resolve_input_handler(app_binary_config.ModelInput.DATAFRAME)
         return self.input_handler(input_)
 
-    def output_handling(
+    def columnar_input_handling(
             self,
-            output: typ.Any
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
     ) -> typ.Any:
-        if self.output_handler is not None:
-            return self.output_handler(output)
+        if self.columnar_input_handler is not None:
+            return self.columnar_input_handler(columns, data)
+        if self.model_wrapper is SBTFormat:
+            self.columnar_input_handler = self.resolve_columnar_input_handler(app_binary_config.ModelInput.DMATRIX)
+        else:
+            self.columnar_input_handler = self.resolve_columnar_input_handler(app_binary_config.ModelInput.DATAFRAME)
+        return self.columnar_input_handler(columns, data)
+
+    @staticmethod
+    def output_type(output: typ.Any) -> app_binary_config.ModelOutput:
         if isinstance(output, np.ndarray):
-            self.output_handler = app_output.from_ndarray
+            return app_binary_config.ModelOutput.NUMPY_ARRAY
         elif isinstance(output, pd.DataFrame):
-            self.output_handler = app_output.from_dataframe
+            return app_binary_config.ModelOutput.DATAFRAME
         elif isinstance(output, typ.List):
-            self.output_handler = app_output.from_list
+            return app_binary_config.ModelOutput.LIST
         else:
             raise ValueError(f'Unsupported output type: {type(output)}')
+
+    def output_handling(
+            self,
+            output: typ.Any
+    ) -> typ.Any:
+        if self.output_handler is not None:
+            return self.output_handler(output)
+        self.output_handler = self.output_handlers[self.output_type(output)]
         return self.output_handler(output)
 
-    def predict(self, request: typ.Any) -> typ.Any:
-        prepared_data = self.input_handling(request)
+    def columnar_output_handling(
+            self,
+            output: typ.Any
+    ) -> typ.Any:
+        if self.columnar_output_handler is not None:
+            return self.columnar_output_handler(output)
+        self.columnar_output_handler = self.columnar_output_handlers[self.output_type(output)]
+        return self.columnar_output_handler(output)
+
+    def invoke(self, prepared_data: typ.Any) -> typ.Tuple[typ.Any, typ.Optional[typ.Any]]:
         LOGGER.debug('ML input: %s', prepared_data)
 
+        if self.single_pass:
+            predict_proba = self.loaded_model.predict_proba(prepared_data)
+            LOGGER.debug('ML output(scores): %s', predict_proba)
+            if len(predict_proba) == 0:
+                raise fastapi.HTTPException(500, 'Empty prediction result.')
+            return self.labels_from_proba(predict_proba), predict_proba
+
         predict = self.loaded_model.predict(prepared_data)
         LOGGER.debug('ML output: %s', predict)
 
         if len(predict) == 0:
             raise fastapi.HTTPException(500, 'Empty prediction result.')
 
-        formatted_predict = self.output_handling(predict)
         if not self.can_predict_proba:
-            if not isinstance(formatted_predict, typ.Dict):
-                return {'result': {'predictions': formatted_predict, **self.info}}
-            else:
-                return {'result': {**formatted_predict, **self.info}}
-        else:
-            predict_proba = self.loaded_model.predict_proba(prepared_data)
-            LOGGER.debug('ML output(scores): %s', predict_proba)
-            formatted_predict_proba = self.output_handling(predict_proba)
-            if not isinstance(formatted_predict, typ.Dict):
-                return {'result': {'predictions': formatted_predict, 'scores': formatted_predict_proba, **self.info}}
-            else:
-                return {'result': {**formatted_predict, 'scores': formatted_predict_proba, **self.info}}
+            return predict, None
+
+        predict_proba = self.loaded_model.predict_proba(prepared_data)
+        LOGGER.debug('ML output(scores): %s', predict_proba)
+        if self.single_pass is None:
+            self.verify_single_pass(predict, predict_proba)
+        return predict, predict_proba
+
+    def format_result(
+            self,
+            predict: typ.Any,
+            predict_proba: typ.Optional[typ.Any],
+            output_handling: typ.Callable[[typ.Any], typ.Any]
+    ) -> typ.Dict[typ.Text, typ.Any]:
+        formatted_predict = output_handling(predict)
+        result = {**formatted_predict} \
+            if isinstance(formatted_predict, typ.Dict) \
+            else {'predictions': formatted_predict}
+        if predict_proba is not None:
+            result['scores'] = output_handling(predict_proba)
+        return {'result': {**result, **self.info}}
+
+    def predict(self, request: typ.Any) -> typ.Any:
+        if isinstance(request, typ.List) and not request:
+            raise app_input.EmptyParameters()
+        prepared_data = self.input_handling(request)
+        return self.format_result(*self.invoke(prepared_data), self.output_handling)
+
+    def predict_columnar(
+            self,
+            columns: typ.List[typ.Text],
+            data: typ.Dict[typ.Text, typ.List[typ.Any]]
+    ) -> typ.Dict[typ.Text, typ.Any]:
+        prepared_data = self.columnar_input_handling(columns, data)
+        return self.format_result(*self.invoke(prepared_data), self.columnar_output_handling)
+
+    def predict_batch(
+            self,
+            requests: typ.List[typ.List[typ.List[app_schemas_impl.ParameterImpl]]]
+    ) -> typ.List[typ.Dict[typ.Text, typ.Any]]:
+        """Scores the rows of several requests at once and splits the results back per request"""
+        prepared_data = self.input_handling([row for rows in requests for row in rows])
+        predict, predict_proba = self.invoke(prepared_data)
+
+        results = []
+        start = 0
+        for rows in requests:
+            end = start + len(rows)
+            results.append(self.format_result(
+                app_output.take_rows(predict, start, end),
+                None if predict_proba is None else app_output.take_rows(predict_proba, start, end),
+                self.output_handling))
+            start = end
+        return results
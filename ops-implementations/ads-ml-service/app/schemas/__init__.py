@@ -21,3 +21,5 @@ from .model_config import ModelConfigCreate, ModelConfigUpdate, ModelConfigInDB,
 from .token import Token, TokenData
 from .user import UserCreate, UserUpdate, UserInDB, User
 from .endpoint import EndpointCreate, EndpointUpdate, EndpointInDB, Endpoint
+from .endpoint_change import EndpointChangeCreate, EndpointChangeUpdate, EndpointChangeInDB, EndpointChange
+from .row_count import RowCountCreate, RowCountUpdate, RowCountInDB, RowCount
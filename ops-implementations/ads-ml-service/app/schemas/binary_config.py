@@ -39,3 +39,4 @@ class ModelWrapper(typ.Text, enum.Enum):
     JOBLIB = 'joblib'
     PMML = 'pmml'
     BST = 'bst'
+    ONNX = 'onnx'
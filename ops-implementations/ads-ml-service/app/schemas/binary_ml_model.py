@@ -42,7 +42,8 @@ class BinaryMlModelUpdate(BinaryMlModelBase):
 
 class BinaryMlModelInDBBase(BinaryMlModelBase):
     id: int
-    model_b64: bytes
+    hash: str
+    size: int
     input_data_structure: app_binary_config.ModelInput
     output_data_structure: app_binary_config.ModelOutput
     format: app_binary_config.ModelWrapper
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import typing
+
+import pydantic
+
+import app.gen.schemas.ops_schemas as ops_schemas
+import app.schemas.impl as impl
+
+# Exact types produced by the json decoder that `ParameterImpl.value_check` accepts
+VALUE_TYPES = frozenset((int, float, bool, str))
+LINK_FIELDS = frozenset(('rel', 'href'))
+
+ModelT = typing.TypeVar('ModelT', bound=pydantic.BaseModel)
+
+
+def build(model: typing.Type[ModelT], fields_set: typing.Set[typing.Text], **values: typing.Any) -> ModelT:
+    """Same as `model.construct` without the lookup of default values, all fields are given"""
+    instance = model.__new__(model)
+    object.__setattr__(instance, '__dict__', values)
+    object.__setattr__(instance, '__fields_set__', fields_set)
+    return instance
+
+
+def decode_link(obj: typing.Any) -> typing.Optional[ops_schemas.Link]:
+    if type(obj) is not dict:
+        return None
+    rel, href = obj.get('rel'), obj.get('href')
+    if (rel is not None and type(rel) is not str) or (href is not None and type(href) is not str):
+        return None
+    return build(ops_schemas.Link, set(LINK_FIELDS.intersection(obj)), rel=rel, href=href)
+
+
+def decode_parameter(obj: typing.Any) -> typing.Optional[impl.ParameterImpl]:
+    if type(obj) is not dict:
+        return None
+    name, value = obj.get('name'), obj.get('value')
+    if type(name) is not str or type(value) not in VALUE_TYPES:
+        return None
+    return build(impl.ParameterImpl, {'name', 'value'}, name=name, value=value)
+
+
+def decode_all(
+        objs: typing.List[typing.Any], decode: typing.Callable[[typing.Any], typing.Optional[typing.Any]]
+) -> typing.Optional[typing.List[typing.Any]]:
+    decoded = []
+    for obj in objs:
+        value = decode(obj)
+        if value is None:
+            return None
+        decoded.append(value)
+    return decoded
+
+
+def decode_row(obj: typing.Any) -> typing.Optional[typing.List[impl.ParameterImpl]]:
+    return decode_all(obj, decode_parameter) if type(obj) is list else None
+
+
+def decode_prediction(payload: typing.Any) -> typing.Optional[impl.PredictionImpl]:
+    """
+    Builds a `PredictionImpl` from a decoded json payload without running pydantic validation.
+    Only the canonical form of a prediction is accepted: None is returned for any payload needing coercion
+    or raising an error, the caller then falls back to pydantic which produces the validation errors.
+    """
+    if type(payload) is not dict:
+        return None
+    target, parameters = payload.get('target'), payload.get('parameters')
+    if type(target) is not list or type(parameters) is not list:
+        return None
+
+    links = decode_all(target, decode_link)
+    decoded = decode_all(parameters, decode_row if parameters and type(parameters[0]) is list else decode_parameter)
+    if links is None or decoded is None:
+        return None
+
+    return build(impl.PredictionImpl, {'target', 'parameters'}, target=links, parameters=decoded)
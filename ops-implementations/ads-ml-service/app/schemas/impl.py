@@ -67,26 +67,43 @@ class ModelImpl(ops_schemas.Model):
 
     @staticmethod
     def from_database(db_obj: models.Model) -> typing.Dict[typing.Text, typing.Any]:
+        return ModelImpl.from_columns(
+            db_obj.id, db_obj.created_at, db_obj.modified_at, db_obj.config.configuration,
+            None if db_obj.endpoint is None else db_obj.endpoint.id)
+
+    @staticmethod
+    def from_listing(row: typing.Any) -> typing.Dict[typing.Text, typing.Any]:
+        """Model of a row of `crud.model.get_listing`"""
+        return ModelImpl.from_columns(row.id, row.created_at, row.modified_at, row.configuration, row.endpoint_id)
+
+    @staticmethod
+    def from_columns(
+            model_id: int,
+            created_at: dt.datetime,
+            modified_at: dt.datetime,
+            configuration: typing.Dict[typing.Text, typing.Any],
+            endpoint_id: typing.Optional[int]
+    ) -> typing.Dict[typing.Text, typing.Any]:
         return {
-            'id': db_obj.id,
-            'created_at': db_obj.created_at.astimezone(dt.timezone.utc).isoformat(),
-            'modified_at': db_obj.modified_at.astimezone(dt.timezone.utc).isoformat(),
-            **db_obj.config.configuration,
+            'id': model_id,
+            'created_at': created_at.astimezone(dt.timezone.utc).isoformat(),
+            'modified_at': modified_at.astimezone(dt.timezone.utc).isoformat(),
+            **configuration,
             'links': [
                 {
                     'rel': 'self',
-                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=db_obj.id)
+                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=model_id)
                 }
                 ,
                 {
                     'rel': 'endpoint',
-                    'href': app_uri.TEMPLATE.format(resource_type='endpoints', resource_id=db_obj.endpoint.id)
+                    'href': app_uri.TEMPLATE.format(resource_type='endpoints', resource_id=endpoint_id)
                 }
 
-            ] if db_obj.endpoint is not None else [
+            ] if endpoint_id is not None else [
                 {
                     'rel': 'self',
-                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=db_obj.id)
+                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=model_id)
                 }
             ]
         }
@@ -94,26 +111,42 @@ class ModelImpl(ops_schemas.Model):
 
 class ModelsImpl(ops_schemas.Models):
     models: typing.Optional[typing.List[ModelImpl]] = pydt.Field(None, description='List of models')
+    links: typing.Optional[typing.List[ops_schemas.Link]] = pydt.Field(
+        None, description='`next` link of the following page, absent on the last page')
 
 
 class EndpointImpl(ops_schemas.Endpoint):
     @staticmethod
     def from_database(e: models.Endpoint) -> typing.Dict[typing.Text, typing.Any]:
-        metadata = e.metadata_
+        return EndpointImpl.from_columns(e.id, e.name, e.deployed_at, e.metadata_, e.binary is not None)
+
+    @staticmethod
+    def from_listing(row: typing.Any) -> typing.Dict[typing.Text, typing.Any]:
+        """Endpoint of a row of `crud.endpoint.get_listing`"""
+        return EndpointImpl.from_columns(row.id, row.name, row.deployed_at, row.metadata_, row.in_service)
+
+    @staticmethod
+    def from_columns(
+            endpoint_id: int,
+            name: typing.Text,
+            deployed_at: dt.datetime,
+            metadata: typing.Optional[typing.Dict[typing.Text, typing.Any]],
+            in_service: bool
+    ) -> typing.Dict[typing.Text, typing.Any]:
         return {
-            'id': e.id,
-            'name': e.name,
-            'deployed_at': e.deployed_at.astimezone(dt.timezone.utc).isoformat(),
-            'status': StatusImpl.in_service if e.binary else StatusImpl.creating,
+            'id': endpoint_id,
+            'name': name,
+            'deployed_at': deployed_at.astimezone(dt.timezone.utc).isoformat(),
+            'status': StatusImpl.in_service if in_service else StatusImpl.creating,
             'metadata': metadata,
             'links': [
                 {
                     'rel': 'self',
-                    'href': app_uri.TEMPLATE.format(resource_type='endpoints', resource_id=e.id)
+                    'href': app_uri.TEMPLATE.format(resource_type='endpoints', resource_id=endpoint_id)
                 },
                 {
                     'rel': 'model',
-                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=e.id)
+                    'href': app_uri.TEMPLATE.format(resource_type='models', resource_id=endpoint_id)
                 }
 
             ]
@@ -121,7 +154,8 @@ class EndpointImpl(ops_schemas.Endpoint):
 
 
 class EndpointsImpl(ops_schemas.Endpoints):
-    pass
+    links: typing.Optional[typing.List[ops_schemas.Link]] = pydt.Field(
+        None, description='`next` link of the following page, absent on the last page')
 
 
 class StatusImpl(typing.Text, enum.Enum):
@@ -158,3 +192,39 @@ class PredictionImpl(pydt.BaseModel):
     parameters: typing.List[typing.Union[typing.List[ParameterImpl], ParameterImpl]] = pydt.Field(
         ..., description='Model parameters', title='Parameters'
     )
+
+
+class ColumnarPredictionImpl(pydt.BaseModel):
+    target: typing.List[ops_schemas.Link] = pydt.Field(
+        ...,
+        description='Add at least a relation to an `endpoint`to be able to call the correct prediction.',
+    )
+    # Columns are kept as plain lists: values are checked by numpy/pandas in bulk instead of cell by cell
+    data: typing.Dict[str, typing.Any] = pydt.Field(
+        ..., description='Feature values indexed by feature name, one array per feature', title='Data'
+    )
+    columns: typing.Optional[typing.List[str]] = pydt.Field(
+        None, description='Order of the features, defaults to the order of `data`', title='Columns'
+    )
+
+    @pydt.validator('data')
+    def data_check(cls, d) -> typing.Dict[str, typing.List[typing.Any]]:
+        if len(d) == 0:
+            raise ValueError('Data is empty')
+        if not all(isinstance(col, list) for col in d.values()):
+            raise ValueError('Data must contain one array per feature')
+        if len({len(col) for col in d.values()}) != 1 or len(next(iter(d.values()))) == 0:
+            raise ValueError('Feature arrays must be non-empty and of the same length')
+        return d
+
+    @pydt.validator('columns', always=True)
+    def columns_check(cls, c, values) -> typing.List[str]:
+        data = values.get('data')
+        if data is None:
+            return c
+        if c is None:
+            return list(data.keys())
+        missing = [col for col in c if col not in data]
+        if missing:
+            raise ValueError(f'Columns not found in data: {missing}')
+        return c
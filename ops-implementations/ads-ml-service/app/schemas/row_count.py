@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+import pydantic as pyd
+
+
+class RowCountBase(pyd.BaseModel):
+    table_name: str
+    value: int
+
+
+class RowCountCreate(RowCountBase):
+    pass
+
+
+class RowCountUpdate(RowCountBase):
+    pass
+
+
+class RowCountInDBBase(RowCountBase):
+    class Config:
+        orm_mode = True
+
+
+class RowCount(RowCountInDBBase):
+    pass
+
+
+class RowCountInDB(RowCountInDBBase):
+    pass
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+from __future__ import annotations
+
+import enum
+import logging
+import typing as typ
+
+import pydantic as pyd
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ScoringMode(typ.Text, enum.Enum):
+    AUTO = 'auto'
+    SINGLE_PASS = 'single_pass'
+    TWO_PASS = 'two_pass'
+
+
+class PMMLEvaluator(typ.Text, enum.Enum):
+    AUTO = 'auto'
+    PYPMML = 'pypmml'
+
+
+class MicroBatching(pyd.BaseModel):
+    """Group concurrent predictions of an endpoint into a single model invocation"""
+    enabled: bool = False
+    max_batch_size: int = pyd.Field(32, gt=0, description='Maximum number of rows in a batch')
+    max_wait_ms: float = pyd.Field(2.0, ge=0, description='Time window to wait for other predictions')
+
+
+class ResultCaching(pyd.BaseModel):
+    """Cache prediction results of an endpoint, keyed by the model binary and the input rows"""
+    enabled: bool = False
+    max_size: int = pyd.Field(1024, gt=0, description='Maximum number of cached results')
+    ttl_seconds: float = pyd.Field(300.0, gt=0, description='Lifetime of a cached result')
+
+
+class XGBoostScoring(pyd.BaseModel):
+    """Scoring of xgboost boosters"""
+    inplace_predict: bool = pyd.Field(True, description='Score float32 arrays without building a DMatrix')
+    nthread: int = pyd.Field(1, gt=0, description='Threads of xgboost for one prediction')
+
+
+class ONNXScoring(pyd.BaseModel):
+    """Scoring of ONNX models by onnxruntime on CPU"""
+    intra_op_threads: int = pyd.Field(1, gt=0, description='Threads used within an operator')
+    inter_op_threads: int = pyd.Field(1, gt=0, description='Threads used to run independent operators')
+
+
+class TreeCompilation(pyd.BaseModel):
+    """Scoring of scikit-learn random forests and gradient boosting models by a compiled node table"""
+    enabled: bool = pyd.Field(False, description='Compile tree ensembles when they are loaded')
+    max_rows: int = pyd.Field(64, gt=0, description='Larger batches are scored by the original model')
+
+
+class RuntimeOptions(pyd.BaseModel):
+    """Per endpoint runtime options, read from `metadata.runtime` of the model configuration"""
+    # models of pinned endpoints stay in the model cache until they are invalidated
+    pinned: bool = False
+    # pickle and joblib models are loaded from an artifact on local disk, their arrays are shared by the workers
+    memory_mapping: bool = False
+    micro_batching: MicroBatching = MicroBatching()
+    result_cache: ResultCaching = ResultCaching()
+    # `single_pass` derives labels from `predict_proba` instead of calling `predict` as well
+    scoring_mode: ScoringMode = ScoringMode.AUTO
+    # `auto` scores PMML documents with the native evaluator when it supports them
+    pmml_evaluator: PMMLEvaluator = PMMLEvaluator.AUTO
+    xgboost: XGBoostScoring = XGBoostScoring()
+    tree_compilation: TreeCompilation = TreeCompilation()
+    onnx: ONNXScoring = ONNXScoring()
+
+    @staticmethod
+    def from_metadata(metadata: typ.Optional[typ.Dict[typ.Text, typ.Any]]) -> RuntimeOptions:
+        import app.core.configuration as app_core_config
+
+        options = (metadata or {}).get(app_core_config.get_config().RUNTIME_OPTIONS_FIELD) or {}
+        try:
+            return RuntimeOptions.parse_obj(options)
+        except pyd.ValidationError:
+            LOGGER.exception('Invalid runtime options, using defaults')
+            return RuntimeOptions()
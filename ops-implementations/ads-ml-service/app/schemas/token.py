@@ -27,3 +27,5 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     sub: Optional[int] = None
+    # expiration timestamp in seconds
+    exp: Optional[int] = None
@@ -56,5 +56,6 @@ def test_get_managed_capabilities(
     assert 'joblib' in content['managed_capabilities']['supported_binary_format']
     assert 'pickle' in content['managed_capabilities']['supported_binary_format']
     assert 'pmml' in content['managed_capabilities']['supported_binary_format']
+    assert 'onnx' in content['managed_capabilities']['supported_binary_format']
     assert 'pmml' in content['managed_capabilities']['supported_upload_format']
     assert content['managed_capabilities']['file_size_limit'] == test_upload_size_limit
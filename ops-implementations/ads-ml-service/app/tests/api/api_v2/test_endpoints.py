@@ -20,12 +20,16 @@ import time
 import typing as typ
 
 import pytest
+import sqlalchemy
 import fastapi.testclient as tstc
 import sqlalchemy.orm as saorm
 
 import app.core.configuration as conf
 import app.crud as crud
 import app.models as models
+import app.schemas as schemas
+import app.schemas.binary_config as app_binary_config
+import app.tests.predictors.scikit_learn.model as app_test_skl
 
 
 def test_get_endpoint(
@@ -159,3 +163,78 @@ def test_delete_endpoint(
 
     assert response.status_code == 204
     assert endpoint is None
+
+
+def test_get_endpoints_not_modified(
+        db: saorm.Session,
+        client: tstc.TestClient,
+        endpoint_with_model: models.Endpoint
+) -> typ.NoReturn:
+    url = conf.get_config().API_V2_STR + '/endpoints'
+    response = client.get(url=url)
+    statements = []
+
+    def executed(connection, cursor, statement: typ.Text, *args: typ.Any):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.get_bind(), 'before_cursor_execute', executed)
+    try:
+        not_modified = client.get(url=url, headers={'If-None-Match': response.headers['etag']})
+    finally:
+        sqlalchemy.event.remove(db.get_bind(), 'before_cursor_execute', executed)
+    patched = client.patch(url=f'{url}/{endpoint_with_model.id}', json={'name': 'patched'})
+    modified = client.get(url=url, headers={'If-None-Match': response.headers['etag']})
+    since = client.get(url=url, headers={'If-Modified-Since': modified.headers['last-modified']})
+
+    assert response.status_code == 200
+    assert not_modified.status_code == 304
+    assert not_modified.headers['etag'] == response.headers['etag']
+    # served from the materialized page without a database session
+    assert statements == []
+    assert patched.status_code == 200
+    assert modified.status_code == 200
+    assert modified.json()['endpoints'][0]['name'].strip() == 'patched'
+    assert modified.headers['etag'] != response.headers['etag']
+    assert since.status_code == 304
+
+
+@pytest.mark.parametrize('size', [2, 6])
+def test_get_endpoints_statements(
+        db: saorm.Session,
+        client: tstc.TestClient,
+        size: int
+) -> typ.NoReturn:
+    for i in range(size):
+        model = crud.model.create_with_config(
+            db, obj_in=schemas.ModelCreate(),
+            config_in=schemas.ModelConfigCreate(configuration=app_test_skl.get_conf()['model']))
+        if i % 2:
+            crud.endpoint.create_with_model(db, obj_in=schemas.EndpointCreate(name=f'endpoint_{i}'), model=model)
+        else:
+            crud.endpoint.create_with_model_and_binary(
+                db, ec=schemas.EndpointCreate(name=f'endpoint_{i}'), model=model, bc=schemas.BinaryMlModelCreate(
+                    model_b64=bytes([i]),
+                    input_data_structure=app_binary_config.ModelInput.AUTO,
+                    output_data_structure=app_binary_config.ModelOutput.AUTO,
+                    format=app_binary_config.ModelWrapper.PICKLE))
+    db.expire_all()
+    statements = []
+
+    def executed(connection, cursor, statement: typ.Text, *args: typ.Any):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.get_bind(), 'before_cursor_execute', executed)
+    try:
+        endpoints = client.get(url=conf.get_config().API_V2_STR + '/endpoints', params={'total_count': True}).json()
+        models_page = client.get(url=conf.get_config().API_V2_STR + '/models', params={'total_count': True}).json()
+    finally:
+        sqlalchemy.event.remove(db.get_bind(), 'before_cursor_execute', executed)
+
+    # one query per page and one for its count, whatever the number of items
+    assert len(statements) == 4
+    assert [endpoint['status'] for endpoint in endpoints['endpoints']] == [
+        'in_service' if i % 2 == 0 else 'creating' for i in range(size)]
+    assert endpoints['total_count'] == size
+    assert [model['links'][-1]['href'] for model in models_page['models']] == [
+        f'/endpoints/{endpoint["id"]}' for endpoint in endpoints['endpoints']]
+    assert models_page['total_count'] == size
@@ -41,3 +41,24 @@ def test_use_access_token(
     assert response.status_code == 200
     assert 'username' in response.json()
     assert response.json()['username'] == get_config().USERNAME_TEST_USER
+
+
+def test_get_access_token_with_wrong_password(
+    client: TestClient
+) -> None:
+    login = {
+        'username': get_config().DEFAULT_USER,
+        'password': get_config().DEFAULT_USER_PWD + '_'
+    }
+    response = client.post(f'{get_config().API_V2_STR}/login/access-token', data=login)
+
+    assert response.status_code == 400
+    assert 'access_token' not in response.json()
+
+
+def test_use_invalid_access_token(
+    client: TestClient
+) -> None:
+    response = client.post(f'{get_config().API_V2_STR}/login/test-token', headers={'Authorization': 'Bearer token'})
+
+    assert response.status_code == 403
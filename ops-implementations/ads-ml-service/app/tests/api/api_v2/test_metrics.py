@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import typing
+
+import fastapi.testclient as tstc
+
+import app.core.configuration as conf
+
+
+def test_get_server_metrics(client: tstc.TestClient) -> typing.NoReturn:
+    response = client.get(f'{conf.get_config().API_V2_STR}/metrics')
+    content = response.json()
+
+    assert response.status_code == 200
+    assert content['inference']['executor'] == conf.get_config().INFERENCE_EXECUTOR
+    assert content['inference']['queue_depth'] == 0
+    assert content['pmml_gateways']['size'] == conf.get_config().PMML_GATEWAY_POOL_SIZE
+    assert content['model_cache']['max_size'] == conf.get_config().MODEL_CACHE_SIZE
+    assert content['model_cache']['policy'] == conf.get_config().MODEL_CACHE_POLICY
+    assert content['token_cache']['max_size'] == conf.get_config().TOKEN_CACHE_SIZE
@@ -16,6 +16,7 @@
 
 
 import datetime as dt
+import hashlib
 import pickle
 import time
 import typing
@@ -27,10 +28,12 @@ import fastapi.testclient as tstc
 import sqlalchemy.orm as orm
 import sqlalchemy.orm as saorm
 
+import app.api.pagination as app_pagination
 import app.core.configuration as conf
 import app.crud as crud
 import app.schemas as schemas
 import app.tests.predictors.identity.model as app_tests_identity
+import app.tests.predictors.onnx.model as app_test_onnx
 import app.tests.predictors.scikit_learn.model as app_test_skl
 import app.models as models
 import app.tests.predictors.pmml_sample.model as app_test_pmml
@@ -67,6 +70,33 @@ def test_get_models(
     assert rst['models'][0]['id'] == str(model_with_config.id)
 
 
+def test_get_models_by_cursor(
+        db: orm.Session,
+        client: tstc.TestClient
+) -> typing.NoReturn:
+    for _ in range(5):
+        crud.model.create_with_config(
+            db, obj_in=schemas.ModelCreate(),
+            config_in=schemas.ModelConfigCreate(configuration=app_test_skl.get_conf()['model']))
+    ids = [model.id for model in crud.model.get_listing(db, limit=100)]
+    pages = [client.get(url=conf.get_config().API_V2_STR + '/models', params={'limit': 2, 'total_count': True}).json()]
+    while pages[-1]['links']:
+        pages.append(client.get(url=pages[-1]['links'][0]['href']).json())
+    crud.model.delete(db, id=ids[0])
+    count = client.get(url=conf.get_config().API_V2_STR + '/models', params={'total_count': True}).json()['total_count']
+    invalid = client.get(url=conf.get_config().API_V2_STR + '/models', params={'cursor': 'x'})
+    exclusive = client.get(
+        url=conf.get_config().API_V2_STR + '/models', params={'offset': 1, 'cursor': app_pagination.encode_cursor(1)})
+
+    assert [model['id'] for page in pages for model in page['models']] == [str(model_id) for model_id in ids]
+    assert all(len(page['models']) == 2 for page in pages[:-1])
+    assert pages[0]['links'][0]['rel'] == 'next'
+    assert pages[0]['total_count'] == len(ids)
+    assert count == len(ids) - 1
+    assert invalid.status_code == 422
+    assert exclusive.status_code == 422
+
+
 @pytest.mark.parametrize(
     'http_params',
     [
@@ -198,6 +228,29 @@ def test_add_binary(
     assert response_1.json()['status'] == 'in_service'
 
 
+def test_add_binary_scoring_mode_verification(
+        db: saorm.Session,
+        client: tstc.TestClient
+) -> typ.NoReturn:
+    model = crud.model.create(db, obj_in=schemas.ModelCreate())
+    crud.model_config.create_with_model(
+        db, obj_in=schemas.ModelConfigCreate(configuration={
+            **app_test_skl.get_conf()['model'],
+            'input_schema': [{'name': 'x', 'order': 0, 'type': 'float'}, {'name': 'y', 'order': 1, 'type': 'float'}]
+        }), model_id=model.id
+    )
+    response = client.post(
+        url=conf.get_config().API_V2_STR + '/models' + f'/{model.id}',
+        files={'file': pickle.dumps(app_test_skl.DisagreeingClassifier())},
+        data=app_test_skl.get_conf()['binary']
+    )
+    response_1 = client.get(
+        url=conf.get_config().API_V2_STR + '/models' + f'/{model.id}')
+
+    assert response.status_code == 201
+    assert response_1.json()['metadata'][conf.get_config().RUNTIME_OPTIONS_FIELD]['scoring_mode'] == 'two_pass'
+
+
 def test_add_non_compatible_binary(
         db: saorm.Session,
         client: tstc.TestClient
@@ -300,3 +353,63 @@ def test_download_binary(
     assert resp.content == str.encode(model_content)
     # filename
     assert re.findall("filename=\"(.+)\"", resp.headers['content-disposition'])[0] == 'scorecard.pmml'
+
+
+def test_onnx_metadata_and_download(
+        client: tstc.TestClient
+) -> typ.NoReturn:
+    # When
+    model_content = app_test_onnx.get_classifier()
+    model = client.post(
+        url='/upload',
+        data={'format': 'onnx'},
+        files={'file': ('classifier.onnx', model_content)}).json()
+    model_id = model['id']
+    metadata = client.get(url=f'/models/{model_id}/metadata')
+    download = client.get(url=f'/models/{model_id}/download')
+
+    # Assert
+    assert metadata.ok
+    assert metadata.json() == {'modelPackage': 'onnx', 'modelType': 'other'}
+    assert download.ok
+    assert download.content == model_content
+    assert re.findall("filename=\"(.+)\"", download.headers['content-disposition'])[0] == 'classifier.onnx'
+
+
+def test_download_conditional_and_range(
+        client: tstc.TestClient
+) -> typ.NoReturn:
+    # When
+    model_content = app_test_pmml.get_pmml_scorecard_file().read_bytes()
+    model = client.post(
+        url='/upload',
+        files={'file': ('scorecard.pmml', model_content)}).json()
+    url = f'/models/{model["id"]}/download'
+    identity = client.get(url=url, headers={'Accept-Encoding': 'identity'})
+    compressed = client.get(url=url, headers={'Accept-Encoding': 'gzip'})
+    not_modified = client.get(
+        url=url, headers={'Accept-Encoding': 'identity', 'If-None-Match': identity.headers['etag']})
+    partial = client.get(url=url, headers={'Range': 'bytes=10-19'})
+    suffix = client.get(url=url, headers={'Range': 'bytes=-5'})
+    changed = client.get(url=url, headers={'Accept-Encoding': 'identity', 'Range': 'bytes=10-19', 'If-Range': '"x"'})
+    unsatisfiable = client.get(url=url, headers={'Range': f'bytes={len(model_content)}-'})
+
+    # Assert
+    assert identity.content == model_content
+    assert identity.headers['etag'] == '"%s"' % hashlib.sha256(model_content).hexdigest()
+    assert identity.headers['content-length'] == str(len(model_content))
+    assert 'content-encoding' not in identity.headers
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert compressed.content == model_content
+    assert compressed.headers['etag'] != identity.headers['etag']
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert partial.status_code == 206
+    assert partial.content == model_content[10:20]
+    assert partial.headers['content-range'] == f'bytes 10-19/{len(model_content)}'
+    assert suffix.status_code == 206
+    assert suffix.content == model_content[-5:]
+    assert changed.status_code == 200
+    assert changed.content == model_content
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers['content-range'] == f'bytes */{len(model_content)}'
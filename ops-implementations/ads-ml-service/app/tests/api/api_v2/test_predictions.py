@@ -20,9 +20,13 @@ import typing as typ
 import fastapi.testclient as tstc
 import pytest
 
+import sqlalchemy.orm as saorm
+
 import app.core.configuration as app_conf
 import app.core.uri as app_uri
+import app.crud as app_crud
 import app.models as app_models
+import app.schemas as app_schemas
 
 
 @pytest.mark.parametrize(
@@ -171,3 +175,253 @@ def test_prediction_with_additional_info(
     assert response.status_code == 404
     assert response.json().get('detail') is not None
     assert 'model not found' in response.json().get('detail')
+
+
+def test_identity_columnar_prediction(
+        client: tstc.TestClient,
+        identity_endpoint: app_models.Endpoint
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    response = client.post(
+        url=app_conf.get_config().API_V2_STR + '/predictions/columnar',
+        json={
+            'columns': ['y', 'x'],
+            'data': {'x': [0.5, 10, -1], 'y': ['a', 'b', 'c']},
+            'target': [
+                {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                    resource_type='endpoints', resource_id=identity_endpoint.id)}
+            ]
+        }
+    )
+
+    assert response.status_code == 200
+    assert response.json()['result'] == {'y': ['a', 'b', 'c'], 'x': [0.5, 10, -1]}
+
+
+def test_skl_columnar_prediction(
+        client: tstc.TestClient,
+        skl_endpoint
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    response = client.post(
+        url=app_conf.get_config().API_V2_STR + '/predictions/columnar',
+        json={
+            'data': {'x': [0.5, 0.1, 0.9], 'y': [0.5, 0.2, 0.3]},
+            'target': [
+                {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                    resource_type='endpoints', resource_id=skl_endpoint.id)}
+            ]
+        }
+    )
+    content = response.json()
+
+    assert response.status_code == 200
+    assert len(content['result']['predictions']) == 3
+    assert len(content['result']['scores']) == 3
+
+
+@pytest.mark.parametrize(
+    'data',
+    [
+        {},
+        {'x': [0.5, 0.1], 'y': [0.5]},
+        {'x': [], 'y': []},
+        {'x': 0.5, 'y': 0.5},
+    ]
+)
+def test_columnar_prediction_invalid_data(
+        client: tstc.TestClient,
+        skl_endpoint,
+        data: typ.Dict[typ.Text, typ.Any]
+) -> typ.NoReturn:
+    response = client.post(
+        url=app_conf.get_config().API_V2_STR + '/predictions/columnar',
+        json={
+            'data': data,
+            'target': [
+                {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                    resource_type='endpoints', resource_id=skl_endpoint.id)}
+            ]
+        }
+    )
+
+    assert response.status_code == 422
+
+
+def test_micro_batched_prediction(
+        client: tstc.TestClient,
+        db: saorm.Session,
+        identity_endpoint: app_models.Endpoint
+) -> typ.NoReturn:
+    import app.runtime.batching as app_batching
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    app_batching.batchers.clear()
+    model_config = app_crud.model_config.get(db, id=identity_endpoint.id)
+    app_crud.model_config.update(db, db_obj=model_config, obj_in=app_schemas.ModelConfigUpdate(configuration={
+        **model_config.configuration,
+        'metadata': {app_cache.RUNTIME_OPTIONS_FIELD: {'micro_batching': {'enabled': True, 'max_wait_ms': 1}}}
+    }))
+
+    responses = [
+        client.post(
+            url=app_conf.get_config().API_V2_STR + '/predictions',
+            json={
+                'parameters': [{'name': 'x', 'value': i}, {'name': 'y', 'value': 'good'}],
+                'target': [
+                    {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                        resource_type='endpoints', resource_id=identity_endpoint.id)}
+                ]
+            }
+        ) for i in range(3)
+    ]
+    metrics = client.get(url=app_conf.get_config().API_V2_STR + '/metrics').json()
+
+    assert [response.json()['result'] for response in responses] == [{'x': i, 'y': 'good'} for i in range(3)]
+    # the first prediction loads the model, following ones are batched
+    assert metrics['micro_batching'][str(identity_endpoint.id)]['requests'] == 2
+
+
+@pytest.mark.parametrize('micro_batching', [False, True])
+def test_prediction_empty_parameters(
+        client: tstc.TestClient,
+        db: saorm.Session,
+        identity_endpoint: app_models.Endpoint,
+        micro_batching: bool
+) -> typ.NoReturn:
+    import app.runtime.batching as app_batching
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    app_batching.batchers.clear()
+    model_config = app_crud.model_config.get(db, id=identity_endpoint.id)
+    app_crud.model_config.update(db, db_obj=model_config, obj_in=app_schemas.ModelConfigUpdate(configuration={
+        **model_config.configuration,
+        'metadata': {app_cache.RUNTIME_OPTIONS_FIELD: {'micro_batching': {'enabled': micro_batching}}}
+    }))
+    body = {
+        'parameters': [],
+        'target': [
+            {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                resource_type='endpoints', resource_id=identity_endpoint.id)}
+        ]
+    }
+
+    # the second request finds the loaded model and is batched
+    responses = [client.post(url=app_conf.get_config().API_V2_STR + '/predictions', json=body) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [422, 422]
+    assert responses[1].json() == {'detail': 'Parameters are empty'}
+
+
+def test_cached_prediction(
+        client: tstc.TestClient,
+        db: saorm.Session,
+        identity_endpoint: app_models.Endpoint
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    import app.runtime.result_cache as app_result_cache
+    app_cache.cache.clear()
+    app_result_cache.result_caches.clear()
+    model_config = app_crud.model_config.get(db, id=identity_endpoint.id)
+    app_crud.model_config.update(db, db_obj=model_config, obj_in=app_schemas.ModelConfigUpdate(configuration={
+        **model_config.configuration,
+        'metadata': {app_cache.RUNTIME_OPTIONS_FIELD: {'result_cache': {'enabled': True}}}
+    }))
+
+    def post(x: typ.Any) -> typ.Dict[typ.Text, typ.Any]:
+        return client.post(
+            url=app_conf.get_config().API_V2_STR + '/predictions',
+            json={
+                'parameters': [{'name': 'x', 'value': x}, {'name': 'y', 'value': 'good'}],
+                'target': [
+                    {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                        resource_type='endpoints', resource_id=identity_endpoint.id)}
+                ]
+            }
+        ).json()
+
+    # the first prediction loads the model, the second is a miss
+    results = [post(1), post(1), post(1), post(1.0), post(True)]
+    metrics = client.get(url=app_conf.get_config().API_V2_STR + '/metrics').json()
+
+    assert [result['result']['x'] for result in results] == [1, 1, 1, 1.0, True]
+    assert metrics['result_cache'][str(identity_endpoint.id)]['hits'] == 1
+    assert metrics['result_cache'][str(identity_endpoint.id)]['misses'] == 3
+    assert metrics['result_cache'][str(identity_endpoint.id)]['size'] == 3
+
+    # manage routes invalidate cached results
+    client.patch(
+        url=app_conf.get_config().API_V2_STR + f'/models/{identity_endpoint.id}', json={'version': 'v2'})
+    metrics = client.get(url=app_conf.get_config().API_V2_STR + '/metrics').json()
+
+    assert str(identity_endpoint.id) not in metrics['result_cache']
+    assert app_cache.cache.peek(identity_endpoint.id) is None
+
+
+@pytest.mark.parametrize(
+    'body',
+    [
+        {'parameters': [{'name': 'x', 'value': 0.5}, {'name': 'y', 'value': 'good'}]},
+        {'parameters': [[{'name': 'x', 'value': 1}, {'name': 'y', 'value': True}]] * 2},
+        {'parameters': [{'name': 'x', 'value': [1]}, {'name': 'y', 'value': 'good'}]},
+        {'parameters': [{'name': 'x'}, {'name': 'y', 'value': 'good'}]},
+        {'parameters': {'name': 'x', 'value': 1}},
+        {'parameters': [[{'name': 'x', 'value': 1}], {'value': 1}]},
+        {},
+        [],
+    ]
+)
+def test_fast_request_decoding(
+        client: tstc.TestClient,
+        identity_endpoint: app_models.Endpoint,
+        monkeypatch: pytest.MonkeyPatch,
+        body: typ.Any
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    if isinstance(body, typ.Dict):
+        body['target'] = [{'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+            resource_type='endpoints', resource_id=identity_endpoint.id)}]
+
+    default = client.post(url=app_conf.get_config().API_V2_STR + '/predictions', json=body)
+    monkeypatch.setattr(app_conf.get_config(), 'FAST_REQUEST_DECODING', True)
+    fast = client.post(url=app_conf.get_config().API_V2_STR + '/predictions', json=body)
+
+    assert fast.status_code == default.status_code
+    assert fast.json() == default.json()
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_prediction_body_like_fastapi(
+        client: tstc.TestClient,
+        identity_endpoint: app_models.Endpoint,
+        monkeypatch: pytest.MonkeyPatch,
+        fast: bool
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    monkeypatch.setattr(app_conf.get_config(), 'FAST_REQUEST_DECODING', fast)
+    url = app_conf.get_config().API_V2_STR + '/predictions'
+    target = '[{"rel": "endpoint", "href": "%s"}]' % app_uri.TEMPLATE.format(
+        resource_type='endpoints', resource_id=identity_endpoint.id)
+
+    # accepted by the json module, not by orjson
+    not_a_number = client.post(url=url, data='{"parameters": [{"name": "x", "value": NaN}], "target": %s}' % target)
+    text = client.post(
+        url=url, data='{"parameters": [{"name": "x", "value": 1}], "target": %s}' % target,
+        headers={'Content-Type': 'text/plain'})
+
+    assert not_a_number.status_code == 200
+    # not read as json by fastapi
+    assert text.status_code == 422
+
+
+def test_prediction_invalid_json(
+        client: tstc.TestClient
+) -> typ.NoReturn:
+    response = client.post(url=app_conf.get_config().API_V2_STR + '/predictions', data=b'{"target": ')
+
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 11]
@@ -20,11 +20,13 @@ import typing as typ
 import pickle
 
 import fastapi.testclient as tstc
+import pytest
 import sqlalchemy.orm as saorm
 
 import app.core.configuration as app_conf
 import app.core.configuration as conf
 import app.core.uri as app_uri
+import app.tests.predictors.onnx.model as app_test_onnx
 import app.tests.predictors.pmml_sample.model as app_test_pmml
 import app.tests.predictors.scikit_learn.model as app_test_sklearn
 
@@ -107,3 +109,72 @@ def test_add_pickle(
 
     assert model_creation_resp.status_code == 201
     assert model_creation_resp.json()['name'] == 'model'
+
+
+def test_add_onnx(
+        db: saorm.Session,
+        client: tstc.TestClient
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    app_cache.cache.clear()
+    model_creation_resp = client.post(
+        url=conf.get_config().API_V2_STR + '/upload',
+        files={'file': ('regressor.onnx', app_test_onnx.get_regressor())}
+    )
+    model_json = model_creation_resp.json()
+
+    prediction_resp = client.post(
+        url=app_conf.get_config().API_V2_STR + '/predictions',
+        json={
+            'parameters': [{'name': 'y', 'value': 2}, {'name': 'x', 'value': 1.5}],
+            'target': [
+                {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                    resource_type='endpoints', resource_id=model_json['id'])}
+            ]
+        }
+    )
+
+    assert model_creation_resp.status_code == 201
+    assert model_json['name'] == 'regressor'
+    assert [(feature['name'], feature['type']) for feature in model_json['input_schema']] == [
+        ('x', 'float32'), ('y', 'int64')]
+    assert prediction_resp.status_code == 200
+    assert prediction_resp.json()['result']['predictions'] == 5.0
+
+
+def test_uploaded_model_is_loaded_once(
+        db: saorm.Session,
+        client: tstc.TestClient,
+        monkeypatch: pytest.MonkeyPatch
+) -> typ.NoReturn:
+    import app.runtime.cache as app_cache
+    import app.runtime.wrapper as app_runtime_wrapper
+    app_cache.cache.clear()
+    loads = []
+    load = app_runtime_wrapper.ONNXFormat.load
+    monkeypatch.setattr(
+        app_runtime_wrapper.ONNXFormat, 'load',
+        staticmethod(lambda *args, **kwargs: loads.append(1) or load(*args, **kwargs)))
+    model_creation_resp = client.post(
+        url=conf.get_config().API_V2_STR + '/upload',
+        files={'file': ('regressor.onnx', app_test_onnx.get_regressor())}
+    )
+    model_id = model_creation_resp.json()['id']
+    cached = app_cache.cache.peek(int(model_id))
+
+    prediction_resp = client.post(
+        url=app_conf.get_config().API_V2_STR + '/predictions',
+        json={
+            'parameters': [{'name': 'y', 'value': 2}, {'name': 'x', 'value': 1.5}],
+            'target': [
+                {'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                    resource_type='endpoints', resource_id=model_id)}
+            ]
+        }
+    )
+
+    assert model_creation_resp.status_code == 201
+    assert prediction_resp.status_code == 200
+    assert cached is not None
+    assert app_cache.cache.peek(int(model_id)) is cached
+    assert len(loads) == 1
@@ -15,6 +15,7 @@
 #
 
 
+import sqlalchemy
 from sqlalchemy.orm import Session
 
 from ....core.configuration import get_config
@@ -54,3 +55,28 @@ def test_update_users_me(
     authenticated_user_1 = crud.user.authenticate(db, username='toto', password='toto')
     assert authenticated_user_1 is not None
     assert authenticated_user_1.id == response.json()['id']
+
+
+def test_get_users_me_from_token_cache(
+    db: Session,
+    client: TestClient,
+    user_token_header
+):
+    statements = []
+
+    def executed(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.get_bind(), 'before_cursor_execute', executed)
+    try:
+        response = client.get(f'{get_config().API_V2_STR}/users/me', headers=user_token_header)
+    finally:
+        sqlalchemy.event.remove(db.get_bind(), 'before_cursor_execute', executed)
+    client.put(f'{get_config().API_V2_STR}/users/me', headers=user_token_header, json={'username': 'toto'})
+    updated = client.get(f'{get_config().API_V2_STR}/users/me', headers=user_token_header)
+
+    assert response.status_code == 200
+    assert response.json()['username'] == get_config().USERNAME_TEST_USER
+    # the user was cached by the login
+    assert statements == []
+    assert updated.json() == {'id': response.json()['id'], 'username': 'toto'}
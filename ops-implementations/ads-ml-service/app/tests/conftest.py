@@ -35,6 +35,8 @@ import app.tests.utils.user as app_tests_user
 @pytest.fixture
 def db(tmp_path) -> typing.Iterable[sqlalchemy_orm.Session]:
     os.environ['MODEL_STORAGE'] = str(tmp_path.resolve())
+    # the configuration is read once, workers would poll the database of the first test
+    os.environ['MODEL_CACHE_SYNC_INTERVAL'] = '0'
     engine = sqlalchemy.create_engine(
         f'sqlite:///{tmp_path.resolve().joinpath("test.db")}', connect_args={"check_same_thread": False})
     app_db_base.Base.metadata.create_all(bind=engine)
@@ -72,12 +74,22 @@ def client(db, tmp_path, test_upload_size_limit) -> typing.Iterable[fastapi_test
     def _db_override():
         return db
 
+    def _lazy_db_override():
+        return app_db_session.LazySession(_db_override)
+
     import app.main as app_main
     import app.api.deps as app_api_deps
+    import app.db.session as app_db_session
+    import app.runtime.discovery_cache as app_discovery_cache
+    import app.runtime.token_cache as app_token_cache
 
+    # pages and users of the database of a previous test
+    app_discovery_cache.pages.clear()
+    app_token_cache.tokens.clear()
     app = app_main.get_app()
 
     app.dependency_overrides[app_api_deps.get_db] = _db_override
+    app.dependency_overrides[app_api_deps.get_lazy_db] = _lazy_db_override
 
     with fastapi_testclient.TestClient(app) as c:
         yield c
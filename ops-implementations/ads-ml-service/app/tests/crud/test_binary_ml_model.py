@@ -15,6 +15,7 @@
 #
 
 
+import hashlib
 import pickle
 import typing
 
@@ -91,6 +92,34 @@ def test_get_binary_ml_model_by_endpoint(
     assert binary_1.format == binary_create.format
 
 
+def test_get_binary_ml_model_with_configuration(
+        db: orm.Session,
+        endpoint_in_db: models.Endpoint,
+        model_config_create: schemas.ModelConfigCreate
+) -> typing.NoReturn:
+    predictor = app.tests.predictors.scikit_learn.model.get_classification_predictor()
+    binary_create = schemas.BinaryMlModelCreate(
+        model_b64=pickle.dumps(predictor),
+        input_data_structure=mapping.ModelInput.DATAFRAME,
+        output_data_structure=mapping.ModelOutput.NUMPY_ARRAY,
+        format=mapping.ModelWrapper.JOBLIB
+    )
+    crud.binary_ml_model.create_with_endpoint(db, obj_in=binary_create, endpoint_id=endpoint_in_db.id)
+
+    # no configuration
+    assert crud.binary_ml_model.get_with_configuration(db, endpoint_id=endpoint_in_db.id) is None
+
+    crud.model_config.create_with_model(db, obj_in=model_config_create, model_id=endpoint_in_db.id)
+    binary = crud.binary_ml_model.get_with_configuration(db, endpoint_id=endpoint_in_db.id)
+
+    assert binary.hash == hashlib.sha256(binary_create.model_b64).hexdigest()
+    assert binary.size == len(binary_create.model_b64)
+    assert binary.input_data_structure == binary_create.input_data_structure
+    assert binary.output_data_structure == binary_create.output_data_structure
+    assert binary.format == binary_create.format
+    assert binary.version == 0
+    assert binary.configuration == model_config_create.configuration
+
 def test_delete_binary_ml_model(
         db: orm.Session,
         endpoint_in_db: models.Endpoint
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# Copyright 2020 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import datetime as dt
+import pickle
+import typing
+
+import sqlalchemy.orm as orm
+
+import app.crud as crud
+import app.models as models
+import app.schemas as schemas
+import app.schemas.binary_config as mapping
+import app.tests.predictors.scikit_learn.model
+
+
+def test_publish_endpoint_change(db: orm.Session, endpoint_in_db: models.Endpoint) -> typing.NoReturn:
+    binary = crud.binary_ml_model.create_with_endpoint(
+        db,
+        obj_in=schemas.BinaryMlModelCreate(
+            model_b64=pickle.dumps(app.tests.predictors.scikit_learn.model.get_classification_predictor()),
+            input_data_structure=mapping.ModelInput.DATAFRAME,
+            output_data_structure=mapping.ModelOutput.NUMPY_ARRAY,
+            format=mapping.ModelWrapper.JOBLIB),
+        endpoint_id=endpoint_in_db.id)
+    assert binary.version == 0
+
+    first = crud.endpoint_change.publish(db, endpoint_id=endpoint_in_db.id, retention_seconds=60)
+    second = crud.endpoint_change.publish(db, endpoint_id=endpoint_in_db.id + 1, retention_seconds=60)
+    db.refresh(binary)
+
+    assert binary.version == first
+    assert [change.endpoint_id for change in crud.endpoint_change.get_since(db, after=0)] == \
+           [endpoint_in_db.id, endpoint_in_db.id + 1]
+    assert [change.id for change in crud.endpoint_change.get_since(db, after=first)] == [second]
+
+
+def test_prune_endpoint_changes(db: orm.Session) -> typing.NoReturn:
+    db.add(models.EndpointChange(endpoint_id=1, changed_at=dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(hours=2)))
+    db.commit()
+
+    change = crud.endpoint_change.publish(db, endpoint_id=2, retention_seconds=3600)
+
+    assert [c.id for c in crud.endpoint_change.get_since(db, after=0)] == [change]
+
+
+def test_record_endpoint_change(db: orm.Session, endpoint_in_db: models.Endpoint) -> typing.NoReturn:
+    version = crud.endpoint_change.record(db, endpoint_id=endpoint_in_db.id, retention_seconds=60)
+    # committed with the change recorded before it
+    binary = crud.binary_ml_model.create_with_endpoint(
+        db,
+        obj_in=schemas.BinaryMlModelCreate(
+            model_b64=pickle.dumps(app.tests.predictors.scikit_learn.model.get_classification_predictor()),
+            input_data_structure=mapping.ModelInput.DATAFRAME,
+            output_data_structure=mapping.ModelOutput.NUMPY_ARRAY,
+            format=mapping.ModelWrapper.JOBLIB),
+        endpoint_id=endpoint_in_db.id)
+
+    assert binary.version == version
+    assert [change.id for change in crud.endpoint_change.get_since(db, after=0)] == [version]
+
+    crud.endpoint_change.record(db, endpoint_id=endpoint_in_db.id, retention_seconds=60)
+    db.rollback()
+    assert [change.id for change in crud.endpoint_change.get_since(db, after=0)] == [version]
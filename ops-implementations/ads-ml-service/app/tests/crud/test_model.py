@@ -72,3 +72,19 @@ def test_cascade_delete_with_endpoint(db: orm.Session, model_in_db: models.Endpo
     endpoint_1 = crud.endpoint.get(db, id=endpoint.id)
 
     assert endpoint_1 is None
+
+
+def test_row_count(db: orm.Session, model_create: schemas.ModelCreate) -> typing.NoReturn:
+    count = crud.row_count.get_count(db, mapped=models.Model)
+    model = crud.model.create(db, obj_in=model_create)
+    created = crud.row_count.get_count(db, mapped=models.Model)
+    crud.endpoint.create_with_model(db, obj_in=schemas.EndpointCreate(name='endpoint'), model=model)
+    endpoints = crud.row_count.get_count(db, mapped=models.Endpoint)
+    # the endpoint is deleted by cascade
+    crud.model.delete(db, id=model.id)
+
+    assert created == count + 1
+    assert crud.row_count.get_count(db, mapped=models.Model) == count
+    assert crud.row_count.get_count(db, mapped=models.Endpoint) == endpoints - 1
+    assert crud.row_count.get_count(db, mapped=models.Model) == db.query(models.Model).count()
+    assert crud.row_count.get_count(db, mapped=models.Endpoint) == db.query(models.Endpoint).count()
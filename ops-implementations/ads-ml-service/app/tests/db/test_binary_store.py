@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import hashlib
+import os
+import pathlib
+import time
+import typing
+
+import pytest
+import sqlalchemy.orm as orm
+
+import app.crud as crud
+import app.db.binary_store as app_binary_store
+import app.schemas as schemas
+import app.schemas.binary_config as app_binary_config
+import app.schemas.impl as impl
+
+
+def test_local_binary_store(tmp_path: pathlib.Path):
+    store = app_binary_store.LocalBinaryStore(tmp_path)
+    key = store.put(b'model')
+
+    assert key == hashlib.sha256(b'model').hexdigest()
+    assert store.put(b'model') == key
+    assert list(store.keys()) == [key]
+    assert store.read(key) == b'model'
+    assert b''.join(store.chunks(key, chunk_size=2)) == b'model'
+    assert list(store.chunks(key, start=1, length=3, chunk_size=2)) == [b'od', b'e']
+    assert b''.join(store.chunks(key, start=3)) == b'el'
+    with pytest.raises(FileNotFoundError):
+        store.read(hashlib.sha256(b'other').hexdigest())
+    with pytest.raises(FileNotFoundError):
+        store.chunks(hashlib.sha256(b'other').hexdigest())
+
+
+def test_prune(tmp_path: pathlib.Path):
+    store = app_binary_store.LocalBinaryStore(tmp_path)
+    referenced, old, recent = store.put(b'referenced'), store.put(b'old'), store.put(b'recent')
+    an_hour_ago = time.time() - 3600
+    for key in (referenced, old):
+        os.utime(store.path(key), (an_hour_ago, an_hour_ago))
+
+    assert store.prune({referenced}, grace_seconds=60) == 1
+    assert set(store.keys()) == {referenced, recent}
+
+
+def test_binary_is_read_on_access(db: orm.Session, monkeypatch: pytest.MonkeyPatch):
+    endpoint_in_db = crud.endpoint.create_with_model(
+        db, obj_in=schemas.EndpointCreate(name='endpoint'), model=crud.model.create(db, obj_in=schemas.ModelCreate()))
+    crud.binary_ml_model.create_with_endpoint(db, obj_in=schemas.BinaryMlModelCreate(
+        model_b64=b'model',
+        input_data_structure=app_binary_config.ModelInput.AUTO,
+        output_data_structure=app_binary_config.ModelOutput.AUTO,
+        format=app_binary_config.ModelWrapper.PICKLE
+    ), endpoint_id=endpoint_in_db.id)
+    binary = crud.binary_ml_model.get(db, id=endpoint_in_db.id)
+
+    assert binary.model_b64 == b'model'
+    assert binary.size == 5
+
+    def read(*_):
+        raise AssertionError('binary is read')
+
+    monkeypatch.setattr(app_binary_store.LocalBinaryStore, 'open', read)
+    db.expire_all()
+    assert impl.EndpointImpl.from_database(crud.endpoint.get(db, id=endpoint_in_db.id))['status'] == 'in_service'
+    crud.endpoint.delete(db, id=endpoint_in_db.id)
+    assert crud.binary_ml_model.get(db, id=endpoint_in_db.id) is None
+
+
+def test_incomplete_store_is_not_created():
+    class ReadOnlyStore(app_binary_store.BinaryStore):
+        def open(self, key: str) -> typing.BinaryIO:
+            raise FileNotFoundError(key)
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
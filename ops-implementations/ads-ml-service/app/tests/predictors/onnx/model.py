@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+#
+# Copyright 2020 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import onnx
+import onnx.helper as helper
+
+OPSETS = [helper.make_opsetid('', 13), helper.make_opsetid('ai.onnx.ml', 1)]
+
+
+def to_bytes(graph: onnx.GraphProto) -> bytes:
+    model = helper.make_model(graph, opset_imports=OPSETS, producer_name='ops-tests')
+    model.ir_version = 8
+    return model.SerializeToString()
+
+
+def get_classifier(zipmap: bool = True) -> bytes:
+    """Linear classifier of a 2D float tensor `input`: label `a` when x > y, `b` otherwise"""
+    labels = ['a', 'b']
+    nodes = [helper.make_node(
+        'LinearClassifier', ['input'], ['label', 'probabilities'], domain='ai.onnx.ml',
+        coefficients=[1.0, -1.0, -1.0, 1.0], intercepts=[0.0, 0.0], classlabels_strings=labels,
+        post_transform='SOFTMAX')]
+    if zipmap:
+        nodes.append(helper.make_node(
+            'ZipMap', ['probabilities'], ['output_probability'], domain='ai.onnx.ml', classlabels_strings=labels))
+        probability_map = onnx.TypeProto()
+        probability_map.map_type.key_type = onnx.TensorProto.STRING
+        probability_map.map_type.value_type.CopyFrom(helper.make_tensor_type_proto(onnx.TensorProto.FLOAT, []))
+        probabilities = helper.make_value_info('output_probability', helper.make_sequence_type_proto(probability_map))
+    else:
+        probabilities = helper.make_tensor_value_info('probabilities', onnx.TensorProto.FLOAT, [None, 2])
+    return to_bytes(helper.make_graph(
+        nodes, 'classifier',
+        [helper.make_tensor_value_info('input', onnx.TensorProto.FLOAT, [None, 2])],
+        [helper.make_tensor_value_info('label', onnx.TensorProto.STRING, [None]), probabilities]))
+
+
+def get_regressor() -> bytes:
+    """Regression of one tensor per feature `x` (float) and `y` (int64): 2x + y"""
+    return to_bytes(helper.make_graph(
+        [
+            helper.make_node('Cast', ['y'], ['y_float'], to=onnx.TensorProto.FLOAT),
+            helper.make_node('Concat', ['x', 'y_float'], ['features'], axis=1),
+            helper.make_node('MatMul', ['features', 'coefficients'], ['variable'])
+        ],
+        'regressor',
+        [
+            helper.make_tensor_value_info('x', onnx.TensorProto.FLOAT, [None, 1]),
+            helper.make_tensor_value_info('y', onnx.TensorProto.INT64, [None, 1])
+        ],
+        [helper.make_tensor_value_info('variable', onnx.TensorProto.FLOAT, [None, 1])],
+        [helper.make_tensor('coefficients', onnx.TensorProto.FLOAT, [2, 1], [2.0, 1.0])]))
@@ -21,7 +21,10 @@ import typing
 import numpy as np
 import pandas as pd
 import yaml
+from sklearn import datasets as skl_datasets
 from sklearn import ensemble as skl_ensemble
+from sklearn import svm as skl_svm
+from sklearn import tree as skl_tree
 
 from app.tests.utils import utils as app_utils
 
@@ -31,6 +34,23 @@ def get_conf() -> typing.Dict[typing.Text, typing.Any]:
         return yaml.safe_load(fd)
 
 
+class DisagreeingClassifier(skl_tree.DecisionTreeClassifier):
+    """Tree classifier whose predict and predict_proba do not agree on the label"""
+    classes_ = np.array(['a', 'b'])
+
+    def predict(self, x) -> np.ndarray:
+        return np.array(['a'] * len(x))
+
+    def predict_proba(self, x) -> np.ndarray:
+        return np.array([[0.2, 0.8]] * len(x))
+
+
+def get_svc_predictor() -> typing.Tuple[skl_svm.SVC, np.ndarray]:
+    """SVC with Platt scaling and its training rows, predict is not the argmax of predict_proba on some of them"""
+    x, y = skl_datasets.make_classification(n_samples=200, flip_y=0.3, random_state=0)
+    return skl_svm.SVC(probability=True, random_state=0).fit(x, y), x
+
+
 def get_classification_predictor() -> skl_ensemble.RandomForestClassifier:
     classifier = skl_ensemble.RandomForestClassifier(random_state=42)
     x_random = pd.DataFrame(data=np.random.rand(10, 2), columns=['x', 'y'])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import hashlib
+import os
+import pathlib
+import pickle
+import stat
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import sklearn.ensemble as skl_ensemble
+import sklearn.neighbors as skl_neighbors
+import sqlalchemy.orm as sqlalchemy_orm
+
+import app.runtime.artifacts as app_artifacts
+import app.runtime.footprint as app_footprint
+import app.runtime.tree_ensembles as app_tree_ensembles
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.runtime_config as app_runtime_config
+
+RNG = np.random.default_rng(42)
+FEATURES = pd.DataFrame(RNG.random((300, 3)), columns=['x', 'y', 'z'])
+LABELS = FEATURES['x'] > FEATURES['y']
+
+
+def test_memory_mapped_model(tmp_path: pathlib.Path):
+    model = skl_neighbors.KNeighborsClassifier(n_neighbors=3).fit(FEATURES, LABELS)
+    binary = pickle.dumps(model)
+    store = app_artifacts.ArtifactStore(tmp_path)
+    built = []
+
+    def build():
+        built.append(True)
+        return pickle.loads(binary)
+
+    loaded = store.load(binary, 'model', build)
+    mapped = store.load(binary, 'model', build)
+
+    assert len(built) == 1
+    assert [path.name for path in tmp_path.iterdir()] == [store.path(binary, 'model').name]
+    assert isinstance(mapped._fit_X, np.memmap) and not mapped._fit_X.flags.writeable
+    assert np.array_equal(mapped.predict(FEATURES), model.predict(FEATURES))
+    assert np.array_equal(loaded.predict(FEATURES), model.predict(FEATURES))
+
+
+def test_deferred_original_model(tmp_path: pathlib.Path):
+    model = skl_ensemble.RandomForestClassifier(n_estimators=5, random_state=0).fit(FEATURES, LABELS)
+    binary = pickle.dumps(model)
+    store = app_artifacts.ArtifactStore(tmp_path)
+
+    mapped = store.load(binary, 'compiled', lambda: app_tree_ensembles.compile_model(pickle.loads(binary), 10))
+    deferred = mapped.original
+
+    assert isinstance(mapped, app_tree_ensembles.CompiledClassifier)
+    assert isinstance(deferred, app_artifacts.DeferredModel)
+    assert isinstance(mapped.table.threshold, np.memmap)
+    assert np.array_equal(mapped.predict_proba(FEATURES.iloc[:10]), model.predict_proba(FEATURES.iloc[:10]))
+    assert np.array_equal(mapped.classes_, model.classes_)
+    # the original model is only loaded for inputs the compiled model does not handle
+    assert deferred.__dict__['__model__'] is None
+    assert np.array_equal(mapped.predict(FEATURES), model.predict(FEATURES))
+    assert isinstance(deferred.__dict__['__model__'], skl_ensemble.RandomForestClassifier)
+
+
+def test_corrupted_artifact(tmp_path: pathlib.Path):
+    model = skl_neighbors.KNeighborsClassifier(n_neighbors=3).fit(FEATURES, LABELS)
+    binary = pickle.dumps(model)
+    store = app_artifacts.ArtifactStore(tmp_path)
+    store.path(binary, 'model').write_bytes(b'truncated')
+
+    assert np.array_equal(store.load(binary, 'model', lambda: pickle.loads(binary)).predict(FEATURES),
+                          model.predict(FEATURES))
+    assert isinstance(store.load(binary, 'model', lambda: None)._fit_X, np.memmap)
+
+
+def test_executor_memory_mapping(db: sqlalchemy_orm.Session):
+    model = skl_ensemble.RandomForestClassifier(n_estimators=50, random_state=0).fit(FEATURES, LABELS)
+    binary = pickle.dumps(model)
+    compilation = app_runtime_config.TreeCompilation(enabled=True)
+    in_memory = app_runtime_wrapper.ModelInvocationExecutor(
+        model=binary, options=app_runtime_config.RuntimeOptions(tree_compilation=compilation))
+    mapped = app_runtime_wrapper.ModelInvocationExecutor(
+        model=binary, options=app_runtime_config.RuntimeOptions(memory_mapping=True, tree_compilation=compilation))
+
+    assert app_artifacts.get_store().path(binary, 'compiled-64').exists()
+    # mapped arrays are shared with other workers
+    assert app_footprint.estimate(mapped, len(binary)) < app_footprint.estimate(in_memory, len(binary)) / 10
+    assert np.array_equal(mapped.loaded_model.predict(FEATURES), model.predict(FEATURES))
+
+
+def test_private_directory(tmp_path: pathlib.Path):
+    directory = app_artifacts.private_directory(tmp_path / 'artifacts')
+
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o700
+    assert app_artifacts.private_directory(directory) == directory
+    # a directory other users can write may hold artifacts they crafted
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        app_artifacts.private_directory(shared)
+    link = tmp_path / 'link'
+    link.symlink_to(directory)
+    with pytest.raises(PermissionError):
+        app_artifacts.private_directory(link)
+
+
+def test_prune_artifacts(tmp_path: pathlib.Path):
+    store = app_artifacts.ArtifactStore(tmp_path)
+    referenced, old, recent = b'referenced', b'old', b'recent'
+    for binary in (referenced, old, recent):
+        store.write(store.path(binary, 'model'), binary)
+    store.write(tmp_path / store.path(old, 'compiled-64').name.replace('.joblib', '.original.joblib'), old)
+    an_hour_ago = time.time() - 3600
+    for path in tmp_path.iterdir():
+        if not path.name.startswith(hashlib.sha256(recent).hexdigest()):
+            os.utime(path, (an_hour_ago, an_hour_ago))
+
+    assert store.prune({hashlib.sha256(referenced).hexdigest()}, grace_seconds=60) == 2
+    assert {path.name for path in tmp_path.iterdir()} == \
+           {store.path(referenced, 'model').name, store.path(recent, 'model').name}
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import asyncio
+import pickle
+
+import fastapi
+import numpy as np
+import pytest
+
+import app.runtime.batching as app_runtime_batching
+import app.runtime.inference as app_runtime_inference
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.binary_config as app_binary_config
+import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
+import app.tests.predictors.identity.model as app_test_identity
+import app.tests.predictors.scikit_learn.model as app_test_skl
+
+class PositivePredictor(object):
+    def predict(self, x):
+        if (np.asarray(x) < 0).any():
+            raise ValueError('Negative feature')
+        return x
+
+
+INFERENCE = app_runtime_inference.InferenceExecutor(kind='thread', workers=2, queue_size=8, queue_timeout=1.0)
+
+
+def get_executor(predictor, output_type=app_binary_config.ModelOutput.AUTO):
+    return app_runtime_wrapper.ModelInvocationExecutor(
+        model=pickle.dumps(predictor),
+        input_type=app_binary_config.ModelInput.DATAFRAME,
+        output_type=output_type,
+        binary_format=app_binary_config.ModelWrapper.PICKLE,
+        options=app_runtime_config.RuntimeOptions(micro_batching={'enabled': True})
+    )
+
+
+def to_parameters(x, y):
+    return [app_schemas_impl.ParameterImpl(name='x', value=x), app_schemas_impl.ParameterImpl(name='y', value=y)]
+
+
+def test_predict_batch_matches_predict():
+    executor = get_executor(app_test_skl.get_classification_predictor())
+    requests = [
+        [to_parameters(0.1, 0.2)],
+        [to_parameters(0.3, 0.4), to_parameters(0.5, 0.6)],
+        [to_parameters(0.7, 0.8)]
+    ]
+
+    assert executor.predict_batch(requests) == [executor.predict(rows) for rows in requests]
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    executor = get_executor(app_test_identity.get_identity_predictor())
+    batcher = app_runtime_batching.MicroBatcher(1, executor, max_batch_size=4, max_wait_ms=50, executor=INFERENCE)
+
+    async def scenario():
+        return await asyncio.gather(*[batcher.predict(to_parameters(i, -i)) for i in range(10)])
+
+    results = asyncio.run(scenario())
+    stats = batcher.stats()
+
+    assert [result['result'] for result in results] == [{'x': i, 'y': -i} for i in range(10)]
+    assert stats['requests'] == 10
+    assert stats['batch_size_distribution'] == {2: 1, 4: 2}
+
+
+def test_micro_batcher_respects_max_batch_size():
+    executor = get_executor(app_test_identity.get_identity_predictor())
+    batcher = app_runtime_batching.MicroBatcher(1, executor, max_batch_size=4, max_wait_ms=50, executor=INFERENCE)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.predict([to_parameters(0, 0), to_parameters(1, 1), to_parameters(2, 2)]),
+            batcher.predict([to_parameters(3, 3), to_parameters(4, 4)]),
+            batcher.predict(to_parameters(5, 5)))
+
+    results = asyncio.run(scenario())
+
+    assert [result['result'] for result in results] == [
+        {'predictions': [{'x': i, 'y': i} for i in range(3)]},
+        {'predictions': [{'x': i, 'y': i} for i in range(3, 5)]},
+        {'x': 5, 'y': 5}]
+    # the second request is not added to the batch of the first one, which would then have 5 rows
+    assert batcher.stats()['batch_size_distribution'] == {1: 1, 2: 1}
+
+
+def test_micro_batcher_isolates_failing_request():
+    executor = get_executor(PositivePredictor())
+    batcher = app_runtime_batching.MicroBatcher(1, executor, max_batch_size=8, max_wait_ms=50, executor=INFERENCE)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.predict(to_parameters(1, 2)), batcher.predict(to_parameters(-1, 2)),
+            batcher.predict(to_parameters(3, 4)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert [result['result'] for result in (results[0], results[2])] == [{'x': 1, 'y': 2}, {'x': 3, 'y': 4}]
+    assert isinstance(results[1], Exception)
+
+
+def test_micro_batcher_rejects_empty_parameters():
+    executor = get_executor(app_test_identity.get_identity_predictor())
+    batcher = app_runtime_batching.MicroBatcher(1, executor, max_batch_size=8, max_wait_ms=10, executor=INFERENCE)
+
+    with pytest.raises(fastapi.HTTPException) as batched:
+        asyncio.run(batcher.predict([]))
+    with pytest.raises(fastapi.HTTPException) as direct:
+        executor.predict([])
+
+    assert batched.value.status_code == direct.value.status_code == 422
+    assert batched.value.detail == direct.value.detail
+
+
+def test_micro_batcher_separates_feature_orders():
+    executor = get_executor(app_test_identity.get_identity_predictor())
+    batcher = app_runtime_batching.MicroBatcher(1, executor, max_batch_size=8, max_wait_ms=10, executor=INFERENCE)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.predict(to_parameters(1, 2)),
+            batcher.predict(list(reversed(to_parameters(3, 4)))))
+
+    results = asyncio.run(scenario())
+
+    assert [result['result'] for result in results] == [{'x': 1, 'y': 2}, {'y': 4, 'x': 3}]
+    assert batcher.stats()['batch_size_distribution'] == {1: 2}
+
+
+def test_micro_batchers_reload():
+    batchers = app_runtime_batching.MicroBatchers()
+    executor = get_executor(app_test_identity.get_identity_predictor())
+
+    assert batchers.get(1, executor) is batchers.get(1, executor)
+    assert batchers.get(1, get_executor(app_test_identity.get_identity_predictor())).model is not executor
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+import datetime as dt
+
+import sqlalchemy.orm as orm
+
+KEY = ('/models', ())
+
+
+def test_pages_follow_generation(db: orm.Session):
+    import app.runtime.discovery_cache as app_discovery_cache
+    pages = app_discovery_cache.DiscoveryCache(max_size=8, ttl_seconds=60)
+    stale = pages.generation
+    pages.put(KEY, b'{"models": []}', stale)
+    changed_at = dt.datetime(2023, 1, 16, tzinfo=dt.timezone.utc)
+    pages.bump(changed_at)
+    # read from the database before the change
+    pages.put(KEY, b'{"models": []}', stale)
+
+    assert pages.get(KEY) is None
+    assert pages.modified_at == changed_at
+    page = pages.put(KEY, b'{"models": [{}]}', pages.generation)
+    assert pages.get(KEY) is page
+    assert page.etag == app_discovery_cache.Page(b'{"models": [{}]}', 0).etag
+    pages.bump(changed_at - dt.timedelta(days=1))
+    assert pages.get(KEY) is None
+    assert pages.modified_at == changed_at
+    assert pages.stats()['hits'] == 1
+
+
+def test_disabled_pages(db: orm.Session):
+    import app.runtime.discovery_cache as app_discovery_cache
+    pages = app_discovery_cache.DiscoveryCache(max_size=0, ttl_seconds=60)
+    page = pages.put(KEY, b'{}', pages.generation)
+
+    assert page.body == b'{}'
+    assert pages.get(KEY) is None
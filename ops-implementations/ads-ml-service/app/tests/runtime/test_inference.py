@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import asyncio
+import threading
+import time
+
+import fastapi
+import pytest
+
+import app.runtime.inference as app_runtime_inference
+
+
+def test_inference_executor_result():
+    executor = app_runtime_inference.InferenceExecutor(kind='thread', workers=1, queue_size=0, queue_timeout=1.0)
+    try:
+        assert asyncio.run(executor.submit(sum, [1, 2, 3])) == 6
+        assert executor.stats()['completed'] == 1
+        assert executor.stats()['pending'] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_inference_executor_rejects_when_queue_is_full():
+    executor = app_runtime_inference.InferenceExecutor(kind='thread', workers=1, queue_size=0, queue_timeout=1.0)
+    release = threading.Event()
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.submit(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(fastapi.HTTPException) as e:
+            await executor.submit(sum, [1])
+        release.set()
+        await blocking
+        return e.value
+
+    try:
+        error = asyncio.run(scenario())
+        assert error.status_code == 429
+        assert executor.stats()['rejected'] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_inference_executor_queue_timeout():
+    executor = app_runtime_inference.InferenceExecutor(kind='thread', workers=1, queue_size=1, queue_timeout=0.05)
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.submit(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(fastapi.HTTPException) as e:
+            await executor.submit(sum, [1])
+        await blocking
+        return e.value
+
+    try:
+        error = asyncio.run(scenario())
+        assert error.status_code == 503
+        assert executor.stats()['timed_out'] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_inference_executor_cancels_queued_prediction():
+    executor = app_runtime_inference.InferenceExecutor(kind='thread', workers=1, queue_size=1, queue_timeout=0.1)
+    release = threading.Event()
+    called = []
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.submit(release.wait, 5))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        with pytest.raises(fastapi.HTTPException) as e:
+            await executor.submit(called.append, 1)
+        elapsed = time.monotonic() - started
+        release.set()
+        await blocking
+        return e.value, elapsed
+
+    try:
+        error, elapsed = asyncio.run(scenario())
+        # answered while the worker is still busy
+        assert error.status_code == 503
+        assert elapsed < 1.0
+        assert called == []
+        assert executor.stats()['timed_out'] == 1
+        assert executor.stats()['pending'] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_inference_executor_http_error():
+    executor = app_runtime_inference.InferenceExecutor(kind='thread', workers=1, queue_size=0, queue_timeout=1.0)
+
+    def failing():
+        raise fastapi.HTTPException(status_code=500, detail='Empty prediction result.')
+
+    try:
+        with pytest.raises(fastapi.HTTPException) as e:
+            asyncio.run(executor.submit(failing))
+        assert e.value.status_code == 500
+        assert e.value.detail == 'Empty prediction result.'
+    finally:
+        executor.shutdown()
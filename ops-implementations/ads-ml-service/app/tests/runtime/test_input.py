@@ -17,9 +17,12 @@
 
 import typing
 
+import fastapi
+import numpy as np
 import pytest
 
 import app.runtime.input as app_runtime_input
+import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as app_schemas_impl
 
 HETEROGENEOUS = [
@@ -97,3 +100,159 @@ def test_to_dataframe(prediction_input, expected_output):
 
     assert df.columns.tolist() == names
     assert df.values.tolist() == expected_output
+
+
+@pytest.mark.parametrize(
+    ('columns', 'data', 'expected_output'),
+    [
+        (['x', 'y'], {'x': [0.5], 'y': [0.5]}, [[0.5, 0.5]]),
+        (['y', 'x'], {'x': [0.5, -0.1], 'y': ['bad', 'good']}, [['bad', 0.5], ['good', -0.1]]),
+        (['x'], {'x': [10, 11], 'y': [True, False]}, [[10], [11]]),
+    ]
+)
+def test_columnar_to_list(columns, data, expected_output):
+    assert app_runtime_input.columnar_to_list(columns, data) == expected_output
+
+
+@pytest.mark.parametrize(
+    ('columns', 'data', 'expected_output'),
+    [
+        (['x', 'y'], {'x': [0.5], 'y': [0.5]}, [[0.5, 0.5]]),
+        (['y', 'x'], {'x': [0.5, -0.1], 'y': [0.3, 0.2]}, [[0.3, 0.5], [0.2, -0.1]]),
+        (['x', 'y'], {'x': [10, 11], 'y': [1, 2]}, [[10, 1], [11, 2]]),
+    ]
+)
+def test_columnar_to_ndarray(columns, data, expected_output):
+    assert app_runtime_input.columnar_to_ndarray(columns, data).tolist() == expected_output
+
+
+def test_columnar_to_dataframe():
+    df = app_runtime_input.columnar_to_dataframe(['y', 'x'], {'x': [0.5, -0.1], 'y': ['bad', 'good']})
+
+    assert df.columns.tolist() == ['y', 'x']
+    assert df.values.tolist() == [['bad', 0.5], ['good', -0.1]]
+    assert df['x'].dtype == 'float64'
+
+
+SCHEMA = [
+    {'name': 'y', 'order': 1, 'type': 'str'},
+    {'name': 'x', 'order': 0, 'type': 'int'},
+    {'name': 'z', 'order': 2, 'type': 'bool'}
+]
+
+
+def test_feature_dtype():
+    assert app_runtime_input.feature_dtype('int') == np.int64
+    assert app_runtime_input.feature_dtype('float32') == np.float32
+    assert app_runtime_input.feature_dtype('double') == np.float64
+    assert app_runtime_input.feature_dtype('integer') == np.int64
+    assert app_runtime_input.feature_dtype('bool_') == np.bool_
+    assert app_runtime_input.feature_dtype('string') == np.dtype(object)
+    assert app_runtime_input.feature_dtype('datetime64') is None
+    assert app_runtime_input.feature_dtype('unknown') is None
+
+
+def test_compile_input_adapter():
+    adapter = app_runtime_input.InputAdapter.compile(SCHEMA)
+
+    assert adapter.names == ['x', 'y', 'z']
+    assert adapter.dtypes == [np.int64, np.dtype(object), np.bool_]
+    assert app_runtime_input.InputAdapter.compile(None) is None
+    assert app_runtime_input.InputAdapter.compile([{'name': 'x', 'order': 0, 'type': 'datetime64'}]) is None
+
+
+def test_input_adapter_reorders_features():
+    adapter = app_runtime_input.InputAdapter.compile(SCHEMA)
+    input_params = [
+        [app_schemas_impl.ParameterImpl(**param) for param in row]
+        for row in [
+            [{'name': 'z', 'value': True}, {'name': 'y', 'value': 'a'}, {'name': 'x', 'value': 1}],
+            [{'name': 'x', 'value': 2}, {'name': 'extra', 'value': 0}, {'name': 'z', 'value': False},
+             {'name': 'y', 'value': 'b'}]
+        ]]
+
+    df = adapter.to_dataframe(input_params)
+
+    assert df.columns.tolist() == ['x', 'y', 'z']
+    assert df.dtypes.tolist() == [np.int64, np.dtype(object), np.bool_]
+    assert df.values.tolist() == [[1, 'a', True], [2, 'b', False]]
+    assert adapter.to_list(input_params[0]) == [[1, 'a', True]]
+
+
+def test_input_adapter_float_buffer():
+    adapter = app_runtime_input.InputAdapter.compile(
+        [{'name': 'x', 'order': 0, 'type': 'float'}, {'name': 'y', 'order': 1, 'type': 'float'}])
+    input_params = [
+        app_schemas_impl.ParameterImpl(name='y', value=10),
+        app_schemas_impl.ParameterImpl(name='x', value=0.5)]
+
+    array = adapter.to_ndarray(input_params)
+
+    assert array.dtype == np.float64
+    assert array.tolist() == [[0.5, 10.0]]
+
+
+@pytest.mark.parametrize(
+    'prediction_input',
+    [
+        [{'name': 'x', 'value': 1}, {'name': 'y', 'value': 'a'}],
+        [{'name': 'x', 'value': 1.5}, {'name': 'y', 'value': 'a'}, {'name': 'z', 'value': True}],
+        [{'name': 'x', 'value': 'a'}, {'name': 'y', 'value': 'a'}, {'name': 'z', 'value': True}],
+        [{'name': 'x', 'value': 1}, {'name': 'y', 'value': 'a'}, {'name': 'z', 'value': 2}],
+        [{'name': 'x', 'value': '1'}, {'name': 'y', 'value': 'a'}, {'name': 'z', 'value': True}],
+    ]
+)
+def test_input_adapter_invalid_input(prediction_input):
+    adapter = app_runtime_input.InputAdapter.compile(SCHEMA)
+
+    with pytest.raises(fastapi.HTTPException) as e:
+        adapter.to_dataframe([app_schemas_impl.ParameterImpl(**param) for param in prediction_input])
+    assert e.value.status_code == 422
+
+
+def test_input_adapter_columnar():
+    adapter = app_runtime_input.InputAdapter.compile(SCHEMA)
+
+    df = adapter.columnar_to_dataframe(['z', 'y', 'x'], {'z': [True, False], 'y': ['a', 'b'], 'x': [1, 2]})
+
+    assert df.columns.tolist() == ['x', 'y', 'z']
+    assert df.values.tolist() == [[1, 'a', True], [2, 'b', False]]
+    with pytest.raises(fastapi.HTTPException):
+        adapter.columnar_to_dataframe(['x', 'y'], {'x': [1], 'y': ['a']})
+    with pytest.raises(fastapi.HTTPException):
+        adapter.columnar_to_dataframe(['x', 'y', 'z'], {'x': ['1'], 'y': ['a'], 'z': [True]})
+
+
+def test_input_adapter_missing_features():
+    rows = [app_schemas_impl.ParameterImpl(name='y', value='a'), app_schemas_impl.ParameterImpl(name='x', value=1)]
+    dense = app_runtime_input.InputAdapter.compile(SCHEMA)
+    # models with a missing value treatment receive the features of the request
+    sparse = app_runtime_input.InputAdapter.compile(SCHEMA, allow_missing=True)
+
+    with pytest.raises(fastapi.HTTPException):
+        dense.input_handler(app_binary_config.ModelInput.DATAFRAME)(rows)
+    assert sparse.input_handler(app_binary_config.ModelInput.DATAFRAME)(rows).columns.tolist() == ['y', 'x']
+    assert sparse.columnar_input_handler(app_binary_config.ModelInput.DATAFRAME)(
+        ['x'], {'x': [1, 2]}).values.tolist() == [[1], [2]]
+    assert sparse.input_handler(app_binary_config.ModelInput.DATAFRAME)(
+        rows + [app_schemas_impl.ParameterImpl(name='z', value=True)]).columns.tolist() == ['x', 'y', 'z']
+
+
+def test_to_float32():
+    rows = [
+        [app_schemas_impl.ParameterImpl(name='y', value=2), app_schemas_impl.ParameterImpl(name='x', value=0.5)],
+        [app_schemas_impl.ParameterImpl(name='y', value=4), app_schemas_impl.ParameterImpl(name='x', value=1.5)]
+    ]
+
+    array = app_runtime_input.to_float32(rows, feature_names=['x', 'y'])
+
+    assert array.dtype == np.float32
+    assert array.flags.c_contiguous
+    assert array.tolist() == [[0.5, 2], [1.5, 4]]
+    assert app_runtime_input.to_float32(rows[0]).tolist() == [[2, 0.5]]
+    assert app_runtime_input.columnar_to_float32(
+        ['y', 'x'], {'x': [0.5, 1.5], 'y': [2, 4]}, feature_names=['x', 'y']).tolist() == array.tolist()
+    with pytest.raises(fastapi.HTTPException):
+        app_runtime_input.to_float32(rows, feature_names=['x', 'z'])
+    with pytest.raises(fastapi.HTTPException):
+        app_runtime_input.to_float32([app_schemas_impl.ParameterImpl(name='x', value='a')])
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import concurrent.futures as futures
+import pickle
+import threading
+import time
+import typing
+
+import numpy as np
+import pytest
+import sqlalchemy
+import sqlalchemy.orm as sqlalchemy_orm
+import xgboost
+
+import app.core.configuration as app_core_config
+import app.crud as app_crud
+import app.models as app_models
+import app.runtime.footprint as app_footprint
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas as app_schemas
+import app.schemas.binary_config as app_binary_config
+import app.schemas.runtime_config as app_runtime_config
+import app.tests.predictors.identity.model as app_test_identity
+import app.tests.predictors.scikit_learn.model as app_test_skl
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def get_executor(pinned: bool = False) -> app_runtime_wrapper.ModelInvocationExecutor:
+    return app_runtime_wrapper.ModelInvocationExecutor(
+        model=pickle.dumps(app_test_identity.get_identity_predictor()),
+        options=app_runtime_config.RuntimeOptions(pinned=pinned))
+
+
+def get_cache(policy: typing.Text = 'lru', **kwargs: typing.Any) -> typing.Tuple[typing.Any, Clock]:
+    import app.runtime.cache as app_cache
+
+    clock = Clock()
+    return app_cache.ModelCache(
+        max_len=kwargs.get('max_len', 8), max_age_seconds=kwargs.get('max_age_seconds', 60),
+        max_bytes=kwargs.get('max_bytes', 1000), policy=policy,
+        change_retention_seconds=kwargs.get('change_retention_seconds', 3600),
+        max_stale_seconds=kwargs.get('max_stale_seconds', 0), session_factory=kwargs.get('session_factory'),
+        clock=clock), clock
+
+
+def test_configuration(db: sqlalchemy_orm.Session):
+    import app.runtime.cache as app_cache
+
+    assert app_cache.cache.max_len == app_core_config.get_config().MODEL_CACHE_SIZE
+    assert app_cache.cache.max_age_seconds == app_core_config.get_config().CACHE_TTL
+
+
+def test_memory_budget_lru(db: sqlalchemy_orm.Session):
+    cache, clock = get_cache()
+    for endpoint_id in range(3):
+        cache.insert(endpoint_id, get_executor(), 400)
+        clock.now += 1
+    assert cache.peek(0) is None
+
+    cache.lookup(1, count=True)
+    cache.insert(3, get_executor(), 400)
+
+    assert cache.peek(1) is not None
+    assert cache.peek(2) is None
+    assert cache.stats()['memory_bytes'] == 800
+    assert cache.stats()['evictions']['memory'] == 2
+    assert cache.stats()['models']['1'] == {
+        'size_bytes': 400, 'pinned': False, 'version': 0, 'hits': 1, 'idle_seconds': 0.0, 'age_seconds': 2.0}
+
+
+def test_memory_budget_lfu(db: sqlalchemy_orm.Session):
+    cache, clock = get_cache('lfu')
+    cache.insert(0, get_executor(), 400)
+    cache.insert(1, get_executor(), 400)
+    for _ in range(2):
+        clock.now += 1
+        cache.lookup(0, count=True)
+    cache.lookup(1, count=True)
+    cache.insert(2, get_executor(), 400)
+
+    assert cache.peek(0) is not None
+    assert cache.peek(1) is None
+    assert cache.stats()['hit_ratio'] == 1.0
+
+
+def test_ttl_is_refreshed_on_access(db: sqlalchemy_orm.Session):
+    cache, clock = get_cache(max_age_seconds=10)
+    cache.insert(0, get_executor(), 1)
+    cache.insert(1, get_executor(), 1)
+    for _ in range(3):
+        clock.now += 8
+        assert cache.lookup(0, count=True) is not None
+
+    assert cache.lookup(1, count=True) is None
+    assert cache.stats()['evictions']['ttl'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_pinned_models(db: sqlalchemy_orm.Session):
+    cache, clock = get_cache(max_len=1, max_age_seconds=10)
+    cache.insert(0, get_executor(pinned=True), 600)
+    cache.insert(1, get_executor(), 300)
+    clock.now += 100
+    cache.insert(2, get_executor(), 2000)
+    cache.insert(3, get_executor(pinned=True), 2000)
+
+    assert cache.peek(0) is not None
+    assert cache.peek(1) is None
+    assert cache.peek(2) is None
+    assert cache.peek(3) is not None
+    assert cache.stats()['evictions'] == {'memory': 0, 'count': 1, 'ttl': 0, 'oversized': 1, 'invalidated': 0}
+
+    cache.invalidate(0)
+    assert cache.peek(0) is None
+    assert cache.stats()['evictions']['invalidated'] == 1
+
+
+@pytest.fixture
+def identity_endpoint(db: sqlalchemy_orm.Session) -> app_models.Endpoint:
+    config = app_test_identity.get_conf()
+    model = app_crud.model.create(db, obj_in=app_schemas.ModelCreate())
+    app_crud.model_config.create_with_model(
+        db, obj_in=app_schemas.ModelConfigCreate(configuration=config['model']), model_id=model.id)
+    endpoint = app_crud.endpoint.create_with_model(
+        db, obj_in=app_schemas.EndpointCreate(**config['endpoint']), model=model)
+    app_crud.binary_ml_model.create_with_endpoint(db, obj_in=app_schemas.BinaryMlModelCreate(
+        model_b64=pickle.dumps(obj=app_test_identity.get_identity_predictor()),
+        **config['binary']
+    ), endpoint_id=endpoint.id)
+    return endpoint
+
+
+def test_sync_between_workers(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    worker, other_worker = get_cache(max_bytes=0)[0], get_cache(max_bytes=0)[0]
+    worker.publish(db, identity_endpoint.id)
+    other_worker.sync(db)
+    loaded = worker.get_deserialized_model(db, identity_endpoint.id)
+    other_loaded = other_worker.get_deserialized_model(db, identity_endpoint.id)
+
+    # changes read again or committed before the models were loaded do not evict them
+    other_worker.sync(db)
+    assert other_worker.peek(identity_endpoint.id) is other_loaded
+
+    worker.publish(db, identity_endpoint.id)
+    assert worker.peek(identity_endpoint.id) is None
+    assert other_worker.peek(identity_endpoint.id) is other_loaded
+
+    other_worker.sync(db)
+    assert other_worker.peek(identity_endpoint.id) is None
+    reloaded = other_worker.get_deserialized_model(db, identity_endpoint.id)
+    assert reloaded is not other_loaded and reloaded is not loaded
+    assert other_worker.stats()['models'][str(identity_endpoint.id)]['version'] == \
+           app_crud.binary_ml_model.get(db, id=identity_endpoint.id).version
+    assert other_worker.stats()['evictions']['invalidated'] == 1
+
+
+def test_sync_after_retention(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    cache, clock = get_cache(max_bytes=0, max_age_seconds=3600, change_retention_seconds=60)
+    cache.sync(db)
+    cache.get_deserialized_model(db, identity_endpoint.id)
+    clock.now += 61
+    cache.sync(db)
+
+    # changes may have been pruned since the last synchronization
+    assert cache.peek(identity_endpoint.id) is None
+
+
+def test_preload(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    cache, _ = get_cache(max_bytes=0)
+    cache.preload(db)
+
+    assert cache.peek(identity_endpoint.id) is not None
+
+
+def test_session_is_opened_on_miss(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    import app.db.session as app_db_session
+
+    cache, _ = get_cache(max_bytes=0)
+    endpoint_id = identity_endpoint.id
+    opened, statements = [], []
+
+    def factory() -> sqlalchemy_orm.Session:
+        opened.append(len(statements))
+        return db
+
+    def executed(connection, cursor, statement: typing.Text, *args: typing.Any):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.get_bind(), 'before_cursor_execute', executed)
+    try:
+        for _ in range(3):
+            assert cache.get_deserialized_model(app_db_session.LazySession(factory), endpoint_id) is not None
+    finally:
+        sqlalchemy.event.remove(db.get_bind(), 'before_cursor_execute', executed)
+
+    # binary and configuration are read by one query, cache hits do not use the database
+    assert opened == [0]
+    assert len(statements) == 1
+
+def wait_for(condition: typing.Callable[[], bool]):
+    deadline = time.monotonic() + 10
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met'
+        time.sleep(0.01)
+
+
+def test_single_flight_loading(db: sqlalchemy_orm.Session):
+    cache, _ = get_cache(max_bytes=0)
+    release = threading.Event()
+    loads = []
+
+    def deserialize(_: sqlalchemy_orm.Session, endpoint_id: int):
+        loads.append(endpoint_id)
+        release.wait(10)
+        return cache.insert(endpoint_id, get_executor(), 1)
+
+    cache.deserialize = deserialize
+    with futures.ThreadPoolExecutor(max_workers=8) as pool:
+        results = [pool.submit(cache.get_deserialized_model, db, 1) for _ in range(8)]
+        wait_for(lambda: cache.stats()['coalesced_loads'] == 7)
+        release.set()
+        models = [result.result() for result in results]
+
+    assert loads == [1]
+    assert all(model is models[0] for model in models)
+    assert cache.stats()['loads'] == 1
+
+
+def test_single_flight_failure(db: sqlalchemy_orm.Session):
+    cache, _ = get_cache()
+    release = threading.Event()
+
+    def deserialize(_: sqlalchemy_orm.Session, endpoint_id: int):
+        release.wait(10)
+        raise ValueError(endpoint_id)
+
+    cache.deserialize = deserialize
+    with futures.ThreadPoolExecutor(max_workers=4) as pool:
+        results = [pool.submit(cache.get_deserialized_model, db, 1) for _ in range(4)]
+        wait_for(lambda: cache.stats()['coalesced_loads'] == 3)
+        release.set()
+
+    assert all(isinstance(result.exception(), ValueError) for result in results)
+    assert cache.peek(1) is None
+
+
+def test_stale_while_revalidate(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    cache, clock = get_cache(
+        max_bytes=0, max_age_seconds=10, max_stale_seconds=100,
+        session_factory=sqlalchemy_orm.sessionmaker(bind=db.get_bind()))
+    loaded = cache.get_deserialized_model(db, identity_endpoint.id)
+
+    # binary did not change: the expired model is fresh again
+    clock.now += 20
+    assert cache.get_deserialized_model(db, identity_endpoint.id) is loaded
+    wait_for(lambda: cache.stats()['models'][str(identity_endpoint.id)]['idle_seconds'] == 0)
+    assert cache.peek(identity_endpoint.id) is loaded
+
+    # binary changed: the expired model is served until the new one is loaded
+    app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id, retention_seconds=60)
+    clock.now += 20
+    assert cache.get_deserialized_model(db, identity_endpoint.id) is loaded
+    wait_for(lambda: cache.peek(identity_endpoint.id) not in (None, loaded))
+    assert cache.stats()['stale_hits'] == 2
+
+    # too old to be served
+    clock.now += 200
+    assert cache.peek(identity_endpoint.id) is None
+
+
+def test_sync_reads_late_commits(db: sqlalchemy_orm.Session, identity_endpoint: app_models.Endpoint):
+    worker, clock = get_cache(max_bytes=0)
+    worker.sync(db)
+    first = app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id + 1, retention_seconds=60)
+    late = app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id, retention_seconds=60)
+    app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id + 1, retention_seconds=60)
+    # the change of the endpoint is not committed yet when the feed is polled
+    db.query(app_models.EndpointChange).filter(app_models.EndpointChange.id == late).delete()
+    db.query(app_models.BinaryMlModel).filter(app_models.BinaryMlModel.id == identity_endpoint.id).update(
+        {app_models.BinaryMlModel.version: 0})
+    db.commit()
+    worker.sync(db)
+    loaded = worker.get_deserialized_model(db, identity_endpoint.id)
+    assert worker.stats()['change_feed_gaps'] == 1
+
+    db.add(app_models.EndpointChange(
+        id=late, endpoint_id=identity_endpoint.id, changed_at=app_crud.endpoint_change.get(db, id=first).changed_at))
+    db.commit()
+    worker.sync(db)
+    assert worker.peek(identity_endpoint.id) is None
+    assert loaded is not None
+    assert worker.stats()['change_feed_gaps'] == 0
+
+    # ids of rolled back transactions are polled for a while
+    db.query(app_models.EndpointChange).filter(app_models.EndpointChange.id == late).delete()
+    app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id + 1, retention_seconds=60)
+    app_crud.endpoint_change.publish(db, endpoint_id=identity_endpoint.id + 1, retention_seconds=60)
+    db.query(app_models.EndpointChange).filter(app_models.EndpointChange.id == late + 2).delete()
+    db.commit()
+    worker.sync(db)
+    assert worker.stats()['change_feed_gaps'] == 1
+    clock.now += worker.gap_grace_seconds + 1
+    worker.sync(db)
+    assert worker.stats()['change_feed_gaps'] == 0
+
+
+def test_footprint():
+    forest = app_test_skl.get_classification_predictor()
+    trees = sum(
+        estimator.tree_.__getstate__()['nodes'].nbytes + estimator.tree_.__getstate__()['values'].nbytes
+        for estimator in forest.estimators_)
+    forest_binary = pickle.dumps(forest)
+    booster = xgboost.train({}, xgboost.DMatrix(np.ones((2, 2)), label=[0, 1]), num_boost_round=1)
+    booster_binary = bytes(booster.save_raw())
+    booster_executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=booster_binary, binary_format=app_binary_config.ModelWrapper.BST)
+
+    assert trees < app_footprint.estimate(app_runtime_wrapper.ModelInvocationExecutor(
+        model=forest_binary, options=app_runtime_config.RuntimeOptions(
+            tree_compilation=app_runtime_config.TreeCompilation(enabled=False))), len(forest_binary)) < 4 * trees
+    assert app_footprint.estimate(booster_executor, len(booster_binary)) > len(booster_binary)
@@ -33,10 +33,15 @@ def test_infer_binary_file_format():
         b'',
         '.Pickle'
     )
+    inferred_4 = app_model_upload.infer_file_format(
+        b'',
+        '.onnx'
+    )
 
     assert inferred_1 == app_binary_config.ModelWrapper.PICKLE
     assert inferred_2 == app_binary_config.ModelWrapper.JOBLIB
     assert inferred_3 == app_binary_config.ModelWrapper.PICKLE
+    assert inferred_4 == app_binary_config.ModelWrapper.ONNX
 
 
 def test_infer_text_file_format():
@@ -52,3 +57,18 @@ def test_infer_text_file_format():
     )
     assert inferred_1 == app_binary_config.ModelWrapper.PMML
     assert inferred_2 is None
+
+
+def test_probe_parameters():
+    probe = app_model_upload.probe_parameters([
+        {'name': 'y', 'order': 1, 'type': 'str'},
+        {'name': 'x', 'order': 0, 'type': 'float64'},
+        {'name': 'z', 'order': 2, 'type': 'bool'}
+    ])
+
+    assert [[(param.name, param.value) for param in row] for row in probe] == [
+        [('x', 0), ('y', '0'), ('z', False)],
+        [('x', 1), ('y', '1'), ('z', True)]
+    ]
+    assert app_model_upload.probe_parameters(None) is None
+    assert app_model_upload.probe_parameters([{'name': 'x', 'order': 0, 'type': 'datetime64'}]) is None
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pypmml
+import pytest
+
+import app.runtime.native_pmml as app_native_pmml
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.runtime_config as app_runtime_config
+import app.tests.predictors.pmml_sample.model as app_test_pmml
+
+E2E = pathlib.Path(__file__).resolve().parents[1].joinpath('e2e')
+
+CHURN_CATEGORIES = {
+    'Gender': ['F', 'M', 'X'],
+    'Status': ['S', 'M', 'D'],
+    'Car Owner': ['N', 'Y'],
+    'Paymethod': ['Auto', 'CC', 'CH']
+}
+
+CHURN_RANGES = {
+    'Children': (0, 5),
+    'Est Income': (0, 150000),
+    'Age': (18, 80),
+    'Usage': (0, 250),
+    'RatePlan': (1, 5)
+}
+
+TREE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<PMML xmlns="http://www.dmg.org/PMML-4_4" version="4.4">
+    <Header/>
+    <DataDictionary>
+        <DataField name="x" optype="continuous" dataType="double"/>
+        <DataField name="c" optype="categorical" dataType="string">
+            <Value value="a"/>
+            <Value value="b"/>
+        </DataField>
+        <DataField name="y" optype="continuous" dataType="double"/>
+    </DataDictionary>
+    <TransformationDictionary>
+        <DerivedField name="scaled" optype="continuous" dataType="double">
+            <NormContinuous field="x">
+                <LinearNorm orig="0" norm="0"/>
+                <LinearNorm orig="10" norm="1"/>
+                <LinearNorm orig="20" norm="4"/>
+            </NormContinuous>
+        </DerivedField>
+        <DerivedField name="bucket" optype="categorical" dataType="string">
+            <Discretize field="x" defaultValue="high">
+                <DiscretizeBin binValue="low">
+                    <Interval closure="openClosed" rightMargin="5"/>
+                </DiscretizeBin>
+                <DiscretizeBin binValue="mid">
+                    <Interval closure="openClosed" leftMargin="5" rightMargin="15"/>
+                </DiscretizeBin>
+            </Discretize>
+        </DerivedField>
+        <DerivedField name="offset" optype="continuous" dataType="double">
+            <Apply function="if">
+                <Apply function="equal">
+                    <FieldRef field="c"/>
+                    <Constant dataType="string">a</Constant>
+                </Apply>
+                <Apply function="*">
+                    <FieldRef field="scaled"/>
+                    <Constant dataType="double">2</Constant>
+                </Apply>
+                <Constant dataType="double">-1</Constant>
+            </Apply>
+        </DerivedField>
+    </TransformationDictionary>
+    <TreeModel functionName="regression" missingValueStrategy="defaultChild" noTrueChildStrategy="returnLastPrediction">
+        <MiningSchema>
+            <MiningField name="x"/>
+            <MiningField name="c" invalidValueTreatment="asMissing"/>
+            <MiningField name="y" usageType="target"/>
+        </MiningSchema>
+        <Output>
+            <OutputField name="y_hat" optype="continuous" dataType="double" feature="predictedValue"/>
+        </Output>
+        <Node id="0" score="0" defaultChild="1">
+            <True/>
+            <Node id="1" score="1" defaultChild="3">
+                <SimplePredicate field="bucket" operator="notEqual" value="high"/>
+                <Node id="3" score="3">
+                    <SimpleSetPredicate field="c" booleanOperator="isIn">
+                        <Array n="1" type="string">"a"</Array>
+                    </SimpleSetPredicate>
+                </Node>
+                <Node id="4" score="4">
+                    <SimplePredicate field="offset" operator="lessThan" value="0"/>
+                </Node>
+            </Node>
+            <Node id="2" score="2">
+                <SimplePredicate field="scaled" operator="greaterThan" value="2.5"/>
+            </Node>
+        </Node>
+    </TreeModel>
+</PMML>
+'''
+
+
+def assert_parity(document: bytes, data: pd.DataFrame):
+    native = app_native_pmml.compile(document).predict(data)
+    reference = pypmml.Model.fromString(document.decode()).predict(data)
+
+    pd.testing.assert_frame_equal(native, reference, check_exact=False, rtol=1e-9)
+
+
+def churn_data(size: int, missing: float = 0.0) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({
+        **{name: rng.choice(values, size) for name, values in CHURN_CATEGORIES.items()},
+        **{name: rng.integers(low, high, size).astype(float) if name in ('Children', 'RatePlan')
+           else rng.uniform(low, high, size) for name, (low, high) in CHURN_RANGES.items()}
+    }).astype(object)
+    return data.mask(rng.random(data.shape) < missing, None)
+
+
+def test_regression_model_parity():
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({
+        'creditScore': rng.normal(580, 150, 200),
+        'income': rng.normal(188000, 70000, 200),
+        'loanAmount': rng.normal(280000, 210000, 200),
+        'monthDuration': rng.integers(6, 36, 200),
+        'rate': rng.normal(0.075, 0.01, 200),
+        'yearlyReimbursement': rng.normal(30000, 22000, 200)
+    })
+
+    assert_parity(app_test_pmml.get_pmml_file().read_bytes(), data)
+
+
+def test_rule_set_model_parity():
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({f'X{i}': rng.integers(-90, -30, 500).astype(float) for i in range(1, 8)}).astype(object)
+
+    assert_parity(E2E.joinpath('wifi.pmml').read_bytes(), data.mask(rng.random(data.shape) < 0.05, None))
+
+
+def test_mining_model_parity():
+    assert_parity(E2E.joinpath('Churn_RandomForestClassifier.xml').read_bytes(), churn_data(300, missing=0.1))
+
+
+def test_scorecard_parity():
+    # comparisons on ordinal fields are left to pypmml
+    document = app_test_pmml.get_pmml_scorecard_file().read_bytes()
+    with pytest.raises(app_native_pmml.UnsupportedPMML):
+        app_native_pmml.compile(document)
+
+    assert_parity(document.replace(b'optype="ordinal"', b'optype="continuous"'), churn_data(300, missing=0.1))
+
+
+def test_tree_model_parity():
+    data = pd.DataFrame({
+        'x': [0.5, 4, 5, 7.5, 12, 15, 16, 25, -3, None, 12, 7.5],
+        'c': ['a', 'b', 'a', 'b', 'a', 'b', 'a', 'b', 'a', 'a', None, 'z']
+    })
+
+    assert_parity(TREE, data)
+
+
+def test_native_input_formats():
+    model = app_native_pmml.compile(E2E.joinpath('wifi.pmml').read_bytes())
+    record = {'X1': -70, 'X2': -50, 'X3': -60, 'X4': -70, 'X5': -70, 'X6': -50, 'X7': -50}
+    row = [record[name] for name in ('X4', 'X5', 'X1', 'X7', 'X3', 'X2', 'X6')]
+
+    assert model.predict(record) == {'predicted': '1', 'confidence': 0.990990990990991}
+    assert model.predict(row) == ['1', 0.990990990990991]
+    assert model.predict([row, row]) == [['1', 0.990990990990991]] * 2
+
+
+def test_unsupported_pmml():
+    with pytest.raises(app_native_pmml.UnsupportedPMML):
+        app_native_pmml.compile(app_test_pmml.get_pmml_no_output_schema_file().read_bytes())
+    with pytest.raises(app_native_pmml.UnsupportedPMML):
+        app_native_pmml.compile(b'<PMML EOF')
+
+
+def test_pmml_format_fallback():
+    native = app_runtime_wrapper.PMMLFormat.load(app_test_pmml.get_pmml_file().read_bytes())
+    unsupported = app_runtime_wrapper.PMMLFormat.load(app_test_pmml.get_pmml_no_output_schema_file().read_bytes())
+    forced = app_runtime_wrapper.PMMLFormat.load(
+        app_test_pmml.get_pmml_file().read_bytes(),
+        app_runtime_config.RuntimeOptions(pmml_evaluator=app_runtime_config.PMMLEvaluator.PYPMML))
+
+    assert isinstance(native.model, app_native_pmml.NativeModel)
+    assert isinstance(unsupported.model, pypmml.Model)
+    assert isinstance(forced.model, pypmml.Model)
@@ -18,6 +18,7 @@
 import typing
 
 import numpy as np
+import orjson
 import pandas as pd
 import pytest
 
@@ -86,3 +87,69 @@ def test_from_ndarray(prediction_output, expected_output):
         data = [[feature['value'] for feature in prediction_output]]
         dataframe_output = pd.DataFrame(data, columns=names)
     assert app_runtime_output.from_dataframe(dataframe_output) == expected_output
+
+
+@pytest.mark.parametrize(
+    ('prediction_output', 'expected_output'),
+    [
+        ([0.5], [0.5]),
+        ([[0.5]], [[0.5]]),
+        ([10, 10], [10, 10]),
+        ([[0.5, 0.5], [0.5, 0.5]], [[0.5, 0.5], [0.5, 0.5]]),
+        (['A'], ['A']),
+    ]
+)
+def test_columnar_from_ndarray(prediction_output, expected_output):
+    assert app_runtime_output.columnar_from_ndarray(np.array(prediction_output)) == expected_output
+
+
+def test_columnar_from_dataframe():
+    dataframe_output = pd.DataFrame([[0.5, 'A'], [-0.1, 'B']], columns=['x', 'y'])
+
+    assert app_runtime_output.columnar_from_dataframe(dataframe_output) == {'x': [0.5, -0.1], 'y': ['A', 'B']}
+
+
+def dumps(content: typing.Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+@pytest.mark.parametrize(
+    'prediction_output',
+    [output for output, _ in EXPECTED] + [[[[0.5, 0.5]]], [[[0.5], [0.5]]], [np.nan, 0.5]]
+)
+def test_encodable_from_ndarray(prediction_output):
+    ndarray_output = np.array(prediction_output)
+
+    assert dumps(app_runtime_output.encodable_from_ndarray(ndarray_output)) == \
+           dumps(app_runtime_output.from_ndarray(ndarray_output))
+
+
+def test_encodable_from_ndarray_keeps_arrays():
+    ndarray_output = np.array([[0.2, 0.8], [0.6, 0.4]])
+
+    assert app_runtime_output.encodable_from_ndarray(ndarray_output) is ndarray_output
+    assert isinstance(app_runtime_output.encodable_from_ndarray(ndarray_output[:1]), np.ndarray)
+    assert app_runtime_output.encodable_from_ndarray(np.array(['A', 'B'])) == ['A', 'B']
+    assert app_runtime_output.encodable_from_ndarray(np.asfortranarray(ndarray_output)) == [[0.2, 0.8], [0.6, 0.4]]
+
+
+def test_encodable_from_ndarray_converts_numbers():
+    swapped = np.array([[0.2, 0.8], [0.6, 0.4]], dtype='>f8')
+    extended = np.array([[0.5, 0.25]], dtype=np.longdouble)
+
+    assert not app_runtime_output.is_encodable(swapped)
+    assert not app_runtime_output.is_encodable(extended)
+    assert dumps(app_runtime_output.encodable_from_ndarray(swapped)) == b'[[0.2,0.8],[0.6,0.4]]'
+    assert dumps(app_runtime_output.encodable_columnar_from_ndarray(swapped)) == b'[[0.2,0.8],[0.6,0.4]]'
+    assert dumps(app_runtime_output.encodable_from_ndarray(extended)) == b'[0.5,0.25]'
+    assert dumps(app_runtime_output.encodable_columnar_from_dataframe(
+        pd.DataFrame({'x': extended[0]}))) == b'{"x":[0.5,0.25]}'
+
+
+def test_encodable_columnar_from_dataframe():
+    dataframe_output = pd.DataFrame([[0.5, 'A'], [-0.1, 'B']], columns=['x', 'y'])
+
+    encodable = app_runtime_output.encodable_columnar_from_dataframe(dataframe_output)
+
+    assert isinstance(encodable['x'], np.ndarray)
+    assert dumps(encodable) == dumps(app_runtime_output.columnar_from_dataframe(dataframe_output))
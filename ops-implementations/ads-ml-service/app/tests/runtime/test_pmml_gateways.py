@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import concurrent.futures as futures
+import time
+import typing
+
+import pypmml
+import pytest
+
+import app.runtime.pmml_gateways as app_pmml_gateways
+import app.tests.predictors.pmml_sample.model as app_test_pmml
+
+RECORD = {
+    'creditScore': 500, 'income': 100000, 'loanAmount': 10000, 'monthDuration': 12, 'rate': 0.07,
+    'yearlyReimbursement': 1000
+}
+
+
+@pytest.fixture
+def pool() -> typing.Iterator[app_pmml_gateways.GatewayPool]:
+    gateway_pool = app_pmml_gateways.GatewayPool(size=2, health_check_interval=30)
+    yield gateway_pool
+    gateway_pool.shutdown()
+
+
+def kill(gateway: app_pmml_gateways.Gateway):
+    gateway.__process__.kill()
+    gateway.__process__.wait()
+
+
+def test_models_are_spread_over_gateways(pool: app_pmml_gateways.GatewayPool):
+    binary = app_test_pmml.get_pmml_file().read_bytes()
+    models = [pool.load(binary) for _ in range(2)]
+    reference = dict(pypmml.Model.fromString(binary.decode()).predict(RECORD))
+
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda i: dict(models[i % 2].predict(RECORD)), range(20)))
+
+    assert all(isinstance(model, pypmml.Model) for model in models)
+    assert results == [reference] * 20
+    assert [gateway['models'] for gateway in pool.stats()['gateways']] == [1, 1]
+    assert [gateway['calls'] for gateway in pool.stats()['gateways']] == [10, 10]
+    assert [field.name for field in models[0].inputFields] == list(RECORD)
+    assert pool.stats()['utilization'] == 0.0
+
+    del models
+    assert [gateway['models'] for gateway in pool.stats()['gateways']] == [0, 0]
+
+
+def test_failed_gateway_is_restarted(pool: app_pmml_gateways.GatewayPool):
+    model = pool.load(app_test_pmml.get_pmml_file().read_bytes())
+    expected = dict(model.predict(RECORD))
+
+    kill(pool.gateways[0])
+
+    assert dict(model.predict(RECORD)) == expected
+    assert pool.stats()['gateways'][0]['restarts'] == 1
+    assert pool.stats()['gateways'][0]['failures'] == 1
+
+
+def test_health_check(pool: app_pmml_gateways.GatewayPool):
+    model = pool.load(app_test_pmml.get_pmml_file().read_bytes())
+
+    pool.check()
+    assert pool.stats()['gateways'][0]['restarts'] == 0
+
+    kill(pool.gateways[0])
+    pool.check()
+
+    assert pool.stats()['gateways'][0]['restarts'] == 1
+    assert pool.stats()['gateways'][1]['started'] is False
+    assert model.predict(RECORD)['predicted_paymentDefault'] == 0
+
+
+def test_gateways_are_checked_in_background():
+    pool = app_pmml_gateways.GatewayPool(size=1, health_check_interval=0.1)
+    try:
+        model = pool.load(app_test_pmml.get_pmml_file().read_bytes())
+        kill(pool.gateways[0])
+
+        # restarted without a prediction
+        deadline = time.monotonic() + 30
+        while pool.stats()['gateways'][0]['restarts'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        assert pool.stats()['gateways'][0]['restarts'] == 1
+        assert pool.stats()['gateways'][0]['calls'] == 0
+        assert model.predict(RECORD)['predicted_paymentDefault'] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_invalid_document(pool: app_pmml_gateways.GatewayPool):
+    with pytest.raises(pypmml.base.PmmlError):
+        pool.load(b'<PMML EOF')
+
+    assert [gateway['models'] for gateway in pool.stats()['gateways']] == [0, 0]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import pickle
+
+import app.runtime.result_cache as app_result_cache
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.binary_config as app_binary_config
+import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
+import app.tests.predictors.identity.model as app_test_identity
+
+
+def get_params(*params):
+    return [app_schemas_impl.ParameterImpl(name=name, value=value) for name, value in params]
+
+
+def test_result_cache_key():
+    ordered = app_result_cache.ResultCache(1, 'hash', max_size=8, ttl_seconds=60)
+    unordered = app_result_cache.ResultCache(1, 'hash', max_size=8, ttl_seconds=60, ordered=False)
+
+    assert ordered.key(get_params(('x', 1), ('y', 'a'))) == ordered.key([get_params(('x', 1), ('y', 'a'))])
+    assert ordered.key(get_params(('x', 1), ('y', 'a'))) != ordered.key(get_params(('y', 'a'), ('x', 1)))
+    assert ordered.key(get_params(('x', 1))) != ordered.key(get_params(('x', 1.0)))
+    assert ordered.key(get_params(('x', 1))) != ordered.key(get_params(('x', True)))
+    assert unordered.key(get_params(('x', 1), ('y', 'a'))) == unordered.key(get_params(('y', 'a'), ('x', 1)))
+
+
+def test_result_cache_eviction():
+    result_cache = app_result_cache.ResultCache(1, 'hash', max_size=2, ttl_seconds=60)
+    keys = [result_cache.key(get_params(('x', i))) for i in range(3)]
+    for i, key in enumerate(keys):
+        result_cache.put(key, {'result': i})
+
+    assert result_cache.get(keys[0]) is None
+    assert result_cache.get(keys[2]) == {'result': 2}
+    assert result_cache.stats()['size'] == 2
+    assert result_cache.stats()['hits'] == 1
+    assert result_cache.stats()['misses'] == 1
+
+
+def test_result_caches_follow_binary():
+    def get_executor(enabled: bool, value: int = 0) -> app_runtime_wrapper.ModelInvocationExecutor:
+        return app_runtime_wrapper.ModelInvocationExecutor(
+            model=pickle.dumps(app_test_identity.get_identity_predictor()) + bytes([value]),
+            input_type=app_binary_config.ModelInput.DATAFRAME,
+            output_type=app_binary_config.ModelOutput.DATAFRAME,
+            binary_format=app_binary_config.ModelWrapper.PICKLE,
+            options=app_runtime_config.RuntimeOptions(result_cache=app_runtime_config.ResultCaching(enabled=enabled))
+        )
+    result_caches = app_result_cache.ResultCaches()
+
+    first = result_caches.get(1, get_executor(True))
+
+    assert result_caches.get(1, get_executor(False)) is None
+    assert result_caches.get(1, get_executor(True)) is first
+    assert result_caches.get(1, get_executor(True, 1)) is not first
+    result_caches.invalidate(1)
+    assert result_caches.stats() == {}
@@ -18,7 +18,11 @@
 import pathlib
 import pickle
 
+import cachetools
+import sqlalchemy.orm as orm
+
 import app.runtime.inspection as app_signature_inspection
+import app.runtime.native_pmml as app_native_pmml
 import app.tests.predictors.pmml_sample.model as app_test_pmml
 
 
@@ -65,3 +69,35 @@ def test_inspect_pmml_subtype():
     # Assert
     assert sub_type_regression == 'RegressionModel'
     assert sub_type_scorecard == 'Scorecard'
+
+
+def test_compiled_pmml_describes_fields_like_pypmml(db: orm.Session):
+    pmml_file = app_test_pmml.get_pmml_file().read_bytes()
+
+    compiled = app_signature_inspection.describe_pmml_model(pmml_file)
+    loaded = app_signature_inspection.load_pmml_model(pmml_file).loaded_model.model
+
+    assert isinstance(compiled, app_native_pmml.NativeModel)
+    assert app_signature_inspection.pmml_input(compiled) == app_signature_inspection.pmml_input(loaded)
+    assert app_signature_inspection.pmml_output(compiled) == app_signature_inspection.pmml_output(loaded)
+    assert app_signature_inspection.pmml_model_name(compiled) == app_signature_inspection.pmml_model_name(loaded)
+    assert app_signature_inspection.pmml_subtype(compiled) == app_signature_inspection.pmml_subtype(loaded)
+
+
+def test_stored_pmml_subtypes_are_bounded(monkeypatch):
+    monkeypatch.setattr(app_signature_inspection, 'PMML_SUBTYPES', cachetools.LRUCache(maxsize=1))
+    pmml_file = app_test_pmml.get_pmml_file().read_bytes()
+    reads = []
+
+    def read() -> bytes:
+        reads.append(1)
+        return pmml_file
+
+    assert app_signature_inspection.stored_pmml_subtype('a', read) == 'RegressionModel'
+    assert app_signature_inspection.stored_pmml_subtype('a', read) == 'RegressionModel'
+    assert len(reads) == 1
+
+    app_signature_inspection.stored_pmml_subtype('b', read)
+    assert list(app_signature_inspection.PMML_SUBTYPES.keys()) == ['b']
+    app_signature_inspection.stored_pmml_subtype('a', read)
+    assert len(reads) == 3
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import time
+
+import sqlalchemy.orm as orm
+
+import app.crud as crud
+import app.schemas as schemas
+
+
+def test_tokens_expire(db: orm.Session):
+    import app.runtime.token_cache as app_token_cache
+    tokens = app_token_cache.TokenCache(max_size=8, ttl_seconds=60)
+    user = crud.user.create(db, obj_in=schemas.UserCreate(username='user', password='password'))
+    tokens.put('valid', user, time.time() + 60)
+    tokens.put('expired', user, time.time() - 1)
+
+    cached = tokens.get('valid')
+    assert cached is not user
+    assert (cached.id, cached.username, cached.hashed_password) == (user.id, user.username, user.hashed_password)
+    assert tokens.get('expired') is None
+    crud.user.update(db, db_obj=db.merge(cached, load=False), obj_in={'username': 'renamed'})
+    assert crud.user.get(db, id=user.id).username == 'renamed'
+    tokens.invalidate(user.id)
+    assert tokens.get('valid') is None
+    assert tokens.stats()['hits'] == 1
+
+
+def test_disabled_tokens(db: orm.Session):
+    import app.runtime.token_cache as app_token_cache
+    tokens = app_token_cache.TokenCache(max_size=0, ttl_seconds=60)
+    user = crud.user.create(db, obj_in=schemas.UserCreate(username='user', password='password'))
+    tokens.put('valid', user, time.time() + 60)
+
+    assert tokens.get('valid') is None
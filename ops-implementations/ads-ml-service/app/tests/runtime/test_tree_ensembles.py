@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import pickle
+import typing
+
+import numpy as np
+import pandas as pd
+import pytest
+import sklearn.ensemble as skl_ensemble
+import sklearn.linear_model as skl_linear
+
+import app.runtime.tree_ensembles as app_tree_ensembles
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.binary_config as app_binary_config
+import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
+
+RNG = np.random.default_rng(42)
+FEATURES = pd.DataFrame(RNG.random((300, 3)), columns=['x', 'y', 'z'])
+LABELS = np.where(FEATURES['x'] > FEATURES['y'], 'high', np.where(FEATURES['z'] > 0.5, 'mid', 'low'))
+
+
+@pytest.mark.parametrize(
+    ('model', 'target'),
+    [
+        (skl_ensemble.RandomForestClassifier(n_estimators=20, random_state=0), LABELS),
+        (skl_ensemble.RandomForestRegressor(n_estimators=20, random_state=0), FEATURES['x'] * FEATURES['z']),
+        (skl_ensemble.GradientBoostingClassifier(n_estimators=20, random_state=0), LABELS),
+        (skl_ensemble.GradientBoostingClassifier(n_estimators=20, random_state=0), LABELS == 'high'),
+        (skl_ensemble.GradientBoostingRegressor(n_estimators=20, random_state=0), FEATURES['x'] * FEATURES['z'])
+    ]
+)
+def test_compiled_outputs(model: typing.Any, target: typing.Any):
+    model.fit(FEATURES, target)
+    compiled = app_tree_ensembles.compile_model(model, max_rows=64)
+    rows = FEATURES.iloc[:50]
+
+    assert isinstance(compiled, app_tree_ensembles.CompiledEnsemble)
+    if hasattr(model, 'predict_proba'):
+        assert np.array_equal(compiled.predict(rows), model.predict(rows))
+        assert compiled.predict_proba(rows) == pytest.approx(model.predict_proba(rows))
+        assert compiled.classes_ is model.classes_
+    else:
+        assert compiled.predict(rows) == pytest.approx(model.predict(rows))
+
+
+def test_original_model_fallback():
+    model = skl_ensemble.RandomForestClassifier(n_estimators=5, random_state=0).fit(FEATURES, LABELS)
+    compiled = app_tree_ensembles.compile_model(model, max_rows=10)
+    nan = FEATURES.iloc[:5].copy()
+    nan.iloc[0, 0] = np.nan
+
+    assert compiled.features(FEATURES.iloc[:10]) is not None
+    # too many rows, columns not in the training order, missing values
+    assert compiled.features(FEATURES.iloc[:11]) is None
+    assert compiled.features(FEATURES.iloc[:5][['y', 'x', 'z']]) is None
+    assert compiled.features(nan) is None
+    assert np.array_equal(compiled.predict(FEATURES), model.predict(FEATURES))
+    assert np.array_equal(compiled.predict(nan.fillna(0.5)), model.predict(nan.fillna(0.5)))
+
+
+def test_unsupported_models():
+    linear = skl_linear.LinearRegression().fit(FEATURES, FEATURES['x'])
+    extra_trees = skl_ensemble.ExtraTreesRegressor(n_estimators=5).fit(FEATURES, FEATURES['x'])
+    initialized = skl_ensemble.GradientBoostingRegressor(
+        n_estimators=5, init=skl_linear.LinearRegression()).fit(FEATURES, FEATURES['x'])
+
+    assert app_tree_ensembles.compile_model(linear, max_rows=64) is linear
+    assert app_tree_ensembles.compile_model(extra_trees, max_rows=64) is extra_trees
+    assert app_tree_ensembles.compile_model(initialized, max_rows=64) is initialized
+
+
+def test_mismatching_model_is_not_used(monkeypatch: pytest.MonkeyPatch):
+    model = skl_ensemble.RandomForestRegressor(n_estimators=5, random_state=0).fit(FEATURES, FEATURES['x'])
+    monkeypatch.setattr(app_tree_ensembles.CompiledEnsemble, 'raw', lambda self, x: np.ones((len(x), 1)))
+
+    assert app_tree_ensembles.compile_model(model, max_rows=64) is model
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_executor_tree_compilation(enabled: bool):
+    model = skl_ensemble.RandomForestClassifier(n_estimators=5, random_state=0).fit(FEATURES, LABELS)
+    executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=pickle.dumps(model),
+        input_type=app_binary_config.ModelInput.DATAFRAME,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.PICKLE,
+        options=app_runtime_config.RuntimeOptions(
+            tree_compilation=app_runtime_config.TreeCompilation(enabled=enabled))
+    )
+    rows = [
+        [app_schemas_impl.ParameterImpl(name=name, value=value) for name, value in row.items()]
+        for row in FEATURES.iloc[:5].to_dict(orient='records')]
+
+    assert isinstance(executor.loaded_model.model, app_tree_ensembles.CompiledEnsemble) is enabled
+    assert executor.predict(rows)['result']['predictions'] == model.predict(FEATURES.iloc[:5]).tolist()
+
+
+def test_tree_compilation_is_opt_in():
+    assert not app_runtime_config.RuntimeOptions().tree_compilation.enabled
+    assert app_runtime_config.RuntimeOptions.from_metadata(
+        {'runtime': {'tree_compilation': {'enabled': True}}}).tree_compilation.enabled
@@ -15,17 +15,25 @@
 #
 
 
+import json
 import pickle
 import typing
 
+import numpy as np
 import pytest
+import sklearn.pipeline as skl_pipeline
+import sklearn.preprocessing as skl_preprocessing
+import xgboost
 
 import app.runtime.input as app_runtime_input
 import app.runtime.wrapper as app_runtime_wrapper
 import app.schemas.binary_config as app_binary_config
 import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
 import app.tests.predictors.identity.model as app_test_identity
+import app.tests.predictors.onnx.model as app_test_onnx
 import app.tests.predictors.pmml.model as app_test_pmml
+import app.tests.predictors.scikit_learn.model as app_test_skl
 import app.tests.predictors.xgboost.model as app_test_xgboost
 
 INPUT = [{'name': 'x', 'value': 0.5}, {'name': 'y', 'value': 0.5}]
@@ -80,7 +88,7 @@ INPUT = [{'name': 'x', 'value': 0.5}, {'name': 'y', 'value': 0.5}]
                 app_binary_config.ModelInput.AUTO,
                 app_binary_config.ModelOutput.NUMPY_ARRAY,
                 app_binary_config.ModelWrapper.BST,
-                app_runtime_input.to_dmatrix
+                app_runtime_input.to_float32
         ),
         (
                 INPUT,
@@ -132,4 +140,187 @@ def test_model_invocation_executor_input_handling(
         )
     model_invocation_executor.input_handling(input_params)
 
-    assert model_invocation_executor.input_handler == input_handler
+    assert getattr(model_invocation_executor.input_handler, 'func', model_invocation_executor.input_handler) \
+        == input_handler
+
+
+def get_skl_executor(
+        predictor: typing.Any,
+        scoring_mode: app_runtime_config.ScoringMode = app_runtime_config.ScoringMode.AUTO
+) -> app_runtime_wrapper.ModelInvocationExecutor:
+    return app_runtime_wrapper.ModelInvocationExecutor(
+        model=pickle.dumps(predictor),
+        input_type=app_binary_config.ModelInput.DATAFRAME,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.PICKLE,
+        options=app_runtime_config.RuntimeOptions(scoring_mode=scoring_mode)
+    )
+
+
+def test_single_pass_scoring():
+    predictor = app_test_skl.get_classification_predictor()
+    rows = [[app_schemas_impl.ParameterImpl(**param) for param in INPUT]] * 3
+    auto = get_skl_executor(predictor)
+    two_pass = get_skl_executor(predictor, app_runtime_config.ScoringMode.TWO_PASS)
+
+    assert auto.single_pass is None
+    assert auto.predict(rows) == two_pass.predict(rows)
+    assert auto.single_pass is True
+    assert auto.predict(rows) == two_pass.predict(rows)
+    assert two_pass.single_pass is False
+
+
+def test_single_pass_scoring_rejected():
+    rows = [[app_schemas_impl.ParameterImpl(**param) for param in INPUT]]
+    auto = get_skl_executor(app_test_skl.DisagreeingClassifier())
+
+    assert auto.predict(rows)['result']['predictions'] == 'a'
+    assert auto.single_pass is False
+    assert auto.predict(rows)['result']['predictions'] == 'a'
+
+
+def test_single_pass_scoring_argmax_classifiers_only():
+    predictor, x = app_test_skl.get_svc_predictor()
+    auto = get_skl_executor(predictor)
+    # the first rows agree, a verification on them would enable single pass scoring
+    assert auto.check_single_pass(x[:2]) is True
+
+    auto = get_skl_executor(predictor)
+    predictions, _ = auto.invoke(x)
+
+    assert auto.single_pass is False
+    assert np.array_equal(predictions, predictor.predict(x))
+    assert get_skl_executor(skl_pipeline.make_pipeline(
+        skl_preprocessing.StandardScaler(), app_test_skl.get_classification_predictor())).single_pass is None
+
+
+def test_single_pass_scoring_not_capable():
+    executor = get_skl_executor(
+        app_test_identity.get_identity_predictor(), app_runtime_config.ScoringMode.SINGLE_PASS)
+
+    assert executor.single_pass is False
+
+
+def test_input_schema_adapter():
+    model_invocation_executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=pickle.dumps(app_test_identity.get_identity_predictor()),
+        input_type=app_binary_config.ModelInput.AUTO,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.PICKLE,
+        input_schema=[{'name': 'x', 'order': 0, 'type': 'float'}, {'name': 'y', 'order': 1, 'type': 'int'}]
+    )
+
+    result = model_invocation_executor.predict(
+        [app_schemas_impl.ParameterImpl(name='y', value=2), app_schemas_impl.ParameterImpl(name='x', value=1)])
+
+    assert model_invocation_executor.input_adapter.names == ['x', 'y']
+    assert result == {'result': {'x': 1.0, 'y': 2}}
+
+
+def get_xgb_executor(
+        booster: xgboost.Booster,
+        input_type: app_binary_config.ModelInput,
+        xgboost_scoring: app_runtime_config.XGBoostScoring
+) -> app_runtime_wrapper.ModelInvocationExecutor:
+    return app_runtime_wrapper.ModelInvocationExecutor(
+        model=bytes(booster.save_raw()),
+        input_type=input_type,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.BST,
+        options=app_runtime_config.RuntimeOptions(xgboost=xgboost_scoring),
+        input_schema=[{'name': 'x', 'order': 0, 'type': 'float64'}, {'name': 'y', 'order': 1, 'type': 'int'}]
+    )
+
+
+def test_xgboost_inplace_predict():
+    rng = np.random.default_rng(42)
+    features = rng.random((100, 2))
+    booster = xgboost.train(
+        {'objective': 'binary:logistic'}, xgboost.DMatrix(features, label=features[:, 0] > features[:, 1]),
+        num_boost_round=5)
+    inplace = get_xgb_executor(
+        booster, app_binary_config.ModelInput.DMATRIX, app_runtime_config.XGBoostScoring(nthread=2))
+    dmatrix = get_xgb_executor(
+        booster, app_binary_config.ModelInput.DMATRIX, app_runtime_config.XGBoostScoring(inplace_predict=False))
+    rows = [
+        [app_schemas_impl.ParameterImpl(name='y', value=int(y * 10)), app_schemas_impl.ParameterImpl(name='x', value=x)]
+        for x, y in features[:10]]
+    expected = booster.predict(xgboost.DMatrix(np.array([[row[1].value, row[0].value] for row in rows])))
+
+    # feature names are not saved in the binary format
+    assert inplace.loaded_model.model.feature_names == ['x', 'y']
+    assert json.loads(inplace.loaded_model.model.save_config())['learner']['generic_param']['nthread'] == '2'
+    assert inplace.input_handling(rows).dtype == np.float32
+    assert inplace.predict(rows)['result']['predictions'] == pytest.approx(expected.tolist())
+    assert inplace.predict_columnar(
+        ['y', 'x'], {'x': [row[1].value for row in rows], 'y': [row[0].value for row in rows]}) == inplace.predict(rows)
+    assert isinstance(dmatrix.input_handling(rows), xgboost.DMatrix)
+    assert dmatrix.predict(rows) == inplace.predict(rows)
+
+
+def test_xgboost_feature_order():
+    booster = xgboost.train(
+        {}, xgboost.DMatrix(np.ones((2, 2)), label=[0, 1], feature_names=['y', 'x']), num_boost_round=1)
+    model = app_runtime_wrapper.SBTFormat(booster, inplace_predict=True)
+
+    assert model.feature_order(app_runtime_input.InputAdapter(['x', 'y'], [np.dtype(np.float64)] * 2)) == [1, 0]
+    assert model.feature_order(app_runtime_input.InputAdapter(['y', 'x'], [np.dtype(np.float64)] * 2)) is None
+
+
+@pytest.mark.parametrize('zipmap', [True, False])
+def test_onnx_classifier(zipmap: bool):
+    executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=app_test_onnx.get_classifier(zipmap),
+        input_type=app_binary_config.ModelInput.AUTO,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.ONNX,
+        options=app_runtime_config.RuntimeOptions(onnx=app_runtime_config.ONNXScoring(intra_op_threads=2))
+    )
+    rows = [
+        [app_schemas_impl.ParameterImpl(name='x', value=1), app_schemas_impl.ParameterImpl(name='y', value=0)],
+        [app_schemas_impl.ParameterImpl(name='x', value=0), app_schemas_impl.ParameterImpl(name='y', value=1)]]
+
+    result = executor.predict(rows)['result']
+
+    assert executor.loaded_model.model.get_session_options().intra_op_num_threads == 2
+    assert executor.can_predict_proba
+    assert result['predictions'] == ['a', 'b']
+    assert result['scores'] == [pytest.approx([0.880797, 0.119203]), pytest.approx([0.119203, 0.880797])]
+
+
+def test_onnx_inputs_by_feature():
+    executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=app_test_onnx.get_regressor(),
+        input_type=app_binary_config.ModelInput.AUTO,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.ONNX,
+        input_schema=[{'name': 'x', 'order': 0, 'type': 'float32'}, {'name': 'y', 'order': 1, 'type': 'int64'}]
+    )
+
+    result = executor.predict_columnar(['y', 'x'], {'x': [0.5, 1.5], 'y': [1, 2]})
+
+    assert not executor.can_predict_proba
+    assert result == {'result': {'predictions': [2.0, 5.0]}}
+
+
+def test_onnx_scores_share_the_prediction_run():
+    executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=app_test_onnx.get_classifier(False),
+        input_type=app_binary_config.ModelInput.AUTO,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.ONNX
+    )
+    loaded = executor.loaded_model
+    runs = []
+    run = loaded.run
+    loaded.run = lambda request: runs.append(request) or run(request)
+    rows = [[app_schemas_impl.ParameterImpl(name='x', value=1), app_schemas_impl.ParameterImpl(name='y', value=0)]]
+
+    executor.single_pass = False
+    executor.predict(rows)
+    # the kept outputs are released once the scores are taken
+    assert len(runs) == 1
+    assert loaded._last_run.outputs == (None, None)
+
+    executor.predict(rows)
+    assert len(runs) == 2
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import pytest
+
+import app.schemas.decoding as app_decoding
+import app.schemas.impl as app_schemas_impl
+
+TARGET = [{'rel': 'endpoint', 'href': 'http://localhost/endpoints/1'}]
+
+
+@pytest.mark.parametrize(
+    'parameters',
+    [
+        [{'name': 'x', 'value': 0.5}, {'name': 'y', 'value': 'good'}, {'name': 'z', 'value': True}],
+        [[{'name': 'x', 'value': 1}, {'name': 'y', 'value': 2}]] * 3,
+        [{'name': 'x', 'value': 1, 'extra': None}],
+        [[]],
+        [],
+    ]
+)
+def test_decode_prediction(parameters):
+    payload = {'target': TARGET, 'parameters': parameters}
+
+    decoded = app_decoding.decode_prediction(payload)
+
+    assert decoded is not None
+    assert decoded == app_schemas_impl.PredictionImpl.parse_obj(payload)
+    assert decoded.__fields_set__ == {'target', 'parameters'}
+
+
+@pytest.mark.parametrize(
+    'payload',
+    [
+        {'target': TARGET, 'parameters': [{'name': 'x', 'value': None}]},
+        {'target': TARGET, 'parameters': [{'name': 1, 'value': 1}]},
+        {'target': TARGET, 'parameters': [{'name': 'x', 'value': {'a': 1}}]},
+        {'target': TARGET, 'parameters': [[{'name': 'x', 'value': 1}], {'name': 'x', 'value': 1}]},
+        {'target': [{'rel': 1}], 'parameters': [{'name': 'x', 'value': 1}]},
+        {'target': TARGET},
+        [],
+        None
+    ]
+)
+def test_decode_prediction_not_canonical(payload):
+    assert app_decoding.decode_prediction(payload) is None
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+import sklearn.ensemble as skl_ensemble
+import sklearn.neighbors as skl_neighbors
+
+# Usage: PYTHONPATH=. python3 scripts/benchmark_model_memory.py --model random_forest --workers 4
+# Memory of worker processes which all load the same model, with and without memory mapped artifacts.
+# PSS splits shared pages between the processes mapping them, RSS counts them in every process.
+
+MODELS = {
+    'random_forest': lambda size: skl_ensemble.RandomForestClassifier(n_estimators=size, random_state=0),
+    # keeps the training rows
+    'k_neighbors': lambda size: skl_neighbors.KNeighborsClassifier(n_neighbors=size)
+}
+
+
+def get_data(features: int, rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    return pd.DataFrame(rng.random((rows, features)), columns=[f'feature_{i}' for i in range(features)])
+
+
+def memory() -> tuple:
+    """RSS, PSS and private memory of the process in MB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == 'kB':
+                values[fields[0].rstrip(':')] = int(fields[1]) / 1024
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def worker(binary: bytes, memory_mapping: bool, features: int, loaded, measured, results):
+    import app.runtime.wrapper as app_runtime_wrapper
+    import app.schemas.binary_config as app_binary_config
+    import app.schemas.runtime_config as app_runtime_config
+
+    batch = get_data(features, 10)
+    executor = app_runtime_wrapper.ModelInvocationExecutor(
+        model=binary,
+        binary_format=app_binary_config.ModelWrapper.JOBLIB,
+        options=app_runtime_config.RuntimeOptions(memory_mapping=memory_mapping))
+    executor.loaded_model.predict_proba(batch)
+    loaded.wait()
+    results.put(memory())
+    # other workers measure while this one still maps the model
+    measured.wait()
+
+
+def measure(binary: bytes, memory_mapping: bool, workers: int, features: int) -> np.ndarray:
+    context = multiprocessing.get_context('spawn')
+    loaded, measured, results = context.Barrier(workers), context.Barrier(workers), context.Queue()
+    processes = [
+        context.Process(target=worker, args=(binary, memory_mapping, features, loaded, measured, results))
+        for _ in range(workers)]
+    for process in processes:
+        process.start()
+    values = np.array([results.get() for _ in processes])
+    for process in processes:
+        process.join()
+    return values.mean(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the memory of workers loading the same model')
+    parser.add_argument('--model', choices=list(MODELS), default='random_forest')
+    parser.add_argument('--size', type=int, default=200, help='number of trees or of neighbors')
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=20000, help='number of training rows')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    data = get_data(args.features, args.rows)
+    binary = pickle.dumps(MODELS[args.model](args.size).fit(data, data['feature_0'] > data['feature_1']))
+
+    with tempfile.TemporaryDirectory() as storage:
+        os.environ['MODEL_STORAGE'] = storage
+        # the artifact is written once, like a preloaded model, workers only map it
+        import app.runtime.wrapper as app_runtime_wrapper
+        import app.schemas.runtime_config as app_runtime_config
+        app_runtime_wrapper.ModelInvocationExecutor(
+            model=binary, options=app_runtime_config.RuntimeOptions(memory_mapping=True))
+
+        print(f'binary: {len(binary) / 1024 ** 2:.1f} MB')
+        print(f'{"workers":>8} {"mmap":>6} {"RSS (MB)":>10} {"PSS (MB)":>10} {"private (MB)":>13}')
+        for workers in args.workers:
+            for memory_mapping in (False, True):
+                rss, pss, private = measure(binary, memory_mapping, workers, args.features)
+                print(f'{workers:>8} {str(memory_mapping):>6} {rss:>10.1f} {pss:>10.1f} {private:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+
+import argparse
+import os
+import pathlib
+import pickle
+import tempfile
+import timeit
+
+import numpy as np
+import sklearn.linear_model as skl_linear
+import yaml
+
+# Usage: PYTHONPATH=. python3 scripts/benchmark_prediction_session.py --features 20 --requests 2000
+# Latency of /predictions served from the model cache, with a session opened for every request as before and with
+# the session opened on cache misses only. Misses read the binary and its configuration in one query.
+
+
+def setup(root: pathlib.Path):
+    logging_configs = yaml.safe_load((pathlib.Path(__file__).parents[1] / 'logging.yaml').read_text())
+    logging_configs['handlers']['info_file_handler']['filename'] = str(root / 'info.log')
+    logging_configs['handlers']['error_file_handler']['filename'] = str(root / 'error.log')
+    for logger in logging_configs['loggers'].values():
+        logger['level'] = 'WARNING'
+    (root / 'logging.yaml').write_text(yaml.dump(logging_configs))
+    os.environ['LOGGING'] = str(root / 'logging.yaml')
+    os.environ['SETTINGS'] = str(root)
+    os.environ['MODEL_STORAGE'] = str(root)
+    os.environ['MODEL_CACHE_SYNC_INTERVAL'] = '0'
+
+
+def add_endpoint(features: int) -> int:
+    import app.crud as app_crud
+    import app.db.base as app_db_base
+    import app.db.session as app_db_session
+    import app.schemas as app_schemas
+    import app.schemas.binary_config as app_binary_config
+
+    app_db_base.Base.metadata.create_all(bind=app_db_session.get_engine())
+    rng = np.random.default_rng(42)
+    x = rng.random((100, features))
+    model = skl_linear.LogisticRegression().fit(x, x[:, 0] > x[:, 1])
+    db = app_db_session.SessionLocal()
+    try:
+        registered = app_crud.model.create(db, obj_in=app_schemas.ModelCreate())
+        app_crud.model_config.create_with_model(
+            db, obj_in=app_schemas.ModelConfigCreate(configuration={'name': 'benchmark'}), model_id=registered.id)
+        endpoint = app_crud.endpoint.create_with_model(
+            db, obj_in=app_schemas.EndpointCreate(name='benchmark'), model=registered)
+        app_crud.binary_ml_model.create_with_endpoint(db, obj_in=app_schemas.BinaryMlModelCreate(
+            model_b64=pickle.dumps(model),
+            input_data_structure=app_binary_config.ModelInput.NUMPY_ARRAY,
+            output_data_structure=app_binary_config.ModelOutput.AUTO,
+            format=app_binary_config.ModelWrapper.PICKLE), endpoint_id=endpoint.id)
+        return endpoint.id
+    finally:
+        db.close()
+
+
+def eager_db():
+    """Session of every request, entered and closed in a worker thread"""
+    import app.db.session as app_db_session
+
+    db = app_db_session.SessionLocal()
+    try:
+        yield app_db_session.LazySession(lambda: db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of cached predictions with eager and lazy sessions')
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(pathlib.Path(tmp))
+
+        import fastapi.testclient as fastapi_testclient
+
+        import app.api.deps as app_api_deps
+        import app.core.configuration as app_core_config
+        import app.core.uri as app_uri
+        import app.main as app_main
+        import app.runtime.cache as app_cache
+
+        endpoint_id = add_endpoint(args.features)
+        app = app_main.get_app()
+        url = app_core_config.get_config().API_V2_STR + '/predictions'
+        body = {
+            'parameters': [{'name': f'feature_{i}', 'value': 0.5} for i in range(args.features)],
+            'target': [{'rel': 'endpoint', 'href': app_uri.TEMPLATE.format(
+                resource_type='endpoints', resource_id=endpoint_id)}]
+        }
+
+        with fastapi_testclient.TestClient(app) as client:
+            def predict():
+                response = client.post(url, json=body)
+                assert response.status_code == 200, response.text
+
+            def miss():
+                app_cache.cache.clear()
+                predict()
+
+            timings = {}
+            number = max(1, args.requests // 10)
+            timings['miss, one query'] = min(timeit.repeat(miss, number=number, repeat=args.repeat)) / number
+            predict()
+            app.dependency_overrides[app_api_deps.get_lazy_db] = eager_db
+            timings['hit, eager session'] = \
+                min(timeit.repeat(predict, number=args.requests, repeat=args.repeat)) / args.requests
+            app.dependency_overrides.clear()
+            timings['hit, lazy session'] = \
+                min(timeit.repeat(predict, number=args.requests, repeat=args.repeat)) / args.requests
+
+    print(f'{"path":>20} {"latency (ms)":>14}')
+    for path, timing in timings.items():
+        print(f'{path:>20} {timing * 1000:>14.3f}')
+    eager, lazy = timings['hit, eager session'], timings['hit, lazy session']
+    print(f'cache hits without a session: {eager / lazy:.2f}x faster')
+
+
+if __name__ == '__main__':
+    main()
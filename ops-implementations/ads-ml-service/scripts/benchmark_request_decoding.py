@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import argparse
+import json
+import timeit
+
+import fastapi.params as fparams
+import fastapi.utils as futils
+import orjson
+
+import app.schemas.decoding as app_decoding
+import app.schemas.impl as app_schemas_impl
+
+# Usage: PYTHONPATH=. python3 scripts/benchmark_request_decoding.py --features=20 --rows 1 10 100 1000
+# Compares the decoding of /predictions bodies by fastapi (json + pydantic) and by FAST_REQUEST_DECODING
+
+PREDICTION_BODY = futils.create_response_field(
+    name='pre_in', type_=app_schemas_impl.PredictionImpl, required=True, field_info=fparams.Body(...))
+
+
+def get_payload(rows: int, features: int) -> bytes:
+    values = (0.5, 10, True, 'label')
+    row = [{'name': f'feature_{i}', 'value': values[i % len(values)]} for i in range(features)]
+    return orjson.dumps({
+        'target': [{'rel': 'endpoint', 'href': 'http://localhost:8080/endpoints/1'}],
+        'parameters': row if rows == 1 else [row] * rows
+    })
+
+
+def decode_with_pydantic(body: bytes) -> app_schemas_impl.PredictionImpl:
+    value, errors = PREDICTION_BODY.validate(json.loads(body), {}, loc=('body',))
+    assert not errors
+    return value
+
+
+def decode_fast(body: bytes) -> app_schemas_impl.PredictionImpl:
+    return app_decoding.decode_prediction(orjson.loads(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of prediction request decoding')
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"bytes":>10} {"pydantic (ms)":>15} {"fast (ms)":>12} {"speedup":>9}')
+    for rows in args.rows:
+        body = get_payload(rows, args.features)
+        assert decode_fast(body) == decode_with_pydantic(body)
+        number = max(1, 2000 // rows)
+        timings = []
+        for decode in (decode_with_pydantic, decode_fast):
+            best = min(timeit.repeat(lambda: decode(body), number=number, repeat=args.repeat))
+            timings.append(best / number * 1000)
+        print(f'{rows:>8} {len(body):>10} {timings[0]:>15.3f} {timings[1]:>12.3f} {timings[0] / timings[1]:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+import sklearn.ensemble as skl_ensemble
+
+import app.runtime.tree_ensembles as app_tree_ensembles
+
+# Usage: PYTHONPATH=. python3 scripts/benchmark_tree_ensembles.py --model random_forest --rows 1 10 64 256
+# Compares predict_proba of a scikit-learn classifier with its compiled node table
+
+MODELS = {
+    'random_forest': lambda trees: skl_ensemble.RandomForestClassifier(n_estimators=trees, random_state=0),
+    'gradient_boosting': lambda trees: skl_ensemble.GradientBoostingClassifier(n_estimators=trees, random_state=0)
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of compiled tree ensembles')
+    parser.add_argument('--model', choices=list(MODELS), default='random_forest')
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 10, 64, 256])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    x = pd.DataFrame(rng.random((5000, args.features)), columns=[f'feature_{i}' for i in range(args.features)])
+    model = MODELS[args.model](args.trees).fit(x, x['feature_0'] > x['feature_1'])
+    compiled = app_tree_ensembles.compile_model(model, max_rows=max(args.rows))
+    assert isinstance(compiled, app_tree_ensembles.CompiledEnsemble), 'the model is not compiled'
+
+    print(f'{"rows":>8} {"original (ms)":>14} {"compiled (ms)":>14} {"speedup":>9}')
+    for rows in args.rows:
+        batch = x.iloc[:rows]
+        number = max(1, 200 // rows)
+        timings = []
+        for predictor in (model, compiled):
+            best = min(timeit.repeat(lambda: predictor.predict_proba(batch), number=number, repeat=args.repeat))
+            timings.append(best / number * 1000)
+        print(f'{rows:>8} {timings[0]:>14.3f} {timings[1]:>14.3f} {timings[0] / timings[1]:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
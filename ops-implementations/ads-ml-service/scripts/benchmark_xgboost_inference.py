@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+# Copyright 2022 IBM
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.IBM Confidential
+#
+
+
+import argparse
+import timeit
+
+import numpy as np
+import xgboost as xgb
+
+import app.runtime.wrapper as app_runtime_wrapper
+import app.schemas.binary_config as app_binary_config
+import app.schemas.impl as app_schemas_impl
+import app.schemas.runtime_config as app_runtime_config
+
+# Usage: PYTHONPATH=. python3 scripts/benchmark_xgboost_inference.py --features=20 --rows 1 10 100 1000 --nthread 1
+# Compares the scoring of /predictions rows by an xgboost booster through DMatrix and through inplace_predict
+
+
+def get_binary(features: int, trees: int) -> bytes:
+    rng = np.random.default_rng(42)
+    x = rng.random((1000, features))
+    booster = xgb.train(
+        {'objective': 'binary:logistic', 'max_depth': 6}, xgb.DMatrix(x, label=x[:, 0] > x[:, 1]),
+        num_boost_round=trees)
+    return bytes(booster.save_raw())
+
+
+def get_executor(binary: bytes, features: int, inplace_predict: bool, nthread: int):
+    return app_runtime_wrapper.ModelInvocationExecutor(
+        model=binary,
+        input_type=app_binary_config.ModelInput.DMATRIX,
+        output_type=app_binary_config.ModelOutput.AUTO,
+        binary_format=app_binary_config.ModelWrapper.BST,
+        options=app_runtime_config.RuntimeOptions(
+            xgboost=app_runtime_config.XGBoostScoring(inplace_predict=inplace_predict, nthread=nthread)),
+        input_schema=[{'name': f'feature_{i}', 'order': i, 'type': 'float64'} for i in range(features)]
+    )
+
+
+def get_rows(rows: int, features: int):
+    rng = np.random.default_rng(0)
+    return [
+        [app_schemas_impl.ParameterImpl(name=f'feature_{i}', value=float(value)) for i, value in enumerate(row)]
+        for row in rng.random((rows, features))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of xgboost scoring')
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--nthread', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    binary = get_binary(args.features, args.trees)
+    dmatrix = get_executor(binary, args.features, False, args.nthread)
+    inplace = get_executor(binary, args.features, True, args.nthread)
+
+    print(f'{"rows":>8} {"DMatrix (ms)":>14} {"inplace (ms)":>14} {"speedup":>9}')
+    for rows in args.rows:
+        request = get_rows(rows, args.features)
+        assert np.allclose(
+            dmatrix.predict(request)['result']['predictions'], inplace.predict(request)['result']['predictions'])
+        number = max(1, 2000 // rows)
+        timings = []
+        for executor in (dmatrix, inplace):
+            best = min(timeit.repeat(lambda: executor.predict(request), number=number, repeat=args.repeat))
+            timings.append(best / number * 1000)
+        print(f'{rows:>8} {timings[0]:>14.3f} {timings[1]:>14.3f} {timings[0] / timings[1]:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()